@@ -0,0 +1,89 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / 'src'))
+
+# Base descartable: se crea antes de importar la configuración de la app
+_tmpdir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmpdir}/benchmark.db"
+
+import orjson
+
+from api.models import Cliente, MantenimientoPreventivo, Sucursal
+from config.database import SessionLocal, bootstrap_schema
+from services.cumplimiento import get_cumplimiento_preventivos
+from services.mantenimientos_preventivos import FRECUENCIA_PERIODOS, period_start
+
+FRECUENCIAS = [key.capitalize() for key in FRECUENCIA_PERIODOS]
+
+
+def seed(db, sucursales: int, desde: date, hasta: date) -> None:
+    cliente = Cliente(nombre="Bench", contacto="Bench", email="bench@example.com")
+    db.add(cliente)
+    db.flush()
+    db.bulk_insert_mappings(Sucursal, [
+        {
+            "nombre": f"Sucursal {i}",
+            "zona": f"Zona {i % 10}",
+            "direccion": "Dir",
+            "superficie": "100",
+            "cliente_id": cliente.id,
+            "frecuencia_preventivo": FRECUENCIAS[i % len(FRECUENCIAS)],
+        }
+        for i in range(sucursales)
+    ])
+    preventivos = []
+    for sucursal_id in range(1, sucursales + 1):
+        frecuencia = FRECUENCIAS[(sucursal_id - 1) % len(FRECUENCIAS)]
+        months = FRECUENCIA_PERIODOS[frecuencia.lower()]
+        index = desde.year * 12
+        while index <= hasta.year * 12 + hasta.month - 1:
+            fecha = date(index // 12, index % 12 + 1, 10)
+            # Uno de cada cinco períodos queda sin preventivo y uno de cada tres sin cerrar
+            if (sucursal_id + index) % 5:
+                preventivos.append({
+                    "cliente_id": cliente.id,
+                    "sucursal_id": sucursal_id,
+                    "frecuencia": frecuencia,
+                    "fecha_apertura": fecha,
+                    "fecha_cierre": fecha if (sucursal_id + index) % 3 else None,
+                    "estado": "Pendiente",
+                    "period_start": period_start(fecha, frecuencia),
+                })
+            index += months
+    db.bulk_insert_mappings(MantenimientoPreventivo, preventivos)
+    db.commit()
+    print(f"{sucursales} sucursales, {len(preventivos)} preventivos")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Mide la matriz de cumplimiento de preventivos")
+    parser.add_argument("--sucursales", type=int, default=3000)
+    parser.add_argument("--anios", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    hasta = date(2024, 12, 31)
+    desde = date(hasta.year - args.anios + 1, 1, 1)
+    bootstrap_schema()
+    db = SessionLocal()
+    seed(db, args.sucursales, desde, hasta)
+    db.close()
+
+    timings = []
+    for _ in range(args.repeat):
+        db = SessionLocal()
+        try:
+            start = time.perf_counter()
+            payload = orjson.dumps(get_cumplimiento_preventivos(db, {"type": "usuario"}, desde=desde, hasta=hasta))
+            timings.append(time.perf_counter() - start)
+        finally:
+            db.close()
+    print(f"matriz + orjson: {min(timings) * 1000:.0f} ms, {len(payload) / 1024:.0f} KiB")
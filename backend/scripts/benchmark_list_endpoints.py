@@ -0,0 +1,94 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / 'src'))
+
+# Base descartable: se crea antes de importar la configuración de la app
+_tmpdir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmpdir}/benchmark.db"
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import selectinload
+
+from api.models import Cliente, MantenimientoCorrectivo, MantenimientoCorrectivoFoto, Sucursal
+from config.database import SessionLocal, bootstrap_schema
+from controllers.mantenimientos_correctivos import _correctivo_to_dict
+from services.mantenimientos_correctivos import get_mantenimientos_correctivos_rows
+
+
+def seed(db, count: int) -> None:
+    cliente = Cliente(nombre="Bench", contacto="Bench", email="bench@example.com")
+    db.add(cliente)
+    db.flush()
+    sucursal = Sucursal(nombre="Central", zona="Norte", direccion="Dir", superficie="100", cliente_id=cliente.id)
+    db.add(sucursal)
+    db.flush()
+    db.bulk_insert_mappings(MantenimientoCorrectivo, [
+        {
+            "cliente_id": cliente.id,
+            "sucursal_id": sucursal.id,
+            "fecha_apertura": date(2020, 1, 1) + timedelta(days=i % 1500),
+            "numero_caso": f"NC-{i}",
+            "incidente": "Pérdida de agua",
+            "rubro": "Otros",
+            "estado": "Pendiente",
+            "prioridad": "Media",
+        }
+        for i in range(count)
+    ])
+    db.bulk_insert_mappings(MantenimientoCorrectivoFoto, [
+        {"mantenimiento_id": i, "url": f"https://storage.example.com/fotos/{i}.jpg"}
+        for i in range(1, count + 1, 2)
+    ])
+    db.commit()
+
+
+def orm_payload(db) -> bytes:
+    # Camino anterior: objetos ORM, dicts en el controller y el encoder genérico de FastAPI
+    mantenimientos = db.query(MantenimientoCorrectivo).options(selectinload(MantenimientoCorrectivo.fotos)).all()
+    items = [_correctivo_to_dict(m) for m in mantenimientos]
+    return json.dumps(jsonable_encoder(items), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def rows_payload(db) -> bytes:
+    return orjson.dumps(get_mantenimientos_correctivos_rows(db))
+
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        db = SessionLocal()
+        try:
+            start = time.perf_counter()
+            fn(db)
+            timings.append(time.perf_counter() - start)
+        finally:
+            db.close()
+    return min(timings)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compara el listado de correctivos ORM + JSON contra columnas + orjson")
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    bootstrap_schema()
+    db = SessionLocal()
+    seed(db, args.rows)
+    db.close()
+
+    before = best_of(orm_payload, args.repeat)
+    after = best_of(rows_payload, args.repeat)
+    print(f"{args.rows} mantenimientos")
+    print(f"ORM + jsonable_encoder: {before * 1000:.0f} ms")
+    print(f"columnas + orjson:      {after * 1000:.0f} ms ({before / after:.1f}x)")
@@ -0,0 +1,15 @@
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / 'src'))
+
+from config.database import bootstrap_schema
+
+if __name__ == '__main__':
+    applied = bootstrap_schema()
+    if applied:
+        print(f"Migraciones aplicadas: {', '.join(str(version) for version in applied)}")
+    else:
+        print("El esquema ya está actualizado")
@@ -0,0 +1,18 @@
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / 'src'))
+
+from config.database import SessionLocal
+from services.resumen_mensual import rebuild_resumen
+
+if __name__ == '__main__':
+    db = SessionLocal()
+    try:
+        filas = rebuild_resumen(db)
+        db.commit()
+    finally:
+        db.close()
+    print(f"Resumen mensual recalculado: {filas} filas")
@@ -0,0 +1,22 @@
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / 'src'))
+
+from config.database import SessionLocal
+from services.sheet_reconcile import reconcile_sheets
+
+if __name__ == '__main__':
+    tipos = sys.argv[1:] or None
+    db = SessionLocal()
+    try:
+        resultado = reconcile_sheets(db, tipos)
+    finally:
+        db.close()
+    for tipo, cambios in resultado.items():
+        print(
+            f"{tipo}: {cambios['filas']} filas, {cambios['actualizadas']} actualizadas, "
+            f"{cambios['agregadas']} agregadas, {cambios['eliminadas']} eliminadas"
+        )
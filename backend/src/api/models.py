@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, ForeignKey, Text, DateTime, func, Boolean
+from sqlalchemy import Column, Integer, String, Date, ForeignKey, Text, DateTime, func, Boolean, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.orm import declarative_base
 from datetime import datetime
@@ -51,6 +51,14 @@ class Cuadrilla(Base):
 
 class MantenimientoPreventivo(Base):
     __tablename__ = "mantenimiento_preventivo"
+    __table_args__ = (
+        Index("ix_mantenimiento_preventivo_sucursal_fecha", "sucursal_id", "fecha_apertura"),
+        Index("ix_mantenimiento_preventivo_cuadrilla_estado", "id_cuadrilla", "estado"),
+        Index("ix_mantenimiento_preventivo_estado_fecha", "estado", "fecha_apertura"),
+        Index("ix_mantenimiento_preventivo_fecha_apertura", "fecha_apertura"),
+        # Un preventivo por sucursal y período; la base rechaza los duplicados aun con altas concurrentes
+        Index("ix_mantenimiento_preventivo_sucursal_periodo", "sucursal_id", "period_start", unique=True),
+    )
     id = Column(Integer, primary_key=True)
     cliente_id = Column(Integer, ForeignKey("cliente.id"), nullable=False)
     sucursal_id = Column(Integer, ForeignKey("sucursal.id"), nullable=False)
@@ -60,6 +68,8 @@ class MantenimientoPreventivo(Base):
     fecha_cierre = Column(Date, nullable=True)
     extendido = Column(DateTime, nullable=True)
     estado = Column(String)
+    # Primer día del período de la frecuencia que contiene fecha_apertura
+    period_start = Column(Date, nullable=True)
 
     cliente = relationship("Cliente")
     sucursal = relationship("Sucursal", back_populates="mantenimientos_preventivos")
@@ -72,18 +82,26 @@ class MantenimientoPreventivo(Base):
     
 class MantenimientoPreventivoPlanilla(Base):
     __tablename__ = "mantenimiento_preventivo_planilla"
+    __table_args__ = (Index("ix_mantenimiento_preventivo_planilla_mantenimiento", "mantenimiento_id"),)
     id = Column(Integer, primary_key=True)
     mantenimiento_id = Column(Integer, ForeignKey("mantenimiento_preventivo.id"))
     url = Column(String, nullable=False)
 
 class MantenimientoPreventivoFoto(Base):
     __tablename__ = "mantenimiento_preventivo_foto"
+    __table_args__ = (Index("ix_mantenimiento_preventivo_foto_mantenimiento", "mantenimiento_id"),)
     id = Column(Integer, primary_key=True)
     mantenimiento_id = Column(Integer, ForeignKey("mantenimiento_preventivo.id"))
     url = Column(String, nullable=False)
 
 class MantenimientoCorrectivo(Base):
     __tablename__ = "mantenimiento_correctivo"
+    __table_args__ = (
+        Index("ix_mantenimiento_correctivo_sucursal_fecha", "sucursal_id", "fecha_apertura"),
+        Index("ix_mantenimiento_correctivo_cuadrilla_estado", "id_cuadrilla", "estado"),
+        Index("ix_mantenimiento_correctivo_estado_fecha", "estado", "fecha_apertura"),
+        Index("ix_mantenimiento_correctivo_fecha_apertura", "fecha_apertura"),
+    )
     id = Column(Integer, primary_key=True)
     cliente_id = Column(Integer, ForeignKey("cliente.id"), nullable=False)
     sucursal_id = Column(Integer, ForeignKey("sucursal.id"), nullable=False)
@@ -108,6 +126,7 @@ class MantenimientoCorrectivo(Base):
 
 class MantenimientoCorrectivoFoto(Base):
     __tablename__ = "mantenimiento_correctivo_foto"
+    __table_args__ = (Index("ix_mantenimiento_correctivo_foto_mantenimiento", "mantenimiento_id"),)
     id = Column(Integer, primary_key=True)
     mantenimiento_id = Column(Integer, ForeignKey("mantenimiento_correctivo.id"))
     url = Column(String, nullable=False)
@@ -122,6 +141,7 @@ class Usuario(Base):
 
 class CorrectivoSeleccionado(Base):
     __tablename__ = "correctivo_seleccionado"
+    __table_args__ = (Index("ix_correctivo_seleccionado_cuadrilla", "id_cuadrilla"),)
     id = Column(Integer, primary_key=True)
     id_cuadrilla = Column(Integer, ForeignKey("cuadrilla.id"))
     id_mantenimiento = Column(Integer, ForeignKey("mantenimiento_correctivo.id"))
@@ -133,6 +153,7 @@ class CorrectivoSeleccionado(Base):
     
 class PreventivoSeleccionado(Base):
     __tablename__ = "preventivo_seleccionado"
+    __table_args__ = (Index("ix_preventivo_seleccionado_cuadrilla", "id_cuadrilla"),)
     id = Column(Integer, primary_key=True)
     id_cuadrilla = Column(Integer, ForeignKey("cuadrilla.id"))
     id_mantenimiento = Column(Integer, ForeignKey("mantenimiento_preventivo.id"))
@@ -144,6 +165,7 @@ class PreventivoSeleccionado(Base):
 
 class PushSubscription(Base):
     __tablename__ = "push_subscription"
+    __table_args__ = (Index("ix_push_subscription_firebase_uid", "firebase_uid"),)
 
     id = Column(Integer, primary_key=True, index=True)
     firebase_uid = Column(String, nullable=False)
@@ -155,6 +177,7 @@ class PushSubscription(Base):
     
 class Notificacion_Correctivo(Base):
     __tablename__ = "notificacion_correctivo"
+    __table_args__ = (Index("ix_notificacion_correctivo_lookup", "firebase_uid", "id_mantenimiento", "mensaje", "created_at"),)
 
     id = Column(Integer, primary_key=True)
     firebase_uid = Column(String, nullable=False)
@@ -167,6 +190,7 @@ class Notificacion_Correctivo(Base):
 
 class Notificacion_Preventivo(Base):
     __tablename__ = "notificacion_preventivo"
+    __table_args__ = (Index("ix_notificacion_preventivo_lookup", "firebase_uid", "id_mantenimiento", "mensaje", "created_at"),)
 
     id = Column(Integer, primary_key=True)
     firebase_uid = Column(String, nullable=False)
@@ -178,6 +202,7 @@ class Notificacion_Preventivo(Base):
     mantenimiento_preventivo = relationship("MantenimientoPreventivo", back_populates="notificacion_preventivo")
 class MensajeCorrectivo(Base):
     __tablename__ = "mensaje_correctivo"
+    __table_args__ = (Index("ix_mensaje_correctivo_mantenimiento_fecha", "id_mantenimiento", "created_at"),)
     id = Column(Integer, primary_key=True)
     firebase_uid = Column(String)
     nombre_usuario = Column(String)
@@ -188,6 +213,7 @@ class MensajeCorrectivo(Base):
     
 class MensajePreventivo(Base):
     __tablename__ = "mensaje_preventivo"
+    __table_args__ = (Index("ix_mensaje_preventivo_mantenimiento_fecha", "id_mantenimiento", "created_at"),)
     id = Column(Integer, primary_key=True)
     firebase_uid = Column(String)
     nombre_usuario = Column(String)
@@ -198,8 +224,64 @@ class MensajePreventivo(Base):
 
 class ColumnPreference(Base):
     __tablename__ = "column_preference"
+    __table_args__ = (Index("ix_column_preference_uid_page", "firebase_uid", "page"),)
 
     id = Column(Integer, primary_key=True)
-    firebase_uid = Column(String, nullable=False, index=True)
+    firebase_uid = Column(String, nullable=False)
     page = Column(String, nullable=False)
     columns = Column(Text, nullable=False)
+
+class ResumenMensualMantenimiento(Base):
+    # Conteos por mes que se actualizan junto con cada alta, cambio o baja de mantenimiento.
+    # Los valores faltantes se guardan como "Sin zona", 0 o "" para que la clave única funcione en Postgres.
+    __tablename__ = "resumen_mensual_mantenimiento"
+    __table_args__ = (
+        UniqueConstraint(
+            "anio", "mes", "cliente_id", "zona", "id_cuadrilla", "tipo", "estado", "prioridad",
+            name="uq_resumen_mensual_mantenimiento_clave",
+        ),
+    )
+
+    id = Column(Integer, primary_key=True)
+    anio = Column(Integer, nullable=False)
+    mes = Column(Integer, nullable=False)
+    cliente_id = Column(Integer, nullable=False)
+    zona = Column(String, nullable=False)
+    id_cuadrilla = Column(Integer, nullable=False, default=0)
+    tipo = Column(String, nullable=False)
+    estado = Column(String, nullable=False, default="")
+    prioridad = Column(String, nullable=False, default="")
+    total = Column(Integer, nullable=False, default=0)
+    resueltos = Column(Integer, nullable=False, default=0)
+
+class SheetSyncOutbox(Base):
+    # Escrituras pendientes en Google Sheets, registradas en la misma transacción que el cambio del mantenimiento.
+    # Un worker en segundo plano las procesa y reintenta con espera creciente las que fallan.
+    __tablename__ = "sheet_sync_outbox"
+    __table_args__ = (Index("ix_sheet_sync_outbox_next_attempt", "next_attempt_at", "id"),)
+
+    id = Column(Integer, primary_key=True)
+    tipo = Column(String, nullable=False)
+    operacion = Column(String, nullable=False)
+    mantenimiento_id = Column(Integer, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class GaleriaPublicada(Base):
+    # Carpetas de GCS con o sin index.html publicado. Las actualiza el generador de galerías en cada subida o baja,
+    # así las filas de la planilla arman sus enlaces sin consultar GCS desde cualquier proceso.
+    __tablename__ = "galeria_publicada"
+
+    carpeta = Column(String, primary_key=True)
+    publicada = Column(Boolean, nullable=False, default=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class IdentityVersion(Base):
+    # Fila única que se incrementa con cada alta, cambio o baja de usuarios y cuadrillas.
+    # Cada proceso la compara con la última que vio para vaciar sus cachés de identidad.
+    __tablename__ = "identity_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
@@ -1,22 +1,27 @@
-from fastapi import FastAPI, Request, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from controllers import users, cuadrillas, clientes, sucursales, zonas, auth, mantenimientos_preventivos, mantenimientos_correctivos, maps, notificaciones, push, chats, preferences
-from config.database import get_db
-from services.auth import verify_user_token
+from controllers import users, cuadrillas, clientes, sucursales, zonas, auth, mantenimientos_preventivos, mantenimientos_correctivos, maps, notificaciones, push, chats, preferences, internal, estadisticas
 from services.chat_ws import chat_manager
 from services.notification_ws import notification_manager
+from services.google_tokeninfo import google_tokeninfo
+from services.reportes import shutdown_report_executor
+from services.sheet_outbox import sheet_outbox_worker
 from auth.firebase import initialize_firebase
+from auth.middleware import AuthMiddleware
+from config.database import bootstrap_schema, dispose_async_engine
 from init_admin import init_admin
 from dotenv import load_dotenv
+import asyncio
 import os
-from starlette.responses import JSONResponse
 
 load_dotenv(dotenv_path="./env.config")
 FRONTEND_URL = os.getenv("FRONTEND_URL")
 EMAIL_ADMIN = os.getenv("EMAIL_ADMIN")
 NOMBRE_ADMIN = os.getenv("NOMBRE_ADMIN")
 PASSWORD_ADMIN = os.getenv("PASSWORD_ADMIN")
+# Desactivar cuando el esquema se prepara aparte con scripts/bootstrap_db.py
+DB_BOOTSTRAP_ON_STARTUP = os.getenv("DB_BOOTSTRAP_ON_STARTUP", "true").lower() == "true"
 DEFAULT_TEST_ENTITY = {
     "type": "usuario",
     "data": {
@@ -28,16 +33,27 @@ DEFAULT_TEST_ENTITY = {
     },
 }
 
+def startup():
+    """Bootstrap the schema and external clients before serving requests."""
+    if DB_BOOTSTRAP_ON_STARTUP:
+        bootstrap_schema()
+    if os.environ.get("TESTING") != "true" and os.environ.get("E2E_TESTING") != "true":
+        initialize_firebase()
+        init_admin(email=EMAIL_ADMIN, nombre=NOMBRE_ADMIN, password=PASSWORD_ADMIN)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    await asyncio.to_thread(startup)
+    if os.environ.get("TESTING") != "true":
+        sheet_outbox_worker.start()
     yield
+    await sheet_outbox_worker.stop()
+    await google_tokeninfo.aclose()
+    await asyncio.to_thread(shutdown_report_executor)
+    await dispose_async_engine()
 
 app = FastAPI(lifespan=lifespan)
 
-if os.environ.get("TESTING") != "true" and os.environ.get("E2E_TESTING") != "true":
-    initialize_firebase()
-    init_admin(email=EMAIL_ADMIN, nombre=NOMBRE_ADMIN, password=PASSWORD_ADMIN)
-
 # Configuración de CORS
 origins = [
     FRONTEND_URL,  # Origen del frontend
@@ -52,51 +68,7 @@ app.add_middleware(
 )
 
 # Middleware de autenticación
-@app.middleware("http")
-async def auth_middleware(request: Request, call_next):
-    if request.url.path == "/auth/verify":
-        return await call_next(request)
-    
-    # Allow OPTIONS requests for CORS preflight
-    if request.method == "OPTIONS":
-        return await call_next(request)
-    
-    if os.environ.get("TESTING") == "true":
-        request.state.current_entity = getattr(
-            request.app.state, "current_entity", DEFAULT_TEST_ENTITY
-        )
-        request.app.state.current_entity = DEFAULT_TEST_ENTITY
-    else:
-        token = request.headers.get("Authorization")
-        if token and token.startswith("Bearer "):
-            token = token.replace("Bearer ", "")
-            try:
-                db = next(get_db())
-                current_entity = verify_user_token(token, db)
-                request.state.current_entity = current_entity
-            except HTTPException as e:
-                return JSONResponse(
-                    content={"detail": e.detail},
-                    status_code=e.status_code
-                )
-            except Exception as e:
-                return JSONResponse(
-                    content={"detail": f"Error interno en la verificación del token: {str(e)}"},
-                    status_code=500
-                )
-            finally:
-                db.close()
-        else:
-            request.state.current_entity = None
-    
-    try:
-        response = await call_next(request)
-        return response
-    except Exception as e:
-        return JSONResponse(
-            content={"detail": "Error interno en el procesamiento de la solicitud"},
-            status_code=500
-        )
+app.add_middleware(AuthMiddleware, default_test_entity=DEFAULT_TEST_ENTITY)
 
 @app.websocket("/ws/chat/{mantenimiento_id}")
 async def websocket_route(websocket: WebSocket, mantenimiento_id: int):
@@ -129,3 +101,5 @@ app.include_router(notificaciones.router)
 app.include_router(push.router)
 app.include_router(chats.router)
 app.include_router(preferences.router)
+app.include_router(internal.router)
+app.include_router(estadisticas.router)
@@ -122,6 +122,29 @@ class MantenimientoPreventivoCreate(BaseModel):
     fecha_apertura: date
     estado: Estado
 
+class PlanificacionAsignacion(BaseModel):
+    sucursal_id: int
+    id_cuadrilla: int
+
+class PlanificacionPreventivos(BaseModel):
+    fecha_apertura: date
+    estado: Estado = Estado.PENDIENTE
+    asignaciones: list[PlanificacionAsignacion] = []
+    autoasignar: bool = False
+
+class FiltrosEstadisticas(BaseModel):
+    cliente_id: Optional[int] = None
+    zona: Optional[str] = None
+    sucursal_id: Optional[int] = None
+    id_cuadrilla: Optional[int] = None
+    estado: Optional[str] = None
+
+class ReporteEstadisticas(BaseModel):
+    meses: list[int] = []
+    anios: list[int] = []
+    # Filtros propios de cada sección de la pantalla de estadísticas
+    secciones: dict[str, FiltrosEstadisticas] = {}
+
 # Esquemas para Mantenimiento Correctivo
 class MantenimientoCorrectivoCreate(BaseModel):
     cliente_id: int
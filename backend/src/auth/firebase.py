@@ -11,6 +11,3 @@ def initialize_firebase():
             cred = credentials.Certificate(json.loads(os.getenv("FIREBASE_CREDENTIALS")))
         firebase_admin.initialize_app(cred, {'databaseURL': os.getenv("FIREBASE_DATABASE_URL")})
     return firebase_admin.get_app()
-
-# Inicializar Firebase al importar el módulo
-initialize_firebase()
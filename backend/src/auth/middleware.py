@@ -0,0 +1,106 @@
+import json
+import os
+from typing import Callable, Optional
+
+from fastapi import HTTPException
+
+from auth.token_verifier import firebase_token_verifier
+from config.database import SessionLocal
+from services.auth import verify_user_token
+
+PUBLIC_PATHS = {"/auth/verify"}
+
+
+class LazyEntityState(dict):
+    """Request state whose `current_entity` is resolved on first read."""
+
+    def __init__(self, initial: dict, resolver: Callable[["LazyEntityState"], Optional[dict]]) -> None:
+        super().__init__(initial)
+        self._resolver = resolver
+
+    def __getitem__(self, key):
+        if key == "current_entity" and not dict.__contains__(self, key):
+            dict.__setitem__(self, key, self._resolver(self))
+        return dict.__getitem__(self, key)
+
+
+def _bearer_token(scope) -> Optional[str]:
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            header = value.decode("latin-1")
+            if header.startswith("Bearer "):
+                return header.replace("Bearer ", "")
+            return None
+    return None
+
+
+def resolve_entity(token: str, state: dict) -> dict:
+    """Verify a bearer token, reusing the request's DB session when the endpoint opened one."""
+    db = state.get("db_session")
+    owns_session = db is None
+    if owns_session:
+        db = SessionLocal()
+    try:
+        return verify_user_token(token, db)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error interno en la verificación del token: {str(e)}")
+    finally:
+        if owns_session:
+            db.close()
+
+
+class AuthMiddleware:
+    """ASGI middleware that exposes `request.state.current_entity` lazily."""
+
+    def __init__(self, app, default_test_entity: Optional[dict] = None) -> None:
+        self.app = app
+        self.default_test_entity = default_test_entity
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if scope["path"] in PUBLIC_PATHS or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        state = scope.setdefault("state", {})
+        if os.environ.get("TESTING") == "true":
+            app_state = scope["app"].state
+            state["current_entity"] = getattr(app_state, "current_entity", self.default_test_entity)
+            app_state.current_entity = self.default_test_entity
+        else:
+            token = _bearer_token(scope)
+            if not token:
+                state["current_entity"] = None
+            else:
+                # Si hace falta refrescar certificados se hace fuera del event loop. Los tokens cacheados
+                # también se resuelven con la base, que indica si otro proceso cambió alguna identidad.
+                await firebase_token_verifier.ensure_keys(token)
+                scope["state"] = LazyEntityState(state, lambda lazy_state: resolve_entity(token, lazy_state))
+
+        response_started = False
+
+        async def send_wrapper(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            if response_started:
+                raise
+            body = json.dumps({"detail": "Error interno en el procesamiento de la solicitud"}).encode("utf-8")
+            await send({
+                "type": "http.response.start",
+                "status": 500,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode("latin-1")),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,165 @@
+import asyncio
+import base64
+import json
+import os
+import re
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+import requests
+from google.auth import jwt
+
+FIREBASE_CERTS_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+FIREBASE_ISSUER_PREFIX = "https://securetoken.google.com/"
+FIREBASE_CLOCK_SKEW_SECONDS = int(os.getenv("FIREBASE_CLOCK_SKEW_SECONDS", "10"))
+# Intervalo mínimo entre refrescos forzados por un "kid" desconocido
+MIN_FORCED_REFRESH_INTERVAL = 60
+DEFAULT_CERTS_MAX_AGE = 3600
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+def _fetch_certs(url: str) -> Tuple[dict, dict]:
+    response = requests.get(url, timeout=10)
+    response.raise_for_status()
+    return response.json(), dict(response.headers)
+
+
+def _cache_lifetime(headers: dict) -> int:
+    normalized = {key.lower(): value for key, value in headers.items()}
+    match = _MAX_AGE_RE.search(normalized.get("cache-control", ""))
+    if not match:
+        return DEFAULT_CERTS_MAX_AGE
+    max_age = int(match.group(1))
+    try:
+        max_age -= int(normalized.get("age", 0))
+    except ValueError:
+        pass
+    return max(max_age, 0)
+
+
+def _default_project_id() -> Optional[str]:
+    project_id = os.getenv("FIREBASE_PROJECT_ID")
+    if project_id:
+        return project_id
+    credentials = os.getenv("FIREBASE_CREDENTIALS")
+    if not credentials:
+        return None
+    try:
+        return json.loads(credentials).get("project_id")
+    except (ValueError, AttributeError):
+        return None
+
+
+class FirebaseTokenVerifier:
+    """Verify Firebase ID tokens locally against cached Google signing certificates."""
+
+    def __init__(
+        self,
+        project_id: Optional[str] = None,
+        clock_skew_seconds: int = FIREBASE_CLOCK_SKEW_SECONDS,
+        certs_url: str = FIREBASE_CERTS_URL,
+        fetch: Callable[[str], Tuple[dict, dict]] = _fetch_certs,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._project_id = project_id
+        self.clock_skew_seconds = clock_skew_seconds
+        self.certs_url = certs_url
+        self._fetch = fetch
+        self._clock = clock
+        self._certs: dict = {}
+        self._expires_at = 0.0
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def project_id(self) -> Optional[str]:
+        if self._project_id is None:
+            self._project_id = _default_project_id()
+        return self._project_id
+
+    def keys_fresh(self) -> bool:
+        """Return True while the cached certificates are within their max-age."""
+        return bool(self._certs) and self._clock() < self._expires_at
+
+    def needs_refresh(self, token: Optional[str] = None) -> bool:
+        """Return True if verifying `token` would require fetching certificates."""
+        if not self.keys_fresh():
+            return True
+        if token is None:
+            return False
+        kid = self._key_id(token)
+        return (
+            kid is not None
+            and kid not in self._certs
+            and self._clock() - self._last_refresh >= MIN_FORCED_REFRESH_INTERVAL
+        )
+
+    def refresh_keys(self, force: bool = False) -> dict:
+        """Fetch Google's certificates unless a fresh copy is already cached."""
+        with self._lock:
+            if self.keys_fresh() and (
+                not force or self._clock() - self._last_refresh < MIN_FORCED_REFRESH_INTERVAL
+            ):
+                return self._certs
+            certs, headers = self._fetch(self.certs_url)
+            now = self._clock()
+            self._certs = certs
+            self._expires_at = now + _cache_lifetime(headers)
+            self._last_refresh = now
+            return self._certs
+
+    async def ensure_keys(self, token: Optional[str] = None) -> None:
+        """Refresh the certificates in a worker thread when `token` would need it."""
+        if not self.project_id or not self.needs_refresh(token):
+            return
+        await asyncio.to_thread(self.refresh_keys, bool(self._certs))
+
+    def verify(self, token: str) -> dict:
+        """Verify signature and Firebase claims, returning the decoded payload with `uid`."""
+        if not self.project_id:
+            raise ValueError("No se configuró el project_id de Firebase")
+        if self.needs_refresh(token):
+            self.refresh_keys(force=bool(self._certs))
+        payload = jwt.decode(
+            token,
+            certs=self._certs,
+            audience=self.project_id,
+            clock_skew_in_seconds=self.clock_skew_seconds,
+        )
+        self._verify_claims(payload)
+        decoded = dict(payload)
+        decoded["uid"] = payload["sub"]
+        return decoded
+
+    def clear(self) -> None:
+        """Forget the cached certificates."""
+        with self._lock:
+            self._certs = {}
+            self._expires_at = 0.0
+            self._last_refresh = 0.0
+
+    def _verify_claims(self, payload: dict) -> None:
+        expected_issuer = FIREBASE_ISSUER_PREFIX + self.project_id
+        if payload.get("iss") != expected_issuer:
+            raise ValueError(f"Issuer inválido: se esperaba {expected_issuer}")
+        subject = payload.get("sub")
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise ValueError("El claim sub del token es inválido")
+        auth_time = payload.get("auth_time")
+        if auth_time is not None and auth_time > self._clock() + self.clock_skew_seconds:
+            raise ValueError("Token used too early: auth_time está en el futuro")
+
+    @staticmethod
+    def _key_id(token: str) -> Optional[str]:
+        try:
+            segment = token.split(".")[0]
+            header = json.loads(base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4)))
+        except (ValueError, IndexError):
+            return None
+        if not isinstance(header, dict):
+            return None
+        return header.get("kid")
+
+firebase_token_verifier = FirebaseTokenVerifier()
@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from config.database import get_db
+from auth.token_verifier import firebase_token_verifier
 from services.auth import verify_user_token, create_firebase_user, update_firebase_user, delete_firebase_user, create_firebase_cuadrilla, update_firebase_cuadrilla, delete_firebase_cuadrilla
 from api.schemas import UserCreate, UserUpdate, CuadrillaCreate, CuadrillaUpdate
 
@@ -11,13 +12,14 @@ security = HTTPBearer()
 @router.post("/verify")
 async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
     token = credentials.credentials
+    await firebase_token_verifier.ensure_keys(token)
     entity = verify_user_token(token, db)
     return entity
 
 @router.post("/create-user", response_model=dict)
 async def create_user(user_data: UserCreate, request: Request, db: Session = Depends(get_db)):
     current_entity = request.state.current_entity
-    new_user = create_firebase_user(user_data, db, current_entity, user_data.id_token)
+    new_user = await create_firebase_user(user_data, db, current_entity, user_data.id_token)
     return {"id": new_user.id, "nombre": new_user.nombre, "email": new_user.email, "rol": new_user.rol}
 
 @router.put("/update-user/{user_id}", response_model=dict)
@@ -35,7 +37,7 @@ async def delete_user(user_id: int, request: Request, db: Session = Depends(get_
 @router.post("/create-cuadrilla", response_model=dict)
 async def create_cuadrilla(cuadrilla_data: CuadrillaCreate, request: Request, db: Session = Depends(get_db)):
     current_entity = request.state.current_entity
-    new_cuadrilla = create_firebase_cuadrilla(cuadrilla_data, db, current_entity, cuadrilla_data.id_token)
+    new_cuadrilla = await create_firebase_cuadrilla(cuadrilla_data, db, current_entity, cuadrilla_data.id_token)
     return {"id": new_cuadrilla.id, "nombre": new_cuadrilla.nombre, "email": new_cuadrilla.email, "zona": new_cuadrilla.zona}
 
 @router.put("/update-cuadrilla/{cuadrilla_id}", response_model=dict)
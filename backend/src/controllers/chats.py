@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Depends, Request, UploadFile, Form, File
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from config.database import get_db
+from config.database import get_async_db, get_db
 from services.chats import get_chat_correctivo, get_chat_preventivo, send_message_correctivo, send_message_preventivo
 from typing import List, Optional
 
@@ -12,7 +14,7 @@ def chat_correctivo_get(mantenimiento_id: int, request: Request, db_session: Ses
     chat = get_chat_correctivo(db_session, mantenimiento_id, current_entity)
     if isinstance(chat, dict):
         return []
-    return [
+    return ORJSONResponse([
         {
             "id": message.id,
             "firebase_uid": message.firebase_uid,
@@ -23,7 +25,7 @@ def chat_correctivo_get(mantenimiento_id: int, request: Request, db_session: Ses
             "fecha": message.created_at,
         }
         for message in chat
-    ]
+    ])
 
 @router.get("/preventivo/{mantenimiento_id}", response_model=List[dict])
 def chat_preventivo_get(mantenimiento_id: int, request: Request, db_session: Session = Depends(get_db)):
@@ -31,7 +33,7 @@ def chat_preventivo_get(mantenimiento_id: int, request: Request, db_session: Ses
     chat = get_chat_preventivo(db_session, mantenimiento_id, current_entity)
     if isinstance(chat, dict):
         return []
-    return [
+    return ORJSONResponse([
         {
             "id": message.id,
             "firebase_uid": message.firebase_uid,
@@ -42,7 +44,7 @@ def chat_preventivo_get(mantenimiento_id: int, request: Request, db_session: Ses
             "fecha": message.created_at,
         }
         for message in chat
-    ]
+    ])
 
 @router.post("/message-correctivo/{mantenimiento_id}", response_model=dict)
 async def correctivo_message_send(
@@ -52,7 +54,7 @@ async def correctivo_message_send(
     nombre_usuario: str = Form(...),
     texto: Optional[str] = Form(None),
     archivo: Optional[UploadFile] = File(None),
-    db_session: Session = Depends(get_db)
+    db_session: AsyncSession = Depends(get_async_db)
 ):
     current_entity = request.state.current_entity
     new_message = await send_message_correctivo(
@@ -82,7 +84,7 @@ async def preventivo_message_send(
     nombre_usuario: str = Form(...),
     texto: Optional[str] = Form(None),
     archivo: Optional[UploadFile] = File(None),
-    db_session: Session = Depends(get_db)
+    db_session: AsyncSession = Depends(get_async_db)
 ):
     current_entity = request.state.current_entity
     new_message = await send_message_preventivo(
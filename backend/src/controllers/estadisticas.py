@@ -0,0 +1,94 @@
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from config.database import get_db
+from services.cumplimiento import get_cumplimiento_preventivos
+from api.schemas import ReporteEstadisticas
+from services.estadisticas import get_estadisticas, get_estadisticas_por_seccion
+from services.reportes import iter_estadisticas_csv, render_pdf_in_worker
+from datetime import date
+from typing import List, Optional
+
+router = APIRouter(prefix="/estadisticas", tags=["estadisticas"])
+
+def _filtros(
+    meses: Optional[List[int]] = Query(None),
+    anios: Optional[List[int]] = Query(None),
+    cliente_id: Optional[int] = None,
+    zona: Optional[str] = None,
+    sucursal_id: Optional[int] = None,
+    id_cuadrilla: Optional[int] = None,
+    estado: Optional[str] = None,
+):
+    return dict(
+        meses=meses,
+        anios=anios,
+        cliente_id=cliente_id,
+        zona=zona,
+        sucursal_id=sucursal_id,
+        id_cuadrilla=id_cuadrilla,
+        estado=estado,
+    )
+
+@router.get("/", response_model=dict)
+def estadisticas_get(
+    request: Request,
+    filtros: dict = Depends(_filtros),
+    secciones: Optional[List[str]] = Query(None),
+    db: Session = Depends(get_db),
+):
+    current_entity = request.state.current_entity
+    return get_estadisticas(db, current_entity, secciones=secciones, **filtros)
+
+@router.get("/reporte.csv")
+def estadisticas_csv(request: Request, filtros: dict = Depends(_filtros), db: Session = Depends(get_db)):
+    current_entity = request.state.current_entity
+    data = get_estadisticas(db, current_entity, **filtros)
+    return StreamingResponse(
+        iter_estadisticas_csv(data),
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": 'attachment; filename="estadisticas.csv"'},
+    )
+
+@router.get("/reporte.pdf")
+async def estadisticas_pdf(request: Request, filtros: dict = Depends(_filtros), db: Session = Depends(get_db)):
+    current_entity = request.state.current_entity
+    data = await run_in_threadpool(get_estadisticas, db, current_entity, **filtros)
+    pdf = await render_pdf_in_worker(data, filtros)
+    return Response(
+        content=pdf,
+        media_type="application/pdf",
+        headers={"Content-Disposition": 'attachment; filename="estadisticas.pdf"'},
+    )
+
+@router.post("/reporte.pdf")
+async def estadisticas_pdf_por_seccion(reporte: ReporteEstadisticas, request: Request, db: Session = Depends(get_db)):
+    current_entity = request.state.current_entity
+    secciones = {seccion: filtros.model_dump() for seccion, filtros in reporte.secciones.items()}
+    data = await run_in_threadpool(
+        get_estadisticas_por_seccion, db, current_entity, secciones, meses=reporte.meses, anios=reporte.anios
+    )
+    # El encabezado del PDF lista los filtros de cada sección
+    filtros = {"meses": reporte.meses, "anios": reporte.anios}
+    for seccion, valores in secciones.items():
+        filtros.update({f"{seccion}.{key}": value for key, value in valores.items()})
+    pdf = await render_pdf_in_worker(data, filtros)
+    return Response(
+        content=pdf,
+        media_type="application/pdf",
+        headers={"Content-Disposition": 'attachment; filename="estadisticas.pdf"'},
+    )
+
+@router.get("/cumplimiento-preventivos")
+def estadisticas_cumplimiento_preventivos(
+    request: Request,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    cliente_id: Optional[int] = None,
+    zona: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    current_entity = request.state.current_entity
+    matriz = get_cumplimiento_preventivos(db, current_entity, desde=desde, hasta=hasta, cliente_id=cliente_id, zona=zona)
+    return ORJSONResponse(matriz)
@@ -0,0 +1,18 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy.orm import Session
+from config.database import get_db
+from services.internal_stats import get_internal_stats
+from services.sheet_reconcile import reconcile_sheets_for
+
+router = APIRouter(prefix="/internal", tags=["internal"])
+
+@router.get("/stats", response_model=dict)
+def internal_stats_get(request: Request):
+    current_entity = request.state.current_entity
+    return get_internal_stats(current_entity)
+
+@router.post("/sheets/reconcile", response_model=dict)
+def internal_sheets_reconcile(request: Request, tipo: Optional[str] = None, db: Session = Depends(get_db)):
+    current_entity = request.state.current_entity
+    return reconcile_sheets_for(db, current_entity, tipo)
@@ -1,58 +1,80 @@
-from fastapi import APIRouter, Depends, Request, UploadFile, Form
+from fastapi import APIRouter, Depends, Request, UploadFile, Form, Query
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from config.database import get_db
-from services.mantenimientos_correctivos import get_mantenimientos_correctivos, get_mantenimiento_correctivo, create_mantenimiento_correctivo, update_mantenimiento_correctivo, delete_mantenimiento_correctivo, delete_mantenimiento_planilla, delete_mantenimiento_photo
+from config.database import get_async_db, get_db
+from services.mantenimientos_correctivos import get_mantenimientos_correctivos_rows, get_mantenimientos_correctivos_rows_page, get_mantenimiento_correctivo, create_mantenimiento_correctivo, update_mantenimiento_correctivo, delete_mantenimiento_correctivo, delete_mantenimiento_planilla, delete_mantenimiento_photo
 from api.schemas import MantenimientoCorrectivoCreate
-from typing import List, Optional
+from services.pagination import MAX_PAGE_SIZE
+from services.exportaciones import FORMATOS, ensure_export_access, iter_export
+from typing import List, Optional, Union
 from datetime import date, datetime
 
 router = APIRouter(prefix="/mantenimientos-correctivos", tags=["mantenimientos-correctivos"])
 
-@router.get("/", response_model=List[dict])
-def mantenimientos_correctivos_get(db: Session = Depends(get_db)):
-    mantenimientos = get_mantenimientos_correctivos(db)
-    return [
-        {
-            "id": m.id,
-            "cliente_id": m.cliente_id,
-            "sucursal_id": m.sucursal_id,
-            "id_cuadrilla": m.id_cuadrilla,
-            "fecha_apertura": m.fecha_apertura,
-            "fecha_cierre": m.fecha_cierre,
-            "numero_caso": m.numero_caso,
-            "incidente": m.incidente,
-            "rubro": m.rubro,
-            "planilla": m.planilla,
-            "fotos": [foto.url for foto in m.fotos],
-            "estado": m.estado,
-            "prioridad": m.prioridad,
-            "extendido": m.extendido
-        }
-        for m in mantenimientos
-    ]
+def _correctivo_to_dict(m):
+    return {
+        "id": m.id,
+        "cliente_id": m.cliente_id,
+        "sucursal_id": m.sucursal_id,
+        "id_cuadrilla": m.id_cuadrilla,
+        "fecha_apertura": m.fecha_apertura,
+        "fecha_cierre": m.fecha_cierre,
+        "numero_caso": m.numero_caso,
+        "incidente": m.incidente,
+        "rubro": m.rubro,
+        "planilla": m.planilla,
+        "fotos": [foto.url for foto in m.fotos],
+        "estado": m.estado,
+        "prioridad": m.prioridad,
+        "extendido": m.extendido
+    }
+
+@router.get("/", response_model=Union[List[dict], dict])
+def mantenimientos_correctivos_get(
+    estado: Optional[str] = None,
+    prioridad: Optional[str] = None,
+    id_cuadrilla: Optional[int] = None,
+    sucursal_id: Optional[int] = None,
+    cliente_id: Optional[int] = None,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    filters = dict(
+        estado=estado,
+        prioridad=prioridad,
+        id_cuadrilla=id_cuadrilla,
+        sucursal_id=sucursal_id,
+        cliente_id=cliente_id,
+        fecha_desde=fecha_desde,
+        fecha_hasta=fecha_hasta,
+    )
+    # Sin limit ni cursor se mantiene la respuesta como lista para los clientes existentes
+    if limit is None and cursor is None:
+        return ORJSONResponse(get_mantenimientos_correctivos_rows(db, **filters))
+    items, next_cursor = get_mantenimientos_correctivos_rows_page(db, limit, cursor, **filters)
+    return ORJSONResponse({"items": items, "next_cursor": next_cursor})
+
+@router.get("/export")
+def mantenimientos_correctivos_export(request: Request, formato: str = "ndjson", gzip: bool = False):
+    ensure_export_access(request.state.current_entity, formato)
+    extension = f"{formato}.gz" if gzip else formato
+    return StreamingResponse(
+        iter_export("correctivos", formato, gzip),
+        media_type="application/gzip" if gzip else FORMATOS[formato],
+        headers={"Content-Disposition": f'attachment; filename="mantenimientos_correctivos.{extension}"'},
+    )
 
 @router.get("/{mantenimiento_id}", response_model=dict)
 def mantenimiento_correctivo_get(mantenimiento_id: int, db: Session = Depends(get_db)):
     mantenimiento = get_mantenimiento_correctivo(db, mantenimiento_id)
-    return {
-        "id": mantenimiento.id,
-        "cliente_id": mantenimiento.cliente_id,
-        "sucursal_id": mantenimiento.sucursal_id,
-        "id_cuadrilla": mantenimiento.id_cuadrilla,
-        "fecha_apertura": mantenimiento.fecha_apertura,
-        "fecha_cierre": mantenimiento.fecha_cierre,
-        "numero_caso": mantenimiento.numero_caso,
-        "incidente": mantenimiento.incidente,
-        "rubro": mantenimiento.rubro,
-        "planilla": mantenimiento.planilla,
-        "fotos": [foto.url for foto in mantenimiento.fotos],
-        "estado": mantenimiento.estado,
-        "prioridad": mantenimiento.prioridad,
-        "extendido": mantenimiento.extendido
-    }
+    return _correctivo_to_dict(mantenimiento)
 
 @router.post("/", response_model=dict)
-async def mantenimiento_correctivo_create(mantenimiento: MantenimientoCorrectivoCreate, request: Request, db: Session = Depends(get_db)):
+async def mantenimiento_correctivo_create(mantenimiento: MantenimientoCorrectivoCreate, request: Request, db: AsyncSession = Depends(get_async_db)):
     current_entity = request.state.current_entity
     new_mantenimiento = await create_mantenimiento_correctivo(
         db,
@@ -97,7 +119,7 @@ async def mantenimiento_correctivo_update(
     estado: Optional[str] = Form(None),
     prioridad: Optional[str] = Form(None),
     extendido: Optional[datetime] = Form(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     current_entity = request.state.current_entity
     updated_mantenimiento = await update_mantenimiento_correctivo(
@@ -1,52 +1,75 @@
-from fastapi import APIRouter, Depends, Request, UploadFile, Form
+from fastapi import APIRouter, Depends, Request, UploadFile, Form, Query
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from config.database import get_db
-from services.mantenimientos_preventivos import get_mantenimientos_preventivos, get_mantenimiento_preventivo, create_mantenimiento_preventivo, update_mantenimiento_preventivo, delete_mantenimiento_preventivo, delete_mantenimiento_planilla, delete_mantenimiento_photo
-from api.schemas import MantenimientoPreventivoCreate
-from typing import List, Optional
+from config.database import get_async_db, get_db
+from services.mantenimientos_preventivos import get_mantenimientos_preventivos_rows, get_mantenimientos_preventivos_rows_page, get_mantenimiento_preventivo, create_mantenimiento_preventivo, planificar_preventivos, update_mantenimiento_preventivo, delete_mantenimiento_preventivo, delete_mantenimiento_planilla, delete_mantenimiento_photo
+from api.schemas import MantenimientoPreventivoCreate, PlanificacionPreventivos
+from services.pagination import MAX_PAGE_SIZE
+from services.exportaciones import FORMATOS, ensure_export_access, iter_export
+from typing import List, Optional, Union
 from datetime import date, datetime
 
 router = APIRouter(prefix="/mantenimientos-preventivos", tags=["mantenimientos-preventivos"])
 
-@router.get("/", response_model=List[dict])
-def mantenimientos_preventivos_get(db: Session = Depends(get_db)):
-    mantenimientos = get_mantenimientos_preventivos(db)
-    return [
-        {
-            "id": m.id,
-            "cliente_id": m.cliente_id,
-            "sucursal_id": m.sucursal_id,
-            "frecuencia": m.frecuencia,
-            "id_cuadrilla": m.id_cuadrilla,
-            "fecha_apertura": m.fecha_apertura,
-            "fecha_cierre": m.fecha_cierre,
-            "planillas": [planilla.url for planilla in m.planillas],
-            "fotos": [foto.url for foto in m.fotos],
-            "extendido": m.extendido,
-            "estado": m.estado
-        }
-        for m in mantenimientos
-    ]
+def _preventivo_to_dict(m):
+    return {
+        "id": m.id,
+        "cliente_id": m.cliente_id,
+        "sucursal_id": m.sucursal_id,
+        "frecuencia": m.frecuencia,
+        "id_cuadrilla": m.id_cuadrilla,
+        "fecha_apertura": m.fecha_apertura,
+        "fecha_cierre": m.fecha_cierre,
+        "planillas": [planilla.url for planilla in m.planillas],
+        "fotos": [foto.url for foto in m.fotos],
+        "extendido": m.extendido,
+        "estado": m.estado
+    }
+
+@router.get("/", response_model=Union[List[dict], dict])
+def mantenimientos_preventivos_get(
+    estado: Optional[str] = None,
+    id_cuadrilla: Optional[int] = None,
+    sucursal_id: Optional[int] = None,
+    cliente_id: Optional[int] = None,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    filters = dict(
+        estado=estado,
+        id_cuadrilla=id_cuadrilla,
+        sucursal_id=sucursal_id,
+        cliente_id=cliente_id,
+        fecha_desde=fecha_desde,
+        fecha_hasta=fecha_hasta,
+    )
+    # Sin limit ni cursor se mantiene la respuesta como lista para los clientes existentes
+    if limit is None and cursor is None:
+        return ORJSONResponse(get_mantenimientos_preventivos_rows(db, **filters))
+    items, next_cursor = get_mantenimientos_preventivos_rows_page(db, limit, cursor, **filters)
+    return ORJSONResponse({"items": items, "next_cursor": next_cursor})
+
+@router.get("/export")
+def mantenimientos_preventivos_export(request: Request, formato: str = "ndjson", gzip: bool = False):
+    ensure_export_access(request.state.current_entity, formato)
+    extension = f"{formato}.gz" if gzip else formato
+    return StreamingResponse(
+        iter_export("preventivos", formato, gzip),
+        media_type="application/gzip" if gzip else FORMATOS[formato],
+        headers={"Content-Disposition": f'attachment; filename="mantenimientos_preventivos.{extension}"'},
+    )
 
 @router.get("/{mantenimiento_id}", response_model=dict)
 def mantenimiento_preventivo_get(mantenimiento_id: int, db: Session = Depends(get_db)):
     mantenimiento = get_mantenimiento_preventivo(db, mantenimiento_id)
-    return {
-        "id": mantenimiento.id,
-        "cliente_id": mantenimiento.cliente_id,
-        "sucursal_id": mantenimiento.sucursal_id,
-        "frecuencia": mantenimiento.frecuencia,
-        "id_cuadrilla": mantenimiento.id_cuadrilla,
-        "fecha_apertura": mantenimiento.fecha_apertura,
-        "fecha_cierre": mantenimiento.fecha_cierre,
-        "planillas": [planilla.url for planilla in mantenimiento.planillas],
-        "fotos": [foto.url for foto in mantenimiento.fotos],
-        "extendido": mantenimiento.extendido,
-        "estado": mantenimiento.estado
-    }
+    return _preventivo_to_dict(mantenimiento)
 
 @router.post("/", response_model=dict)
-async def mantenimiento_preventivo_create(mantenimiento: MantenimientoPreventivoCreate, request: Request, db: Session = Depends(get_db)):
+async def mantenimiento_preventivo_create(mantenimiento: MantenimientoPreventivoCreate, request: Request, db: AsyncSession = Depends(get_async_db)):
     current_entity = request.state.current_entity
     new_mantenimiento = await create_mantenimiento_preventivo(
         db,
@@ -68,6 +91,18 @@ async def mantenimiento_preventivo_create(mantenimiento: MantenimientoPreventivo
         "estado": new_mantenimiento.estado
     }
 
+@router.post("/planificar", response_model=dict)
+async def mantenimientos_preventivos_planificar(planificacion: PlanificacionPreventivos, request: Request, db: AsyncSession = Depends(get_async_db)):
+    resultado = await planificar_preventivos(
+        db,
+        planificacion.fecha_apertura,
+        request.state.current_entity,
+        asignaciones={a.sucursal_id: a.id_cuadrilla for a in planificacion.asignaciones},
+        estado=planificacion.estado.value,
+        autoasignar=planificacion.autoasignar,
+    )
+    return ORJSONResponse(resultado)
+
 @router.put("/{mantenimiento_id}", response_model=dict)
 async def mantenimiento_preventivo_update(
     mantenimiento_id: int,
@@ -82,7 +117,7 @@ async def mantenimiento_preventivo_update(
     fotos: Optional[List[UploadFile]] = None,
     extendido: Optional[datetime] = Form(None),
     estado: Optional[str] = Form(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     current_entity = request.state.current_entity
     updated_mantenimiento = await update_mantenimiento_preventivo(
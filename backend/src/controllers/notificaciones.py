@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Depends, Request
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from config.database import get_db
+from config.database import get_async_db, get_db
 from services.notificaciones import get_notification_correctivo, get_notification_preventivo, notificacion_correctivo_leida, notificacion_preventivo_leida, delete_notificaciones, notify_nearby_maintenances, delete_notificacion
 from typing import List
 from api.schemas import NearbyNotificationCreate
@@ -10,12 +12,12 @@ router = APIRouter(prefix="/notificaciones", tags=["notificaciones"])
 @router.get("/correctivos/{firebase_uid}", response_model=List[dict])
 def notificaciones_correctivos_get(firebase_uid: str, db: Session = Depends(get_db)):
     notificaciones = get_notification_correctivo(db, firebase_uid)
-    return [{"id": n.id, "firebase_uid": n.firebase_uid, "id_mantenimiento": n.id_mantenimiento, "mensaje": n.mensaje, "leida": n.leida, "created_at": n.created_at} for n in notificaciones]
+    return ORJSONResponse([{"id": n.id, "firebase_uid": n.firebase_uid, "id_mantenimiento": n.id_mantenimiento, "mensaje": n.mensaje, "leida": n.leida, "created_at": n.created_at} for n in notificaciones])
 
 @router.get("/preventivos/{firebase_uid}", response_model=List[dict])
 def notificaciones_preventivos_get(firebase_uid: str, db: Session = Depends(get_db)):
     notificaciones = get_notification_preventivo(db, firebase_uid)
-    return [{"id": n.id, "firebase_uid": n.firebase_uid, "id_mantenimiento": n.id_mantenimiento, "mensaje": n.mensaje, "leida": n.leida, "created_at": n.created_at} for n in notificaciones]
+    return ORJSONResponse([{"id": n.id, "firebase_uid": n.firebase_uid, "id_mantenimiento": n.id_mantenimiento, "mensaje": n.mensaje, "leida": n.leida, "created_at": n.created_at} for n in notificaciones])
 
 @router.put("/correctivos/{id_notificacion}", response_model=dict)
 def notificacion_correctivo_put(id_notificacion: int, db: Session = Depends(get_db)):
@@ -32,7 +34,7 @@ def notificaciones_delete(firebase_uid: str, db: Session = Depends(get_db)):
     return delete_notificaciones(db, firebase_uid)
 
 @router.post("/nearby", response_model=dict)
-async def notificaciones_nearby(payload: NearbyNotificationCreate, request: Request, db: Session = Depends(get_db)):
+async def notificaciones_nearby(payload: NearbyNotificationCreate, request: Request, db: AsyncSession = Depends(get_async_db)):
     current = request.state.current_entity
     return await notify_nearby_maintenances(db, current, [m.model_dump() for m in payload.mantenimientos])
 
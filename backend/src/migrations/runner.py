@@ -0,0 +1,95 @@
+# Migraciones versionadas del esquema
+import importlib
+import pkgutil
+import re
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, exc, select
+from sqlalchemy.engine import Connection, Engine
+
+import migrations.versions as versions_package
+
+_VERSION_RE = re.compile(r"^v(\d{4})_(\w+)$")
+
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime(timezone=True), nullable=False),
+)
+
+
+class _AlreadyApplied(Exception):
+    """The version row was inserted by a concurrent runner."""
+
+
+class Migration:
+    """A numbered schema change loaded from `migrations/versions/vNNNN_<name>.py`.
+
+    Modules that set `TRANSACTIONAL = False` run on an autocommit connection,
+    for statements Postgres refuses inside a transaction block.
+    """
+
+    def __init__(self, version: int, name: str, upgrade: Callable[[Connection], None], transactional: bool = True) -> None:
+        self.version = version
+        self.name = name
+        self.upgrade = upgrade
+        self.transactional = transactional
+
+
+def discover_migrations() -> List[Migration]:
+    """Return every migration module in version order."""
+    found = []
+    for module_info in pkgutil.iter_modules(versions_package.__path__):
+        match = _VERSION_RE.match(module_info.name)
+        if not match:
+            continue
+        module = importlib.import_module(f"{versions_package.__name__}.{module_info.name}")
+        found.append(Migration(int(match.group(1)), match.group(2), module.upgrade, getattr(module, "TRANSACTIONAL", True)))
+    found.sort(key=lambda migration: migration.version)
+    return found
+
+
+def applied_versions(engine: Engine) -> set:
+    """Return the versions already recorded in `schema_migrations`."""
+    schema_migrations.create(engine, checkfirst=True)
+    with engine.connect() as connection:
+        return set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+
+def run_migrations(engine: Engine, target: Optional[int] = None) -> List[int]:
+    """Apply pending migrations up to `target` (all by default), each in its own transaction.
+
+    Non-transactional migrations must be idempotent: the version is recorded
+    after they finish, so a failure halfway leaves them to run again.
+    """
+    applied = applied_versions(engine)
+    executed = []
+    for migration in discover_migrations():
+        if migration.version in applied or (target is not None and migration.version > target):
+            continue
+        if not migration.transactional:
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+                migration.upgrade(connection)
+        try:
+            with engine.begin() as connection:
+                if migration.transactional:
+                    migration.upgrade(connection)
+                try:
+                    connection.execute(
+                        schema_migrations.insert().values(
+                            version=migration.version,
+                            name=migration.name,
+                            applied_at=datetime.now(timezone.utc),
+                        )
+                    )
+                except exc.IntegrityError as error:
+                    raise _AlreadyApplied() from error
+        except _AlreadyApplied:
+            # Otro proceso aplicó la misma versión en paralelo; los errores de la migración misma se propagan
+            continue
+        executed.append(migration.version)
+    return executed
@@ -0,0 +1,58 @@
+"""Índices compuestos para las consultas más frecuentes de los servicios.
+
+Las tablas creadas con `create_all` ya los traen desde `api/models.py`;
+esta migración los agrega a las bases existentes. En Postgres se crean con
+CONCURRENTLY para no bloquear escrituras en tablas grandes, lo que exige
+correr fuera de una transacción.
+"""
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+INDEXES = [
+    # Períodos de preventivos, mapas y listados filtrados
+    ("ix_mantenimiento_correctivo_sucursal_fecha", "mantenimiento_correctivo", ("sucursal_id", "fecha_apertura")),
+    ("ix_mantenimiento_correctivo_cuadrilla_estado", "mantenimiento_correctivo", ("id_cuadrilla", "estado")),
+    ("ix_mantenimiento_correctivo_estado_fecha", "mantenimiento_correctivo", ("estado", "fecha_apertura")),
+    ("ix_mantenimiento_correctivo_fecha_apertura", "mantenimiento_correctivo", ("fecha_apertura",)),
+    ("ix_mantenimiento_preventivo_sucursal_fecha", "mantenimiento_preventivo", ("sucursal_id", "fecha_apertura")),
+    ("ix_mantenimiento_preventivo_cuadrilla_estado", "mantenimiento_preventivo", ("id_cuadrilla", "estado")),
+    ("ix_mantenimiento_preventivo_estado_fecha", "mantenimiento_preventivo", ("estado", "fecha_apertura")),
+    ("ix_mantenimiento_preventivo_fecha_apertura", "mantenimiento_preventivo", ("fecha_apertura",)),
+    ("ix_mantenimiento_correctivo_foto_mantenimiento", "mantenimiento_correctivo_foto", ("mantenimiento_id",)),
+    ("ix_mantenimiento_preventivo_foto_mantenimiento", "mantenimiento_preventivo_foto", ("mantenimiento_id",)),
+    ("ix_mantenimiento_preventivo_planilla_mantenimiento", "mantenimiento_preventivo_planilla", ("mantenimiento_id",)),
+    # Deduplicación diaria de notificaciones
+    ("ix_notificacion_correctivo_lookup", "notificacion_correctivo", ("firebase_uid", "id_mantenimiento", "mensaje", "created_at")),
+    ("ix_notificacion_preventivo_lookup", "notificacion_preventivo", ("firebase_uid", "id_mantenimiento", "mensaje", "created_at")),
+    # Historial de chat por mantenimiento
+    ("ix_mensaje_correctivo_mantenimiento_fecha", "mensaje_correctivo", ("id_mantenimiento", "created_at")),
+    ("ix_mensaje_preventivo_mantenimiento_fecha", "mensaje_preventivo", ("id_mantenimiento", "created_at")),
+    ("ix_push_subscription_firebase_uid", "push_subscription", ("firebase_uid",)),
+    ("ix_correctivo_seleccionado_cuadrilla", "correctivo_seleccionado", ("id_cuadrilla",)),
+    ("ix_preventivo_seleccionado_cuadrilla", "preventivo_seleccionado", ("id_cuadrilla",)),
+    ("ix_column_preference_uid_page", "column_preference", ("firebase_uid", "page")),
+]
+
+# Reemplazado por ix_column_preference_uid_page, que cubre el mismo prefijo
+DROPPED_INDEXES = ["ix_column_preference_firebase_uid"]
+
+TRANSACTIONAL = False
+
+
+def _invalid_indexes(connection: Connection) -> set:
+    # Un CREATE INDEX CONCURRENTLY interrumpido deja el índice marcado como inválido
+    rows = connection.execute(
+        text("SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE NOT i.indisvalid")
+    )
+    return set(rows.scalars())
+
+
+def upgrade(connection: Connection) -> None:
+    concurrently = "CONCURRENTLY " if connection.dialect.name == "postgresql" else ""
+    invalid = _invalid_indexes(connection) if concurrently else set()
+    for name in DROPPED_INDEXES:
+        connection.execute(text(f"DROP INDEX {concurrently}IF EXISTS {name}"))
+    for name, table, columns in INDEXES:
+        if name in invalid:
+            connection.execute(text(f"DROP INDEX {concurrently}IF EXISTS {name}"))
+        connection.execute(text(f"CREATE INDEX {concurrently}IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"))
@@ -0,0 +1,88 @@
+"""Tabla de resumen mensual de mantenimientos, cargada con el histórico existente.
+
+A partir de acá los servicios la mantienen al día en la misma transacción
+que cada alta, cambio o baja; `scripts/rebuild_resumen.py` la recalcula.
+"""
+from sqlalchemy import Column, Date, Integer, MetaData, String, Table, UniqueConstraint, case, extract, func, insert, literal, select
+from sqlalchemy.engine import Connection
+
+# Copias fijas de las tablas y de la carga inicial, independientes de los modelos y servicios actuales
+metadata = MetaData()
+resumen = Table(
+    "resumen_mensual_mantenimiento",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("anio", Integer, nullable=False),
+    Column("mes", Integer, nullable=False),
+    Column("cliente_id", Integer, nullable=False),
+    Column("zona", String, nullable=False),
+    Column("id_cuadrilla", Integer, nullable=False),
+    Column("tipo", String, nullable=False),
+    Column("estado", String, nullable=False),
+    Column("prioridad", String, nullable=False),
+    Column("total", Integer, nullable=False),
+    Column("resueltos", Integer, nullable=False),
+    UniqueConstraint(
+        "anio", "mes", "cliente_id", "zona", "id_cuadrilla", "tipo", "estado", "prioridad",
+        name="uq_resumen_mensual_mantenimiento_clave",
+    ),
+)
+sucursal = Table("sucursal", metadata, Column("id", Integer), Column("zona", String))
+correctivo = Table(
+    "mantenimiento_correctivo",
+    metadata,
+    Column("id", Integer),
+    Column("cliente_id", Integer),
+    Column("sucursal_id", Integer),
+    Column("id_cuadrilla", Integer),
+    Column("fecha_apertura", Date),
+    Column("estado", String),
+    Column("prioridad", String),
+)
+preventivo = Table(
+    "mantenimiento_preventivo",
+    metadata,
+    Column("id", Integer),
+    Column("cliente_id", Integer),
+    Column("sucursal_id", Integer),
+    Column("id_cuadrilla", Integer),
+    Column("fecha_apertura", Date),
+    Column("fecha_cierre", Date),
+    Column("estado", String),
+)
+
+
+def _grouped_select(table: Table, tipo: str, resuelto, prioridad):
+    anio = extract("year", table.c.fecha_apertura)
+    mes = extract("month", table.c.fecha_apertura)
+    zona = func.coalesce(sucursal.c.zona, "Sin zona")
+    cuadrilla = func.coalesce(table.c.id_cuadrilla, 0)
+    estado = func.coalesce(table.c.estado, "")
+    return (
+        select(anio, mes, table.c.cliente_id, zona, cuadrilla, literal(tipo), estado, prioridad, func.count(table.c.id), func.sum(resuelto))
+        .select_from(table)
+        .outerjoin(sucursal, sucursal.c.id == table.c.sucursal_id)
+        .where(table.c.fecha_apertura.isnot(None))
+        .group_by(anio, mes, table.c.cliente_id, zona, cuadrilla, estado, prioridad)
+    )
+
+
+def upgrade(connection: Connection) -> None:
+    resumen.create(connection, checkfirst=True)
+    columns = [
+        resumen.c[name]
+        for name in ("anio", "mes", "cliente_id", "zona", "id_cuadrilla", "tipo", "estado", "prioridad", "total", "resueltos")
+    ]
+    connection.execute(resumen.delete())
+    connection.execute(insert(resumen).from_select(columns, _grouped_select(
+        correctivo,
+        "correctivo",
+        case((correctivo.c.estado == "Finalizado", 1), else_=0),
+        func.coalesce(correctivo.c.prioridad, ""),
+    )))
+    connection.execute(insert(resumen).from_select(columns, _grouped_select(
+        preventivo,
+        "preventivo",
+        case((preventivo.c.fecha_cierre.isnot(None), 1), else_=0),
+        literal(""),
+    )))
@@ -0,0 +1,62 @@
+"""Columna `period_start` de preventivos con índice único por sucursal.
+
+Reemplaza la consulta por rango de fechas con la que se evitaban dos
+preventivos en el mismo período. Si la base ya tenía duplicados, solo el
+más antiguo de cada período queda con la clave; el resto queda en NULL.
+"""
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import Column, Date, Integer, MetaData, String, Table, bindparam, inspect, select, text, update
+from sqlalchemy.engine import Connection
+
+INDEX_NAME = "ix_mantenimiento_preventivo_sucursal_periodo"
+
+# Copias fijas de la tabla y del cálculo del período, independientes del modelo y del servicio actuales
+FRECUENCIA_PERIODOS = {"mensual": 1, "trimestral": 3, "cuatrimestral": 4, "semestral": 6}
+table = Table(
+    "mantenimiento_preventivo",
+    MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("sucursal_id", Integer),
+    Column("frecuencia", String),
+    Column("fecha_apertura", Date),
+    Column("period_start", Date),
+)
+
+
+def period_start(fecha: Optional[date], frecuencia: Optional[str]) -> Optional[date]:
+    if fecha is None or not frecuencia:
+        return None
+    months = FRECUENCIA_PERIODOS.get(frecuencia.lower())
+    if months is None:
+        return None
+    return date(fecha.year, ((fecha.month - 1) // months) * months + 1, 1)
+
+
+def upgrade(connection: Connection) -> None:
+    columns = {column["name"] for column in inspect(connection).get_columns(table.name)}
+    if "period_start" not in columns:
+        connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN period_start DATE"))
+
+    rows = connection.execute(
+        select(table.c.id, table.c.sucursal_id, table.c.fecha_apertura, table.c.frecuencia).order_by(table.c.id)
+    )
+    seen = set()
+    values = []
+    for id_, sucursal_id, fecha_apertura, frecuencia in rows:
+        inicio = period_start(fecha_apertura, frecuencia)
+        if inicio is not None and (sucursal_id, inicio) in seen:
+            inicio = None
+        elif inicio is not None:
+            seen.add((sucursal_id, inicio))
+        values.append({"row_id": id_, "inicio": inicio})
+    if values:
+        connection.execute(
+            update(table).where(table.c.id == bindparam("row_id")).values(period_start=bindparam("inicio")),
+            values,
+        )
+
+    connection.execute(
+        text(f"CREATE UNIQUE INDEX IF NOT EXISTS {INDEX_NAME} ON {table.name} (sucursal_id, period_start)")
+    )
@@ -0,0 +1,22 @@
+"""Tabla `sheet_sync_outbox` con las escrituras pendientes en Google Sheets."""
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table, Text
+from sqlalchemy.engine import Connection
+
+# Copia fija de la tabla, independiente del modelo actual
+sheet_sync_outbox = Table(
+    "sheet_sync_outbox",
+    MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("tipo", String, nullable=False),
+    Column("operacion", String, nullable=False),
+    Column("mantenimiento_id", Integer, nullable=False),
+    Column("attempts", Integer, nullable=False),
+    Column("next_attempt_at", DateTime, nullable=False),
+    Column("last_error", Text, nullable=True),
+    Column("created_at", DateTime),
+    Index("ix_sheet_sync_outbox_next_attempt", "next_attempt_at", "id"),
+)
+
+
+def upgrade(connection: Connection) -> None:
+    sheet_sync_outbox.create(connection, checkfirst=True)
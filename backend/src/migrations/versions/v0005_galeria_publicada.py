@@ -0,0 +1,20 @@
+"""Tabla `galeria_publicada` con el estado de las galerías de fotos y planillas.
+
+Las carpetas existentes no se cargan acá: la primera consulta de cada una
+la resuelve contra GCS y guarda el resultado.
+"""
+from sqlalchemy import Boolean, Column, DateTime, MetaData, String, Table
+from sqlalchemy.engine import Connection
+
+# Copia fija de la tabla, independiente del modelo actual
+galeria_publicada = Table(
+    "galeria_publicada",
+    MetaData(),
+    Column("carpeta", String, primary_key=True),
+    Column("publicada", Boolean, nullable=False),
+    Column("updated_at", DateTime),
+)
+
+
+def upgrade(connection: Connection) -> None:
+    galeria_publicada.create(connection, checkfirst=True)
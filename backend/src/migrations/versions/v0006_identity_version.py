@@ -0,0 +1,23 @@
+"""Tabla `identity_version` con el contador compartido de cambios de identidad.
+
+Cada alta, cambio o baja de usuarios y cuadrillas lo incrementa; los procesos
+que lo ven cambiar vacían sus cachés de identidad.
+"""
+from sqlalchemy import Column, Integer, MetaData, Table, insert, select
+from sqlalchemy.engine import Connection
+
+# Copia fija de la tabla, independiente del modelo actual
+metadata = MetaData()
+identity_version = Table(
+    "identity_version",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("version", Integer, nullable=False, default=0),
+)
+
+
+def upgrade(connection: Connection) -> None:
+    identity_version.create(connection, checkfirst=True)
+    existing = connection.execute(select(identity_version.c.id).where(identity_version.c.id == 1)).first()
+    if existing is None:
+        connection.execute(insert(identity_version).values(id=1, version=0))
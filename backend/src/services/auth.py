@@ -1,13 +1,70 @@
+import asyncio
 import os
 from firebase_admin import auth
 from sqlalchemy.orm import Session
 from api.models import Usuario, Cuadrilla
+from auth.token_verifier import firebase_token_verifier
 from fastapi import HTTPException
 from api.schemas import UserCreate, UserUpdate, CuadrillaCreate, CuadrillaUpdate, Role
-import requests
-import time
+from services.entity_directory import entity_directory
+from services.google_tokeninfo import google_tokeninfo
+from services.identity_version import bump_identity_version, sync_identity_caches
+from services.resumen_mensual import unassign_cuadrilla
+from services.token_cache import token_cache
+from typing import Optional
 
-def verify_user_token(token: str, db: Session, retries: int = 3):
+def _invalidate_identity(email: Optional[str] = None, firebase_uid: Optional[str] = None):
+    entity_directory.invalidate(email=email, firebase_uid=firebase_uid)
+    token_cache.discard_entity(email=email, firebase_uid=firebase_uid)
+
+def _resolve_entity(db: Session, email: str, firebase_uid: str):
+    user = db.query(Usuario).filter(Usuario.email == email).first()
+    if user:
+        if user.firebase_uid and user.firebase_uid != firebase_uid:
+            raise HTTPException(status_code=403, detail="El UID de Firebase no coincide con el registrado para este usuario")
+        if not user.firebase_uid:
+            user.firebase_uid = firebase_uid
+            db.commit()
+            db.refresh(user)
+        return {
+            "type": "usuario",
+            "data": {
+                "id": user.id,
+                "uid": user.firebase_uid,
+                "nombre": user.nombre,
+                "email": user.email,
+                "rol": user.rol
+            }
+        }
+
+    cuadrilla = db.query(Cuadrilla).filter(Cuadrilla.email == email).first()
+    if cuadrilla:
+        if cuadrilla.firebase_uid and cuadrilla.firebase_uid != firebase_uid:
+            raise HTTPException(status_code=403, detail="El UID de Firebase no coincide con el registrado para esta cuadrilla")
+        if not cuadrilla.firebase_uid:
+            cuadrilla.firebase_uid = firebase_uid
+            db.commit()
+            db.refresh(cuadrilla)
+        return {
+            "type": "cuadrilla",
+            "data": {
+                "id": cuadrilla.id,
+                "uid": cuadrilla.firebase_uid,
+                "nombre": cuadrilla.nombre,
+                "email": cuadrilla.email,
+                "zona": cuadrilla.zona
+            }
+        }
+
+    raise HTTPException(status_code=403, detail="Entidad no registrada en el sistema")
+
+def _decode_token(token: str) -> dict:
+    # Verificación local con certificados cacheados; sin project_id se delega en firebase_admin
+    if firebase_token_verifier.project_id:
+        return firebase_token_verifier.verify(token)
+    return auth.verify_id_token(token, clock_skew_seconds=firebase_token_verifier.clock_skew_seconds)
+
+def verify_user_token(token: str, db: Session):
     # In E2E mode, short-circuit and return a static admin entity
     if os.environ.get("E2E_TESTING") == "true":
         return {
@@ -20,61 +77,50 @@ def verify_user_token(token: str, db: Session, retries: int = 3):
                 "rol": Role.ADMIN,
             },
         }
-    for attempt in range(retries):
-        try:
-            decoded_token = auth.verify_id_token(token)
-            email = decoded_token.get("email")
-            firebase_uid = decoded_token.get("uid")
-
-            if not email:
-                raise HTTPException(status_code=400, detail="No se proporcionó un email en el token")
-
-            user = db.query(Usuario).filter(Usuario.email == email).first()
-            if user:
-                if user.firebase_uid and user.firebase_uid != firebase_uid:
-                    raise HTTPException(status_code=403, detail="El UID de Firebase no coincide con el registrado para este usuario")
-                if not user.firebase_uid:
-                    user.firebase_uid = firebase_uid
-                    db.commit()
-                    db.refresh(user)
-                return {
-                    "type": "usuario",
-                    "data": {
-                        "id": user.id,
-                        "uid": user.firebase_uid,
-                        "nombre": user.nombre,
-                        "email": user.email,
-                        "rol": user.rol
-                    }
-                }
-
-            cuadrilla = db.query(Cuadrilla).filter(Cuadrilla.email == email).first()
-            if cuadrilla:
-                if cuadrilla.firebase_uid and cuadrilla.firebase_uid != firebase_uid:
-                    raise HTTPException(status_code=403, detail="El UID de Firebase no coincide con el registrado para esta cuadrilla")
-                if not cuadrilla.firebase_uid:
-                    cuadrilla.firebase_uid = firebase_uid
-                    db.commit()
-                    db.refresh(cuadrilla)
-                return {
-                    "type": "cuadrilla",
-                    "data": {
-                        "id": cuadrilla.id,
-                        "uid": cuadrilla.firebase_uid,
-                        "nombre": cuadrilla.nombre,
-                        "email": cuadrilla.email,
-                        "zona": cuadrilla.zona
-                    }
-                }
-
-            raise HTTPException(status_code=403, detail="Entidad no registrada en el sistema")
-        except Exception as e:
-            if "Token used too early" in str(e) and attempt < retries - 1:
-                time.sleep(1)  # Wait before retry
-                continue
-            raise HTTPException(status_code=401, detail=f"Token inválido: {str(e)}")
-
-def create_firebase_user(user_data: UserCreate, db: Session, current_entity: dict, id_token: str):
+    # El contador compartido invalida lo cacheado si otro proceso cambió alguna identidad
+    sync_identity_caches(db)
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+    try:
+        decoded_token = _decode_token(token)
+        email = decoded_token.get("email")
+        firebase_uid = decoded_token.get("uid")
+
+        if not email:
+            raise HTTPException(status_code=400, detail="No se proporcionó un email en el token")
+
+        generation = entity_directory.generation
+        entity = entity_directory.get(email)
+        if entity is None or entity["data"]["uid"] != firebase_uid:
+            entity = _resolve_entity(db, email, firebase_uid)
+            entity_directory.put(entity, generation)
+        if entity_directory.generation == generation:
+            token_cache.set(token, entity, decoded_token.get("exp"))
+        return entity
+    except Exception as e:
+        raise HTTPException(status_code=401, detail=f"Token inválido: {str(e)}")
+
+async def _verify_google_id_token(id_token: str, expected_email: str):
+    # Verify the Google ID token
+    decoded_token = await google_tokeninfo.verify(id_token)
+
+    if "error" in decoded_token:
+        raise HTTPException(status_code=401, detail=f"Token inválido: {decoded_token.get('error_description', decoded_token['error'])}")
+
+    if decoded_token.get("email") != expected_email:
+        raise HTTPException(status_code=400, detail="El email del token no coincide con el proporcionado")
+    return decoded_token
+
+async def _get_or_create_firebase_uid(email: str) -> str:
+    # Create or fetch Firebase user outside the event loop
+    try:
+        firebase_user = await asyncio.to_thread(auth.create_user, email=email)
+    except auth.EmailAlreadyExistsError:
+        firebase_user = await asyncio.to_thread(auth.get_user_by_email, email)
+    return firebase_user.uid
+
+async def create_firebase_user(user_data: UserCreate, db: Session, current_entity: dict, id_token: str):
     if current_entity is not None:
         if not current_entity:
             raise HTTPException(status_code=401, detail="Autenticación requerida")
@@ -86,24 +132,8 @@ def create_firebase_user(user_data: UserCreate, db: Session, current_entity: dic
             if not id_token:
                 raise HTTPException(status_code=400, detail="Se requiere un ID token de Google")
 
-            # Verify the Google ID token
-            response = requests.get(f"https://www.googleapis.com/oauth2/v3/tokeninfo?id_token={id_token}")
-            decoded_token = response.json()
-            
-            if "error" in decoded_token:
-                raise HTTPException(status_code=401, detail=f"Token inválido: {decoded_token['error_description']}")
-
-            email = decoded_token.get("email")
-            if email != user_data.email:
-                raise HTTPException(status_code=400, detail="El email del token no coincide con el proporcionado")
-            
-            # Create or fetch Firebase user
-            try:
-                firebase_user = auth.create_user(email=user_data.email)
-                firebase_uid = firebase_user.uid
-            except auth.EmailAlreadyExistsError:
-                firebase_user = auth.get_user_by_email(user_data.email)
-                firebase_uid = firebase_user.uid
+            await _verify_google_id_token(id_token, user_data.email)
+            firebase_uid = await _get_or_create_firebase_uid(user_data.email)
         else:
             firebase_uid = "test-uid"
 
@@ -114,8 +144,10 @@ def create_firebase_user(user_data: UserCreate, db: Session, current_entity: dic
             firebase_uid=firebase_uid
         )
         db.add(db_user)
+        bump_identity_version(db)
         db.commit()
         db.refresh(db_user)
+        _invalidate_identity(email=db_user.email, firebase_uid=db_user.firebase_uid)
         return db_user
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error al crear usuario: {str(e)}")
@@ -136,8 +168,10 @@ def update_firebase_user(user_id: int, user_data: UserUpdate, db: Session, curre
         if user_data.rol is not None:
             db_user.rol = user_data.rol
 
+        bump_identity_version(db)
         db.commit()
         db.refresh(db_user)
+        _invalidate_identity(email=db_user.email, firebase_uid=db_user.firebase_uid)
         return db_user
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error al actualizar usuario: {str(e)}")
@@ -156,12 +190,14 @@ def delete_firebase_user(user_id: int, db: Session, current_entity: dict):
         if os.environ.get("E2E_TESTING") != "true" and db_user.firebase_uid:
             auth.delete_user(db_user.firebase_uid)
         db.delete(db_user)
+        bump_identity_version(db)
         db.commit()
+        _invalidate_identity(email=db_user.email, firebase_uid=db_user.firebase_uid)
         return {"message": f"Usuario {db_user.email} eliminado correctamente"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error al eliminar usuario: {str(e)}")
 
-def create_firebase_cuadrilla(cuadrilla_data: CuadrillaCreate, db: Session, current_entity: dict, id_token: str):
+async def create_firebase_cuadrilla(cuadrilla_data: CuadrillaCreate, db: Session, current_entity: dict, id_token: str):
     if not current_entity:
         raise HTTPException(status_code=401, detail="Autenticación requerida")
     if current_entity["type"] != "usuario":
@@ -172,25 +208,8 @@ def create_firebase_cuadrilla(cuadrilla_data: CuadrillaCreate, db: Session, curr
             if not id_token:
                 raise HTTPException(status_code=400, detail="Se requiere un ID token de Google")
 
-            # Verify the Google ID token
-            response = requests.get(f"https://www.googleapis.com/oauth2/v3/tokeninfo?id_token={id_token}")
-            decoded_token = response.json()
-
-            if "error" in decoded_token:
-                raise HTTPException(status_code=401, detail=f"Token inválido: {decoded_token['error_description']}")
-
-            email = decoded_token.get("email")
-
-            if email != cuadrilla_data.email:
-                raise HTTPException(status_code=400, detail="El email del token no coincide con el proporcionado")
-
-            # Create or fetch Firebase user
-            try:
-                firebase_user = auth.create_user(email=cuadrilla_data.email)
-                firebase_uid = firebase_user.uid
-            except auth.EmailAlreadyExistsError:
-                firebase_user = auth.get_user_by_email(cuadrilla_data.email)
-                firebase_uid = firebase_user.uid
+            await _verify_google_id_token(id_token, cuadrilla_data.email)
+            firebase_uid = await _get_or_create_firebase_uid(cuadrilla_data.email)
         else:
             firebase_uid = "test-uid"
 
@@ -201,8 +220,10 @@ def create_firebase_cuadrilla(cuadrilla_data: CuadrillaCreate, db: Session, curr
             firebase_uid=firebase_uid
         )
         db.add(db_cuadrilla)
+        bump_identity_version(db)
         db.commit()
         db.refresh(db_cuadrilla)
+        _invalidate_identity(email=db_cuadrilla.email, firebase_uid=db_cuadrilla.firebase_uid)
         return db_cuadrilla
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error al crear cuadrilla: {str(e)}")
@@ -223,8 +244,10 @@ def update_firebase_cuadrilla(cuadrilla_id: int, cuadrilla_data: CuadrillaUpdate
         if cuadrilla_data.zona is not None:
             db_cuadrilla.zona = cuadrilla_data.zona
 
+        bump_identity_version(db)
         db.commit()
         db.refresh(db_cuadrilla)
+        _invalidate_identity(email=db_cuadrilla.email, firebase_uid=db_cuadrilla.firebase_uid)
         return db_cuadrilla
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error al actualizar cuadrilla: {str(e)}")
@@ -242,8 +265,12 @@ def delete_firebase_cuadrilla(cuadrilla_id: int, db: Session, current_entity: di
     try:
         if os.environ.get("E2E_TESTING") != "true" and db_cuadrilla.firebase_uid:
             auth.delete_user(db_cuadrilla.firebase_uid)
+        # Sus mantenimientos quedan sin cuadrilla: el resumen los pasa al mismo bucket
+        unassign_cuadrilla(db, db_cuadrilla.id)
         db.delete(db_cuadrilla)
+        bump_identity_version(db)
         db.commit()
+        _invalidate_identity(email=db_cuadrilla.email, firebase_uid=db_cuadrilla.firebase_uid)
         return {"message": f"Cuadrilla {db_cuadrilla.email} eliminada correctamente"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error al eliminar cuadrilla: {str(e)}")
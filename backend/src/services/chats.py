@@ -4,14 +4,31 @@ from fastapi import HTTPException, UploadFile
 from typing import Optional
 from services.gcloud_storage import upload_chat_file_to_gcloud
 from services.chat_ws import chat_manager
+from config.database import DbSession, run_db
 import os
 
 GOOGLE_CLOUD_BUCKET_NAME = os.getenv("GOOGLE_CLOUD_BUCKET_NAME")
 
+def _save_message(db_session: Session, db_message):
+    db_session.add(db_message)
+    db_session.commit()
+    db_session.refresh(db_message)
+    return db_message
+
+def _rollback(db_session: Session):
+    db_session.rollback()
+
+CHAT_LIST_KEYS = ("id", "firebase_uid", "nombre_usuario", "id_mantenimiento", "texto", "archivo", "created_at")
+
+def _chat_rows(db_session: Session, model, mantenimiento_id: int):
+    # Solo las columnas del listado, como tuplas con acceso por atributo
+    columns = [getattr(model, key) for key in CHAT_LIST_KEYS]
+    return db_session.query(*columns).filter(model.id_mantenimiento == mantenimiento_id).order_by(model.created_at, model.id).all()
+
 def get_chat_correctivo(db_session: Session, mantenimiento_id: int, current_entity: dict):
     if not current_entity:
         raise HTTPException(status_code=401, detail="Autenticación requerida")
-    chat = db_session.query(MensajeCorrectivo).filter(MensajeCorrectivo.id_mantenimiento == mantenimiento_id).all()
+    chat = _chat_rows(db_session, MensajeCorrectivo, mantenimiento_id)
     if not chat:
         return {"message": "No hay mensajes"}
     return chat
@@ -19,13 +36,13 @@ def get_chat_correctivo(db_session: Session, mantenimiento_id: int, current_enti
 def get_chat_preventivo(db_session: Session, mantenimiento_id: int, current_entity: dict):
     if not current_entity:
         raise HTTPException(status_code=401, detail="Autenticación requerida")
-    chat = db_session.query(MensajePreventivo).filter(MensajePreventivo.id_mantenimiento == mantenimiento_id).all()
+    chat = _chat_rows(db_session, MensajePreventivo, mantenimiento_id)
     if not chat:
         return {"message": "No hay mensajes"}
     return chat
 
 async def send_message_correctivo(
-    db_session: Session,
+    db_session: DbSession,
     id_mantenimiento: int,
     firebase_uid: str,
     nombre_usuario: str,
@@ -53,9 +70,7 @@ async def send_message_correctivo(
             archivo_url = await upload_chat_file_to_gcloud(archivo, bucket_name, f"{base_folder}/chat")
             db_message.archivo = archivo_url
         
-        db_session.add(db_message)
-        db_session.commit()
-        db_session.refresh(db_message)
+        await run_db(db_session, _save_message, db_message)
         await chat_manager.send_message(
             id_mantenimiento,
             {
@@ -70,12 +85,12 @@ async def send_message_correctivo(
         )
         return db_message
     except Exception as e:
-        db_session.rollback()
+        await run_db(db_session, _rollback)
         raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
 
 
 async def send_message_preventivo(
-    db_session: Session,
+    db_session: DbSession,
     id_mantenimiento: int,
     firebase_uid: str,
     nombre_usuario: str,
@@ -103,9 +118,7 @@ async def send_message_preventivo(
             archivo_url = await upload_chat_file_to_gcloud(archivo, bucket_name, f"{base_folder}/chat")
             db_message.archivo = archivo_url
         
-        db_session.add(db_message)
-        db_session.commit()
-        db_session.refresh(db_message)
+        await run_db(db_session, _save_message, db_message)
         await chat_manager.send_message(
             id_mantenimiento,
             {
@@ -120,5 +133,5 @@ async def send_message_preventivo(
         )
         return db_message
     except Exception as e:
-        db_session.rollback()
+        await run_db(db_session, _rollback)
         raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
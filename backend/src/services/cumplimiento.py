@@ -0,0 +1,113 @@
+from datetime import date
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, case, extract, func, select
+from sqlalchemy.orm import Session
+
+from api.models import MantenimientoPreventivo, Sucursal
+from services.mantenimientos_preventivos import FRECUENCIA_PERIODOS, period_start
+
+# Códigos de cada celda de la matriz, en el orden de ESTADOS
+ESTADOS = ("faltante", "pendiente", "realizado")
+FALTANTE, PENDIENTE, REALIZADO = range(len(ESTADOS))
+
+
+def _ensure_usuario(current_entity: dict):
+    if not current_entity:
+        raise HTTPException(status_code=401, detail="Autenticación requerida")
+    if current_entity.get("type") != "usuario":
+        raise HTTPException(status_code=403, detail="No tienes permisos")
+
+
+def _month_index(fecha: date) -> int:
+    return fecha.year * 12 + fecha.month - 1
+
+
+def _periodos(desde: date, hasta: date, frecuencia: str) -> list:
+    # Inicios de período de la frecuencia que tocan la ventana, del primero al que contiene `hasta`
+    months = FRECUENCIA_PERIODOS[frecuencia]
+    first = _month_index(period_start(desde, frecuencia))
+    last = _month_index(period_start(hasta, frecuencia))
+    return [date(index // 12, index % 12 + 1, 1) for index in range(first, last + 1, months)]
+
+
+def get_cumplimiento_preventivos(
+    db: Session,
+    current_entity: dict,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    cliente_id: Optional[int] = None,
+    zona: Optional[str] = None,
+) -> dict:
+    """Build the sucursal × period preventivo grid as parallel arrays.
+
+    Each row of `matriz` has one code per period of that sucursal's
+    frequency (`periodos[frecuencia]`); codes index into `estados`.
+    """
+    _ensure_usuario(current_entity)
+    hasta = hasta or date.today()
+    desde = desde or date(hasta.year, 1, 1)
+    if desde > hasta:
+        raise HTTPException(status_code=400, detail="Rango de fechas inválido")
+
+    periodos = {key: _periodos(desde, hasta, key) for key in FRECUENCIA_PERIODOS}
+    primeros = {key: _month_index(starts[0]) for key, starts in periodos.items()}
+    frecuencia = func.lower(Sucursal.frecuencia_preventivo)
+    # Una sola consulta: cada sucursal con sus preventivos de la ventana, ya con la clave de período
+    query = (
+        select(
+            Sucursal.id,
+            Sucursal.nombre,
+            Sucursal.zona,
+            Sucursal.cliente_id,
+            frecuencia,
+            # Mes absoluto del período y código de la celda como enteros: nada que convertir por fila
+            extract("year", MantenimientoPreventivo.period_start) * 12 + extract("month", MantenimientoPreventivo.period_start) - 1,
+            case((MantenimientoPreventivo.fecha_cierre.isnot(None), REALIZADO), else_=PENDIENTE),
+        )
+        .outerjoin(
+            MantenimientoPreventivo,
+            and_(
+                MantenimientoPreventivo.sucursal_id == Sucursal.id,
+                MantenimientoPreventivo.period_start >= min(starts[0] for starts in periodos.values()),
+                MantenimientoPreventivo.period_start <= hasta,
+            ),
+        )
+        .where(frecuencia.in_(list(FRECUENCIA_PERIODOS)))
+        .order_by(Sucursal.id)
+    )
+    if cliente_id is not None:
+        query = query.where(Sucursal.cliente_id == cliente_id)
+    if zona:
+        query = query.where(Sucursal.zona == zona)
+
+    sucursales = {"id": [], "nombre": [], "zona": [], "cliente_id": [], "frecuencia": []}
+    matriz = []
+    fila = None
+    # Ejecución Core sobre la conexión de la sesión: sin el armado de filas del ORM
+    for sucursal_id, nombre, sucursal_zona, sucursal_cliente, freq, mes, estado in db.connection().execute(query):
+        if not sucursales["id"] or sucursales["id"][-1] != sucursal_id:
+            sucursales["id"].append(sucursal_id)
+            sucursales["nombre"].append(nombre)
+            sucursales["zona"].append(sucursal_zona)
+            sucursales["cliente_id"].append(sucursal_cliente)
+            sucursales["frecuencia"].append(freq)
+            fila = [FALTANTE] * len(periodos[freq])
+            matriz.append(fila)
+        if mes is None:
+            continue
+        # La columna sale de aritmética de meses sobre la clave guardada, sin buscar rangos
+        columna, resto = divmod(int(mes) - primeros[freq], FRECUENCIA_PERIODOS[freq])
+        if resto == 0 and 0 <= columna < len(fila):
+            fila[columna] = estado
+
+    usados = set(sucursales["frecuencia"])
+    return {
+        "desde": desde,
+        "hasta": hasta,
+        "estados": list(ESTADOS),
+        "periodos": {key: starts for key, starts in periodos.items() if key in usados},
+        "sucursales": sucursales,
+        "matriz": matriz,
+    }
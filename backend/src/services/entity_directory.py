@@ -0,0 +1,89 @@
+import os
+import threading
+import time
+from typing import Optional
+
+ENTITY_DIRECTORY_TTL = int(os.getenv("ENTITY_DIRECTORY_TTL", "300"))
+
+
+class EntityDirectory:
+    """In-memory map from email and firebase_uid to resolved entity payloads."""
+
+    def __init__(self, ttl: int = ENTITY_DIRECTORY_TTL, clock=time.monotonic) -> None:
+        self.ttl = ttl
+        self._clock = clock
+        self._by_email: dict[str, tuple[float, dict]] = {}
+        self._email_by_uid: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.generation = 0
+
+    def get(self, email: str) -> Optional[dict]:
+        """Return the cached entity for an email, or None if absent or expired."""
+        with self._lock:
+            entry = self._by_email.get(email)
+            if entry is None:
+                return None
+            expires_at, entity = entry
+            if expires_at <= self._clock():
+                self._drop(email)
+                return None
+            return entity
+
+    def get_by_uid(self, firebase_uid: str) -> Optional[dict]:
+        """Return the cached entity for a firebase UID, or None if absent or expired."""
+        with self._lock:
+            email = self._email_by_uid.get(firebase_uid)
+        if email is None:
+            return None
+        return self.get(email)
+
+    def put(self, entity: dict, generation: int) -> bool:
+        """Store an entity resolved while `generation` was current.
+
+        The entity is discarded if any invalidation happened since, so a
+        lookup that raced with a write can never repopulate stale data.
+        """
+        if self.ttl <= 0:
+            return False
+        data = entity["data"]
+        with self._lock:
+            if generation != self.generation:
+                return False
+            self._drop(data["email"])
+            self._by_email[data["email"]] = (self._clock() + self.ttl, entity)
+            if data.get("uid"):
+                self._email_by_uid[data["uid"]] = data["email"]
+            return True
+
+    def invalidate(self, email: Optional[str] = None, firebase_uid: Optional[str] = None) -> None:
+        """Forget an entity by email and/or firebase UID."""
+        with self._lock:
+            self.generation += 1
+            if firebase_uid:
+                uid_email = self._email_by_uid.pop(firebase_uid, None)
+                if uid_email:
+                    self._drop(uid_email)
+            if email:
+                self._drop(email)
+
+    def clear(self) -> None:
+        """Forget every entity."""
+        with self._lock:
+            self.generation += 1
+            self._by_email.clear()
+            self._email_by_uid.clear()
+
+    def stats(self) -> dict:
+        """Return the current size of the directory."""
+        with self._lock:
+            return {"size": len(self._by_email), "ttl": self.ttl}
+
+    def _drop(self, email: str) -> None:
+        entry = self._by_email.pop(email, None)
+        if entry is None:
+            return
+        uid = entry[1]["data"].get("uid")
+        if uid and self._email_by_uid.get(uid) == email:
+            del self._email_by_uid[uid]
+
+entity_directory = EntityDirectory()
@@ -0,0 +1,252 @@
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import case, extract, func, select
+from sqlalchemy.orm import Session
+
+from api.models import Cuadrilla, MantenimientoCorrectivo, MantenimientoPreventivo, ResumenMensualMantenimiento, Sucursal
+from services.resumen_mensual import SIN_ZONA, TIPO_CORRECTIVO, TIPO_PREVENTIVO
+
+
+def _ensure_usuario(current_entity: dict):
+    if not current_entity:
+        raise HTTPException(status_code=401, detail="Autenticación requerida")
+    if current_entity.get("type") != "usuario":
+        raise HTTPException(status_code=403, detail="No tienes permisos")
+
+
+def _days_between(db: Session, start, end):
+    # Postgres resta fechas en días enteros; SQLite necesita julianday
+    if db.get_bind().dialect.name == "sqlite":
+        return func.julianday(end) - func.julianday(start)
+    return end - start
+
+
+def _apply_filters(
+    query,
+    model,
+    meses: Optional[List[int]] = None,
+    anios: Optional[List[int]] = None,
+    cliente_id: Optional[int] = None,
+    zona: Optional[str] = None,
+    sucursal_id: Optional[int] = None,
+    id_cuadrilla: Optional[int] = None,
+    estado: Optional[str] = None,
+):
+    if meses:
+        query = query.filter(extract("month", model.fecha_apertura).in_(meses))
+    if anios:
+        query = query.filter(extract("year", model.fecha_apertura).in_(anios))
+    if cliente_id is not None:
+        query = query.filter(model.cliente_id == cliente_id)
+    if zona is not None:
+        query = query.filter(model.sucursal_id.in_(select(Sucursal.id).where(Sucursal.zona == zona)))
+    if sucursal_id is not None:
+        query = query.filter(model.sucursal_id == sucursal_id)
+    if id_cuadrilla is not None:
+        query = query.filter(model.id_cuadrilla == id_cuadrilla)
+    if estado is not None:
+        query = query.filter(model.estado == estado)
+    return query
+
+
+def _counts_by(db: Session, model, column, **filters) -> dict:
+    query = _apply_filters(db.query(column, func.count(model.id)), model, **filters)
+    return {key: total for key, total in query.group_by(column).all()}
+
+
+def _by_month(db: Session, model, **filters) -> List[dict]:
+    anio = extract("year", model.fecha_apertura)
+    mes = extract("month", model.fecha_apertura)
+    query = _apply_filters(db.query(anio, mes, func.count(model.id)), model, **filters)
+    rows = query.filter(model.fecha_apertura.isnot(None)).group_by(anio, mes).order_by(anio, mes).all()
+    return [{"anio": int(a), "mes": int(m), "total": total} for a, m, total in rows]
+
+
+def _by_cuadrilla(db: Session, model, resuelto, **filters) -> List[dict]:
+    query = db.query(
+        Cuadrilla.id,
+        Cuadrilla.nombre,
+        func.count(model.id),
+        func.sum(case((resuelto, 1), else_=0)),
+    ).join(Cuadrilla, Cuadrilla.id == model.id_cuadrilla)
+    rows = _apply_filters(query, model, **filters).group_by(Cuadrilla.id, Cuadrilla.nombre).order_by(Cuadrilla.nombre).all()
+    return [
+        {"id_cuadrilla": id_cuadrilla, "nombre": nombre, "asignados": asignados, "resueltos": int(resueltos or 0)}
+        for id_cuadrilla, nombre, asignados, resueltos in rows
+    ]
+
+
+def _by_rubro(db: Session, **filters) -> List[dict]:
+    model = MantenimientoCorrectivo
+    dias = _days_between(db, model.fecha_apertura, model.fecha_cierre)
+    query = db.query(model.rubro, func.count(model.id), func.avg(dias)).filter(model.estado == "Finalizado")
+    rows = _apply_filters(query, model, **filters).group_by(model.rubro).order_by(model.rubro).all()
+    return [
+        {"rubro": rubro, "count": total, "avg_days": round(float(avg_days), 2) if avg_days is not None else 0}
+        for rubro, total, avg_days in rows
+    ]
+
+
+def _by_sucursal(db: Session, **filters) -> List[dict]:
+    model = MantenimientoCorrectivo
+    query = db.query(Sucursal.id, Sucursal.nombre, Sucursal.zona, func.count(model.id)).join(
+        Sucursal, Sucursal.id == model.sucursal_id
+    )
+    rows = _apply_filters(query, model, **filters).group_by(Sucursal.id, Sucursal.nombre, Sucursal.zona).order_by(Sucursal.nombre).all()
+    return [
+        {"sucursal_id": sucursal_id, "sucursal": nombre, "zona": zona, "total": total}
+        for sucursal_id, nombre, zona, total in rows
+    ]
+
+
+def _zona_totals(db: Session, **filters) -> list:
+    model = MantenimientoCorrectivo
+    zona = func.coalesce(Sucursal.zona, SIN_ZONA)
+    query = db.query(zona, func.count(model.id)).join(Sucursal, Sucursal.id == model.sucursal_id)
+    return _apply_filters(query, model, **filters).group_by(zona).all()
+
+
+def _by_zona(db: Session, totals: list, **filters) -> List[dict]:
+    zona = func.coalesce(Sucursal.zona, SIN_ZONA)
+    # El promedio es por sucursal de la zona, aunque no tenga correctivos en el período
+    sucursales = db.query(zona, func.count(Sucursal.id))
+    if filters.get("cliente_id") is not None:
+        sucursales = sucursales.filter(Sucursal.cliente_id == filters["cliente_id"])
+    if filters.get("sucursal_id") is not None:
+        sucursales = sucursales.filter(Sucursal.id == filters["sucursal_id"])
+    sucursales_by_zona = dict(sucursales.group_by(zona).all())
+
+    return [
+        {
+            "zona": nombre,
+            "total": total,
+            "sucursales": sucursales_by_zona.get(nombre, 0),
+            "promedio": round(total / (sucursales_by_zona.get(nombre) or 1), 2),
+        }
+        for nombre, total in sorted(totals)
+    ]
+
+
+def _rollup_query(db: Session, tipo: str, *columns, **filters):
+    resumen = ResumenMensualMantenimiento
+    query = db.query(*columns).filter(resumen.tipo == tipo)
+    if filters.get("meses"):
+        query = query.filter(resumen.mes.in_(filters["meses"]))
+    if filters.get("anios"):
+        query = query.filter(resumen.anio.in_(filters["anios"]))
+    if filters.get("cliente_id") is not None:
+        query = query.filter(resumen.cliente_id == filters["cliente_id"])
+    if filters.get("zona") is not None:
+        query = query.filter(resumen.zona == filters["zona"])
+    if filters.get("id_cuadrilla") is not None:
+        query = query.filter(resumen.id_cuadrilla == filters["id_cuadrilla"])
+    if filters.get("estado") is not None:
+        query = query.filter(resumen.estado == filters["estado"])
+    return query
+
+
+def _rollup_sections(db: Session, tipo: str, **filters) -> dict:
+    resumen = ResumenMensualMantenimiento
+    total = func.sum(resumen.total)
+
+    def counts_by(column):
+        rows = _rollup_query(db, tipo, column, total, **filters).group_by(column).all()
+        # En el resumen los valores faltantes se guardan como ""
+        return {key or None: int(count) for key, count in rows}
+
+    meses = _rollup_query(db, tipo, resumen.anio, resumen.mes, total, **filters).group_by(resumen.anio, resumen.mes).order_by(resumen.anio, resumen.mes)
+    cuadrillas = (
+        _rollup_query(db, tipo, Cuadrilla.id, Cuadrilla.nombre, total, func.sum(resumen.resueltos), **filters)
+        .join(Cuadrilla, Cuadrilla.id == resumen.id_cuadrilla)
+        .group_by(Cuadrilla.id, Cuadrilla.nombre)
+        .order_by(Cuadrilla.nombre)
+    )
+    sections = {
+        "total": int(_rollup_query(db, tipo, total, **filters).scalar() or 0),
+        "por_estado": counts_by(resumen.estado),
+        "por_mes": [{"anio": anio, "mes": mes, "total": int(count)} for anio, mes, count in meses],
+        "por_cuadrilla": [
+            {"id_cuadrilla": id_cuadrilla, "nombre": nombre, "asignados": int(asignados), "resueltos": int(resueltos)}
+            for id_cuadrilla, nombre, asignados, resueltos in cuadrillas
+        ],
+    }
+    if tipo == TIPO_CORRECTIVO:
+        sections["por_prioridad"] = counts_by(resumen.prioridad)
+    return sections
+
+
+def _rollup_zona_totals(db: Session, **filters) -> list:
+    resumen = ResumenMensualMantenimiento
+    query = _rollup_query(db, TIPO_CORRECTIVO, resumen.zona, func.sum(resumen.total), **filters)
+    return [(zona, int(total)) for zona, total in query.group_by(resumen.zona).all()]
+
+
+def _table_sections(db: Session, model, resuelto, **filters) -> dict:
+    return {
+        "total": _apply_filters(db.query(func.count(model.id)), model, **filters).scalar(),
+        "por_estado": _counts_by(db, model, model.estado, **filters),
+        "por_mes": _by_month(db, model, **filters),
+        "por_cuadrilla": _by_cuadrilla(db, model, resuelto, **filters),
+    }
+
+
+# Partes del tablero que se pueden pedir por separado con `secciones`
+SECCIONES = ("correctivos", "preventivos", "rubros", "zonas", "sucursales")
+
+
+def get_estadisticas(db: Session, current_entity: dict, secciones: Optional[List[str]] = None, **filters) -> dict:
+    """Aggregate maintenance counts for the dashboard.
+
+    Counts come from the monthly rollup; rubro and sucursal breakdowns, and
+    any query filtered by sucursal, still group the maintenance tables.
+    `secciones` limits the work to the requested parts (all by default).
+    """
+    _ensure_usuario(current_entity)
+    if secciones and any(seccion not in SECCIONES for seccion in secciones):
+        raise HTTPException(status_code=400, detail="Sección de estadísticas inválida")
+    pedidas = set(secciones or SECCIONES)
+    correctivo = MantenimientoCorrectivo
+    preventivo = MantenimientoPreventivo
+    por_sucursal = filters.get("sucursal_id") is not None
+    correctivos, preventivos = {}, {}
+    if "correctivos" in pedidas:
+        if por_sucursal:
+            correctivos = _table_sections(db, correctivo, correctivo.estado == "Finalizado", **filters)
+            correctivos["por_prioridad"] = _counts_by(db, correctivo, correctivo.prioridad, **filters)
+        else:
+            correctivos = _rollup_sections(db, TIPO_CORRECTIVO, **filters)
+    if "preventivos" in pedidas:
+        if por_sucursal:
+            preventivos = _table_sections(db, preventivo, preventivo.fecha_cierre.isnot(None), **filters)
+        else:
+            preventivos = _rollup_sections(db, TIPO_PREVENTIVO, **filters)
+    if "rubros" in pedidas:
+        correctivos["por_rubro"] = _by_rubro(db, **filters)
+    if "zonas" in pedidas:
+        zona_totals = _zona_totals(db, **filters) if por_sucursal else _rollup_zona_totals(db, **filters)
+        correctivos["por_zona"] = _by_zona(db, zona_totals, **filters)
+    if "sucursales" in pedidas:
+        correctivos["por_sucursal"] = _by_sucursal(db, **filters)
+    return {"correctivos": correctivos, "preventivos": preventivos}
+
+
+def get_estadisticas_por_seccion(db: Session, current_entity: dict, secciones: Dict[str, dict], **filters) -> dict:
+    """Like `get_estadisticas`, with each section computed under its own filters.
+
+    Sections sharing the same filters are computed together; sections missing
+    from `secciones` use only the common `filters`.
+    """
+    if any(seccion not in SECCIONES for seccion in secciones):
+        raise HTTPException(status_code=400, detail="Sección de estadísticas inválida")
+    grupos = {}
+    for seccion in SECCIONES:
+        propios = {key: value for key, value in (secciones.get(seccion) or {}).items() if value is not None}
+        grupos.setdefault(tuple(sorted(propios.items())), []).append(seccion)
+    resultado = {"correctivos": {}, "preventivos": {}}
+    for propios, pedidas in grupos.items():
+        data = get_estadisticas(db, current_entity, secciones=pedidas, **{**filters, **dict(propios)})
+        # Cada grupo calcula solo sus secciones, así que las claves no se pisan
+        resultado["correctivos"].update(data["correctivos"])
+        resultado["preventivos"].update(data["preventivos"])
+    return resultado
@@ -0,0 +1,113 @@
+import csv
+import io
+import zlib
+from datetime import date, datetime
+from typing import Callable, Iterable, Iterator, Optional
+
+import orjson
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from api.models import Cliente, Cuadrilla, MantenimientoCorrectivo, MantenimientoPreventivo, Sucursal
+from config.database import SessionLocal
+
+EXPORT_BATCH_SIZE = 1000
+FORMATOS = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+_COMMON = ("cliente_id", "sucursal_id", "id_cuadrilla", "fecha_apertura", "fecha_cierre", "estado", "extendido")
+CORRECTIVO_FIELDS = ("id", "numero_caso", *_COMMON, "incidente", "rubro", "prioridad", "planilla")
+PREVENTIVO_FIELDS = ("id", "frecuencia", *_COMMON)
+JOINED_FIELDS = ("cliente", "sucursal", "zona", "cuadrilla")
+
+MODELS = {
+    "correctivos": (MantenimientoCorrectivo, CORRECTIVO_FIELDS),
+    "preventivos": (MantenimientoPreventivo, PREVENTIVO_FIELDS),
+}
+
+
+def ensure_export_access(current_entity: dict, formato: str) -> None:
+    if not current_entity:
+        raise HTTPException(status_code=401, detail="Autenticación requerida")
+    if current_entity.get("type") != "usuario":
+        raise HTTPException(status_code=403, detail="No tienes permisos")
+    if formato not in FORMATOS:
+        raise HTTPException(status_code=400, detail="Formato de exportación inválido")
+
+
+def _export_select(tipo: str):
+    model, fields = MODELS[tipo]
+    # Nombres relacionados en la misma consulta, sin cargas perezosas por fila
+    return (
+        select(
+            *(getattr(model, field) for field in fields),
+            Cliente.nombre.label("cliente"),
+            Sucursal.nombre.label("sucursal"),
+            Sucursal.zona.label("zona"),
+            Cuadrilla.nombre.label("cuadrilla"),
+        )
+        .outerjoin(Cliente, Cliente.id == model.cliente_id)
+        .outerjoin(Sucursal, Sucursal.id == model.sucursal_id)
+        .outerjoin(Cuadrilla, Cuadrilla.id == model.id_cuadrilla)
+        .order_by(model.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+
+
+def iter_export_batches(db: Session, tipo: str) -> Iterator[list]:
+    """Yield export rows in `EXPORT_BATCH_SIZE` batches through a server-side cursor."""
+    for partition in db.execute(_export_select(tipo)).partitions():
+        yield partition
+
+
+def _encode_ndjson(columns, partitions) -> Iterator[bytes]:
+    for rows in partitions:
+        yield b"".join(orjson.dumps(dict(zip(columns, row))) + b"\n" for row in rows)
+
+
+def _csv_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, str) and value[:1] in ("=", "+", "-", "@"):
+        return "'" + value
+    return value
+
+
+def _encode_csv(columns, partitions) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in partitions:
+        writer.writerows([_csv_value(value) for value in row] for row in rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Compress a byte stream incrementally into a single gzip member."""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def iter_export(tipo: str, formato: str, comprimir: bool = False, session_factory: Optional[Callable[[], Session]] = None) -> Iterator[bytes]:
+    """Stream the full history of `tipo` encoded as `formato`.
+
+    The generator owns its session: the request-scoped one is closed before
+    a streaming response starts sending.
+    """
+    _, fields = MODELS[tipo]
+    columns = fields + JOINED_FIELDS
+    encode = _encode_ndjson if formato == "ndjson" else _encode_csv
+    db = (session_factory or SessionLocal)()
+    try:
+        chunks = encode(columns, iter_export_batches(db, tipo))
+        yield from gzip_chunks(chunks) if comprimir else chunks
+    finally:
+        db.close()
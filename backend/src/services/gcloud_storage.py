@@ -1,18 +1,94 @@
 from google.cloud import storage
 from google.api_core.exceptions import GoogleAPIError
 from fastapi import HTTPException, UploadFile
+from typing import Optional
 import uuid
 import os
 import json
+import logging
+import threading
 
-GOOGLE_CREDENTIALS = json.loads(os.getenv("GOOGLE_CREDENTIALS"))
+from sqlalchemy.exc import SQLAlchemyError
+
+from api.models import GaleriaPublicada
+from config.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_CREDENTIALS = os.getenv("GOOGLE_CREDENTIALS")
+_storage_client = None
+_storage_client_source = None
+_storage_client_lock = threading.Lock()
+
+def get_storage_client() -> Optional[storage.Client]:
+    """Return the shared storage client, built from GOOGLE_CREDENTIALS on first use (None if not configured)."""
+    global _storage_client, _storage_client_source
+    credentials = GOOGLE_CREDENTIALS
+    with _storage_client_lock:
+        if _storage_client is None or _storage_client_source != credentials:
+            info = json.loads(credentials) if credentials else None
+            _storage_client = storage.Client.from_service_account_info(info) if info else None
+            _storage_client_source = credentials
+        return _storage_client
+
+def _gallery_key(bucket_name: str, folder: str) -> str:
+    return f"{bucket_name}/{folder.rstrip('/')}/"
+
+def _record_gallery(bucket_name: str, folder: str, published: bool):
+    db = SessionLocal()
+    try:
+        db.merge(GaleriaPublicada(carpeta=_gallery_key(bucket_name, folder), publicada=published))
+        db.commit()
+    except SQLAlchemyError as exc:
+        # La galería ya quedó escrita; si falta el registro, la próxima consulta la busca en GCS
+        db.rollback()
+        logger.warning("No se pudo registrar la galería %s: %s", folder, exc)
+    finally:
+        db.close()
+
+def gallery_states(bucket_name: str, folders) -> dict:
+    """Return whether each folder has a gallery index, keyed by folder.
+
+    The states are stored in the database by the gallery generator, so every
+    process sees them; they are read in one query for all `folders`, and
+    folders never recorded are checked in GCS once.
+    """
+    folders = list(dict.fromkeys(folders))
+    if not folders:
+        return {}
+    keys = {_gallery_key(bucket_name, folder): folder for folder in folders}
+    db = SessionLocal()
+    try:
+        recorded = dict(
+            db.query(GaleriaPublicada.carpeta, GaleriaPublicada.publicada).filter(GaleriaPublicada.carpeta.in_(keys)).all()
+        )
+    finally:
+        db.close()
+    states = {folder: recorded[key] for key, folder in keys.items() if key in recorded}
+    missing = [folder for folder in folders if folder not in states]
+    if not missing:
+        return states
+    storage_client = get_storage_client()
+    for folder in missing:
+        if storage_client is None:
+            states[folder] = False
+            continue
+        prefix = folder.rstrip("/") + "/"
+        exists = storage_client.bucket(bucket_name).blob(f"{prefix}index.html").exists()
+        _record_gallery(bucket_name, folder, exists)
+        states[folder] = exists
+    return states
+
+def gallery_published(bucket_name: str, folder: str) -> bool:
+    """Return whether `folder` has a gallery index (see `gallery_states`)."""
+    return gallery_states(bucket_name, [folder])[folder]
 
 def create_folder_if_not_exists(bucket_name: str, folder_path: str):
     try:
-        if not GOOGLE_CREDENTIALS:
+        storage_client = get_storage_client()
+        if storage_client is None:
             raise HTTPException(status_code=500, detail="Google Cloud credentials not configured")
         
-        storage_client = storage.Client.from_service_account_info(GOOGLE_CREDENTIALS)
         bucket = storage_client.bucket(bucket_name)
         if not folder_path.endswith('/'):
             folder_path += '/'
@@ -25,10 +101,10 @@ def create_folder_if_not_exists(bucket_name: str, folder_path: str):
 def generate_gallery_html(bucket_name: str, folder: str):
     """Generate an HTML gallery for photos in the specified GCS folder."""
     try:
-        if not GOOGLE_CREDENTIALS:
+        storage_client = get_storage_client()
+        if storage_client is None:
             raise HTTPException(status_code=500, detail="Google Cloud credentials not configured")
         
-        storage_client = storage.Client.from_service_account_info(GOOGLE_CREDENTIALS)
         bucket = storage_client.bucket(bucket_name)
         prefix = folder.rstrip("/") + "/"
         
@@ -36,6 +112,7 @@ def generate_gallery_html(bucket_name: str, folder: str):
         index_blob = bucket.blob(f"{prefix}index.html")
         if index_blob.exists():
             index_blob.delete()
+        _record_gallery(bucket_name, folder, False)
         
         blobs = bucket.list_blobs(prefix=prefix)
         urls = [
@@ -71,6 +148,7 @@ def generate_gallery_html(bucket_name: str, folder: str):
         blob.cache_control = "no-cache, max-age=0"
         blob.upload_from_string(html_content, content_type="text/html")
         blob.patch()
+        _record_gallery(bucket_name, folder, True)
         return f"https://storage.googleapis.com/{bucket_name}/{prefix}index.html"
     except GoogleAPIError as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate gallery HTML: {str(e)}")
@@ -79,10 +157,10 @@ def generate_gallery_html(bucket_name: str, folder: str):
 
 async def upload_file_to_gcloud(file: UploadFile, bucket_name: str, folder: str = "") -> str:
     try:
-        if not GOOGLE_CREDENTIALS:
+        storage_client = get_storage_client()
+        if storage_client is None:
             raise HTTPException(status_code=500, detail="Google Cloud credentials not configured")
         
-        storage_client = storage.Client.from_service_account_info(GOOGLE_CREDENTIALS)
         bucket = storage_client.bucket(bucket_name)
         
         create_folder_if_not_exists(bucket_name, folder)
@@ -105,10 +183,10 @@ async def upload_file_to_gcloud(file: UploadFile, bucket_name: str, folder: str
     
 async def upload_chat_file_to_gcloud(file: UploadFile, bucket_name: str, folder: str = "") -> str:
     try:
-        if not GOOGLE_CREDENTIALS:
+        storage_client = get_storage_client()
+        if storage_client is None:
             raise HTTPException(status_code=500, detail="Google Cloud credentials not configured")
         
-        storage_client = storage.Client.from_service_account_info(GOOGLE_CREDENTIALS)
         bucket = storage_client.bucket(bucket_name)
         
         create_folder_if_not_exists(bucket_name, folder)
@@ -127,10 +205,10 @@ async def upload_chat_file_to_gcloud(file: UploadFile, bucket_name: str, folder:
 
 def delete_file_in_folder(bucket_name: str, folder: str, file_path: str) -> bool:
     try:
-        if not GOOGLE_CREDENTIALS:
+        storage_client = get_storage_client()
+        if storage_client is None:
             raise HTTPException(status_code=500, detail="Google Cloud credentials not configured")
         
-        storage_client = storage.Client.from_service_account_info(GOOGLE_CREDENTIALS)
         bucket = storage_client.bucket(bucket_name)
         blob = bucket.blob(f"{folder.rstrip('/')}/{file_path.lstrip('/')}")
         exists = blob.exists()
@@ -1,32 +1,23 @@
 import os
 import json
 import logging
+import threading
 from datetime import date, datetime
+from typing import Optional
 
 import gspread
 from gspread.exceptions import APIError
-try:
-    from gspread.exceptions import CellNotFound
-except ImportError:
-    class CellNotFound(Exception):
-        """Fallback when gspread does not expose CellNotFound."""
-        pass
+from gspread.utils import a1_range_to_grid_range
 from oauth2client.service_account import ServiceAccountCredentials
-from google.cloud import storage
 
 from api.models import MantenimientoCorrectivo, MantenimientoPreventivo
+from services.gcloud_storage import gallery_published, gallery_states
 
 logger = logging.getLogger(__name__)
 
 GOOGLE_CREDENTIALS = os.getenv("GOOGLE_CREDENTIALS")
 GOOGLE_CLOUD_BUCKET_NAME = os.getenv("GOOGLE_CLOUD_BUCKET_NAME")
 SHEET_ID = os.getenv("GOOGLE_SHEET_ID")
-GOOGLE_CREDENTIALS_DICT = json.loads(GOOGLE_CREDENTIALS) if GOOGLE_CREDENTIALS else None
-storage_client = (
-    storage.Client.from_service_account_info(GOOGLE_CREDENTIALS_DICT)
-    if GOOGLE_CREDENTIALS_DICT
-    else None
-)
 
 TRACKING_COLUMN_NAME = "_mantenimiento_id"
 
@@ -62,37 +53,86 @@ PREVENTIVO_HEADER = [
 ]
 PREVENTIVO_VISIBLE_COLUMNS = len(PREVENTIVO_HEADER) - 1
 
-def get_client():
-    if not GOOGLE_CREDENTIALS_DICT:
+# Sesión compartida por el proceso: cliente autorizado, hojas abiertas y hojas ya preparadas
+_client = None
+_client_source = None
+_worksheets = {}
+_prepared_sheets = {}
+_row_indexes = {}
+_sheets_lock = threading.Lock()
+
+def _credentials_dict():
+    if not GOOGLE_CREDENTIALS:
         return None
-    scope = [
-        "https://spreadsheets.google.com/feeds",
-        "https://www.googleapis.com/auth/drive",
-    ]
     try:
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(GOOGLE_CREDENTIALS_DICT, scope)
-        return gspread.authorize(creds)
-    except Exception as exc:
-        logger.warning("Failed to initialize Google Sheets client: %s", exc, exc_info=True)
+        return json.loads(GOOGLE_CREDENTIALS) or None
+    except ValueError:
+        logger.warning("GOOGLE_CREDENTIALS no es un JSON válido")
         return None
 
-def _blob_exists(path: str) -> bool:
-    if not storage_client or not GOOGLE_CLOUD_BUCKET_NAME:
+def get_client():
+    """Return the shared gspread client, authorized once per GOOGLE_CREDENTIALS value.
+
+    The authorized session refreshes its token by itself when it expires.
+    """
+    global _client, _client_source
+    credentials = GOOGLE_CREDENTIALS
+    with _sheets_lock:
+        if _client is not None and _client_source == credentials:
+            return _client
+        credentials_dict = _credentials_dict()
+        if not credentials_dict:
+            return None
+        scope = [
+            "https://spreadsheets.google.com/feeds",
+            "https://www.googleapis.com/auth/drive",
+        ]
+        try:
+            creds = ServiceAccountCredentials.from_json_keyfile_dict(credentials_dict, scope)
+            _client = gspread.authorize(creds)
+        except Exception as exc:
+            logger.warning("Failed to initialize Google Sheets client: %s", exc, exc_info=True)
+            return None
+        _client_source = credentials
+        # Las hojas abiertas con el cliente anterior ya no sirven
+        _worksheets.clear()
+        _prepared_sheets.clear()
+        _row_indexes.clear()
+        return _client
+
+def _gallery_exists(folder: str) -> bool:
+    if not GOOGLE_CLOUD_BUCKET_NAME:
         return False
-    bucket = storage_client.bucket(GOOGLE_CLOUD_BUCKET_NAME)
-    return bucket.blob(path).exists()
+    return gallery_published(GOOGLE_CLOUD_BUCKET_NAME, folder)
 
-def get_fotos_gallery_url(mantenimiento_id, tipo):
-    blob_path = f"mantenimientos_{tipo}/{mantenimiento_id}/fotos/index.html"
-    if not _blob_exists(blob_path):
-        return None
-    return f"https://storage.googleapis.com/{GOOGLE_CLOUD_BUCKET_NAME}/{blob_path}"
+def _fotos_folder(mantenimiento_id, tipo) -> str:
+    return f"mantenimientos_{tipo}/{mantenimiento_id}/fotos"
 
-def get_planillas_gallery_url(mantenimiento_id):
-    blob_path = f"mantenimientos_preventivos/{mantenimiento_id}/planillas/index.html"
-    if not _blob_exists(blob_path):
+def _planillas_folder(mantenimiento_id) -> str:
+    return f"mantenimientos_preventivos/{mantenimiento_id}/planillas"
+
+def _gallery_url(folder: str, galleries: Optional[dict]):
+    published = galleries.get(folder, False) if galleries is not None else _gallery_exists(folder)
+    if not published:
         return None
-    return f"https://storage.googleapis.com/{GOOGLE_CLOUD_BUCKET_NAME}/{blob_path}"
+    return f"https://storage.googleapis.com/{GOOGLE_CLOUD_BUCKET_NAME}/{folder}/index.html"
+
+def get_fotos_gallery_url(mantenimiento_id, tipo, galleries: Optional[dict] = None):
+    return _gallery_url(_fotos_folder(mantenimiento_id, tipo), galleries)
+
+def get_planillas_gallery_url(mantenimiento_id, galleries: Optional[dict] = None):
+    return _gallery_url(_planillas_folder(mantenimiento_id), galleries)
+
+def _load_galleries(tipo: str, mantenimientos) -> dict:
+    """Gallery states for every link of `mantenimientos`, read in one query."""
+    if not GOOGLE_CLOUD_BUCKET_NAME:
+        return {}
+    folders = []
+    for mantenimiento in mantenimientos:
+        folders.append(_fotos_folder(mantenimiento.id, f"{tipo}s"))
+        if tipo == "preventivo":
+            folders.append(_planillas_folder(mantenimiento.id))
+    return gallery_states(GOOGLE_CLOUD_BUCKET_NAME, folders)
 
 def _get_worksheet(sheet_name: str):
     if not SHEET_ID:
@@ -100,13 +140,27 @@ def _get_worksheet(sheet_name: str):
     client = get_client()
     if not client:
         return None
-    return client.open_by_key(SHEET_ID).worksheet(sheet_name)
+    key = (SHEET_ID, sheet_name)
+    with _sheets_lock:
+        worksheet = _worksheets.get(key)
+        if worksheet is None:
+            worksheet = client.open_by_key(SHEET_ID).worksheet(sheet_name)
+            _worksheets[key] = worksheet
+        return worksheet
+
+def reset_worksheet_cache():
+    """Forget open worksheets so the next write reopens and re-checks them."""
+    with _sheets_lock:
+        _worksheets.clear()
+        _prepared_sheets.clear()
+        _row_indexes.clear()
 
 def _safe_sheet_operation(operation_name: str, callback):
     try:
         callback()
     except Exception as exc:
         logger.warning("Google Sheets %s failed: %s", operation_name, exc, exc_info=True)
+        reset_worksheet_cache()
 
 def _column_letter(index: int) -> str:
     if index <= 0:
@@ -121,18 +175,14 @@ def _apply_filters(worksheet, visible_columns: int):
     if visible_columns <= 0:
         return
     last_col_letter = _column_letter(visible_columns)
-    last_row = worksheet.row_count or 1
     try:
-        worksheet.set_basic_filter(f"A1:{last_col_letter}{max(last_row, 1)}")
+        # Rango sin fila final: cubre también las filas que se agreguen después
+        worksheet.set_basic_filter(f"A1:{last_col_letter}")
     except APIError:
         pass
     except Exception:
         pass
 
-def _append_row_with_filters(worksheet, row_values, visible_columns: int):
-    worksheet.append_row(row_values)
-    _apply_filters(worksheet, visible_columns)
-
 def _hide_column(worksheet, column_index: int):
     if column_index <= 0:
         return
@@ -171,10 +221,10 @@ def _resolve_related_name(mantenimiento, attr: str) -> str:
     fallback = getattr(mantenimiento, f"{attr}_nombre", None)
     return fallback or ""
 
-def _build_correctivo_row(mantenimiento: MantenimientoCorrectivo, include_links: bool = False):
+def _build_correctivo_row(mantenimiento: MantenimientoCorrectivo, include_links: bool = False, galleries: Optional[dict] = None):
     foto_url = ""
     if include_links:
-        foto_url = get_fotos_gallery_url(mantenimiento.id, "correctivos") or ""
+        foto_url = get_fotos_gallery_url(mantenimiento.id, "correctivos", galleries) or ""
     return [
         _resolve_related_name(mantenimiento, "cliente"),
         _resolve_related_name(mantenimiento, "sucursal"),
@@ -192,12 +242,12 @@ def _build_correctivo_row(mantenimiento: MantenimientoCorrectivo, include_links:
         _tracking_token(mantenimiento),
     ]
 
-def _build_preventivo_row(mantenimiento: MantenimientoPreventivo, include_links: bool = False):
+def _build_preventivo_row(mantenimiento: MantenimientoPreventivo, include_links: bool = False, galleries: Optional[dict] = None):
     planillas_url = ""
     fotos_url = ""
     if include_links:
-        planillas_url = get_planillas_gallery_url(mantenimiento.id) or ""
-        fotos_url = get_fotos_gallery_url(mantenimiento.id, "preventivos") or ""
+        planillas_url = get_planillas_gallery_url(mantenimiento.id, galleries) or ""
+        fotos_url = get_fotos_gallery_url(mantenimiento.id, "preventivos", galleries) or ""
     return [
         _resolve_related_name(mantenimiento, "cliente"),
         _resolve_related_name(mantenimiento, "sucursal"),
@@ -211,116 +261,289 @@ def _build_preventivo_row(mantenimiento: MantenimientoPreventivo, include_links:
         _tracking_token(mantenimiento),
     ]
 
-def append_correctivo(mantenimiento: MantenimientoCorrectivo):
-    def _operation():
-        worksheet = _get_worksheet("MantenimientosCorrectivos")
-        if not worksheet:
-            return
-        _ensure_header(worksheet, CORRECTIVO_HEADER, CORRECTIVO_VISIBLE_COLUMNS)
-        _append_row_with_filters(
-            worksheet,
-            _build_correctivo_row(mantenimiento, include_links=False),
-            CORRECTIVO_VISIBLE_COLUMNS,
-        )
-    _safe_sheet_operation("append_correctivo", _operation)
+# Hoja, encabezado, columnas visibles y armado de fila por tipo de mantenimiento
+SHEETS = {
+    "correctivo": ("MantenimientosCorrectivos", CORRECTIVO_HEADER, CORRECTIVO_VISIBLE_COLUMNS, _build_correctivo_row),
+    "preventivo": ("MantenimientosPreventivos", PREVENTIVO_HEADER, PREVENTIVO_VISIBLE_COLUMNS, _build_preventivo_row),
+}
 
-def update_correctivo(mantenimiento: MantenimientoCorrectivo):
-    def _operation():
-        worksheet = _get_worksheet("MantenimientosCorrectivos")
-        if not worksheet:
-            return
-        _ensure_header(worksheet, CORRECTIVO_HEADER, CORRECTIVO_VISIBLE_COLUMNS)
-        token = _tracking_token(mantenimiento)
-        if not token:
-            _append_row_with_filters(
-                worksheet,
-                _build_correctivo_row(mantenimiento, include_links=False),
-                CORRECTIVO_VISIBLE_COLUMNS,
-            )
+def _open_sheet(tipo: str):
+    sheet_name, header, visible_columns, _ = SHEETS[tipo]
+    worksheet = _get_worksheet(sheet_name)
+    if not worksheet:
+        return None
+    # Encabezado, filtro y columna oculta se verifican una vez por hoja abierta
+    with _sheets_lock:
+        if _prepared_sheets.get(sheet_name) is not worksheet:
+            _ensure_header(worksheet, header, visible_columns)
+            _prepared_sheets[sheet_name] = worksheet
+    return worksheet
+
+def _load_row_index(worksheet, column: int) -> dict:
+    # Una sola lectura de la columna de seguimiento; la fila 1 es el encabezado
+    values = worksheet.col_values(column)
+    return {token: row for row, token in enumerate(values, start=1) if row > 1 and token}
+
+def _row_index(tipo: str, worksheet, reload: bool = False) -> dict:
+    """Return the cached tracking token -> row number map of an open worksheet."""
+    sheet_name, header, _, _ = SHEETS[tipo]
+    with _sheets_lock:
+        cached = _row_indexes.get(sheet_name)
+        if not reload and cached and cached[0] is worksheet:
+            return cached[1]
+    index = _load_row_index(worksheet, len(header))
+    with _sheets_lock:
+        _row_indexes[sheet_name] = (worksheet, index)
+    return index
+
+def _find_rows(tipo: str, worksheet, tokens: list) -> dict:
+    """Locate the rows of `tokens`, re-reading the column once if the cache is stale.
+
+    Located rows are confirmed with one read of their tracking cells before the
+    caller writes to them. Tokens not present in the sheet are left out of the result.
+    """
+    _, header, _, _ = SHEETS[tipo]
+    index = _row_index(tipo, worksheet)
+    if not all(token in index for token in tokens):
+        # Otro proceso pudo agregar filas desde la última lectura
+        index = _row_index(tipo, worksheet, reload=True)
+    rows = {token: index[token] for token in tokens if token in index}
+    if not rows:
+        return rows
+    # Ordenar la hoja a mano u otro worker que borra filas corren las posiciones en caché
+    column = _column_letter(len(header))
+    values = worksheet.batch_get([f"{column}{row}" for row in rows.values()])
+    if all(value and value[0] and value[0][0] == token for value, token in zip(values, rows)):
+        return rows
+    index = _row_index(tipo, worksheet, reload=True)
+    return {token: index[token] for token in tokens if token in index}
+
+def _find_row(tipo: str, worksheet, token: str):
+    return _find_rows(tipo, worksheet, [token]).get(token)
+
+def _appended_start_row(response):
+    try:
+        updated_range = response["updates"]["updatedRange"]
+        return a1_range_to_grid_range(updated_range.rsplit("!", 1)[-1])["startRowIndex"] + 1
+    except (KeyError, TypeError, AttributeError, ValueError):
+        return None
+
+def _record_appended(tipo: str, worksheet, tokens: list, response):
+    start_row = _appended_start_row(response)
+    with _sheets_lock:
+        cached = _row_indexes.get(SHEETS[tipo][0])
+        if not cached or cached[0] is not worksheet:
             return
-        try:
-            cell = worksheet.find(token, in_column=len(CORRECTIVO_HEADER))
-        except CellNotFound:
-            _append_row_with_filters(
-                worksheet,
-                _build_correctivo_row(mantenimiento, include_links=False),
-                CORRECTIVO_VISIBLE_COLUMNS,
-            )
+        if start_row is None:
+            # Sin la fila de destino no se puede mantener el índice: se relee en el próximo uso
+            _row_indexes.pop(SHEETS[tipo][0], None)
             return
-        row = _build_correctivo_row(mantenimiento, include_links=True)
-        end_col = _column_letter(len(CORRECTIVO_HEADER))
-        worksheet.update(f"A{cell.row}:{end_col}{cell.row}", [row])
-    _safe_sheet_operation("update_correctivo", _operation)
+        for offset, token in enumerate(tokens):
+            if token:
+                cached[1][token] = start_row + offset
 
-def delete_correctivo(mantenimiento_id: int):
-    def _operation():
-        worksheet = _get_worksheet("MantenimientosCorrectivos")
-        if not worksheet:
+def _append(tipo: str, worksheet, mantenimientos: list, include_links: bool = False, galleries: Optional[dict] = None):
+    _, _, _, build_row = SHEETS[tipo]
+    rows = [build_row(m, include_links=include_links, galleries=galleries) for m in mantenimientos]
+    if len(rows) == 1:
+        response = worksheet.append_row(rows[0])
+    else:
+        # Una sola llamada a la API para todas las filas del lote
+        response = worksheet.append_rows(rows)
+    _record_appended(tipo, worksheet, [_tracking_token(m) for m in mantenimientos], response)
+
+def append_rows(tipo: str, mantenimientos: list, skip_existing: bool = False):
+    """Append one row per maintenance. Raises on API errors so the caller can retry.
+
+    With `skip_existing`, maintenances whose tracking token is already in the
+    sheet are left out, so a retried append does not duplicate rows.
+    """
+    if not mantenimientos:
+        return
+    worksheet = _open_sheet(tipo)
+    if not worksheet:
+        return
+    if skip_existing:
+        existing = _row_index(tipo, worksheet)
+        mantenimientos = [m for m in mantenimientos if _tracking_token(m) not in existing]
+        if not mantenimientos:
             return
-        _ensure_header(worksheet, CORRECTIVO_HEADER, CORRECTIVO_VISIBLE_COLUMNS)
-        token = _tracking_token(mantenimiento_id)
+    _append(tipo, worksheet, mantenimientos)
+
+def update_row(tipo: str, mantenimiento):
+    """Rewrite the row of a maintenance, appending it when missing. Raises on API errors."""
+    worksheet = _open_sheet(tipo)
+    if not worksheet:
+        return
+    _, header, _, build_row = SHEETS[tipo]
+    token = _tracking_token(mantenimiento)
+    row_number = _find_row(tipo, worksheet, token) if token else None
+    if row_number is None:
+        _append(tipo, worksheet, [mantenimiento])
+        return
+    row = build_row(mantenimiento, include_links=True)
+    end_col = _column_letter(len(header))
+    worksheet.update(f"A{row_number}:{end_col}{row_number}", [row])
+
+def delete_row(tipo: str, mantenimiento_id: int):
+    """Remove the row of a maintenance if present. Raises on API errors."""
+    worksheet = _open_sheet(tipo)
+    if not worksheet:
+        return
+    token = _tracking_token(mantenimiento_id)
+    if not token:
+        return
+    row_number = _find_row(tipo, worksheet, token)
+    if row_number is None:
+        return
+    _delete_located_row(tipo, worksheet, token, row_number)
+
+def _delete_located_row(tipo: str, worksheet, token: str, row_number: int):
+    worksheet.delete_rows(row_number)
+    # Las filas de abajo suben una posición
+    with _sheets_lock:
+        cached = _row_indexes.get(SHEETS[tipo][0])
+        if cached and cached[0] is worksheet:
+            index = cached[1]
+            index.pop(token, None)
+            for other, row in index.items():
+                if row > row_number:
+                    index[other] = row - 1
+
+def apply_changes(tipo: str, appends=(), updates=(), deletes=()):
+    """Write a coalesced set of changes to one worksheet. Raises on API errors.
+
+    Updated rows go out in a single batch_update, located before any delete
+    shifts rows; deletes run bottom-up; new rows, plus updated ones missing
+    from the sheet, are appended last in one call. Appended rows carry the
+    gallery links too, since an append may have later updates folded in.
+    The gallery states of the whole batch are read in one query.
+    """
+    if not (appends or updates or deletes):
+        return
+    worksheet = _open_sheet(tipo)
+    if not worksheet:
+        return
+    _, header, _, build_row = SHEETS[tipo]
+    end_col = _column_letter(len(header))
+    galleries = _load_galleries(tipo, [*appends, *updates])
+    pending = list(appends)
+    if updates:
+        rows = _find_rows(tipo, worksheet, [_tracking_token(m) for m in updates])
+        data = []
+        for mantenimiento in updates:
+            row_number = rows.get(_tracking_token(mantenimiento))
+            if row_number is None:
+                pending.append(mantenimiento)
+                continue
+            data.append({"range": f"A{row_number}:{end_col}{row_number}", "values": [build_row(mantenimiento, include_links=True, galleries=galleries)]})
+        if data:
+            worksheet.batch_update(data)
+    if deletes:
+        rows = _find_rows(tipo, worksheet, [_tracking_token(i) for i in deletes])
+        for token, row_number in sorted(rows.items(), key=lambda item: item[1], reverse=True):
+            _delete_located_row(tipo, worksheet, token, row_number)
+    if pending:
+        # Igual que un append reintentado: lo que ya figura en la hoja no se duplica
+        existing = _row_index(tipo, worksheet)
+        pending = [m for m in pending if _tracking_token(m) not in existing]
+        if pending:
+            _append(tipo, worksheet, pending, include_links=True, galleries=galleries)
+
+# Filas por llamada en la reconciliación, para no superar el tamaño máximo de un pedido
+RECONCILE_CHUNK_ROWS = 5000
+
+def _contiguous(rows: list) -> list:
+    """Group sorted row numbers into (first, last) runs."""
+    runs = []
+    for row in rows:
+        if runs and runs[-1][1] == row - 1:
+            runs[-1][1] = row
+        else:
+            runs.append([row, row])
+    return [tuple(run) for run in runs]
+
+def reconcile_sheet(tipo: str, mantenimientos: list) -> dict:
+    """Make the worksheet match `mantenimientos`, writing only what differs.
+
+    The sheet is read once. Changed rows go out as batched ranged updates, rows
+    of maintenances that no longer exist (or duplicated ones) are removed in a
+    single request, and missing rows are appended together. Gallery link cells
+    are kept from the sheet. Raises on API errors.
+    """
+    resultado = {"filas": len(mantenimientos), "actualizadas": 0, "agregadas": 0, "eliminadas": 0}
+    worksheet = _open_sheet(tipo)
+    if not worksheet:
+        return resultado
+    _, header, _, build_row = SHEETS[tipo]
+    width = len(header)
+    link_columns = [i for i, name in enumerate(header) if name.endswith("_gallery_url")]
+    current = {}
+    sobrantes = []
+    for row_number, values in enumerate(worksheet.get_all_values()[1:], start=2):
+        values = (list(values) + [""] * width)[:width]
+        token = values[-1]
         if not token:
-            return
-        try:
-            cell = worksheet.find(token, in_column=len(CORRECTIVO_HEADER))
-        except CellNotFound:
-            return
-        worksheet.delete_rows(cell.row)
-    _safe_sheet_operation("delete_correctivo", _operation)
+            continue
+        if token in current:
+            sobrantes.append(row_number)
+        else:
+            current[token] = (row_number, values)
+
+    updates, nuevas = [], []
+    for mantenimiento in mantenimientos:
+        expected = build_row(mantenimiento, include_links=False)
+        located = current.pop(expected[-1], None)
+        if located is None:
+            nuevas.append(expected)
+            continue
+        row_number, values = located
+        for column in link_columns:
+            expected[column] = values[column]
+        if [str(value) for value in expected] != values:
+            updates.append((row_number, expected))
+    sobrantes.extend(row_number for row_number, _ in current.values())
+
+    end_col = _column_letter(width)
+    # Filas contiguas cambiadas viajan como un único rango
+    by_row = dict(updates)
+    data, filas = [], 0
+    for first, last in _contiguous(sorted(by_row)):
+        data.append({"range": f"A{first}:{end_col}{last}", "values": [by_row[row] for row in range(first, last + 1)]})
+        filas += last - first + 1
+        if filas >= RECONCILE_CHUNK_ROWS:
+            worksheet.batch_update(data)
+            data, filas = [], 0
+    if data:
+        worksheet.batch_update(data)
+    if sobrantes:
+        # Todas las bajas en un pedido, de abajo hacia arriba para no correr las filas pendientes
+        requests = [
+            {"deleteDimension": {"range": {"sheetId": worksheet.id, "dimension": "ROWS", "startIndex": first - 1, "endIndex": last}}}
+            for first, last in reversed(_contiguous(sorted(sobrantes)))
+        ]
+        worksheet.spreadsheet.batch_update({"requests": requests})
+    for start in range(0, len(nuevas), RECONCILE_CHUNK_ROWS):
+        worksheet.append_rows(nuevas[start:start + RECONCILE_CHUNK_ROWS])
+    with _sheets_lock:
+        _row_indexes.pop(SHEETS[tipo][0], None)
+    resultado.update(actualizadas=len(updates), agregadas=len(nuevas), eliminadas=len(sobrantes))
+    return resultado
+
+def append_correctivo(mantenimiento: MantenimientoCorrectivo):
+    _safe_sheet_operation("append_correctivo", lambda: append_rows("correctivo", [mantenimiento]))
+
+def update_correctivo(mantenimiento: MantenimientoCorrectivo):
+    _safe_sheet_operation("update_correctivo", lambda: update_row("correctivo", mantenimiento))
+
+def delete_correctivo(mantenimiento_id: int):
+    _safe_sheet_operation("delete_correctivo", lambda: delete_row("correctivo", mantenimiento_id))
 
 def append_preventivo(mantenimiento: MantenimientoPreventivo):
-    def _operation():
-        worksheet = _get_worksheet("MantenimientosPreventivos")
-        if not worksheet:
-            return
-        _ensure_header(worksheet, PREVENTIVO_HEADER, PREVENTIVO_VISIBLE_COLUMNS)
-        _append_row_with_filters(
-            worksheet,
-            _build_preventivo_row(mantenimiento, include_links=False),
-            PREVENTIVO_VISIBLE_COLUMNS,
-        )
-    _safe_sheet_operation("append_preventivo", _operation)
+    _safe_sheet_operation("append_preventivo", lambda: append_rows("preventivo", [mantenimiento]))
 
 def update_preventivo(mantenimiento: MantenimientoPreventivo):
-    def _operation():
-        worksheet = _get_worksheet("MantenimientosPreventivos")
-        if not worksheet:
-            return
-        _ensure_header(worksheet, PREVENTIVO_HEADER, PREVENTIVO_VISIBLE_COLUMNS)
-        token = _tracking_token(mantenimiento)
-        if not token:
-            _append_row_with_filters(
-                worksheet,
-                _build_preventivo_row(mantenimiento, include_links=False),
-                PREVENTIVO_VISIBLE_COLUMNS,
-            )
-            return
-        try:
-            cell = worksheet.find(token, in_column=len(PREVENTIVO_HEADER))
-        except CellNotFound:
-            _append_row_with_filters(
-                worksheet,
-                _build_preventivo_row(mantenimiento, include_links=False),
-                PREVENTIVO_VISIBLE_COLUMNS,
-            )
-            return
-        row = _build_preventivo_row(mantenimiento, include_links=True)
-        end_col = _column_letter(len(PREVENTIVO_HEADER))
-        worksheet.update(f"A{cell.row}:{end_col}{cell.row}", [row])
-    _safe_sheet_operation("update_preventivo", _operation)
+    _safe_sheet_operation("update_preventivo", lambda: update_row("preventivo", mantenimiento))
 
 def delete_preventivo(mantenimiento_id: int):
-    def _operation():
-        worksheet = _get_worksheet("MantenimientosPreventivos")
-        if not worksheet:
-            return
-        _ensure_header(worksheet, PREVENTIVO_HEADER, PREVENTIVO_VISIBLE_COLUMNS)
-        token = _tracking_token(mantenimiento_id)
-        if not token:
-            return
-        try:
-            cell = worksheet.find(token, in_column=len(PREVENTIVO_HEADER))
-        except CellNotFound:
-            return
-        worksheet.delete_rows(cell.row)
-    _safe_sheet_operation("delete_preventivo", _operation)
+    _safe_sheet_operation("delete_preventivo", lambda: delete_row("preventivo", mantenimiento_id))
@@ -0,0 +1,68 @@
+import asyncio
+import os
+from typing import Optional
+
+import httpx
+
+from services.token_cache import TokenCache
+
+GOOGLE_TOKENINFO_URL = "https://www.googleapis.com/oauth2/v3/tokeninfo"
+GOOGLE_TOKENINFO_TIMEOUT = float(os.getenv("GOOGLE_TOKENINFO_TIMEOUT", "5"))
+GOOGLE_TOKENINFO_CACHE_TTL = int(os.getenv("GOOGLE_TOKENINFO_CACHE_TTL", "60"))
+GOOGLE_TOKENINFO_MAX_CONNECTIONS = int(os.getenv("GOOGLE_TOKENINFO_MAX_CONNECTIONS", "10"))
+
+
+class GoogleTokenInfoClient:
+    """Async, pooled client for Google's tokeninfo endpoint with a short-lived result cache."""
+
+    def __init__(
+        self,
+        url: str = GOOGLE_TOKENINFO_URL,
+        timeout: float = GOOGLE_TOKENINFO_TIMEOUT,
+        cache_ttl: int = GOOGLE_TOKENINFO_CACHE_TTL,
+        max_connections: int = GOOGLE_TOKENINFO_MAX_CONNECTIONS,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        self.url = url
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.cache = TokenCache(ttl=cache_ttl, max_entries=256)
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            # El pool de conexiones queda ligado al event loop que lo creó
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                transport=self._transport,
+            )
+            self._loop = loop
+        return self._client
+
+    async def verify(self, id_token: str) -> dict:
+        """Return the tokeninfo payload for an ID token, cached until it expires."""
+        cached = self.cache.get(id_token)
+        if cached is not None:
+            return cached
+        response = await self._get_client().get(self.url, params={"id_token": id_token})
+        decoded_token = response.json()
+        if "error" not in decoded_token and response.status_code == 200:
+            exp = decoded_token.get("exp")
+            self.cache.set(id_token, decoded_token, float(exp) if exp else None)
+        return decoded_token
+
+    async def aclose(self) -> None:
+        """Close the pooled HTTP client."""
+        if self._client is not None:
+            await self._client.aclose()
+        self._client = None
+        self._loop = None
+
+google_tokeninfo = GoogleTokenInfoClient()
@@ -0,0 +1,33 @@
+import threading
+from typing import Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from api.models import IdentityVersion
+from services.entity_directory import entity_directory
+from services.token_cache import token_cache
+
+_lock = threading.Lock()
+_seen_version: Optional[int] = None
+
+
+def bump_identity_version(db: Session) -> None:
+    """Mark every cached identity as stale in all processes; commits with the caller's transaction."""
+    result = db.execute(
+        update(IdentityVersion).where(IdentityVersion.id == 1).values(version=IdentityVersion.version + 1)
+    )
+    if result.rowcount == 0:
+        db.add(IdentityVersion(id=1, version=1))
+
+
+def sync_identity_caches(db: Session) -> None:
+    """Drop this process's identity caches if another process changed an identity since the last check."""
+    global _seen_version
+    version = db.execute(select(IdentityVersion.version).where(IdentityVersion.id == 1)).scalar() or 0
+    with _lock:
+        if version == _seen_version:
+            return
+        entity_directory.clear()
+        token_cache.discard_all()
+        _seen_version = version
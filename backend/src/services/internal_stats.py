@@ -0,0 +1,22 @@
+from fastapi import HTTPException
+
+from api.schemas import Role
+from config.database import get_pool_stats
+from services.entity_directory import entity_directory
+from services.token_cache import token_cache
+
+
+def _ensure_admin(current_entity: dict):
+    if not current_entity:
+        raise HTTPException(status_code=401, detail="Autenticación requerida")
+    if current_entity.get("type") != "usuario" or current_entity["data"].get("rol") != Role.ADMIN:
+        raise HTTPException(status_code=403, detail="No tienes permisos de administrador")
+
+
+def get_internal_stats(current_entity: dict):
+    _ensure_admin(current_entity)
+    return {
+        "token_cache": token_cache.stats(),
+        "entity_directory": entity_directory.stats(),
+        "db_pool": get_pool_stats(),
+    }
@@ -3,15 +3,26 @@ from typing import List, Optional
 import os
 
 from fastapi import HTTPException, UploadFile
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 
+from config.database import DbSession, run_db
 from api.models import Cliente, Cuadrilla, MantenimientoCorrectivo, MantenimientoCorrectivoFoto, Sucursal
 from services.gcloud_storage import delete_file_in_folder, upload_file_to_gcloud
-from services.google_sheets import append_correctivo, delete_correctivo, update_correctivo
 from services.notificaciones import notify_user, notify_users_correctivo
+from services.pagination import keyset_page
+from services.resumen_mensual import TIPO_CORRECTIVO, record_change, rollup_entry
+from services.sheet_outbox import APPEND, DELETE, UPDATE, queue_sheet_sync
+from services.row_lists import rows_to_dicts, urls_by_mantenimiento
 
 GOOGLE_CLOUD_BUCKET_NAME = os.getenv("GOOGLE_CLOUD_BUCKET_NAME")
 
+# Columnas que devuelve el listado; las fotos se agregan aparte en una sola consulta
+LIST_KEYS = (
+    "id", "cliente_id", "sucursal_id", "id_cuadrilla", "fecha_apertura", "fecha_cierre",
+    "numero_caso", "incidente", "rubro", "planilla", "estado", "prioridad", "extendido",
+)
+LIST_COLUMNS = tuple(getattr(MantenimientoCorrectivo, key) for key in LIST_KEYS)
+
 
 def _ensure_usuario(current_entity: dict):
     if not current_entity:
@@ -46,19 +57,71 @@ def _get_cuadrilla(db: Session, cuadrilla_id: int) -> Cuadrilla:
     return cuadrilla
 
 
-def get_mantenimientos_correctivos(db: Session):
-    return db.query(MantenimientoCorrectivo).all()
+def _apply_filters(
+    query,
+    estado: Optional[str] = None,
+    prioridad: Optional[str] = None,
+    id_cuadrilla: Optional[int] = None,
+    sucursal_id: Optional[int] = None,
+    cliente_id: Optional[int] = None,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+):
+    if estado is not None:
+        query = query.filter(MantenimientoCorrectivo.estado == estado)
+    if prioridad is not None:
+        query = query.filter(MantenimientoCorrectivo.prioridad == prioridad)
+    if id_cuadrilla is not None:
+        query = query.filter(MantenimientoCorrectivo.id_cuadrilla == id_cuadrilla)
+    if sucursal_id is not None:
+        query = query.filter(MantenimientoCorrectivo.sucursal_id == sucursal_id)
+    if cliente_id is not None:
+        query = query.filter(MantenimientoCorrectivo.cliente_id == cliente_id)
+    if fecha_desde is not None:
+        query = query.filter(MantenimientoCorrectivo.fecha_apertura >= fecha_desde)
+    if fecha_hasta is not None:
+        query = query.filter(MantenimientoCorrectivo.fecha_apertura <= fecha_hasta)
+    return query
+
+
+def _correctivo_rows(db: Session, rows, ids) -> list:
+    fotos_by_id = urls_by_mantenimiento(db, MantenimientoCorrectivoFoto, ids)
+    items = rows_to_dicts(rows, LIST_KEYS)
+    for item in items:
+        item["fotos"] = fotos_by_id.get(item["id"], [])
+    return items
+
+
+def get_mantenimientos_correctivos_rows(db: Session, **filters) -> list:
+    """Return the list endpoint payload as plain dicts, built from column tuples."""
+    query = _apply_filters(db.query(*LIST_COLUMNS), **filters)
+    ids = _apply_filters(db.query(MantenimientoCorrectivo.id), **filters)
+    return _correctivo_rows(db, query.all(), ids.statement)
+
+
+def get_mantenimientos_correctivos_rows_page(db: Session, limit: Optional[int] = None, cursor: Optional[str] = None, **filters):
+    """Keyset-paginated variant of `get_mantenimientos_correctivos_rows`."""
+    query = _apply_filters(db.query(*LIST_COLUMNS), **filters)
+    rows, next_cursor = keyset_page(query, MantenimientoCorrectivo.id, limit, cursor)
+    if not rows:
+        return [], next_cursor
+    return _correctivo_rows(db, rows, [row.id for row in rows]), next_cursor
 
 
 def get_mantenimiento_correctivo(db: Session, mantenimiento_id: int):
-    mantenimiento = db.query(MantenimientoCorrectivo).filter(MantenimientoCorrectivo.id == mantenimiento_id).first()
+    mantenimiento = (
+        db.query(MantenimientoCorrectivo)
+        .options(selectinload(MantenimientoCorrectivo.fotos))
+        .filter(MantenimientoCorrectivo.id == mantenimiento_id)
+        .first()
+    )
     if not mantenimiento:
         raise HTTPException(status_code=404, detail="Mantenimiento correctivo no encontrado")
     return mantenimiento
 
 
 async def create_mantenimiento_correctivo(
-    db: Session,
+    db: DbSession,
     cliente_id: int,
     sucursal_id: int,
     id_cuadrilla: Optional[int],
@@ -72,37 +135,43 @@ async def create_mantenimiento_correctivo(
 ):
     _ensure_usuario(current_entity)
 
-    cliente = _get_cliente(db, cliente_id)
-    sucursal = _get_sucursal(db, sucursal_id)
-    _ensure_cliente_sucursal(cliente.id, sucursal)
-
-    cuadrilla = _get_cuadrilla(db, id_cuadrilla) if id_cuadrilla else None
-
-    db_mantenimiento = MantenimientoCorrectivo(
-        cliente_id=cliente_id,
-        sucursal_id=sucursal_id,
-        id_cuadrilla=id_cuadrilla,
-        fecha_apertura=fecha_apertura,
-        numero_caso=numero_caso,
-        incidente=incidente,
-        rubro=rubro,
-        estado=estado,
-        prioridad=prioridad,
-    )
-    db.add(db_mantenimiento)
-    db.commit()
-    db.refresh(db_mantenimiento)
-    append_correctivo(db_mantenimiento)
-    if cuadrilla is not None:
-        if prioridad == "Alta":
+    def _create(session: Session):
+        cliente = _get_cliente(session, cliente_id)
+        sucursal = _get_sucursal(session, sucursal_id)
+        _ensure_cliente_sucursal(cliente.id, sucursal)
+
+        cuadrilla = _get_cuadrilla(session, id_cuadrilla) if id_cuadrilla else None
+
+        db_mantenimiento = MantenimientoCorrectivo(
+            cliente_id=cliente_id,
+            sucursal_id=sucursal_id,
+            id_cuadrilla=id_cuadrilla,
+            fecha_apertura=fecha_apertura,
+            numero_caso=numero_caso,
+            incidente=incidente,
+            rubro=rubro,
+            estado=estado,
+            prioridad=prioridad,
+        )
+        session.add(db_mantenimiento)
+        session.flush()
+        record_change(session, None, rollup_entry(session, db_mantenimiento, TIPO_CORRECTIVO))
+        queue_sheet_sync(session, TIPO_CORRECTIVO, APPEND, db_mantenimiento.id)
+        session.commit()
+        session.refresh(db_mantenimiento)
+        if cuadrilla is not None and prioridad == "Alta":
             notify_user(
-                db_session=db,
+                db_session=session,
                 firebase_uid=cuadrilla.firebase_uid,
                 id_mantenimiento=db_mantenimiento.id,
                 mensaje=f"Nuevo correctivo asignado - Sucursal: {sucursal.nombre} | Incidente: {db_mantenimiento.incidente} | Prioridad: {db_mantenimiento.prioridad}",
                 title="Nuevo correctivo urgente asignado",
                 body=f"Sucursal: {sucursal.nombre} | Incidente: {db_mantenimiento.incidente}",
             )
+        return db_mantenimiento, sucursal, cuadrilla
+
+    db_mantenimiento, sucursal, cuadrilla = await run_db(db, _create)
+    if cuadrilla is not None:
         await notify_users_correctivo(
             db_session=db,
             id_mantenimiento=db_mantenimiento.id,
@@ -113,7 +182,7 @@ async def create_mantenimiento_correctivo(
 
 
 async def update_mantenimiento_correctivo(
-    db: Session,
+    db: DbSession,
     mantenimiento_id: int,
     current_entity: dict,
     cliente_id: Optional[int] = None,
@@ -132,36 +201,41 @@ async def update_mantenimiento_correctivo(
 ):
     _ensure_usuario(current_entity)
 
-    db_mantenimiento = get_mantenimiento_correctivo(db, mantenimiento_id)
+    db_mantenimiento = await run_db(db, get_mantenimiento_correctivo, mantenimiento_id)
+    resumen_anterior = await run_db(db, rollup_entry, db_mantenimiento, TIPO_CORRECTIVO)
 
     bucket_name = GOOGLE_CLOUD_BUCKET_NAME
     if not bucket_name:
         raise HTTPException(status_code=500, detail="Google Cloud Bucket name not configured")
     base_folder = f"mantenimientos_correctivos/{mantenimiento_id}"
 
-    final_cliente_id = cliente_id if cliente_id is not None else db_mantenimiento.cliente_id
-    final_sucursal_id = sucursal_id if sucursal_id is not None else db_mantenimiento.sucursal_id
-    cliente = _get_cliente(db, final_cliente_id)
-    sucursal = _get_sucursal(db, final_sucursal_id)
-    _ensure_cliente_sucursal(cliente.id, sucursal)
-
-    db_mantenimiento.cliente_id = cliente.id
-    db_mantenimiento.sucursal_id = sucursal.id
-
-    if fecha_apertura is not None:
-        db_mantenimiento.fecha_apertura = fecha_apertura
-    if numero_caso is not None:
-        db_mantenimiento.numero_caso = numero_caso
-    if incidente is not None:
-        db_mantenimiento.incidente = incidente
-    if rubro is not None:
-        db_mantenimiento.rubro = rubro
-
-    if id_cuadrilla:
-        cuadrilla = _get_cuadrilla(db, id_cuadrilla)
-        db_mantenimiento.id_cuadrilla = id_cuadrilla
-    else:
-        cuadrilla = _get_cuadrilla(db, db_mantenimiento.id_cuadrilla) if db_mantenimiento.id_cuadrilla else None
+    def _apply_changes(session: Session):
+        final_cliente_id = cliente_id if cliente_id is not None else db_mantenimiento.cliente_id
+        final_sucursal_id = sucursal_id if sucursal_id is not None else db_mantenimiento.sucursal_id
+        cliente = _get_cliente(session, final_cliente_id)
+        sucursal = _get_sucursal(session, final_sucursal_id)
+        _ensure_cliente_sucursal(cliente.id, sucursal)
+
+        db_mantenimiento.cliente_id = cliente.id
+        db_mantenimiento.sucursal_id = sucursal.id
+
+        if fecha_apertura is not None:
+            db_mantenimiento.fecha_apertura = fecha_apertura
+        if numero_caso is not None:
+            db_mantenimiento.numero_caso = numero_caso
+        if incidente is not None:
+            db_mantenimiento.incidente = incidente
+        if rubro is not None:
+            db_mantenimiento.rubro = rubro
+
+        if id_cuadrilla:
+            cuadrilla = _get_cuadrilla(session, id_cuadrilla)
+            db_mantenimiento.id_cuadrilla = id_cuadrilla
+        else:
+            cuadrilla = _get_cuadrilla(session, db_mantenimiento.id_cuadrilla) if db_mantenimiento.id_cuadrilla else None
+        return sucursal, cuadrilla
+
+    sucursal, cuadrilla = await run_db(db, _apply_changes)
 
     if planilla is not None:
         planilla_url = await upload_file_to_gcloud(planilla, bucket_name, f"{base_folder}/planilla")
@@ -179,17 +253,15 @@ async def update_mantenimiento_correctivo(
         else:
             db_mantenimiento.fecha_cierre = fecha_cierre
 
+    # Los avisos se envían después de guardar: crearlos hace commit y separaría el cambio de su resumen y su fila en el outbox
+    avisos = []
+
     if estado is not None:
         db_mantenimiento.estado = estado
         if estado not in ("Solucionado", "Finalizado"):
             db_mantenimiento.fecha_cierre = None
         if estado == "Solucionado":
-            await notify_users_correctivo(
-                db_session=db,
-                id_mantenimiento=mantenimiento_id,
-                mensaje=f"Correctivo Solucionado - Sucursal: {sucursal.nombre} | Incidente: {db_mantenimiento.incidente}",
-                firebase_uid=None,
-            )
+            avisos.append(f"Correctivo Solucionado - Sucursal: {sucursal.nombre} | Incidente: {db_mantenimiento.incidente}")
 
     if prioridad is not None:
         db_mantenimiento.prioridad = prioridad
@@ -199,26 +271,37 @@ async def update_mantenimiento_correctivo(
     if extendido is not None:
         db_mantenimiento.extendido = extendido
         if cuadrilla:
-            await notify_users_correctivo(
-                db_session=db,
-                id_mantenimiento=mantenimiento_id,
-                mensaje=f"Extendido solicitado - Sucursal: {sucursal.nombre} | Cuadrilla: {cuadrilla.nombre}",
-                firebase_uid=None,
+            avisos.append(f"Extendido solicitado - Sucursal: {sucursal.nombre} | Cuadrilla: {cuadrilla.nombre}")
+
+    def _save(session: Session):
+        record_change(session, resumen_anterior, rollup_entry(session, db_mantenimiento, TIPO_CORRECTIVO))
+        queue_sheet_sync(session, TIPO_CORRECTIVO, UPDATE, db_mantenimiento.id)
+        session.commit()
+        session.refresh(db_mantenimiento)
+        # El controlador lee las fotos fuera de la sesión
+        session.refresh(db_mantenimiento, ["fotos"])
+
+        if cuadrilla is not None and prioridad_actual == "Alta":
+            notify_user(
+                db_session=session,
+                firebase_uid=cuadrilla.firebase_uid,
+                id_mantenimiento=db_mantenimiento.id,
+                mensaje=f"Correctivo urgente asignado - Sucursal: {sucursal.nombre} | Incidente: {db_mantenimiento.incidente} | Prioridad: {db_mantenimiento.prioridad}",
+                title="Correctivo urgente asignado",
+                body=f"Sucursal: {sucursal.nombre} | Incidente: {db_mantenimiento.incidente}",
             )
 
-    db.commit()
-    db.refresh(db_mantenimiento)
-    update_correctivo(db_mantenimiento)
+    await run_db(db, _save)
 
-    if cuadrilla is not None and prioridad_actual == "Alta":
-        notify_user(
+    for mensaje in avisos:
+        await notify_users_correctivo(
             db_session=db,
-            firebase_uid=cuadrilla.firebase_uid,
-            id_mantenimiento=db_mantenimiento.id,
-            mensaje=f"Correctivo urgente asignado - Sucursal: {sucursal.nombre} | Incidente: {db_mantenimiento.incidente} | Prioridad: {db_mantenimiento.prioridad}",
-            title="Correctivo urgente asignado",
-            body=f"Sucursal: {sucursal.nombre} | Incidente: {db_mantenimiento.incidente}",
+            id_mantenimiento=mantenimiento_id,
+            mensaje=mensaje,
+            firebase_uid=None,
         )
+
+    if cuadrilla is not None and prioridad_actual == "Alta":
         await notify_users_correctivo(
             db_session=db,
             id_mantenimiento=db_mantenimiento.id,
@@ -232,9 +315,10 @@ async def update_mantenimiento_correctivo(
 def delete_mantenimiento_correctivo(db: Session, mantenimiento_id: int, current_entity: dict):
     _ensure_usuario(current_entity)
     db_mantenimiento = get_mantenimiento_correctivo(db, mantenimiento_id)
+    record_change(db, rollup_entry(db, db_mantenimiento, TIPO_CORRECTIVO), None)
     db.delete(db_mantenimiento)
+    queue_sheet_sync(db, TIPO_CORRECTIVO, DELETE, mantenimiento_id)
     db.commit()
-    delete_correctivo(mantenimiento_id)
     return {"message": f"Mantenimiento correctivo con id {mantenimiento_id} eliminado"}
 
 
@@ -245,10 +329,10 @@ def delete_mantenimiento_planilla(db: Session, mantenimiento_id: int, file_name:
     delete_file_in_folder(GOOGLE_CLOUD_BUCKET_NAME, f"mantenimientos_correctivos/{mantenimiento_id}/planilla/", file_name)
 
     db_mantenimiento.planilla = None
+    queue_sheet_sync(db, TIPO_CORRECTIVO, UPDATE, mantenimiento_id)
 
     db.commit()
     db.refresh(db_mantenimiento)
-    update_correctivo(db_mantenimiento)
     return True
 
 
@@ -270,6 +354,6 @@ def delete_mantenimiento_photo(db: Session, mantenimiento_id: int, file_name: st
 
     delete_file_in_folder(GOOGLE_CLOUD_BUCKET_NAME, f"mantenimientos_correctivos/{mantenimiento_id}/fotos/", file_name)
     db.delete(foto)
+    queue_sheet_sync(db, TIPO_CORRECTIVO, UPDATE, mantenimiento_id)
     db.commit()
-    update_correctivo(db_mantenimiento)
     return True
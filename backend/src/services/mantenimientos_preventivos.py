@@ -1,11 +1,14 @@
 from calendar import monthrange
 from datetime import date, datetime
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 import os
 
 from fastapi import HTTPException, UploadFile
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, exists, func, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
 
+from config.database import DbSession, run_db
 from api.models import (
     Cliente,
     Cuadrilla,
@@ -15,8 +18,11 @@ from api.models import (
     Sucursal,
 )
 from services.gcloud_storage import delete_file_in_folder, upload_file_to_gcloud
-from services.google_sheets import append_preventivo, delete_preventivo, update_preventivo
-from services.notificaciones import notify_users_preventivo
+from services.notificaciones import notify_preventivos_batch, notify_users_preventivo
+from services.pagination import keyset_page
+from services.resumen_mensual import TIPO_PREVENTIVO, record_change, record_created, rollup_entry, rollup_entry_for_zona
+from services.sheet_outbox import APPEND, DELETE, UPDATE, queue_sheet_sync
+from services.row_lists import rows_to_dicts, urls_by_mantenimiento
 
 GOOGLE_CLOUD_BUCKET_NAME = os.getenv("GOOGLE_CLOUD_BUCKET_NAME")
 FRECUENCIA_PERIODOS = {
@@ -25,6 +31,14 @@ FRECUENCIA_PERIODOS = {
     "cuatrimestral": 4,
     "semestral": 6,
 }
+PERIOD_INDEX = "ix_mantenimiento_preventivo_sucursal_periodo"
+
+# Columnas que devuelve el listado; planillas y fotos se agregan aparte en una consulta cada una
+LIST_KEYS = (
+    "id", "cliente_id", "sucursal_id", "frecuencia", "id_cuadrilla",
+    "fecha_apertura", "fecha_cierre", "extendido", "estado",
+)
+LIST_COLUMNS = tuple(getattr(MantenimientoPreventivo, key) for key in LIST_KEYS)
 
 
 def _ensure_usuario(current_entity: dict):
@@ -84,42 +98,100 @@ def _calculate_period_range(fecha: date, frecuencia: str) -> Tuple[date, date]:
     return start_date, end_date
 
 
-def _ensure_preventivo_period(
-    db: Session,
-    sucursal_id: int,
-    fecha: date,
-    frecuencia: str,
-    exclude_id: Optional[int] = None,
-):
-    inicio, fin = _calculate_period_range(fecha, frecuencia)
-    query = db.query(MantenimientoPreventivo).filter(
-        MantenimientoPreventivo.sucursal_id == sucursal_id,
-        MantenimientoPreventivo.fecha_apertura >= inicio,
-        MantenimientoPreventivo.fecha_apertura <= fin,
-    )
-    if exclude_id:
-        query = query.filter(MantenimientoPreventivo.id != exclude_id)
-    existe = query.first()
-    if existe:
+def period_start(fecha: Optional[date], frecuencia: Optional[str]) -> Optional[date]:
+    """Return the stored period key of a preventivo, or None when it has no date or a valid frequency."""
+    if fecha is None or not frecuencia or frecuencia.lower() not in FRECUENCIA_PERIODOS:
+        return None
+    return _calculate_period_range(fecha, frecuencia)[0]
+
+
+def _is_period_conflict(exc: IntegrityError) -> bool:
+    # Postgres nombra el índice violado; SQLite, las columnas del índice único
+    message = str(exc.orig)
+    return PERIOD_INDEX in message or ("UNIQUE" in message and "period_start" in message)
+
+
+def _flush_preventivo_period(db: Session):
+    # El índice único (sucursal_id, period_start) es el que garantiza un preventivo por período
+    try:
+        db.flush()
+    except IntegrityError as exc:
+        db.rollback()
+        if not _is_period_conflict(exc):
+            raise
         raise HTTPException(
             status_code=400,
             detail="Ya existe un mantenimiento preventivo para esta sucursal en el período correspondiente a su frecuencia",
         )
 
 
-def get_mantenimientos_preventivos(db: Session):
-    return db.query(MantenimientoPreventivo).all()
+def _apply_filters(
+    query,
+    estado: Optional[str] = None,
+    id_cuadrilla: Optional[int] = None,
+    sucursal_id: Optional[int] = None,
+    cliente_id: Optional[int] = None,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+):
+    if estado is not None:
+        query = query.filter(MantenimientoPreventivo.estado == estado)
+    if id_cuadrilla is not None:
+        query = query.filter(MantenimientoPreventivo.id_cuadrilla == id_cuadrilla)
+    if sucursal_id is not None:
+        query = query.filter(MantenimientoPreventivo.sucursal_id == sucursal_id)
+    if cliente_id is not None:
+        query = query.filter(MantenimientoPreventivo.cliente_id == cliente_id)
+    if fecha_desde is not None:
+        query = query.filter(MantenimientoPreventivo.fecha_apertura >= fecha_desde)
+    if fecha_hasta is not None:
+        query = query.filter(MantenimientoPreventivo.fecha_apertura <= fecha_hasta)
+    return query
+
+
+def _preventivo_rows(db: Session, rows, ids) -> list:
+    planillas_by_id = urls_by_mantenimiento(db, MantenimientoPreventivoPlanilla, ids)
+    fotos_by_id = urls_by_mantenimiento(db, MantenimientoPreventivoFoto, ids)
+    items = rows_to_dicts(rows, LIST_KEYS)
+    for item in items:
+        item["planillas"] = planillas_by_id.get(item["id"], [])
+        item["fotos"] = fotos_by_id.get(item["id"], [])
+    return items
+
+
+def get_mantenimientos_preventivos_rows(db: Session, **filters) -> list:
+    """Return the list endpoint payload as plain dicts, built from column tuples."""
+    query = _apply_filters(db.query(*LIST_COLUMNS), **filters)
+    ids = _apply_filters(db.query(MantenimientoPreventivo.id), **filters)
+    return _preventivo_rows(db, query.all(), ids.statement)
+
+
+def get_mantenimientos_preventivos_rows_page(db: Session, limit: Optional[int] = None, cursor: Optional[str] = None, **filters):
+    """Keyset-paginated variant of `get_mantenimientos_preventivos_rows`."""
+    query = _apply_filters(db.query(*LIST_COLUMNS), **filters)
+    rows, next_cursor = keyset_page(query, MantenimientoPreventivo.id, limit, cursor)
+    if not rows:
+        return [], next_cursor
+    return _preventivo_rows(db, rows, [row.id for row in rows]), next_cursor
 
 
 def get_mantenimiento_preventivo(db: Session, mantenimiento_id: int):
-    mantenimiento = db.query(MantenimientoPreventivo).filter(MantenimientoPreventivo.id == mantenimiento_id).first()
+    mantenimiento = (
+        db.query(MantenimientoPreventivo)
+        .options(
+            selectinload(MantenimientoPreventivo.planillas),
+            selectinload(MantenimientoPreventivo.fotos),
+        )
+        .filter(MantenimientoPreventivo.id == mantenimiento_id)
+        .first()
+    )
     if not mantenimiento:
         raise HTTPException(status_code=404, detail="Mantenimiento preventivo no encontrado")
     return mantenimiento
 
 
 async def create_mantenimiento_preventivo(
-    db: Session,
+    db: DbSession,
     cliente_id: int,
     sucursal_id: int,
     frecuencia: str,
@@ -130,35 +202,42 @@ async def create_mantenimiento_preventivo(
 ):
     _ensure_usuario(current_entity)
 
-    cliente = _get_cliente(db, cliente_id)
-    sucursal = _get_sucursal(db, sucursal_id)
-    _ensure_cliente_sucursal(cliente.id, sucursal)
+    def _create(session: Session):
+        cliente = _get_cliente(session, cliente_id)
+        sucursal = _get_sucursal(session, sucursal_id)
+        _ensure_cliente_sucursal(cliente.id, sucursal)
 
-    if not sucursal.frecuencia_preventivo:
-        raise HTTPException(status_code=400, detail="La sucursal no tiene mantenimiento preventivo configurado")
-
-    sucursal_frecuencia = sucursal.frecuencia_preventivo
-    if frecuencia and frecuencia.lower() != sucursal_frecuencia.lower():
-        raise HTTPException(
-            status_code=400,
-            detail="La frecuencia seleccionada no coincide con la configuración de la sucursal",
-        )
+        if not sucursal.frecuencia_preventivo:
+            raise HTTPException(status_code=400, detail="La sucursal no tiene mantenimiento preventivo configurado")
 
-    _ensure_preventivo_period(db, sucursal.id, fecha_apertura, sucursal_frecuencia)
-    cuadrilla = _get_cuadrilla(db, id_cuadrilla)
+        sucursal_frecuencia = sucursal.frecuencia_preventivo
+        if frecuencia and frecuencia.lower() != sucursal_frecuencia.lower():
+            raise HTTPException(
+                status_code=400,
+                detail="La frecuencia seleccionada no coincide con la configuración de la sucursal",
+            )
 
-    db_mantenimiento = MantenimientoPreventivo(
-        cliente_id=cliente_id,
-        sucursal_id=sucursal_id,
-        frecuencia=sucursal_frecuencia,
-        id_cuadrilla=id_cuadrilla,
-        fecha_apertura=fecha_apertura,
-        estado=estado,
-    )
-    db.add(db_mantenimiento)
-    db.commit()
-    db.refresh(db_mantenimiento)
-    append_preventivo(db_mantenimiento)
+        _normalize_frecuencia(sucursal_frecuencia)
+        cuadrilla = _get_cuadrilla(session, id_cuadrilla)
+
+        db_mantenimiento = MantenimientoPreventivo(
+            cliente_id=cliente_id,
+            sucursal_id=sucursal_id,
+            frecuencia=sucursal_frecuencia,
+            id_cuadrilla=id_cuadrilla,
+            fecha_apertura=fecha_apertura,
+            estado=estado,
+            period_start=period_start(fecha_apertura, sucursal_frecuencia),
+        )
+        session.add(db_mantenimiento)
+        _flush_preventivo_period(session)
+        record_change(session, None, rollup_entry(session, db_mantenimiento, TIPO_PREVENTIVO))
+        queue_sheet_sync(session, TIPO_PREVENTIVO, APPEND, db_mantenimiento.id)
+        session.commit()
+        session.refresh(db_mantenimiento)
+        return db_mantenimiento, sucursal, cuadrilla
+
+    db_mantenimiento, sucursal, cuadrilla = await run_db(db, _create)
     await notify_users_preventivo(
         db_session=db,
         id_mantenimiento=db_mantenimiento.id,
@@ -168,8 +247,87 @@ async def create_mantenimiento_preventivo(
     return db_mantenimiento
 
 
+def _sucursales_sin_preventivo(db: Session, fecha: date) -> List[Sucursal]:
+    # Una condición por frecuencia, así el período de cada sucursal se resuelve en la misma consulta
+    condiciones = []
+    for frecuencia in FRECUENCIA_PERIODOS:
+        inicio, _ = _calculate_period_range(fecha, frecuencia)
+        existente = exists().where(
+            MantenimientoPreventivo.sucursal_id == Sucursal.id,
+            MantenimientoPreventivo.period_start == inicio,
+        )
+        condiciones.append(and_(func.lower(Sucursal.frecuencia_preventivo) == frecuencia, ~existente))
+    return db.query(Sucursal).filter(or_(*condiciones)).order_by(Sucursal.id).all()
+
+
+async def planificar_preventivos(
+    db: DbSession,
+    fecha_apertura: date,
+    current_entity: dict,
+    asignaciones: Optional[Dict[int, int]] = None,
+    estado: str = "Pendiente",
+    autoasignar: bool = False,
+):
+    """Create the missing preventivo of every sucursal for the period containing `fecha_apertura`.
+
+    `asignaciones` maps sucursal ids to cuadrilla ids. Other sucursales get no
+    cuadrilla and are listed in `sin_cuadrilla`, unless `autoasignar` is set,
+    in which case they get the first cuadrilla of their zona when there is one.
+    """
+    _ensure_usuario(current_entity)
+    asignaciones = asignaciones or {}
+
+    def _plan(session: Session):
+        sucursales = _sucursales_sin_preventivo(session, fecha_apertura)
+        cuadrillas = {c.id: c for c in session.query(Cuadrilla).order_by(Cuadrilla.id).all()}
+        if set(asignaciones.values()) - set(cuadrillas):
+            raise HTTPException(status_code=404, detail="Cuadrilla no encontrada")
+        por_zona = {}
+        if autoasignar:
+            for cuadrilla in cuadrillas.values():
+                por_zona.setdefault(cuadrilla.zona, cuadrilla)
+
+        nuevos, sin_cuadrilla = [], []
+        for sucursal in sucursales:
+            cuadrilla = cuadrillas.get(asignaciones.get(sucursal.id)) or por_zona.get(sucursal.zona)
+            if cuadrilla is None:
+                # Se crea igual, para asignarlo después desde la edición
+                sin_cuadrilla.append(sucursal.id)
+            mantenimiento = MantenimientoPreventivo(
+                cliente_id=sucursal.cliente_id,
+                sucursal_id=sucursal.id,
+                frecuencia=sucursal.frecuencia_preventivo,
+                id_cuadrilla=cuadrilla.id if cuadrilla else None,
+                fecha_apertura=fecha_apertura,
+                estado=estado,
+                period_start=period_start(fecha_apertura, sucursal.frecuencia_preventivo),
+            )
+            nuevos.append((mantenimiento, sucursal, cuadrilla))
+        if not nuevos:
+            return [], [], sin_cuadrilla
+
+        session.add_all([mantenimiento for mantenimiento, _, _ in nuevos])
+        _flush_preventivo_period(session)
+        record_created(session, [rollup_entry_for_zona(m, TIPO_PREVENTIVO, s.zona) for m, s, _ in nuevos])
+        creados = [{key: getattr(m, key) for key in LIST_KEYS} for m, _, _ in nuevos]
+        avisos = [
+            (cuadrilla.firebase_uid, m.id, f"Nuevo preventivo asignado - Sucursal: {sucursal.nombre}")
+            for m, sucursal, cuadrilla in nuevos
+            if cuadrilla is not None
+        ]
+        # El worker de la planilla agrupa estas altas consecutivas en un solo append
+        for creado in creados:
+            queue_sheet_sync(session, TIPO_PREVENTIVO, APPEND, creado["id"])
+        session.commit()
+        return creados, avisos, sin_cuadrilla
+
+    creados, avisos, sin_cuadrilla = await run_db(db, _plan)
+    await notify_preventivos_batch(db, avisos)
+    return {"creados": creados, "sin_cuadrilla": sin_cuadrilla}
+
+
 async def update_mantenimiento_preventivo(
-    db: Session,
+    db: DbSession,
     mantenimiento_id: int,
     current_entity: dict,
     cliente_id: Optional[int] = None,
@@ -185,61 +343,58 @@ async def update_mantenimiento_preventivo(
 ):
     _ensure_usuario(current_entity)
 
-    db_mantenimiento = get_mantenimiento_preventivo(db, mantenimiento_id)
+    db_mantenimiento = await run_db(db, get_mantenimiento_preventivo, mantenimiento_id)
+    resumen_anterior = await run_db(db, rollup_entry, db_mantenimiento, TIPO_PREVENTIVO)
 
     bucket_name = GOOGLE_CLOUD_BUCKET_NAME
     if not bucket_name:
         raise HTTPException(status_code=500, detail="Google Cloud Bucket name not configured")
     base_folder = f"mantenimientos_preventivos/{mantenimiento_id}"
 
-    final_cliente_id = cliente_id if cliente_id is not None else db_mantenimiento.cliente_id
-    final_sucursal_id = sucursal_id if sucursal_id is not None else db_mantenimiento.sucursal_id
+    def _apply_changes(session: Session):
+        final_cliente_id = cliente_id if cliente_id is not None else db_mantenimiento.cliente_id
+        final_sucursal_id = sucursal_id if sucursal_id is not None else db_mantenimiento.sucursal_id
 
-    cliente = _get_cliente(db, final_cliente_id)
-    sucursal = _get_sucursal(db, final_sucursal_id)
-    _ensure_cliente_sucursal(cliente.id, sucursal)
+        cliente = _get_cliente(session, final_cliente_id)
+        sucursal = _get_sucursal(session, final_sucursal_id)
+        _ensure_cliente_sucursal(cliente.id, sucursal)
 
-    if not sucursal.frecuencia_preventivo:
-        raise HTTPException(status_code=400, detail="La sucursal no tiene mantenimiento preventivo configurado")
+        if not sucursal.frecuencia_preventivo:
+            raise HTTPException(status_code=400, detail="La sucursal no tiene mantenimiento preventivo configurado")
 
-    if frecuencia and frecuencia.lower() != sucursal.frecuencia_preventivo.lower():
-        raise HTTPException(
-            status_code=400,
-            detail="La frecuencia seleccionada no coincide con la configuración de la sucursal",
-        )
+        if frecuencia and frecuencia.lower() != sucursal.frecuencia_preventivo.lower():
+            raise HTTPException(
+                status_code=400,
+                detail="La frecuencia seleccionada no coincide con la configuración de la sucursal",
+            )
 
-    nueva_fecha_apertura = fecha_apertura or db_mantenimiento.fecha_apertura
-    _ensure_preventivo_period(
-        db,
-        sucursal.id,
-        nueva_fecha_apertura,
-        sucursal.frecuencia_preventivo,
-        exclude_id=db_mantenimiento.id,
-    )
+        _normalize_frecuencia(sucursal.frecuencia_preventivo)
+        db_mantenimiento.cliente_id = cliente.id
+        db_mantenimiento.sucursal_id = sucursal.id
+        db_mantenimiento.frecuencia = sucursal.frecuencia_preventivo
+
+        if fecha_apertura is not None:
+            db_mantenimiento.fecha_apertura = fecha_apertura
+        db_mantenimiento.period_start = period_start(db_mantenimiento.fecha_apertura, db_mantenimiento.frecuencia)
+        _flush_preventivo_period(session)
+        if id_cuadrilla:
+            cuadrilla = _get_cuadrilla(session, id_cuadrilla)
+            db_mantenimiento.id_cuadrilla = id_cuadrilla
+        else:
+            cuadrilla = _get_cuadrilla(session, db_mantenimiento.id_cuadrilla) if db_mantenimiento.id_cuadrilla else None
+        return sucursal, cuadrilla
 
-    db_mantenimiento.cliente_id = cliente.id
-    db_mantenimiento.sucursal_id = sucursal.id
-    db_mantenimiento.frecuencia = sucursal.frecuencia_preventivo
+    sucursal, cuadrilla = await run_db(db, _apply_changes)
 
-    if fecha_apertura is not None:
-        db_mantenimiento.fecha_apertura = fecha_apertura
-    if id_cuadrilla:
-        cuadrilla = _get_cuadrilla(db, id_cuadrilla)
-        db_mantenimiento.id_cuadrilla = id_cuadrilla
-    else:
-        cuadrilla = _get_cuadrilla(db, db_mantenimiento.id_cuadrilla)
+    # Los avisos se envían después de guardar: crearlos hace commit y separaría el cambio de su resumen y su fila en el outbox
+    avisos = []
 
     if fecha_cierre is not None:
         if fecha_cierre == date(1, 1, 1):
             db_mantenimiento.fecha_cierre = None
         else:
             db_mantenimiento.fecha_cierre = fecha_cierre
-            await notify_users_preventivo(
-                db_session=db,
-                id_mantenimiento=db_mantenimiento.id,
-                mensaje=f"Preventivo Solucionado - Sucursal: {sucursal.nombre}",
-                firebase_uid=None,
-            )
+            avisos.append(f"Preventivo Solucionado - Sucursal: {sucursal.nombre}")
 
     if planillas is not None:
         for planilla in planillas:
@@ -255,19 +410,29 @@ async def update_mantenimiento_preventivo(
 
     if extendido is not None:
         db_mantenimiento.extendido = extendido
+        if cuadrilla:
+            avisos.append(f"Extendido solicitado - Sucursal: {sucursal.nombre} | Cuadrilla: {cuadrilla.nombre}")
+
+    if estado is not None:
+        db_mantenimiento.estado = estado
+
+    def _save(session: Session):
+        record_change(session, resumen_anterior, rollup_entry(session, db_mantenimiento, TIPO_PREVENTIVO))
+        queue_sheet_sync(session, TIPO_PREVENTIVO, UPDATE, db_mantenimiento.id)
+        session.commit()
+        session.refresh(db_mantenimiento)
+        # El controlador lee planillas y fotos fuera de la sesión
+        session.refresh(db_mantenimiento, ["planillas", "fotos"])
+
+    await run_db(db, _save)
+
+    for mensaje in avisos:
         await notify_users_preventivo(
             db_session=db,
             id_mantenimiento=mantenimiento_id,
-            mensaje=f"Extendido solicitado - Sucursal: {sucursal.nombre} | Cuadrilla: {cuadrilla.nombre}",
+            mensaje=mensaje,
             firebase_uid=None,
         )
-
-    if estado is not None:
-        db_mantenimiento.estado = estado
-
-    db.commit()
-    db.refresh(db_mantenimiento)
-    update_preventivo(db_mantenimiento)
     return db_mantenimiento
 
 
@@ -275,9 +440,10 @@ def delete_mantenimiento_preventivo(db: Session, mantenimiento_id: int, current_
     _ensure_usuario(current_entity)
 
     db_mantenimiento = get_mantenimiento_preventivo(db, mantenimiento_id)
+    record_change(db, rollup_entry(db, db_mantenimiento, TIPO_PREVENTIVO), None)
     db.delete(db_mantenimiento)
+    queue_sheet_sync(db, TIPO_PREVENTIVO, DELETE, mantenimiento_id)
     db.commit()
-    delete_preventivo(mantenimiento_id)
     return {"message": f"Mantenimiento preventivo con id {mantenimiento_id} eliminado"}
 
 
@@ -299,8 +465,8 @@ def delete_mantenimiento_planilla(db: Session, mantenimiento_id: int, file_name:
 
     delete_file_in_folder(GOOGLE_CLOUD_BUCKET_NAME, f"mantenimientos_preventivos/{mantenimiento_id}/planillas/", file_name)
     db.delete(planilla)
+    queue_sheet_sync(db, TIPO_PREVENTIVO, UPDATE, mantenimiento_id)
     db.commit()
-    update_preventivo(db_mantenimiento)
     return True
 
 
@@ -322,6 +488,6 @@ def delete_mantenimiento_photo(db: Session, mantenimiento_id: int, file_name: st
 
     delete_file_in_folder(GOOGLE_CLOUD_BUCKET_NAME, f"mantenimientos_preventivos/{mantenimiento_id}/fotos/", file_name)
     db.delete(foto)
+    queue_sheet_sync(db, TIPO_PREVENTIVO, UPDATE, mantenimiento_id)
     db.commit()
-    update_preventivo(db_mantenimiento)
     return True
@@ -6,6 +6,7 @@ from .notification_ws import notification_manager
 from datetime import datetime
 from zoneinfo import ZoneInfo
 from typing import Optional
+from config.database import DbSession, run_db
     
 def notify_user(db_session: Session, firebase_uid: str, id_mantenimiento: int, mensaje: str, title: str, body: str):
     existing_notification = db_session.query(Notificacion_Correctivo).filter(
@@ -30,11 +31,18 @@ def notify_user(db_session: Session, firebase_uid: str, id_mantenimiento: int, m
             return {"message": "Notification sent"}
     return {"message": "Notification already sent"}
 
+NOTIFICATION_LIST_KEYS = ("id", "firebase_uid", "id_mantenimiento", "mensaje", "leida", "created_at")
+
+def _notification_rows(db_session: Session, model, firebase_uid: str):
+    # Solo las columnas del listado, como tuplas con acceso por atributo
+    columns = [getattr(model, key) for key in NOTIFICATION_LIST_KEYS]
+    return db_session.query(*columns).filter(model.firebase_uid == firebase_uid).all()
+
 def get_notification_correctivo(db_session: Session, firebase_uid: str):
-    return db_session.query(Notificacion_Correctivo).filter(Notificacion_Correctivo.firebase_uid == firebase_uid).all()
+    return _notification_rows(db_session, Notificacion_Correctivo, firebase_uid)
 
 def get_notification_preventivo(db_session: Session, firebase_uid: str):
-    return db_session.query(Notificacion_Preventivo).filter(Notificacion_Preventivo.firebase_uid == firebase_uid).all()
+    return _notification_rows(db_session, Notificacion_Preventivo, firebase_uid)
 
 def notificacion_correctivo_leida(db_session: Session, id_notificacion: int):
     db_notificacion = db_session.query(Notificacion_Correctivo).filter(Notificacion_Correctivo.id == id_notificacion).first()
@@ -50,87 +58,121 @@ def notificacion_preventivo_leida(db_session: Session, id_notificacion: int):
     db_session.refresh(db_notificacion)
     return db_notificacion
 
-async def send_notification_correctivo(db_session: Session, firebase_uid: str, id_mantenimiento: int, mensaje: str):
-    existing_notification = db_session.query(Notificacion_Correctivo).filter(
-        Notificacion_Correctivo.firebase_uid == firebase_uid,
-        Notificacion_Correctivo.id_mantenimiento == id_mantenimiento,
-        Notificacion_Correctivo.mensaje == mensaje,
-        Notificacion_Correctivo.created_at >= datetime.now(ZoneInfo("America/Argentina/Buenos_Aires")).replace(hour=0, minute=0, second=0, microsecond=0),
-        Notificacion_Correctivo.created_at < datetime.now(ZoneInfo("America/Argentina/Buenos_Aires")).replace(hour=23, minute=59, second=59, microsecond=999999)
-    ).first()
-    if not existing_notification:
-        db_notificacion = Notificacion_Correctivo(firebase_uid=firebase_uid, id_mantenimiento=id_mantenimiento, mensaje=mensaje)
-        db_session.add(db_notificacion)
-        db_session.commit()
-        db_session.refresh(db_notificacion)
-        await notification_manager.send_notification(
-            firebase_uid,
-            {
-                "id": db_notificacion.id,
-                "firebase_uid": firebase_uid,
-                "id_mantenimiento": id_mantenimiento,
-                "mensaje": mensaje,
-                "leida": db_notificacion.leida,
-                "created_at": db_notificacion.created_at.isoformat(),
-                "tipo": "correctivo",
-            },
-        )
-        return True
-    return False
-
-async def send_notification_preventivo(db_session: Session, firebase_uid: str, id_mantenimiento: int, mensaje: str):
-    existing_notification = db_session.query(Notificacion_Preventivo).filter(
-        Notificacion_Preventivo.firebase_uid == firebase_uid,
-        Notificacion_Preventivo.id_mantenimiento == id_mantenimiento,
-        Notificacion_Preventivo.mensaje == mensaje, 
-        Notificacion_Preventivo.created_at >= datetime.now(ZoneInfo("America/Argentina/Buenos_Aires")).replace(hour=0, minute=0, second=0, microsecond=0),
-        Notificacion_Preventivo.created_at < datetime.now(ZoneInfo("America/Argentina/Buenos_Aires")).replace(hour=23, minute=59, second=59, microsecond=999999)
+def _today_range():
+    now = datetime.now(ZoneInfo("America/Argentina/Buenos_Aires"))
+    return (
+        now.replace(hour=0, minute=0, second=0, microsecond=0),
+        now.replace(hour=23, minute=59, second=59, microsecond=999999),
+    )
+
+def _create_notification(db_session: Session, model, firebase_uid: str, id_mantenimiento: int, mensaje: str):
+    inicio, fin = _today_range()
+    existing_notification = db_session.query(model).filter(
+        model.firebase_uid == firebase_uid,
+        model.id_mantenimiento == id_mantenimiento,
+        model.mensaje == mensaje,
+        model.created_at >= inicio,
+        model.created_at < fin
     ).first()
-    if not existing_notification:
-        db_notificacion = Notificacion_Preventivo(firebase_uid=firebase_uid, id_mantenimiento=id_mantenimiento, mensaje=mensaje)
-        db_session.add(db_notificacion)
-        db_session.commit()
-        db_session.refresh(db_notificacion)
-        await notification_manager.send_notification(
-            firebase_uid,
-            {
-                "id": db_notificacion.id,
-                "firebase_uid": firebase_uid,
-                "id_mantenimiento": id_mantenimiento,
-                "mensaje": mensaje,
-                "leida": db_notificacion.leida,
-                "created_at": db_notificacion.created_at.isoformat(),
-                "tipo": "preventivo",
-            },
-        )
-        return True
-    return False
-
-async def notify_users_correctivo(db_session: Session, id_mantenimiento: int, mensaje: str, firebase_uid: Optional[str] = None):
+    if existing_notification:
+        return None
+    db_notificacion = model(firebase_uid=firebase_uid, id_mantenimiento=id_mantenimiento, mensaje=mensaje)
+    db_session.add(db_notificacion)
+    db_session.commit()
+    db_session.refresh(db_notificacion)
+    return db_notificacion
+
+def _firebase_uids_by_rol(db_session: Session, rol: str) -> list[str]:
+    return [usuario.firebase_uid for usuario in db_session.query(Usuario).filter(Usuario.rol == rol).all()]
+
+async def _send_notification(db_session: DbSession, model, tipo: str, firebase_uid: str, id_mantenimiento: int, mensaje: str):
+    db_notificacion = await run_db(db_session, _create_notification, model, firebase_uid, id_mantenimiento, mensaje)
+    if db_notificacion is None:
+        return False
+    await notification_manager.send_notification(
+        firebase_uid,
+        {
+            "id": db_notificacion.id,
+            "firebase_uid": firebase_uid,
+            "id_mantenimiento": id_mantenimiento,
+            "mensaje": mensaje,
+            "leida": db_notificacion.leida,
+            "created_at": db_notificacion.created_at.isoformat(),
+            "tipo": tipo,
+        },
+    )
+    return True
+
+async def send_notification_correctivo(db_session: DbSession, firebase_uid: str, id_mantenimiento: int, mensaje: str):
+    return await _send_notification(db_session, Notificacion_Correctivo, "correctivo", firebase_uid, id_mantenimiento, mensaje)
+
+async def send_notification_preventivo(db_session: DbSession, firebase_uid: str, id_mantenimiento: int, mensaje: str):
+    return await _send_notification(db_session, Notificacion_Preventivo, "preventivo", firebase_uid, id_mantenimiento, mensaje)
+
+async def notify_users_correctivo(db_session: DbSession, id_mantenimiento: int, mensaje: str, firebase_uid: Optional[str] = None):
     if firebase_uid is not None:
         await send_notification_correctivo(db_session, firebase_uid, id_mantenimiento, mensaje)
     else:
-        encargados = db_session.query(Usuario).filter(Usuario.rol == "Encargado de Mantenimiento").all()
-        for encargado in encargados:
-            await send_notification_correctivo(db_session, encargado.firebase_uid, id_mantenimiento, mensaje)
+        encargados = await run_db(db_session, _firebase_uids_by_rol, "Encargado de Mantenimiento")
+        for encargado_uid in encargados:
+            await send_notification_correctivo(db_session, encargado_uid, id_mantenimiento, mensaje)
         if "Solucionado" in mensaje:
-            admins = db_session.query(Usuario).filter(Usuario.rol == "Administrador").all()
-            for admin in admins:
-                await send_notification_correctivo(db_session, admin.firebase_uid, id_mantenimiento, mensaje)
+            admins = await run_db(db_session, _firebase_uids_by_rol, "Administrador")
+            for admin_uid in admins:
+                await send_notification_correctivo(db_session, admin_uid, id_mantenimiento, mensaje)
 
-async def notify_users_preventivo(db_session: Session, id_mantenimiento: int, mensaje: str, firebase_uid: Optional[str] = None):
+async def notify_users_preventivo(db_session: DbSession, id_mantenimiento: int, mensaje: str, firebase_uid: Optional[str] = None):
     if firebase_uid is not None:
         await send_notification_preventivo(db_session, firebase_uid, id_mantenimiento, mensaje)
     else:
-        encargados = db_session.query(Usuario).filter(Usuario.rol == "Encargado de Mantenimiento").all()
-        for encargado in encargados:
-            await send_notification_preventivo(db_session, encargado.firebase_uid, id_mantenimiento, mensaje)
+        encargados = await run_db(db_session, _firebase_uids_by_rol, "Encargado de Mantenimiento")
+        for encargado_uid in encargados:
+            await send_notification_preventivo(db_session, encargado_uid, id_mantenimiento, mensaje)
         if "Solucionado" in mensaje:
-            admins = db_session.query(Usuario).filter(Usuario.rol == "Administrador").all()
-            for admin in admins:
-                await send_notification_preventivo(db_session, admin.firebase_uid, id_mantenimiento, mensaje)
+            admins = await run_db(db_session, _firebase_uids_by_rol, "Administrador")
+            for admin_uid in admins:
+                await send_notification_preventivo(db_session, admin_uid, id_mantenimiento, mensaje)
+
+def _create_notifications(db_session: Session, model, destinos: list[tuple[str, int, str]]):
+    # Mantenimientos recién creados: no hay notificaciones previas que deduplicar
+    db_notificaciones = [
+        model(firebase_uid=firebase_uid, id_mantenimiento=id_mantenimiento, mensaje=mensaje)
+        for firebase_uid, id_mantenimiento, mensaje in destinos
+    ]
+    db_session.add_all(db_notificaciones)
+    db_session.flush()
+    # Se arma la respuesta antes del commit para no recargar cada fila expirada
+    payloads = [
+        {
+            "id": n.id,
+            "firebase_uid": n.firebase_uid,
+            "id_mantenimiento": n.id_mantenimiento,
+            "mensaje": n.mensaje,
+            "leida": n.leida,
+            "created_at": n.created_at.isoformat(),
+        }
+        for n in db_notificaciones
+    ]
+    db_session.commit()
+    return payloads
+
+async def notify_preventivos_batch(db_session: DbSession, avisos: list[tuple[Optional[str], int, str]]):
+    """Notify many new preventivos with one insert; avisos without a cuadrilla uid go to the encargados."""
+    if not avisos:
+        return []
+    destinos = [(uid, id_mantenimiento, mensaje) for uid, id_mantenimiento, mensaje in avisos if uid is not None]
+    sin_uid = [(id_mantenimiento, mensaje) for uid, id_mantenimiento, mensaje in avisos if uid is None]
+    if sin_uid:
+        encargados = await run_db(db_session, _firebase_uids_by_rol, "Encargado de Mantenimiento")
+        destinos.extend((uid, id_mantenimiento, mensaje) for id_mantenimiento, mensaje in sin_uid for uid in encargados)
+    if not destinos:
+        return []
+    creadas = await run_db(db_session, _create_notifications, Notificacion_Preventivo, destinos)
+    for payload in creadas:
+        await notification_manager.send_notification(payload["firebase_uid"], {**payload, "tipo": "preventivo"})
+    return creadas
 
-async def notify_nearby_maintenances(db_session: Session, current_entity: dict, mantenimientos: list[dict]):
+async def notify_nearby_maintenances(db_session: DbSession, current_entity: dict, mantenimientos: list[dict]):
     if not current_entity:
         raise HTTPException(status_code=401, detail="Autenticación requerida")
     firebase_uid = current_entity["data"]["uid"]
@@ -140,7 +182,7 @@ async def notify_nearby_maintenances(db_session: Session, current_entity: dict,
         else:
             created = await send_notification_preventivo(db_session, firebase_uid, m['id'], m.get('mensaje', ''))
         if created:
-            send_webpush_notification(db_session, firebase_uid, 'Mantenimiento cercano', m.get('mensaje', ''))
+            await run_db(db_session, send_webpush_notification, firebase_uid, 'Mantenimiento cercano', m.get('mensaje', ''))
     return {"message": "Notificaciones enviadas"}
 
 def delete_notificaciones(db_session: Session, firebase_uid: str):
@@ -0,0 +1,38 @@
+import base64
+import json
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Query
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(last_id: int) -> str:
+    """Return an opaque cursor pointing after the row with `last_id`."""
+    payload = json.dumps({"id": last_id}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        last_id = payload["id"]
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    if not isinstance(last_id, int):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    return last_id
+
+
+def keyset_page(query: Query, id_column, limit: Optional[int] = None, cursor: Optional[str] = None) -> Tuple[list, Optional[str]]:
+    """Return one page of `query` ordered by `id_column` descending, plus the cursor for the next page."""
+    page_size = min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+    if cursor:
+        query = query.filter(id_column < decode_cursor(cursor))
+    rows = query.order_by(id_column.desc()).limit(page_size + 1).all()
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, encode_cursor(rows[-1].id)
@@ -0,0 +1,150 @@
+import asyncio
+import csv
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+REPORT_PDF_WORKERS = int(os.getenv("REPORT_PDF_WORKERS", "1"))
+
+# (título, encabezados, filas) de cada tabla del reporte
+Section = Tuple[str, List[str], List[list]]
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def report_sections(data: dict) -> List[Section]:
+    """Flatten the `/estadisticas` payload into titled tables shared by the CSV and PDF reports."""
+    correctivos = data.get("correctivos", {})
+    preventivos = data.get("preventivos", {})
+
+    def counts(title, header, values):
+        return title, [header, "Total"], [[key or "Sin dato", total] for key, total in sorted(values.items(), key=lambda item: str(item[0]))]
+
+    def cuadrillas(title, rows):
+        return title, ["Cuadrilla", "Asignados", "Resueltos", "Ratio"], [
+            [row["nombre"], row["asignados"], row["resueltos"], f"{row['resueltos'] / row['asignados']:.2f}" if row["asignados"] else "0.00"]
+            for row in rows
+        ]
+
+    def meses(title, rows):
+        return title, ["Año", "Mes", "Total"], [[row["anio"], row["mes"], row["total"]] for row in rows]
+
+    return [
+        ("Resumen", ["Tipo", "Total"], [["Correctivos", correctivos.get("total", 0)], ["Preventivos", preventivos.get("total", 0)]]),
+        counts("Correctivos por estado", "Estado", correctivos.get("por_estado", {})),
+        counts("Correctivos por prioridad", "Prioridad", correctivos.get("por_prioridad", {})),
+        meses("Correctivos por mes", correctivos.get("por_mes", [])),
+        cuadrillas("Correctivos por cuadrilla", correctivos.get("por_cuadrilla", [])),
+        ("Correctivos finalizados por rubro", ["Rubro", "Cantidad", "Días promedio"], [
+            [row["rubro"] or "Sin dato", row["count"], f"{row['avg_days']:.2f}"] for row in correctivos.get("por_rubro", [])
+        ]),
+        ("Correctivos por zona", ["Zona", "Total", "Sucursales", "Promedio por sucursal"], [
+            [row["zona"], row["total"], row["sucursales"], f"{row['promedio']:.2f}"] for row in correctivos.get("por_zona", [])
+        ]),
+        ("Correctivos por sucursal", ["Sucursal", "Zona", "Total"], [
+            [row["sucursal"], row["zona"], row["total"]] for row in correctivos.get("por_sucursal", [])
+        ]),
+        counts("Preventivos por estado", "Estado", preventivos.get("por_estado", {})),
+        meses("Preventivos por mes", preventivos.get("por_mes", [])),
+        cuadrillas("Preventivos por cuadrilla", preventivos.get("por_cuadrilla", [])),
+    ]
+
+
+def _safe_cell(value):
+    # Evita que Excel interprete nombres cargados por usuarios como fórmulas
+    if isinstance(value, str) and value[:1] in ("=", "+", "-", "@"):
+        return "'" + value
+    return value
+
+
+def iter_estadisticas_csv(data: dict) -> Iterator[bytes]:
+    """Yield the report as CSV, one encoded row at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush() -> bytes:
+        chunk = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate(0)
+        return chunk
+
+    # BOM para que Excel detecte UTF-8
+    yield "\ufeff".encode("utf-8")
+    for index, (title, headers, rows) in enumerate(report_sections(data)):
+        if index:
+            writer.writerow([])
+        writer.writerow([title])
+        writer.writerow(headers)
+        yield flush()
+        for row in rows:
+            writer.writerow([_safe_cell(value) for value in row])
+            yield flush()
+
+
+def render_estadisticas_pdf(data: dict, filtros: Optional[dict] = None) -> bytes:
+    """Render the report as a PDF document. CPU-bound; run it through `render_pdf_in_worker`."""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    styles = getSampleStyleSheet()
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, title="Estadísticas de mantenimientos")
+    story = [Paragraph("Estadísticas de mantenimientos", styles["Title"])]
+    aplicados = {key: value for key, value in (filtros or {}).items() if value not in (None, [], "")}
+    if aplicados:
+        detalle = ", ".join(
+            f"{key}: {', '.join(map(str, value)) if isinstance(value, list) else value}" for key, value in aplicados.items()
+        )
+        story.append(Paragraph(f"Filtros: {escape(detalle)}", styles["Normal"]))
+    table_style = TableStyle([
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#2c2c2c")),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+        ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+        ("FONTSIZE", (0, 0), (-1, -1), 9),
+    ])
+    for title, headers, rows in report_sections(data):
+        story.append(Spacer(1, 12))
+        story.append(Paragraph(title, styles["Heading3"]))
+        if not rows:
+            story.append(Paragraph("Sin datos para los filtros seleccionados", styles["Normal"]))
+            continue
+        table = Table([headers] + [[str(value) for value in row] for row in rows], repeatRows=1)
+        table.setStyle(table_style)
+        story.append(table)
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def get_report_executor() -> ProcessPoolExecutor:
+    """Return the shared process pool used to render PDFs, creating it on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # "spawn" evita heredar los hilos y conexiones del proceso del servidor
+            _executor = ProcessPoolExecutor(
+                max_workers=max(REPORT_PDF_WORKERS, 1),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def shutdown_report_executor() -> None:
+    """Stop the PDF worker processes."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+async def render_pdf_in_worker(data: dict, filtros: Optional[dict] = None) -> bytes:
+    """Render the PDF in a worker process so the event loop keeps serving requests."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_report_executor(), render_estadisticas_pdf, data, filtros)
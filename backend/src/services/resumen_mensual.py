@@ -0,0 +1,175 @@
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import case, delete, extract, func, insert, literal, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from api.models import MantenimientoCorrectivo, MantenimientoPreventivo, ResumenMensualMantenimiento, Sucursal
+
+TIPO_CORRECTIVO = "correctivo"
+TIPO_PREVENTIVO = "preventivo"
+SIN_ZONA = "Sin zona"
+SIN_CUADRILLA = 0
+
+KEY_COLUMNS = ("anio", "mes", "cliente_id", "zona", "id_cuadrilla", "tipo", "estado", "prioridad")
+MODELS = {TIPO_CORRECTIVO: MantenimientoCorrectivo, TIPO_PREVENTIVO: MantenimientoPreventivo}
+
+# (clave, resuelto) de un mantenimiento; None si no suma al resumen
+Entry = Optional[Tuple[tuple, int]]
+
+
+def _resuelto(tipo: str, estado: Optional[str], fecha_cierre) -> int:
+    if tipo == TIPO_CORRECTIVO:
+        return int(estado == "Finalizado")
+    return int(fecha_cierre is not None)
+
+
+def rollup_entry(db: Session, mantenimiento, tipo: str) -> Entry:
+    """Return the rollup key and resolved flag a maintenance currently contributes."""
+    if mantenimiento.fecha_apertura is None:
+        return None
+    zona = db.query(Sucursal.zona).filter(Sucursal.id == mantenimiento.sucursal_id).scalar()
+    return rollup_entry_for_zona(mantenimiento, tipo, zona)
+
+
+def rollup_entry_for_zona(mantenimiento, tipo: str, zona: Optional[str]) -> Entry:
+    """Like `rollup_entry`, for callers that already know the sucursal's zona."""
+    if mantenimiento.fecha_apertura is None:
+        return None
+    prioridad = mantenimiento.prioridad if tipo == TIPO_CORRECTIVO else None
+    key = (
+        mantenimiento.fecha_apertura.year,
+        mantenimiento.fecha_apertura.month,
+        mantenimiento.cliente_id,
+        zona or SIN_ZONA,
+        mantenimiento.id_cuadrilla or SIN_CUADRILLA,
+        tipo,
+        mantenimiento.estado or "",
+        prioridad or "",
+    )
+    return key, _resuelto(tipo, mantenimiento.estado, mantenimiento.fecha_cierre)
+
+
+def _upsert(db: Session, key: tuple, total: int, resueltos: int) -> None:
+    table = ResumenMensualMantenimiento.__table__
+    values = dict(zip(KEY_COLUMNS, key), total=total, resueltos=resueltos)
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        module = postgresql if dialect == "postgresql" else sqlite
+        stmt = module.insert(table).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(KEY_COLUMNS),
+            set_={"total": table.c.total + stmt.excluded.total, "resueltos": table.c.resueltos + stmt.excluded.resueltos},
+        )
+        db.execute(stmt)
+        return
+    match = [table.c[column] == value for column, value in zip(KEY_COLUMNS, key)]
+    result = db.execute(
+        update(table).where(*match).values(total=table.c.total + total, resueltos=table.c.resueltos + resueltos)
+    )
+    if result.rowcount == 0:
+        db.execute(insert(table).values(**values))
+
+
+def apply_deltas(db: Session, deltas: Dict[tuple, List[int]]) -> None:
+    """Add `[total, resueltos]` deltas per key inside the caller's transaction."""
+    table = ResumenMensualMantenimiento.__table__
+    for key, (total, resueltos) in deltas.items():
+        if total == 0 and resueltos == 0:
+            continue
+        _upsert(db, key, total, resueltos)
+        if total < 0:
+            match = [table.c[column] == value for column, value in zip(KEY_COLUMNS, key)]
+            db.execute(delete(table).where(*match, table.c.total <= 0))
+
+
+def record_change(db: Session, before: Entry, after: Entry) -> None:
+    """Move one maintenance from its previous rollup bucket to the current one (without committing)."""
+    if before == after:
+        return
+    deltas = defaultdict(lambda: [0, 0])
+    if before is not None:
+        deltas[before[0]][0] -= 1
+        deltas[before[0]][1] -= before[1]
+    if after is not None:
+        deltas[after[0]][0] += 1
+        deltas[after[0]][1] += after[1]
+    apply_deltas(db, deltas)
+
+
+def record_created(db: Session, entries: List[Entry]) -> None:
+    """Add many new maintenances to the rollup with one upsert per bucket (without committing)."""
+    deltas = defaultdict(lambda: [0, 0])
+    for entry in entries:
+        if entry is not None:
+            deltas[entry[0]][0] += 1
+            deltas[entry[0]][1] += entry[1]
+    apply_deltas(db, deltas)
+
+
+def _grouped_select(tipo: str, *criteria):
+    model = MODELS[tipo]
+    anio = extract("year", model.fecha_apertura)
+    mes = extract("month", model.fecha_apertura)
+    zona = func.coalesce(Sucursal.zona, SIN_ZONA)
+    cuadrilla = func.coalesce(model.id_cuadrilla, SIN_CUADRILLA)
+    estado = func.coalesce(model.estado, "")
+    prioridad = func.coalesce(model.prioridad, "") if tipo == TIPO_CORRECTIVO else literal("")
+    if tipo == TIPO_CORRECTIVO:
+        resuelto = case((model.estado == "Finalizado", 1), else_=0)
+    else:
+        resuelto = case((model.fecha_cierre.isnot(None), 1), else_=0)
+    group = (anio, mes, model.cliente_id, zona, cuadrilla, estado, prioridad)
+    return (
+        select(anio, mes, model.cliente_id, zona, cuadrilla, literal(tipo), estado, prioridad, func.count(model.id), func.sum(resuelto))
+        .select_from(model)
+        .outerjoin(Sucursal, Sucursal.id == model.sucursal_id)
+        .where(model.fecha_apertura.isnot(None), *criteria)
+        .group_by(*group)
+    )
+
+
+def move_sucursal_zona(db: Session, sucursal_id: int, zona_anterior: Optional[str], zona_nueva: Optional[str]) -> None:
+    """Re-bucket a sucursal's maintenances after its zona changed (without committing)."""
+    if (zona_anterior or SIN_ZONA) == (zona_nueva or SIN_ZONA):
+        return
+    deltas = defaultdict(lambda: [0, 0])
+    for tipo, model in MODELS.items():
+        for row in db.execute(_grouped_select(tipo, model.sucursal_id == sucursal_id)):
+            anio, mes, cliente_id, _, *rest, total, resueltos = row
+            old_key = (int(anio), int(mes), cliente_id, zona_anterior or SIN_ZONA, *rest)
+            new_key = (int(anio), int(mes), cliente_id, zona_nueva or SIN_ZONA, *rest)
+            deltas[old_key][0] -= total
+            deltas[old_key][1] -= int(resueltos or 0)
+            deltas[new_key][0] += total
+            deltas[new_key][1] += int(resueltos or 0)
+    apply_deltas(db, deltas)
+
+
+def unassign_cuadrilla(db: Session, cuadrilla_id: int) -> None:
+    """Re-bucket a cuadrilla's maintenances under SIN_CUADRILLA before it is deleted (without committing)."""
+    deltas = defaultdict(lambda: [0, 0])
+    for tipo, model in MODELS.items():
+        for row in db.execute(_grouped_select(tipo, model.id_cuadrilla == cuadrilla_id)):
+            anio, mes, cliente_id, zona, _, *rest, total, resueltos = row
+            old_key = (int(anio), int(mes), cliente_id, zona, cuadrilla_id, *rest)
+            new_key = (int(anio), int(mes), cliente_id, zona, SIN_CUADRILLA, *rest)
+            deltas[old_key][0] -= total
+            deltas[old_key][1] -= int(resueltos or 0)
+            deltas[new_key][0] += total
+            deltas[new_key][1] += int(resueltos or 0)
+    apply_deltas(db, deltas)
+
+
+def rebuild_resumen(db) -> int:
+    """Recompute the whole rollup from the maintenance tables (caller commits).
+
+    Accepts a Session or a Connection, so migrations can reuse it.
+    """
+    table = ResumenMensualMantenimiento.__table__
+    db.execute(delete(table))
+    columns = [table.c[column] for column in KEY_COLUMNS] + [table.c.total, table.c.resueltos]
+    for tipo in MODELS:
+        db.execute(insert(table).from_select(columns, _grouped_select(tipo)))
+    return db.execute(select(func.count()).select_from(table)).scalar()
@@ -0,0 +1,26 @@
+from collections import defaultdict
+from typing import Iterable, Sequence
+
+from sqlalchemy.orm import Session
+
+
+def rows_to_dicts(rows: Iterable[Sequence], keys: Sequence[str]) -> list:
+    """Turn column tuples into dicts keyed by `keys` without hydrating ORM objects."""
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def urls_by_mantenimiento(db: Session, model, mantenimiento_ids) -> dict:
+    """Group `model.url` by `mantenimiento_id` in a single query.
+
+    `mantenimiento_ids` may be a list of ids or a select of ids (e.g. the
+    filtered list query), so the whole listing costs one extra round trip.
+    """
+    grouped = defaultdict(list)
+    rows = (
+        db.query(model.mantenimiento_id, model.url)
+        .filter(model.mantenimiento_id.in_(mantenimiento_ids))
+        .order_by(model.mantenimiento_id, model.id)
+    )
+    for mantenimiento_id, url in rows:
+        grouped[mantenimiento_id].append(url)
+    return grouped
@@ -0,0 +1,210 @@
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy.orm import Session, selectinload
+
+from api.models import MantenimientoCorrectivo, MantenimientoPreventivo, SheetSyncOutbox
+from config.database import SessionLocal
+from services import google_sheets
+
+logger = logging.getLogger(__name__)
+
+SHEET_SYNC_INTERVAL = float(os.getenv("SHEET_SYNC_INTERVAL", "2"))
+SHEET_SYNC_BATCH_SIZE = 100
+# Ventana en la que se juntan los cambios seguidos de un mismo mantenimiento (p. ej. varias fotos)
+SHEET_SYNC_DEBOUNCE = timedelta(seconds=float(os.getenv("SHEET_SYNC_DEBOUNCE", "3")))
+# Tiempo que una pasada se reserva las entradas tomadas, por si el proceso muere a mitad de camino
+SHEET_SYNC_LEASE = timedelta(minutes=5)
+MAX_BACKOFF = timedelta(minutes=30)
+
+APPEND = "append"
+UPDATE = "update"
+DELETE = "delete"
+
+MODELS = {"correctivo": MantenimientoCorrectivo, "preventivo": MantenimientoPreventivo}
+
+
+def queue_sheet_sync(db: Session, tipo: str, operacion: str, mantenimiento_id: int) -> None:
+    """Record a sheet write in the caller's transaction; the worker applies it after commit.
+
+    The entry becomes due after `SHEET_SYNC_DEBOUNCE`, so quick successive
+    changes to the same row are written together.
+    """
+    db.add(SheetSyncOutbox(
+        tipo=tipo,
+        operacion=operacion,
+        mantenimiento_id=mantenimiento_id,
+        next_attempt_at=datetime.utcnow() + SHEET_SYNC_DEBOUNCE,
+    ))
+
+
+def _backoff(attempts: int) -> timedelta:
+    return min(timedelta(seconds=5 * 2 ** attempts), MAX_BACKOFF)
+
+
+def _claim(db: Session, now: datetime, limit: int, flush: bool = False) -> list:
+    horizon = now + SHEET_SYNC_DEBOUNCE
+    entries = (
+        db.query(SheetSyncOutbox)
+        .filter(SheetSyncOutbox.next_attempt_at <= (horizon if flush else now))
+        .order_by(SheetSyncOutbox.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    if entries and not flush:
+        # Los cambios aún en ventana de las mismas filas salen en esta pasada
+        keys = {(entry.tipo, entry.mantenimiento_id) for entry in entries}
+        siguientes = (
+            db.query(SheetSyncOutbox)
+            .filter(
+                SheetSyncOutbox.next_attempt_at > now,
+                SheetSyncOutbox.next_attempt_at <= horizon,
+                SheetSyncOutbox.mantenimiento_id.in_({mantenimiento_id for _, mantenimiento_id in keys}),
+            )
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        entries = sorted(
+            entries + [entry for entry in siguientes if (entry.tipo, entry.mantenimiento_id) in keys],
+            key=lambda entry: entry.id,
+        )
+    for entry in entries:
+        entry.next_attempt_at = now + SHEET_SYNC_LEASE
+    db.commit()
+    return entries
+
+
+def _net_operations(entries: list) -> dict:
+    """Reduce entries (in queue order) to one operation per maintenance.
+
+    Updates after an append fold into the append; an append followed by a
+    delete cancels out, since the row was never written.
+    """
+    operaciones = {}
+    for entry in entries:
+        previa = operaciones.get(entry.mantenimiento_id)
+        if entry.operacion == DELETE:
+            if previa == APPEND:
+                del operaciones[entry.mantenimiento_id]
+            else:
+                operaciones[entry.mantenimiento_id] = DELETE
+        elif entry.operacion == UPDATE and previa in (APPEND, DELETE):
+            continue
+        else:
+            operaciones[entry.mantenimiento_id] = entry.operacion
+    return operaciones
+
+
+def _load(db: Session, tipo: str, ids) -> dict:
+    if not ids:
+        return {}
+    model = MODELS[tipo]
+    rows = (
+        db.query(model)
+        .options(selectinload(model.cliente), selectinload(model.sucursal), selectinload(model.cuadrilla))
+        .filter(model.id.in_(set(ids)))
+        .all()
+    )
+    return {row.id: row for row in rows}
+
+
+def _apply(db: Session, tipo: str, operaciones: dict) -> None:
+    # Si el mantenimiento ya no existe no hay nada que escribir: su baja llega en otra entrada
+    mantenimientos = _load(db, tipo, [i for i, operacion in operaciones.items() if operacion != DELETE])
+
+    def pendientes(operacion):
+        return [mantenimientos[i] for i, op in operaciones.items() if op == operacion and i in mantenimientos]
+
+    google_sheets.apply_changes(
+        tipo,
+        appends=pendientes(APPEND),
+        updates=pendientes(UPDATE),
+        deletes=[i for i, operacion in operaciones.items() if operacion == DELETE],
+    )
+
+
+def process_sheet_outbox(
+    session_factory: Optional[Callable[[], Session]] = None,
+    now: Optional[datetime] = None,
+    limit: int = SHEET_SYNC_BATCH_SIZE,
+    flush: bool = False,
+) -> int:
+    """Apply due outbox entries and return how many were taken.
+
+    Entries are coalesced per maintenance and written with one batch per
+    worksheet. A failed worksheet batch stays in the outbox with exponential
+    backoff. With `flush`, entries still inside the debounce window are
+    taken as well.
+    """
+    now = now or datetime.utcnow()
+    db = (session_factory or SessionLocal)()
+    try:
+        entries = _claim(db, now, limit, flush)
+        por_tipo = defaultdict(list)
+        for entry in entries:
+            por_tipo[entry.tipo].append(entry)
+        for tipo, group in por_tipo.items():
+            try:
+                _apply(db, tipo, _net_operations(group))
+            except Exception as exc:
+                logger.warning("Google Sheets sync of %s failed: %s", tipo, exc, exc_info=True)
+                google_sheets.reset_worksheet_cache()
+                db.rollback()
+                for entry in group:
+                    entry.attempts += 1
+                    entry.next_attempt_at = now + _backoff(entry.attempts)
+                    entry.last_error = str(exc)[:1000]
+            else:
+                for entry in group:
+                    db.delete(entry)
+            db.commit()
+        return len(entries)
+    finally:
+        db.close()
+
+
+class SheetOutboxWorker:
+    """Background task that drains the outbox while the app is running."""
+
+    def __init__(self, interval: float = SHEET_SYNC_INTERVAL) -> None:
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        # Lo que quedó esperando la ventana se escribe antes de cerrar
+        try:
+            while await asyncio.to_thread(process_sheet_outbox, flush=True) >= SHEET_SYNC_BATCH_SIZE:
+                pass
+        except Exception:
+            logger.exception("Google Sheets outbox flush failed")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                processed = await asyncio.to_thread(process_sheet_outbox)
+            except Exception:
+                logger.exception("Google Sheets outbox pass failed")
+                processed = 0
+            # Con un lote lleno se sigue sin esperar
+            if processed < SHEET_SYNC_BATCH_SIZE:
+                await asyncio.sleep(self.interval)
+
+
+sheet_outbox_worker = SheetOutboxWorker()
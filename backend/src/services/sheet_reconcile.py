@@ -0,0 +1,34 @@
+from typing import Iterable, Optional
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session, joinedload
+
+from api.schemas import Role
+from services import google_sheets
+from services.sheet_outbox import MODELS
+
+
+def _mantenimientos(db: Session, tipo: str) -> list:
+    model = MODELS[tipo]
+    # Una sola consulta con los nombres relacionados que necesitan las filas
+    return (
+        db.query(model)
+        .options(joinedload(model.cliente), joinedload(model.sucursal), joinedload(model.cuadrilla))
+        .order_by(model.id)
+        .all()
+    )
+
+
+def reconcile_sheets(db: Session, tipos: Optional[Iterable[str]] = None) -> dict:
+    """Rewrite the drifted parts of each maintenance worksheet from the database."""
+    return {tipo: google_sheets.reconcile_sheet(tipo, _mantenimientos(db, tipo)) for tipo in (tipos or MODELS)}
+
+
+def reconcile_sheets_for(db: Session, current_entity: dict, tipo: Optional[str] = None) -> dict:
+    if not current_entity:
+        raise HTTPException(status_code=401, detail="Autenticación requerida")
+    if current_entity.get("type") != "usuario" or current_entity["data"].get("rol") != Role.ADMIN:
+        raise HTTPException(status_code=403, detail="No tienes permisos de administrador")
+    if tipo is not None and tipo not in MODELS:
+        raise HTTPException(status_code=400, detail="Tipo de mantenimiento inválido")
+    return reconcile_sheets(db, [tipo] if tipo else None)
@@ -6,6 +6,7 @@ from sqlalchemy.orm import Session
 
 from api.models import Cliente, Sucursal
 from auth.firebase import initialize_firebase
+from services.resumen_mensual import move_sucursal_zona
 
 ALLOWED_FRECUENCIAS = {"Mensual", "Trimestral", "Cuatrimestral", "Semestral"}
 
@@ -153,6 +154,7 @@ def update_sucursal(
 ):
     _ensure_usuario(current_entity)
     sucursal = get_sucursal(db_session, sucursal_id)
+    zona_anterior = sucursal.zona
 
     if cliente_id is not None and cliente_id != sucursal.cliente_id:
         _get_cliente(db_session, cliente_id)
@@ -174,6 +176,7 @@ def update_sucursal(
         sucursal.frecuencia_preventivo = _validate_frecuencia(frecuencia_preventivo)
 
     try:
+        move_sucursal_zona(db_session, sucursal.id, zona_anterior, sucursal.zona)
         db_session.commit()
         db_session.refresh(sucursal)
     except Exception as exc:
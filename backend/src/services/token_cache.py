@@ -0,0 +1,96 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+AUTH_TOKEN_CACHE_TTL = int(os.getenv("AUTH_TOKEN_CACHE_TTL", "300"))
+AUTH_TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_TOKEN_CACHE_MAX_ENTRIES", "1024"))
+
+
+class TokenCache:
+    """Bounded in-process cache of verified Firebase ID tokens."""
+
+    def __init__(self, ttl: int = AUTH_TOKEN_CACHE_TTL, max_entries: int = AUTH_TOKEN_CACHE_MAX_ENTRIES, clock=time.time) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> Optional[dict]:
+        """Return the cached entity for a token, or None if absent or expired."""
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, entity = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entity
+
+    def set(self, token: str, entity: dict, exp: Optional[float] = None) -> None:
+        """Store a verified entity until the token `exp` claim or the TTL, whichever comes first."""
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        expires_at = self._clock() + self.ttl
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+        if expires_at <= self._clock():
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (expires_at, entity)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard_entity(self, email: Optional[str] = None, firebase_uid: Optional[str] = None) -> None:
+        """Drop every cached token that resolved to the given email or firebase UID."""
+        with self._lock:
+            stale = [
+                key
+                for key, (_, entity) in self._entries.items()
+                if (email and entity.get("data", {}).get("email") == email)
+                or (firebase_uid and entity.get("data", {}).get("uid") == firebase_uid)
+            ]
+            for key in stale:
+                del self._entries[key]
+
+    def discard_all(self) -> None:
+        """Drop every cached token, keeping the counters."""
+        with self._lock:
+            self._entries.clear()
+
+    def clear(self) -> None:
+        """Drop every cached token and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the current size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+            }
+
+token_cache = TokenCache()
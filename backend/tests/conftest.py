@@ -1,9 +1,12 @@
+import asyncio
 import os
 import sys
+from contextlib import contextmanager
 from pathlib import Path
 
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import event
 from sqlalchemy.orm import sessionmaker
 
 # Configurar variables de entorno antes de importar la aplicación
@@ -40,6 +43,37 @@ def db_session():
     finally:
         session.close()
 
+@pytest.fixture(scope="function")
+def run_with_async_session(db_session):
+    """Run `fn(session)` with an AsyncSession (aiosqlite) bound to the test database."""
+    from config.database import get_async_session_factory
+
+    def run(fn):
+        async def runner():
+            async with get_async_session_factory()() as session:
+                return await fn(session)
+        return asyncio.run(runner())
+
+    return run
+
+@pytest.fixture
+def count_queries():
+    """Context manager that collects every SQL statement run on the test engine."""
+    @contextmanager
+    def counter():
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+    return counter
+
 @pytest.fixture(scope="function")
 def client(db_session):
     def override_get_db():
@@ -76,4 +110,15 @@ def mock_firebase(monkeypatch):
     monkeypatch.setattr("firebase_admin.db.reference", dummy_reference)
     monkeypatch.setattr("src.services.sucursales.initialize_firebase", lambda: None)
     monkeypatch.setattr("src.services.maps.initialize_firebase", lambda: None)
+
+@pytest.fixture(autouse=True)
+def reset_auth_caches():
+    from services.entity_directory import entity_directory
+    from services.token_cache import token_cache
+
+    token_cache.clear()
+    entity_directory.clear()
+    yield
+    token_cache.clear()
+    entity_directory.clear()
     
\ No newline at end of file
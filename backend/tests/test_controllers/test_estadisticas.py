@@ -0,0 +1,81 @@
+from datetime import date
+from unittest.mock import AsyncMock, patch
+
+
+def test_estadisticas_get_forwards_filters(client):
+    payload = {"correctivos": {"total": 0}, "preventivos": {"total": 0}}
+    with patch("controllers.estadisticas.get_estadisticas", return_value=payload) as get_estadisticas:
+        resp = client.get(
+            "/estadisticas/",
+            params=[("meses", 1), ("meses", 2), ("anios", 2024), ("zona", "Norte"), ("id_cuadrilla", 3), ("secciones", "rubros")],
+        )
+    assert resp.status_code == 200
+    assert resp.json() == payload
+    kwargs = get_estadisticas.call_args.kwargs
+    assert kwargs["meses"] == [1, 2]
+    assert kwargs["anios"] == [2024]
+    assert kwargs["zona"] == "Norte"
+    assert kwargs["id_cuadrilla"] == 3
+    assert kwargs["cliente_id"] is None
+    assert kwargs["secciones"] == ["rubros"]
+
+
+def test_estadisticas_get_rejects_invalid_month(client):
+    resp = client.get("/estadisticas/", params={"meses": "enero"})
+    assert resp.status_code == 422
+
+
+def test_estadisticas_csv_streams_attachment(client):
+    payload = {"correctivos": {"total": 2}, "preventivos": {"total": 1}}
+    with patch("controllers.estadisticas.get_estadisticas", return_value=payload):
+        resp = client.get("/estadisticas/reporte.csv", params={"anios": 2024})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/csv")
+    assert "estadisticas.csv" in resp.headers["content-disposition"]
+    assert "Correctivos,2" in resp.content.decode("utf-8-sig")
+
+
+def test_estadisticas_pdf_renders_in_worker(client):
+    payload = {"correctivos": {"total": 2}, "preventivos": {"total": 1}}
+    render = AsyncMock(return_value=b"%PDF-1.4 test")
+    with patch("controllers.estadisticas.get_estadisticas", return_value=payload), patch(
+        "controllers.estadisticas.render_pdf_in_worker", render
+    ):
+        resp = client.get("/estadisticas/reporte.pdf", params={"zona": "Norte"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/pdf"
+    assert resp.content == b"%PDF-1.4 test"
+    data, filtros = render.await_args.args
+    assert data == payload
+    assert filtros["zona"] == "Norte"
+
+
+def test_estadisticas_pdf_applies_section_filters(client):
+    payload = {"correctivos": {"total": 2}, "preventivos": {"total": 1}}
+    render = AsyncMock(return_value=b"%PDF-1.4 test")
+    with patch("controllers.estadisticas.get_estadisticas_por_seccion", return_value=payload) as por_seccion, patch(
+        "controllers.estadisticas.render_pdf_in_worker", render
+    ):
+        resp = client.post(
+            "/estadisticas/reporte.pdf",
+            json={"meses": [1], "anios": [2024], "secciones": {"zonas": {"cliente_id": 2}, "rubros": {"estado": "Finalizado"}}},
+        )
+    assert resp.status_code == 200
+    assert resp.content == b"%PDF-1.4 test"
+    args, kwargs = por_seccion.call_args
+    assert args[2]["zonas"]["cliente_id"] == 2
+    assert args[2]["rubros"]["estado"] == "Finalizado"
+    assert kwargs == {"meses": [1], "anios": [2024]}
+    data, filtros = render.await_args.args
+    assert data == payload
+    assert filtros["zonas.cliente_id"] == 2 and filtros["rubros.estado"] == "Finalizado"
+
+
+def test_estadisticas_cumplimiento_forwards_window(client):
+    payload = {"estados": ["faltante"], "periodos": {}, "sucursales": {"id": []}, "matriz": []}
+    with patch("controllers.estadisticas.get_cumplimiento_preventivos", return_value=payload) as get_cumplimiento:
+        resp = client.get("/estadisticas/cumplimiento-preventivos", params={"desde": "2024-01-01", "hasta": "2024-06-30", "zona": "Norte"})
+    assert resp.status_code == 200
+    assert resp.json() == payload
+    kwargs = get_cumplimiento.call_args.kwargs
+    assert (kwargs["desde"], kwargs["hasta"], kwargs["zona"]) == (date(2024, 1, 1), date(2024, 6, 30), "Norte")
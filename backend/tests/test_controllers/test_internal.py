@@ -0,0 +1,29 @@
+from src.api.schemas import Role
+
+
+def test_internal_stats_returns_token_cache_counters(client):
+    client.app.state.current_entity = {"type": "usuario", "data": {"rol": Role.ADMIN}}
+    resp = client.get("/internal/stats")
+    assert resp.status_code == 200
+    assert set(resp.json()["token_cache"]) >= {"hits", "misses", "size"}
+    assert set(resp.json()["db_pool"]) >= {"in_use", "overflow", "wait_avg_ms", "wait_max_ms"}
+
+
+def test_internal_stats_requires_admin(client):
+    client.app.state.current_entity = {"type": "cuadrilla", "data": {"id": 1}}
+    resp = client.get("/internal/stats")
+    assert resp.status_code == 403
+
+
+def test_reconcile_sheets_requires_admin(client):
+    client.app.state.current_entity = {"type": "cuadrilla", "data": {"id": 1}}
+    resp = client.post("/internal/sheets/reconcile")
+    assert resp.status_code == 403
+
+
+def test_reconcile_sheets_reports_changes_per_tipo(client):
+    client.app.state.current_entity = {"type": "usuario", "data": {"rol": Role.ADMIN}}
+    resp = client.post("/internal/sheets/reconcile", params={"tipo": "correctivo"})
+    assert resp.status_code == 200
+    assert set(resp.json()["correctivo"]) == {"filas", "actualizadas", "agregadas", "eliminadas"}
+    assert client.post("/internal/sheets/reconcile", params={"tipo": "otro"}).status_code == 400
@@ -1,6 +1,8 @@
 from datetime import date
 from unittest.mock import AsyncMock, MagicMock, patch
 
+from controllers.mantenimientos_correctivos import _correctivo_to_dict
+
 
 def _correctivo_mock():
     return MagicMock(
@@ -21,14 +23,39 @@ def _correctivo_mock():
     )
 
 
+def _correctivo_row():
+    return _correctivo_to_dict(_correctivo_mock())
+
+
 def test_list_mantenimientos_correctivos(client):
-    m = _correctivo_mock()
-    with patch("controllers.mantenimientos_correctivos.get_mantenimientos_correctivos", return_value=[m]):
+    with patch("controllers.mantenimientos_correctivos.get_mantenimientos_correctivos_rows", return_value=[_correctivo_row()]):
         resp = client.get("/mantenimientos-correctivos/")
     assert resp.status_code == 200
     assert resp.json()[0]["fotos"] == ["https://example.com/foto-1.jpg"]
 
 
+def test_list_mantenimientos_correctivos_paginated(client):
+    page = MagicMock(return_value=([_correctivo_row()], "next-token"))
+    with patch("controllers.mantenimientos_correctivos.get_mantenimientos_correctivos_rows_page", page):
+        resp = client.get(
+            "/mantenimientos-correctivos/",
+            params={"limit": 1, "estado": "Pendiente", "fecha_desde": "2025-01-01"},
+        )
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["next_cursor"] == "next-token"
+    assert body["items"][0]["id"] == 1
+    args, kwargs = page.call_args
+    assert args[1:] == (1, None)
+    assert kwargs["estado"] == "Pendiente"
+    assert kwargs["fecha_desde"] == date(2025, 1, 1)
+
+
+def test_list_mantenimientos_correctivos_rejects_large_limit(client):
+    resp = client.get("/mantenimientos-correctivos/", params={"limit": 10000})
+    assert resp.status_code == 422
+
+
 def test_get_mantenimiento_correctivo(client):
     m = _correctivo_mock()
     with patch("controllers.mantenimientos_correctivos.get_mantenimiento_correctivo", return_value=m):
@@ -122,3 +149,18 @@ def test_mantenimiento_photo_delete_uses_service(client):
     assert resp.status_code == 200
     assert resp.json() == {"message": "Foto eliminada correctamente"}
     mock_delete.assert_called_once()
+
+
+def test_export_mantenimientos_correctivos_streams_attachment(client):
+    with patch("controllers.mantenimientos_correctivos.iter_export", return_value=iter([b"a\n", b"b\n"])) as iter_export:
+        resp = client.get("/mantenimientos-correctivos/export", params={"formato": "csv"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/csv")
+    assert 'filename="mantenimientos_correctivos.csv"' in resp.headers["content-disposition"]
+    assert resp.content == b"a\nb\n"
+    iter_export.assert_called_once_with("correctivos", "csv", False)
+
+
+def test_export_mantenimientos_correctivos_rejects_invalid_format(client):
+    resp = client.get("/mantenimientos-correctivos/export", params={"formato": "xlsx"})
+    assert resp.status_code == 400
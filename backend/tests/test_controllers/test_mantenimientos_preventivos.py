@@ -1,5 +1,8 @@
+from datetime import date
 from unittest.mock import AsyncMock, MagicMock, patch
 
+from controllers.mantenimientos_preventivos import _preventivo_to_dict
+
 
 def _preventivo_mock():
     return MagicMock(
@@ -17,14 +20,30 @@ def _preventivo_mock():
     )
 
 
+def _preventivo_row():
+    return _preventivo_to_dict(_preventivo_mock())
+
+
 def test_list_mantenimientos_preventivos(client):
-    m = _preventivo_mock()
-    with patch("controllers.mantenimientos_preventivos.get_mantenimientos_preventivos", return_value=[m]):
+    with patch("controllers.mantenimientos_preventivos.get_mantenimientos_preventivos_rows", return_value=[_preventivo_row()]):
         resp = client.get("/mantenimientos-preventivos/")
     assert resp.status_code == 200
     assert resp.json()[0]["planillas"] == ["https://example.com/planilla.pdf"]
 
 
+def test_list_mantenimientos_preventivos_with_cursor(client):
+    page = MagicMock(return_value=([_preventivo_row()], None))
+    with patch("controllers.mantenimientos_preventivos.get_mantenimientos_preventivos_rows_page", page):
+        resp = client.get("/mantenimientos-preventivos/", params={"cursor": "abc", "sucursal_id": 1})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["next_cursor"] is None
+    assert body["items"][0]["planillas"] == ["https://example.com/planilla.pdf"]
+    args, kwargs = page.call_args
+    assert args[1:] == (None, "abc")
+    assert kwargs["sucursal_id"] == 1
+
+
 def test_get_mantenimiento_preventivo(client):
     m = _preventivo_mock()
     with patch("controllers.mantenimientos_preventivos.get_mantenimiento_preventivo", return_value=m):
@@ -108,3 +127,34 @@ def test_mantenimiento_photo_delete(client):
     assert resp.status_code == 200
     assert resp.json() == {"message": "Foto eliminada correctamente"}
     mock_delete.assert_called_once()
+
+
+def test_export_mantenimientos_preventivos_gzip(client):
+    with patch("controllers.mantenimientos_preventivos.iter_export", return_value=iter([b"\x1f\x8b"])) as iter_export:
+        resp = client.get("/mantenimientos-preventivos/export", params={"gzip": True})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/gzip"
+    assert 'filename="mantenimientos_preventivos.ndjson.gz"' in resp.headers["content-disposition"]
+    iter_export.assert_called_once_with("preventivos", "ndjson", True)
+
+
+def test_export_mantenimientos_preventivos_requires_usuario(client):
+    client.app.state.current_entity = {"type": "cuadrilla", "id": 1}
+    resp = client.get("/mantenimientos-preventivos/export")
+    assert resp.status_code == 403
+
+
+def test_planificar_preventivos_forwards_asignaciones(client):
+    resultado = {"creados": [], "sin_cuadrilla": [3]}
+    with patch(
+        "controllers.mantenimientos_preventivos.planificar_preventivos", AsyncMock(return_value=resultado)
+    ) as planificar:
+        resp = client.post(
+            "/mantenimientos-preventivos/planificar",
+            json={"fecha_apertura": "2025-04-01", "asignaciones": [{"sucursal_id": 1, "id_cuadrilla": 2}]},
+        )
+    assert resp.status_code == 200
+    assert resp.json() == resultado
+    args = planificar.await_args
+    assert args.args[1] == date(2025, 4, 1)
+    assert args.kwargs == {"asignaciones": {1: 2}, "estado": "Pendiente", "autoasignar": False}
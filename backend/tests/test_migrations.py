@@ -0,0 +1,315 @@
+from datetime import date, datetime
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy import create_engine, exc, inspect, select, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from api.models import (
+    Base,
+    Cliente,
+    ColumnPreference,
+    CorrectivoSeleccionado,
+    GaleriaPublicada,
+    IdentityVersion,
+    MantenimientoCorrectivo,
+    MantenimientoPreventivo,
+    MensajeCorrectivo,
+    Notificacion_Correctivo,
+    PushSubscription,
+    ResumenMensualMantenimiento,
+    SheetSyncOutbox,
+    Sucursal,
+)
+from migrations import runner
+from migrations.runner import applied_versions, discover_migrations, run_migrations
+from migrations.versions import v0001_hot_lookup_indexes as v0001
+from migrations.versions import v0003_preventivo_period_start as v0003
+from services.mantenimientos_preventivos import period_start
+from services.resumen_mensual import rebuild_resumen
+
+
+@pytest.fixture
+def memory_engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+def _index_names(engine, table):
+    return {index["name"] for index in inspect(engine).get_indexes(table)}
+
+
+def test_migrations_are_discovered_in_order():
+    versions = [migration.version for migration in discover_migrations()]
+    assert versions == sorted(versions)
+    assert versions[0] == 1
+
+
+def test_run_migrations_adds_indexes_to_legacy_schema(memory_engine):
+    with memory_engine.begin() as connection:
+        for name, _, _ in v0001.INDEXES:
+            connection.execute(text(f"DROP INDEX {name}"))
+        connection.execute(text("CREATE INDEX ix_column_preference_firebase_uid ON column_preference (firebase_uid)"))
+
+    assert run_migrations(memory_engine) == [migration.version for migration in discover_migrations()]
+
+    for name, table, _ in v0001.INDEXES:
+        assert name in _index_names(memory_engine, table)
+    assert "ix_column_preference_firebase_uid" not in _index_names(memory_engine, "column_preference")
+    assert 1 in applied_versions(memory_engine)
+
+
+def _zonas(engine):
+    with engine.connect() as connection:
+        return connection.execute(text("SELECT COUNT(*) FROM zona")).scalar()
+
+
+def _fake_migration(upgrade):
+    return runner.Migration(99, "fake", upgrade)
+
+
+def test_run_migrations_propagates_integrity_errors_from_upgrade(memory_engine, monkeypatch):
+    def upgrade(connection):
+        connection.execute(text("INSERT INTO zona (id, nombre) VALUES (1, 'Norte')"))
+        connection.execute(text("INSERT INTO zona (id, nombre) VALUES (1, 'Sur')"))
+
+    monkeypatch.setattr(runner, "discover_migrations", lambda: [_fake_migration(upgrade)])
+    with pytest.raises(exc.IntegrityError):
+        run_migrations(memory_engine)
+    assert 99 not in applied_versions(memory_engine)
+    assert _zonas(memory_engine) == 0
+
+
+def test_run_migrations_skips_version_applied_concurrently(memory_engine, monkeypatch):
+    run_migrations(memory_engine)
+    with memory_engine.begin() as connection:
+        connection.execute(runner.schema_migrations.insert().values(version=99, name="fake", applied_at=datetime.now()))
+
+    def upgrade(connection):
+        connection.execute(text("INSERT INTO zona (id, nombre) VALUES (1, 'Norte')"))
+
+    monkeypatch.setattr(runner, "discover_migrations", lambda: [_fake_migration(upgrade)])
+    # Otro proceso registró la versión después de que este leyó las aplicadas
+    monkeypatch.setattr(runner, "applied_versions", lambda engine: set())
+
+    assert run_migrations(memory_engine) == []
+    # La migración del proceso que perdió la carrera se deshace entera
+    assert _zonas(memory_engine) == 0
+
+
+def test_hot_lookup_indexes_run_outside_a_transaction(memory_engine, monkeypatch):
+    seen = []
+    monkeypatch.setattr(v0001, "upgrade", lambda connection: seen.append(connection.get_execution_options().get("isolation_level")))
+    run_migrations(memory_engine, target=1)
+    assert seen == ["AUTOCOMMIT"]
+    assert applied_versions(memory_engine) == {1}
+
+
+def test_hot_lookup_indexes_are_built_concurrently_on_postgres():
+    statements = []
+    connection = MagicMock()
+    connection.dialect.name = "postgresql"
+    connection.execute.side_effect = lambda statement: statements.append(str(statement)) or MagicMock(
+        scalars=lambda: ["ix_mantenimiento_correctivo_fecha_apertura"]
+    )
+
+    v0001.upgrade(connection)
+
+    assert statements[1] == "DROP INDEX CONCURRENTLY IF EXISTS ix_column_preference_firebase_uid"
+    assert "DROP INDEX CONCURRENTLY IF EXISTS ix_mantenimiento_correctivo_fecha_apertura" in statements
+    creates = [statement for statement in statements if statement.startswith("CREATE")]
+    assert len(creates) == len(v0001.INDEXES)
+    assert all(statement.startswith("CREATE INDEX CONCURRENTLY IF NOT EXISTS") for statement in creates)
+
+
+def test_resumen_migration_backfills_existing_maintenances(memory_engine):
+    ResumenMensualMantenimiento.__table__.drop(memory_engine)
+    Session = sessionmaker(bind=memory_engine)
+    with Session() as session:
+        cliente = Cliente(nombre="ACME", contacto="Jane", email="acme@example.com")
+        session.add(cliente)
+        session.flush()
+        sucursal = Sucursal(nombre="Central", zona="Norte", cliente_id=cliente.id)
+        session.add(sucursal)
+        session.flush()
+        session.add_all(
+            MantenimientoPreventivo(cliente_id=cliente.id, sucursal_id=sucursal.id, fecha_apertura=date(2024, 1, day), estado="Pendiente")
+            for day in (1, 2)
+        )
+        session.commit()
+
+    run_migrations(memory_engine)
+
+    with Session() as session:
+        rows = session.query(ResumenMensualMantenimiento.tipo, ResumenMensualMantenimiento.total).all()
+    assert rows == [("preventivo", 2)]
+
+
+def test_resumen_migration_matches_service_rebuild(memory_engine):
+    ResumenMensualMantenimiento.__table__.drop(memory_engine)
+    Session = sessionmaker(bind=memory_engine)
+    with Session() as session:
+        cliente = Cliente(nombre="ACME", contacto="Jane", email="acme@example.com")
+        session.add(cliente)
+        session.flush()
+        sucursal = Sucursal(nombre="Central", cliente_id=cliente.id)
+        session.add(sucursal)
+        session.flush()
+        session.add_all([
+            MantenimientoCorrectivo(cliente_id=cliente.id, sucursal_id=sucursal.id, fecha_apertura=date(2024, 2, 1), estado="Finalizado", prioridad="Alta"),
+            MantenimientoCorrectivo(cliente_id=cliente.id, sucursal_id=sucursal.id, fecha_apertura=date(2024, 2, 9), estado="Pendiente"),
+            MantenimientoPreventivo(cliente_id=cliente.id, sucursal_id=sucursal.id, fecha_apertura=date(2024, 3, 1), fecha_cierre=date(2024, 3, 5)),
+        ])
+        session.commit()
+
+    run_migrations(memory_engine)
+
+    def rows(session):
+        columns = [c for c in ResumenMensualMantenimiento.__table__.columns if c.name != "id"]
+        return sorted(tuple(row) for row in session.execute(select(*columns)))
+
+    with Session() as session:
+        migrated = rows(session)
+        rebuild_resumen(session)
+        assert rows(session) == migrated
+    assert len(migrated) == 3
+
+
+def test_period_start_migration_backfills_and_keeps_oldest_duplicate(memory_engine):
+    with memory_engine.begin() as connection:
+        connection.execute(text("DROP INDEX ix_mantenimiento_preventivo_sucursal_periodo"))
+        connection.execute(text("ALTER TABLE mantenimiento_preventivo DROP COLUMN period_start"))
+    Session = sessionmaker(bind=memory_engine)
+    with Session() as session:
+        cliente = Cliente(nombre="ACME", contacto="Jane", email="acme@example.com")
+        session.add(cliente)
+        session.flush()
+        sucursal = Sucursal(nombre="Central", zona="Norte", cliente_id=cliente.id)
+        session.add(sucursal)
+        session.flush()
+        for fecha in (date(2024, 4, 10), date(2024, 5, 3), date(2024, 7, 1)):
+            session.execute(
+                text(
+                    "INSERT INTO mantenimiento_preventivo (cliente_id, sucursal_id, frecuencia, fecha_apertura) "
+                    "VALUES (:cliente, :sucursal, 'Trimestral', :fecha)"
+                ),
+                {"cliente": cliente.id, "sucursal": sucursal.id, "fecha": fecha},
+            )
+        session.commit()
+
+    run_migrations(memory_engine)
+
+    with Session() as session:
+        rows = session.query(MantenimientoPreventivo.fecha_apertura, MantenimientoPreventivo.period_start).order_by(MantenimientoPreventivo.id).all()
+    assert rows == [
+        (date(2024, 4, 10), date(2024, 4, 1)),
+        (date(2024, 5, 3), None),
+        (date(2024, 7, 1), date(2024, 7, 1)),
+    ]
+    assert "ix_mantenimiento_preventivo_sucursal_periodo" in _index_names(memory_engine, "mantenimiento_preventivo")
+
+
+def test_period_start_migration_matches_service():
+    for frecuencia in ("Mensual", "trimestral", "Cuatrimestral", "Semestral", "Anual", None):
+        for fecha in (date(2024, 1, 31), date(2024, 5, 15), date(2024, 12, 1), None):
+            assert v0003.period_start(fecha, frecuencia) == period_start(fecha, frecuencia)
+
+
+def test_sheet_outbox_migration_creates_table(memory_engine):
+    SheetSyncOutbox.__table__.drop(memory_engine)
+    run_migrations(memory_engine)
+    assert "ix_sheet_sync_outbox_next_attempt" in _index_names(memory_engine, "sheet_sync_outbox")
+    columns = {column["name"] for column in inspect(memory_engine).get_columns("sheet_sync_outbox")}
+    assert columns == {column.name for column in SheetSyncOutbox.__table__.columns}
+
+
+def test_galeria_publicada_migration_matches_model(memory_engine):
+    GaleriaPublicada.__table__.drop(memory_engine)
+    run_migrations(memory_engine)
+    columns = {column["name"] for column in inspect(memory_engine).get_columns("galeria_publicada")}
+    assert columns == {column.name for column in GaleriaPublicada.__table__.columns}
+
+
+def test_identity_version_migration_seeds_the_counter(memory_engine):
+    IdentityVersion.__table__.drop(memory_engine)
+    run_migrations(memory_engine)
+    columns = {column["name"] for column in inspect(memory_engine).get_columns("identity_version")}
+    assert columns == {column.name for column in IdentityVersion.__table__.columns}
+    with memory_engine.connect() as connection:
+        assert connection.execute(select(IdentityVersion.id, IdentityVersion.version)).all() == [(1, 0)]
+
+
+def test_run_migrations_is_idempotent(memory_engine):
+    run_migrations(memory_engine)
+    assert run_migrations(memory_engine) == []
+
+
+def test_models_declare_the_migrated_indexes():
+    declared = {
+        index.name: (table.name, tuple(column.name for column in index.columns))
+        for table in Base.metadata.tables.values()
+        for index in table.indexes
+    }
+    for name, table, columns in v0001.INDEXES:
+        assert declared[name] == (table, columns)
+
+
+def _query_plan(session, query):
+    compiled = query.statement.compile(dialect=session.get_bind().dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).fetchall()
+    return " ".join(row[-1] for row in rows)
+
+
+@pytest.mark.parametrize(
+    "build_query, index_name",
+    [
+        (
+            lambda s: s.query(Notificacion_Correctivo).filter(
+                Notificacion_Correctivo.firebase_uid == "uid",
+                Notificacion_Correctivo.id_mantenimiento == 1,
+                Notificacion_Correctivo.mensaje == "m",
+                Notificacion_Correctivo.created_at >= datetime(2024, 1, 1),
+                Notificacion_Correctivo.created_at < datetime(2024, 1, 2),
+            ),
+            "ix_notificacion_correctivo_lookup",
+        ),
+        (
+            lambda s: s.query(MensajeCorrectivo)
+            .filter(MensajeCorrectivo.id_mantenimiento == 1)
+            .order_by(MensajeCorrectivo.created_at, MensajeCorrectivo.id),
+            "ix_mensaje_correctivo_mantenimiento_fecha",
+        ),
+        (
+            lambda s: s.query(MantenimientoPreventivo).filter(
+                MantenimientoPreventivo.sucursal_id == 1,
+                MantenimientoPreventivo.fecha_apertura >= date(2024, 1, 1),
+                MantenimientoPreventivo.fecha_apertura <= date(2024, 3, 31),
+            ),
+            "ix_mantenimiento_preventivo_sucursal_fecha",
+        ),
+        (
+            lambda s: s.query(PushSubscription).filter(PushSubscription.firebase_uid == "uid"),
+            "ix_push_subscription_firebase_uid",
+        ),
+        (
+            lambda s: s.query(CorrectivoSeleccionado).filter(CorrectivoSeleccionado.id_cuadrilla == 1),
+            "ix_correctivo_seleccionado_cuadrilla",
+        ),
+        (
+            lambda s: s.query(ColumnPreference).filter_by(firebase_uid="uid", page="correctivos"),
+            "ix_column_preference_uid_page",
+        ),
+    ],
+)
+def test_hot_queries_use_indexes(memory_engine, build_query, index_name):
+    run_migrations(memory_engine)
+    session = sessionmaker(bind=memory_engine)()
+    try:
+        plan = _query_plan(session, build_query(session))
+    finally:
+        session.close()
+    assert index_name in plan
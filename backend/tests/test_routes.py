@@ -1,33 +1,17 @@
 import os
 import json
 import asyncio
-from starlette.requests import Request
-from starlette.responses import Response
+import pytest
+from starlette.datastructures import State
 from fastapi import HTTPException
 import src.api.routes as routes
+import auth.middleware as auth_middleware
+from auth.middleware import AuthMiddleware
 
 os.environ["TESTING"] = "true"
 
 app = routes.app
 
-def build_request(path="/test", method="GET", headers=None):
-    scope = {
-        "type": "http",
-        "scheme": "http",
-        "method": method,
-        "path": path,
-        "root_path": "",
-        "query_string": b"",
-        "headers": headers or [],
-        "client": ("testclient", 50000),
-        "server": ("testserver", 80),
-        "app": app,
-    }
-    return Request(scope)
-
-async def dummy_call_next(request):
-    return Response("ok")
-
 def test_app_instance():
     """ Verifica que la instancia de app es de FastAPI """
     assert app.title is not None
@@ -66,58 +50,163 @@ def test_lifespan_runs():
             return True
     assert asyncio.run(run())
 
+class DummyApp:
+    def __init__(self, handler=None):
+        self.state = State()
+        self.handler = handler
+        self.seen_state = None
+
+    async def __call__(self, scope, receive, send):
+        self.seen_state = scope.get("state")
+        if self.handler is not None:
+            await self.handler(scope)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+
+def run_middleware(path="/test", method="GET", headers=None, handler=None):
+    inner = DummyApp(handler)
+    middleware = AuthMiddleware(inner, default_test_entity=routes.DEFAULT_TEST_ENTITY)
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "headers": headers or [],
+        "app": inner,
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    return scope, inner, messages
+
+
+def test_auth_middleware_is_pure_asgi():
+    assert any(m.cls is AuthMiddleware for m in app.user_middleware)
+    assert not any(m.cls.__name__ == "BaseHTTPMiddleware" for m in app.user_middleware)
+
+
 def test_auth_middleware_options_request():
-    request = build_request(method="OPTIONS")
-    response = asyncio.run(routes.auth_middleware(request, dummy_call_next))
-    assert response.status_code == 200
+    scope, inner, messages = run_middleware(method="OPTIONS")
+    assert messages[0]["status"] == 200
+    assert "current_entity" not in (inner.seen_state or {})
+
 
 def test_auth_middleware_sets_default_entity_when_testing():
-    request = build_request()
-    response = asyncio.run(routes.auth_middleware(request, dummy_call_next))
-    assert request.state.current_entity == routes.DEFAULT_TEST_ENTITY
-    assert response.status_code == 200
+    scope, inner, messages = run_middleware()
+    assert inner.seen_state["current_entity"] == routes.DEFAULT_TEST_ENTITY
+    assert messages[0]["status"] == 200
+
+
+def test_auth_middleware_without_token_sets_none(monkeypatch):
+    monkeypatch.setenv("TESTING", "false")
+    scope, inner, messages = run_middleware()
+    assert inner.seen_state["current_entity"] is None
+
+
+def test_auth_middleware_resolves_identity_lazily(monkeypatch):
+    calls = []
+
+    def fake_verify(token, db):
+        calls.append((token, db))
+        return {"user": "ok"}
 
-def test_auth_middleware_valid_token(monkeypatch):
     class DummyDB:
         def close(self):
             pass
 
-    def fake_get_db():
-        yield DummyDB()
+    monkeypatch.setenv("TESTING", "false")
+    monkeypatch.setattr(auth_middleware, "verify_user_token", fake_verify)
+    monkeypatch.setattr(auth_middleware, "SessionLocal", DummyDB)
+
+    scope, inner, messages = run_middleware(headers=[(b"authorization", b"Bearer token")])
+    assert messages[0]["status"] == 200
+    assert calls == []
+
+    assert inner.seen_state["current_entity"] == {"user": "ok"}
+    assert inner.seen_state["current_entity"] == {"user": "ok"}
+    assert len(calls) == 1
+
+
+def test_auth_middleware_reuses_request_db_session(monkeypatch):
+    session = object()
+    seen = []
+
+    def fake_verify(token, db):
+        seen.append(db)
+        return {"user": "ok"}
+
+    def fail_session_local():
+        raise AssertionError("a second session should not be opened")
+
+    async def endpoint(scope):
+        scope["state"]["db_session"] = session
+        assert scope["state"]["current_entity"] == {"user": "ok"}
 
     monkeypatch.setenv("TESTING", "false")
-    monkeypatch.setattr(routes, "get_db", fake_get_db)
-    monkeypatch.setattr(routes, "verify_user_token", lambda token, db: {"user": "ok"})
+    monkeypatch.setattr(auth_middleware, "verify_user_token", fake_verify)
+    monkeypatch.setattr(auth_middleware, "SessionLocal", fail_session_local)
+
+    run_middleware(headers=[(b"authorization", b"Bearer token")], handler=endpoint)
+    assert seen == [session]
 
-    request = build_request(headers=[(b"authorization", b"Bearer token")])
-    response = asyncio.run(routes.auth_middleware(request, dummy_call_next))
-    assert request.state.current_entity == {"user": "ok"}
-    assert response.status_code == 200
 
 def test_auth_middleware_http_exception(monkeypatch):
+    def fake_verify(token, db):
+        raise HTTPException(status_code=403, detail="invalid")
+
     class DummyDB:
         def close(self):
             pass
 
-    def fake_get_db():
-        yield DummyDB()
-
-    def fake_verify(token, db):
-        raise HTTPException(status_code=403, detail="invalid")
-
     monkeypatch.setenv("TESTING", "false")
-    monkeypatch.setattr(routes, "get_db", fake_get_db)
-    monkeypatch.setattr(routes, "verify_user_token", fake_verify)
+    monkeypatch.setattr(auth_middleware, "verify_user_token", fake_verify)
+    monkeypatch.setattr(auth_middleware, "SessionLocal", DummyDB)
+
+    scope, inner, messages = run_middleware(headers=[(b"authorization", b"Bearer bad")])
+    with pytest.raises(HTTPException) as exc_info:
+        inner.seen_state["current_entity"]
+    assert exc_info.value.status_code == 403
 
-    request = build_request(headers=[(b"authorization", b"Bearer bad")])
-    response = asyncio.run(routes.auth_middleware(request, dummy_call_next))
-    assert response.status_code == 403
-    assert json.loads(response.body) == {"detail": "invalid"}
 
 def test_auth_middleware_call_next_exception():
-    async def failing_call_next(request):
+    async def failing(scope):
         raise Exception("boom")
 
-    request = build_request()
-    response = asyncio.run(routes.auth_middleware(request, failing_call_next))
-    assert response.status_code == 500
+    scope, inner, messages = run_middleware(handler=failing)
+    assert messages[0]["status"] == 500
+    assert json.loads(messages[1]["body"]) == {"detail": "Error interno en el procesamiento de la solicitud"}
+
+
+def test_auth_middleware_uses_token_cache(db_session, monkeypatch):
+    import services.auth as live_auth
+    from services.identity_version import sync_identity_caches
+
+    def fail_decode(token):
+        raise AssertionError("no verification expected on a cache hit")
+
+    monkeypatch.setenv("TESTING", "false")
+    monkeypatch.setattr(live_auth, "_decode_token", fail_decode)
+    sync_identity_caches(db_session)
+    live_auth.token_cache.set("cached", {"type": "usuario", "data": {"id": 1}})
+
+    scope, inner, messages = run_middleware(headers=[(b"authorization", b"Bearer cached")])
+    assert messages[0]["status"] == 200
+    assert inner.seen_state["current_entity"] == {"type": "usuario", "data": {"id": 1}}
+    assert live_auth.token_cache.stats()["hits"] == 1
+
+
+def test_invalid_token_returns_json_error_from_endpoint(client, monkeypatch):
+    def fake_verify(token, db):
+        raise HTTPException(status_code=401, detail="Token inválido: bad")
+
+    monkeypatch.setenv("TESTING", "false")
+    monkeypatch.setattr(auth_middleware, "verify_user_token", fake_verify)
+    resp = client.get("/preferences/home", headers={"Authorization": "Bearer bad"})
+    assert resp.status_code == 401
+    assert resp.json() == {"detail": "Token inválido: bad"}
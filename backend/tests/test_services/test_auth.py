@@ -1,8 +1,13 @@
+import asyncio
+from datetime import date
+from unittest.mock import AsyncMock
 import pytest
 from fastapi import HTTPException
 from src.services import auth as auth_service
 from src.api.schemas import UserCreate, UserUpdate, CuadrillaCreate, CuadrillaUpdate, Role
-from src.api.models import Usuario, Cuadrilla
+from src.api.models import Usuario, Cuadrilla, IdentityVersion, Cliente, Sucursal, MantenimientoCorrectivo, MantenimientoPreventivo, ResumenMensualMantenimiento
+from services.resumen_mensual import rebuild_resumen
+from services.identity_version import bump_identity_version
 
 def test_verify_user_token(db_session, monkeypatch):
     user = Usuario(nombre="Test", email="user@example.com", rol="Admin")
@@ -10,7 +15,7 @@ def test_verify_user_token(db_session, monkeypatch):
     db_session.commit()
     db_session.refresh(user)
 
-    def mock_verify_id_token(token):
+    def mock_verify_id_token(token, **kwargs):
         return {"email": "user@example.com", "uid": "uid123"}
 
     monkeypatch.setattr(auth_service.auth, "verify_id_token", mock_verify_id_token)
@@ -22,25 +27,174 @@ def test_verify_user_token(db_session, monkeypatch):
     assert result["data"]["uid"] == "uid123"
     assert db_session.query(Usuario).filter_by(email="user@example.com").first().firebase_uid == "uid123"
 
+def test_verify_user_token_populates_token_cache(db_session, monkeypatch):
+    user = Usuario(nombre="Test", email="cache@example.com", rol="Admin", firebase_uid="uid-cache")
+    db_session.add(user)
+    db_session.commit()
+
+    monkeypatch.setattr(
+        auth_service.auth,
+        "verify_id_token",
+        lambda token, **kwargs: {"email": "cache@example.com", "uid": "uid-cache", "exp": 4102444800},
+    )
+
+    result = auth_service.verify_user_token("cache-token", db_session)
+
+    assert auth_service.token_cache.get("cache-token") == result
+
+def test_verify_user_token_uses_entity_directory(db_session, monkeypatch):
+    user = Usuario(nombre="Dir", email="dir@example.com", rol=Role.ENCARGADO, firebase_uid="uid-dir")
+    db_session.add(user)
+    db_session.commit()
+
+    monkeypatch.setattr(auth_service.auth, "verify_id_token", lambda token, **kwargs: {"email": "dir@example.com", "uid": "uid-dir"})
+    auth_service.verify_user_token("t1", db_session)
+
+    class NoQuerySession:
+        def execute(self, statement):
+            # Solo se permite leer el contador de identidades
+            return db_session.execute(statement)
+
+        def query(self, *args, **kwargs):
+            raise AssertionError("directory hit should not query the database")
+
+    result = auth_service.verify_user_token("t2", NoQuerySession())
+    assert result["data"]["rol"] == Role.ENCARGADO
+
+def test_update_firebase_user_invalidates_cached_identity(db_session, monkeypatch):
+    user = Usuario(nombre="Role", email="role@example.com", rol=Role.ADMIN, firebase_uid="uid-role")
+    db_session.add(user)
+    db_session.commit()
+    db_session.refresh(user)
+
+    monkeypatch.setattr(auth_service.auth, "verify_id_token", lambda token, **kwargs: {"email": "role@example.com", "uid": "uid-role", "exp": 4102444800})
+    auth_service.verify_user_token("role-token", db_session)
+    assert auth_service.token_cache.get("role-token")["data"]["rol"] == Role.ADMIN
+
+    current = {"type": "usuario", "data": {"rol": Role.ADMIN}}
+    auth_service.update_firebase_user(user.id, UserUpdate(rol=Role.ENCARGADO), db_session, current)
+
+    assert auth_service.token_cache.get("role-token") is None
+    assert auth_service.entity_directory.get("role@example.com") is None
+    result = auth_service.verify_user_token("role-token", db_session)
+    assert result["data"]["rol"] == Role.ENCARGADO
+
+def test_delete_firebase_cuadrilla_invalidates_cached_identity(db_session, monkeypatch):
+    cuadrilla = Cuadrilla(nombre="Gone", zona="Z", email="gone@example.com", firebase_uid="uid-gone")
+    db_session.add(cuadrilla)
+    db_session.commit()
+    db_session.refresh(cuadrilla)
+
+    monkeypatch.setattr(auth_service.auth, "verify_id_token", lambda token, **kwargs: {"email": "gone@example.com", "uid": "uid-gone"})
+    monkeypatch.setattr(auth_service.auth, "delete_user", lambda uid: None)
+    auth_service.verify_user_token("gone-token", db_session)
+
+    auth_service.delete_firebase_cuadrilla(cuadrilla.id, db_session, {"type": "usuario"})
+
+    assert auth_service.entity_directory.get_by_uid("uid-gone") is None
+    with pytest.raises(HTTPException) as exc_info:
+        auth_service.verify_user_token("gone-token", db_session)
+    assert exc_info.value.status_code == 401
+
+def test_identity_write_in_another_process_invalidates_cached_identity(db_session, monkeypatch):
+    user = Usuario(nombre="Shared", email="shared@example.com", rol=Role.ADMIN, firebase_uid="uid-shared")
+    db_session.add(user)
+    db_session.commit()
+
+    monkeypatch.setattr(auth_service.auth, "verify_id_token", lambda token, **kwargs: {"email": "shared@example.com", "uid": "uid-shared", "exp": 4102444800})
+    assert auth_service.verify_user_token("shared-token", db_session)["data"]["rol"] == Role.ADMIN
+
+    # Otro proceso cambia el rol: sus cachés locales no se enteran, solo el contador compartido
+    user.rol = Role.ENCARGADO
+    bump_identity_version(db_session)
+    db_session.commit()
+
+    result = auth_service.verify_user_token("shared-token", db_session)
+    assert result["data"]["rol"] == Role.ENCARGADO
+
+def test_identity_writes_bump_the_shared_version(db_session, monkeypatch):
+    cuadrilla = Cuadrilla(nombre="Ver", zona="Z", email="ver@example.com", firebase_uid="uid-ver")
+    db_session.add(cuadrilla)
+    db_session.commit()
+    monkeypatch.setattr(auth_service.auth, "delete_user", lambda uid: None)
+
+    auth_service.update_firebase_cuadrilla(cuadrilla.id, CuadrillaUpdate(zona="Y"), db_session, {"type": "usuario"})
+    auth_service.delete_firebase_cuadrilla(cuadrilla.id, db_session, {"type": "usuario"})
+
+    assert db_session.query(IdentityVersion).one().version == 2
+
+def test_delete_firebase_cuadrilla_moves_rollup_to_sin_cuadrilla(db_session, monkeypatch):
+    cliente = Cliente(nombre="ACME", contacto="Jane", email="acme@example.com")
+    db_session.add(cliente)
+    db_session.commit()
+    sucursal = Sucursal(nombre="Central", zona="Norte", direccion="Dir", superficie="1", cliente_id=cliente.id)
+    cuadrilla = Cuadrilla(nombre="Baja", zona="Norte", email="baja@example.com", firebase_uid="uid-baja")
+    db_session.add_all([sucursal, cuadrilla])
+    db_session.commit()
+    common = dict(cliente_id=cliente.id, sucursal_id=sucursal.id, fecha_apertura=date(2024, 3, 5))
+    db_session.add_all([
+        MantenimientoCorrectivo(id_cuadrilla=cuadrilla.id, estado="Finalizado", prioridad="Alta", **common),
+        MantenimientoCorrectivo(estado="Finalizado", prioridad="Alta", **common),
+        MantenimientoPreventivo(id_cuadrilla=cuadrilla.id, frecuencia="Mensual", estado="Pendiente", **common),
+    ])
+    db_session.commit()
+    rebuild_resumen(db_session)
+    db_session.commit()
+    monkeypatch.setattr(auth_service.auth, "delete_user", lambda uid: None)
+
+    auth_service.delete_firebase_cuadrilla(cuadrilla.id, db_session, {"type": "usuario"})
+
+    resumen = ResumenMensualMantenimiento
+    columns = (resumen.id_cuadrilla, resumen.tipo, resumen.estado, resumen.total, resumen.resueltos)
+    rollup = sorted(db_session.query(*columns).all())
+    rebuild_resumen(db_session)
+    assert rollup == sorted(db_session.query(*columns).all())
+    assert rollup == [(0, "correctivo", "Finalizado", 2, 2), (0, "preventivo", "Pendiente", 1, 0)]
+
 def test_create_firebase_user(db_session, monkeypatch):
     user_data = UserCreate(nombre="Nuevo", email="new@example.com", rol=Role.ENCARGADO, id_token="t")
     current = {"type": "usuario", "data": {"rol": Role.ADMIN}}
 
-    class DummyResp:
-        def json(self):
-            return {"email": "new@example.com", "sub": "google"}
-
     class DummyFirebaseUser:
         uid = "fb123"
 
-    monkeypatch.setattr(auth_service.requests, "get", lambda url: DummyResp())
+    monkeypatch.setattr(auth_service.google_tokeninfo, "verify", AsyncMock(return_value={"email": "new@example.com", "sub": "google"}))
     monkeypatch.setattr(auth_service.auth, "create_user", lambda email: DummyFirebaseUser())
 
-    result = auth_service.create_firebase_user(user_data, db_session, current, "token")
+    result = asyncio.run(auth_service.create_firebase_user(user_data, db_session, current, "token"))
 
     assert result.email == "new@example.com"
     assert result.firebase_uid == "fb123"
 
+def test_create_firebase_user_existing_firebase_account(db_session, monkeypatch):
+    user_data = UserCreate(nombre="Existente", email="exists@example.com", rol=Role.ENCARGADO, id_token="t")
+    current = {"type": "usuario", "data": {"rol": Role.ADMIN}}
+
+    class DummyFirebaseUser:
+        uid = "fb-existing"
+
+    def raise_exists(email):
+        raise auth_service.auth.EmailAlreadyExistsError("exists", None, None)
+
+    monkeypatch.setattr(auth_service.google_tokeninfo, "verify", AsyncMock(return_value={"email": "exists@example.com"}))
+    monkeypatch.setattr(auth_service.auth, "create_user", raise_exists)
+    monkeypatch.setattr(auth_service.auth, "get_user_by_email", lambda email: DummyFirebaseUser())
+
+    result = asyncio.run(auth_service.create_firebase_user(user_data, db_session, current, "token"))
+
+    assert result.firebase_uid == "fb-existing"
+
+def test_create_firebase_user_email_mismatch(db_session, monkeypatch):
+    user_data = UserCreate(nombre="Otro", email="other@example.com", rol=Role.ENCARGADO, id_token="t")
+    current = {"type": "usuario", "data": {"rol": Role.ADMIN}}
+    monkeypatch.setattr(auth_service.google_tokeninfo, "verify", AsyncMock(return_value={"email": "someone@example.com"}))
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(auth_service.create_firebase_user(user_data, db_session, current, "token"))
+
+    assert exc_info.value.status_code == 400
+    assert "no coincide" in exc_info.value.detail
+
 def test_update_firebase_user(db_session):
     user = Usuario(nombre="Old", email="old@example.com", rol=Role.ENCARGADO, firebase_uid="u1")
     db_session.add(user)
@@ -71,17 +225,13 @@ def test_create_firebase_cuadrilla(db_session, monkeypatch):
     data = CuadrillaCreate(nombre="C1", zona="Z", email="c@example.com", id_token="t")
     current = {"type": "usuario"}
 
-    class DummyResp:
-        def json(self):
-            return {"email": "c@example.com", "sub": "google"}
-
     class DummyFirebaseUser:
         uid = "fb123"
 
-    monkeypatch.setattr(auth_service.requests, "get", lambda url: DummyResp())
+    monkeypatch.setattr(auth_service.google_tokeninfo, "verify", AsyncMock(return_value={"email": "c@example.com", "sub": "google"}))
     monkeypatch.setattr(auth_service.auth, "create_user", lambda email: DummyFirebaseUser())
 
-    result = auth_service.create_firebase_cuadrilla(data, db_session, current, "token")
+    result = asyncio.run(auth_service.create_firebase_cuadrilla(data, db_session, current, "token"))
 
     assert result.email == "c@example.com"
     assert result.firebase_uid == "fb123"
@@ -113,7 +263,7 @@ def test_delete_firebase_cuadrilla(db_session, monkeypatch):
     assert "eliminada" in result["message"]
 
 def test_verify_user_token_invalid_token(db_session, monkeypatch):
-    def mock_verify_id_token(token):
+    def mock_verify_id_token(token, **kwargs):
         raise Exception("bad token")
 
     monkeypatch.setattr(auth_service.auth, "verify_id_token", mock_verify_id_token)
@@ -128,7 +278,7 @@ def test_create_firebase_user_missing_id_token(db_session):
     current = {"type": "usuario", "data": {"rol": Role.ADMIN}}
 
     with pytest.raises(HTTPException) as exc_info:
-        auth_service.create_firebase_user(user_data, db_session, current, None)
+        asyncio.run(auth_service.create_firebase_user(user_data, db_session, current, None))
 
     assert exc_info.value.status_code == 400
 
@@ -154,7 +304,7 @@ def test_create_firebase_cuadrilla_missing_id_token(db_session):
     current = {"type": "usuario"}
 
     with pytest.raises(HTTPException) as exc_info:
-        auth_service.create_firebase_cuadrilla(data, db_session, current, None)
+        asyncio.run(auth_service.create_firebase_cuadrilla(data, db_session, current, None))
 
     assert exc_info.value.status_code == 400
 
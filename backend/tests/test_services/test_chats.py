@@ -125,3 +125,16 @@ def test_send_message_preventivo_no_bucket(db_session, monkeypatch):
                 db_session, 1, "uid", "N", {"type": "usuario"}, texto="hola"
             )
         )
+
+def test_send_message_correctivo_with_async_session(db_session, run_with_async_session):
+    with patch("src.services.chats.chat_manager.send_message", AsyncMock()) as mock_send:
+        result = run_with_async_session(
+            lambda session: chat_service.send_message_correctivo(
+                session, 1, "uid", "N", {"type": "usuario"}, texto="hola"
+            )
+        )
+
+    assert result.id is not None
+    assert result.created_at is not None
+    mock_send.assert_awaited_once()
+    assert db_session.query(MensajeCorrectivo).filter_by(texto="hola").count() == 1
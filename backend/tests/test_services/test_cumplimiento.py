@@ -0,0 +1,73 @@
+from datetime import date
+
+import pytest
+from fastapi import HTTPException
+
+from src.api.models import Cliente, MantenimientoPreventivo, Sucursal
+from src.services import cumplimiento
+from src.services.mantenimientos_preventivos import period_start
+
+USUARIO = {"type": "usuario"}
+
+
+@pytest.fixture
+def sucursales(db_session):
+    cliente = Cliente(nombre="ACME", contacto="Jane", email="acme@example.com")
+    db_session.add(cliente)
+    db_session.commit()
+    mensual = Sucursal(nombre="Mensual", zona="Norte", direccion="D", superficie="1", cliente_id=cliente.id, frecuencia_preventivo="Mensual")
+    trimestral = Sucursal(nombre="Trimestral", zona="Sur", direccion="D", superficie="1", cliente_id=cliente.id, frecuencia_preventivo="Trimestral")
+    sin_plan = Sucursal(nombre="Sin plan", zona="Norte", direccion="D", superficie="1", cliente_id=cliente.id)
+    db_session.add_all([mensual, trimestral, sin_plan])
+    db_session.commit()
+
+    def preventivo(sucursal, fecha, cierre=None):
+        return MantenimientoPreventivo(
+            cliente_id=cliente.id, sucursal_id=sucursal.id, frecuencia=sucursal.frecuencia_preventivo,
+            fecha_apertura=fecha, fecha_cierre=cierre, estado="Pendiente",
+            period_start=period_start(fecha, sucursal.frecuencia_preventivo),
+        )
+
+    db_session.add_all([
+        preventivo(mensual, date(2023, 12, 5), date(2023, 12, 9)),
+        preventivo(mensual, date(2024, 1, 5), date(2024, 1, 9)),
+        preventivo(mensual, date(2024, 3, 2)),
+        preventivo(trimestral, date(2024, 2, 20), date(2024, 3, 1)),
+    ])
+    db_session.commit()
+    return {"mensual": mensual, "trimestral": trimestral}
+
+
+def test_cumplimiento_builds_grid_per_frequency(db_session, sucursales):
+    result = cumplimiento.get_cumplimiento_preventivos(db_session, USUARIO, desde=date(2024, 1, 15), hasta=date(2024, 4, 30))
+
+    assert result["estados"] == ["faltante", "pendiente", "realizado"]
+    assert result["periodos"] == {
+        "mensual": [date(2024, m, 1) for m in (1, 2, 3, 4)],
+        "trimestral": [date(2024, 1, 1), date(2024, 4, 1)],
+    }
+    assert result["sucursales"]["nombre"] == ["Mensual", "Trimestral"]
+    assert result["sucursales"]["frecuencia"] == ["mensual", "trimestral"]
+    assert result["matriz"] == [[2, 0, 1, 0], [2, 0]]
+
+
+def test_cumplimiento_filters_by_zona(db_session, sucursales):
+    result = cumplimiento.get_cumplimiento_preventivos(db_session, USUARIO, desde=date(2024, 1, 1), hasta=date(2024, 3, 31), zona="Sur")
+    assert result["sucursales"]["id"] == [sucursales["trimestral"].id]
+    assert list(result["periodos"]) == ["trimestral"]
+    assert result["matriz"] == [[2]]
+
+
+def test_cumplimiento_runs_one_query(db_session, sucursales, count_queries):
+    with count_queries() as statements:
+        cumplimiento.get_cumplimiento_preventivos(db_session, USUARIO, desde=date(2022, 1, 1), hasta=date(2024, 12, 31))
+    assert len(statements) == 1
+
+
+def test_cumplimiento_validates_access_and_range(db_session):
+    with pytest.raises(HTTPException) as exc:
+        cumplimiento.get_cumplimiento_preventivos(db_session, {"type": "cuadrilla"})
+    assert exc.value.status_code == 403
+    with pytest.raises(HTTPException) as exc:
+        cumplimiento.get_cumplimiento_preventivos(db_session, USUARIO, desde=date(2024, 5, 1), hasta=date(2024, 1, 1))
+    assert exc.value.status_code == 400
@@ -0,0 +1,45 @@
+from src.services.entity_directory import EntityDirectory
+
+
+def _entity(email="u@example.com", uid="uid-1", rol="Administrador"):
+    return {"type": "usuario", "data": {"id": 1, "uid": uid, "email": email, "nombre": "U", "rol": rol}}
+
+
+class FakeClock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_entity_directory_lookup_by_email_and_uid():
+    directory = EntityDirectory(ttl=60)
+    assert directory.put(_entity(), directory.generation)
+    assert directory.get("u@example.com")["data"]["uid"] == "uid-1"
+    assert directory.get_by_uid("uid-1")["data"]["email"] == "u@example.com"
+
+
+def test_entity_directory_invalidate_by_uid_drops_email_entry():
+    directory = EntityDirectory(ttl=60)
+    directory.put(_entity(), directory.generation)
+    directory.invalidate(firebase_uid="uid-1")
+    assert directory.get("u@example.com") is None
+    assert directory.get_by_uid("uid-1") is None
+
+
+def test_entity_directory_rejects_put_after_concurrent_invalidation():
+    directory = EntityDirectory(ttl=60)
+    generation = directory.generation
+    directory.invalidate(email="u@example.com")
+    assert not directory.put(_entity(), generation)
+    assert directory.get("u@example.com") is None
+
+
+def test_entity_directory_entries_expire():
+    clock = FakeClock()
+    directory = EntityDirectory(ttl=10, clock=clock)
+    directory.put(_entity(), directory.generation)
+    clock.now = 11
+    assert directory.get("u@example.com") is None
+    assert directory.stats()["size"] == 0
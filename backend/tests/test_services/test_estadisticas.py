@@ -0,0 +1,187 @@
+from datetime import date
+
+import pytest
+from fastapi import HTTPException
+
+from src.api.models import Cliente, Cuadrilla, MantenimientoCorrectivo, MantenimientoPreventivo, Sucursal
+from src.services import estadisticas as est
+from src.services.resumen_mensual import rebuild_resumen
+
+USUARIO = {"type": "usuario"}
+
+
+@pytest.fixture
+def datos(db_session):
+    cliente = Cliente(nombre="ACME", contacto="Jane", email="acme@example.com")
+    otro = Cliente(nombre="Otro", contacto="John", email="otro@example.com")
+    db_session.add_all([cliente, otro])
+    db_session.commit()
+    norte = Sucursal(nombre="Norte 1", zona="Norte", direccion="D", superficie="1", cliente_id=cliente.id)
+    norte_2 = Sucursal(nombre="Norte 2", zona="Norte", direccion="D", superficie="1", cliente_id=cliente.id)
+    sur = Sucursal(nombre="Sur 1", zona="Sur", direccion="D", superficie="1", cliente_id=otro.id)
+    alfa = Cuadrilla(nombre="Alfa", zona="Norte", email="alfa@example.com")
+    beta = Cuadrilla(nombre="Beta", zona="Sur", email="beta@example.com")
+    db_session.add_all([norte, norte_2, sur, alfa, beta])
+    db_session.commit()
+
+    def correctivo(sucursal, cuadrilla, apertura, estado, rubro="Otros", prioridad="Media", cierre=None):
+        return MantenimientoCorrectivo(
+            cliente_id=sucursal.cliente_id,
+            sucursal_id=sucursal.id,
+            id_cuadrilla=cuadrilla.id,
+            fecha_apertura=apertura,
+            fecha_cierre=cierre,
+            numero_caso="NC",
+            estado=estado,
+            rubro=rubro,
+            prioridad=prioridad,
+        )
+
+    db_session.add_all([
+        correctivo(norte, alfa, date(2024, 1, 10), "Finalizado", "Plomería", "Alta", date(2024, 1, 14)),
+        correctivo(norte, alfa, date(2024, 1, 20), "Finalizado", "Plomería", "Alta", date(2024, 1, 22)),
+        correctivo(norte, alfa, date(2024, 2, 5), "Pendiente", "Electricidad"),
+        correctivo(sur, beta, date(2025, 2, 5), "Finalizado", "Electricidad", "Baja", date(2025, 2, 6)),
+        MantenimientoPreventivo(
+            cliente_id=cliente.id, sucursal_id=norte.id, frecuencia="Mensual", id_cuadrilla=alfa.id,
+            fecha_apertura=date(2024, 1, 1), fecha_cierre=date(2024, 1, 3), estado="Finalizado",
+        ),
+        MantenimientoPreventivo(
+            cliente_id=otro.id, sucursal_id=sur.id, frecuencia="Mensual", id_cuadrilla=beta.id,
+            fecha_apertura=date(2024, 2, 1), estado="Pendiente",
+        ),
+    ])
+    db_session.commit()
+    rebuild_resumen(db_session)
+    db_session.commit()
+    return {"cliente": cliente, "alfa": alfa, "beta": beta}
+
+
+def test_get_estadisticas_requires_usuario(db_session):
+    with pytest.raises(HTTPException) as exc:
+        est.get_estadisticas(db_session, None)
+    assert exc.value.status_code == 401
+    with pytest.raises(HTTPException) as exc:
+        est.get_estadisticas(db_session, {"type": "cuadrilla"})
+    assert exc.value.status_code == 403
+
+
+def test_get_estadisticas_groups_without_filters(db_session, datos):
+    result = est.get_estadisticas(db_session, USUARIO)
+    correctivos = result["correctivos"]
+
+    assert correctivos["total"] == 4
+    assert correctivos["por_estado"] == {"Finalizado": 3, "Pendiente": 1}
+    assert correctivos["por_prioridad"] == {"Alta": 2, "Media": 1, "Baja": 1}
+    assert correctivos["por_mes"] == [
+        {"anio": 2024, "mes": 1, "total": 2},
+        {"anio": 2024, "mes": 2, "total": 1},
+        {"anio": 2025, "mes": 2, "total": 1},
+    ]
+    assert correctivos["por_cuadrilla"] == [
+        {"id_cuadrilla": datos["alfa"].id, "nombre": "Alfa", "asignados": 3, "resueltos": 2},
+        {"id_cuadrilla": datos["beta"].id, "nombre": "Beta", "asignados": 1, "resueltos": 1},
+    ]
+    assert correctivos["por_rubro"] == [
+        {"rubro": "Electricidad", "count": 1, "avg_days": 1.0},
+        {"rubro": "Plomería", "count": 2, "avg_days": 3.0},
+    ]
+    assert correctivos["por_zona"] == [
+        {"zona": "Norte", "total": 3, "sucursales": 2, "promedio": 1.5},
+        {"zona": "Sur", "total": 1, "sucursales": 1, "promedio": 1.0},
+    ]
+    assert [s["total"] for s in correctivos["por_sucursal"]] == [3, 1]
+
+    preventivos = result["preventivos"]
+    assert preventivos["total"] == 2
+    assert preventivos["por_estado"] == {"Finalizado": 1, "Pendiente": 1}
+    assert [(c["nombre"], c["asignados"], c["resueltos"]) for c in preventivos["por_cuadrilla"]] == [("Alfa", 1, 1), ("Beta", 1, 0)]
+
+
+def test_get_estadisticas_applies_filters(db_session, datos):
+    result = est.get_estadisticas(db_session, USUARIO, meses=[1, 2], anios=[2024], zona="Norte")
+    assert result["correctivos"]["total"] == 3
+    assert result["correctivos"]["por_estado"] == {"Finalizado": 2, "Pendiente": 1}
+    assert result["preventivos"]["total"] == 1
+
+    result = est.get_estadisticas(db_session, USUARIO, meses=[1], cliente_id=datos["cliente"].id, estado="Finalizado")
+    assert result["correctivos"]["total"] == 2
+    assert result["correctivos"]["por_rubro"] == [{"rubro": "Plomería", "count": 2, "avg_days": 3.0}]
+    assert result["preventivos"]["por_cuadrilla"] == [
+        {"id_cuadrilla": datos["alfa"].id, "nombre": "Alfa", "asignados": 1, "resueltos": 1},
+    ]
+
+
+@pytest.mark.parametrize("filters", [{}, {"anios": [2024], "zona": "Norte"}, {"estado": "Finalizado", "meses": [2]}])
+def test_rollup_matches_maintenance_tables(db_session, datos, filters):
+    correctivo = MantenimientoCorrectivo
+    preventivo = MantenimientoPreventivo
+    from_tables = est._table_sections(db_session, correctivo, correctivo.estado == "Finalizado", **filters)
+    from_tables["por_prioridad"] = est._counts_by(db_session, correctivo, correctivo.prioridad, **filters)
+    assert est._rollup_sections(db_session, "correctivo", **filters) == from_tables
+    assert est._rollup_sections(db_session, "preventivo", **filters) == est._table_sections(
+        db_session, preventivo, preventivo.fecha_cierre.isnot(None), **filters
+    )
+    assert sorted(est._rollup_zona_totals(db_session, **filters)) == sorted(est._zona_totals(db_session, **filters))
+
+
+def test_get_estadisticas_by_sucursal_reads_maintenance_tables(db_session, datos):
+    sucursal_id = db_session.query(Sucursal.id).filter(Sucursal.nombre == "Norte 1").scalar()
+    result = est.get_estadisticas(db_session, USUARIO, sucursal_id=sucursal_id)
+    assert result["correctivos"]["total"] == 3
+    assert result["preventivos"]["total"] == 1
+    assert result["correctivos"]["por_zona"] == [{"zona": "Norte", "total": 3, "sucursales": 1, "promedio": 3.0}]
+
+
+def test_get_estadisticas_runs_fixed_number_of_queries(db_session, datos, count_queries):
+    with count_queries() as statements:
+        est.get_estadisticas(db_session, USUARIO, anios=[2024])
+    # Una consulta agregada por sección, sin importar cuántos mantenimientos haya
+    assert len(statements) == 13
+
+
+def test_get_estadisticas_computes_only_requested_sections(db_session, datos, count_queries):
+    with count_queries() as statements:
+        result = est.get_estadisticas(db_session, USUARIO, secciones=["rubros"], anios=[2024])
+    assert result == {
+        "correctivos": {"por_rubro": [{"rubro": "Plomería", "count": 2, "avg_days": 3.0}]},
+        "preventivos": {},
+    }
+    assert len(statements) == 1
+
+    completo = est.get_estadisticas(db_session, USUARIO, anios=[2024])
+    partes = est.get_estadisticas(db_session, USUARIO, secciones=["correctivos", "zonas"], anios=[2024])
+    assert partes["correctivos"]["por_zona"] == completo["correctivos"]["por_zona"]
+    assert partes["correctivos"]["por_cuadrilla"] == completo["correctivos"]["por_cuadrilla"]
+    assert "por_sucursal" not in partes["correctivos"]
+
+
+def test_get_estadisticas_rejects_unknown_section(db_session):
+    with pytest.raises(HTTPException) as exc:
+        est.get_estadisticas(db_session, USUARIO, secciones=["todo"])
+    assert exc.value.status_code == 400
+
+
+def test_get_estadisticas_por_seccion_applies_each_section_filters(db_session, datos):
+    result = est.get_estadisticas_por_seccion(
+        db_session,
+        USUARIO,
+        {"correctivos": {"zona": "Norte"}, "rubros": {"estado": "Finalizado"}, "preventivos": {"zona": None}},
+        anios=[2024],
+    )
+
+    norte = est.get_estadisticas(db_session, USUARIO, anios=[2024], zona="Norte")
+    finalizados = est.get_estadisticas(db_session, USUARIO, anios=[2024], estado="Finalizado")
+    todos = est.get_estadisticas(db_session, USUARIO, anios=[2024])
+    assert result["correctivos"]["por_cuadrilla"] == norte["correctivos"]["por_cuadrilla"]
+    assert result["correctivos"]["total"] == norte["correctivos"]["total"]
+    assert result["correctivos"]["por_rubro"] == finalizados["correctivos"]["por_rubro"]
+    assert result["correctivos"]["por_zona"] == todos["correctivos"]["por_zona"]
+    assert result["correctivos"]["por_sucursal"] == todos["correctivos"]["por_sucursal"]
+    assert result["preventivos"] == todos["preventivos"]
+
+
+def test_get_estadisticas_por_seccion_rejects_unknown_section(db_session):
+    with pytest.raises(HTTPException) as exc:
+        est.get_estadisticas_por_seccion(db_session, USUARIO, {"todo": {}})
+    assert exc.value.status_code == 400
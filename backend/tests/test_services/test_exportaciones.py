@@ -0,0 +1,100 @@
+import csv
+import gzip
+import io
+from datetime import date
+
+import orjson
+import pytest
+from fastapi import HTTPException
+
+from src.api.models import Cliente, Cuadrilla, MantenimientoCorrectivo, MantenimientoPreventivo, Sucursal
+from src.services import exportaciones as exp
+
+
+@pytest.fixture
+def historial(db_session):
+    cliente = Cliente(nombre="ACME", contacto="Jane", email="acme@example.com")
+    db_session.add(cliente)
+    db_session.commit()
+    sucursal = Sucursal(nombre="Central", zona="Norte", direccion="Dir", superficie="1", cliente_id=cliente.id)
+    cuadrilla = Cuadrilla(nombre="Alfa", zona="Norte", email="alfa@example.com")
+    db_session.add_all([sucursal, cuadrilla])
+    db_session.commit()
+    db_session.add_all([
+        MantenimientoCorrectivo(
+            cliente_id=cliente.id, sucursal_id=sucursal.id, id_cuadrilla=cuadrilla.id if i % 2 else None,
+            fecha_apertura=date(2024, 1, i + 1), numero_caso=f"NC-{i}", incidente="=HYPERLINK()" if i == 0 else "Pérdida",
+            rubro="Plomería", estado="Pendiente", prioridad="Alta",
+        )
+        for i in range(5)
+    ])
+    db_session.add(MantenimientoPreventivo(
+        cliente_id=cliente.id, sucursal_id=sucursal.id, frecuencia="Mensual",
+        fecha_apertura=date(2024, 2, 1), estado="Pendiente",
+    ))
+    db_session.commit()
+
+
+def _ndjson(chunks):
+    return [orjson.loads(line) for line in b"".join(chunks).splitlines()]
+
+
+def test_ensure_export_access():
+    with pytest.raises(HTTPException) as exc:
+        exp.ensure_export_access(None, "csv")
+    assert exc.value.status_code == 401
+    with pytest.raises(HTTPException) as exc:
+        exp.ensure_export_access({"type": "cuadrilla"}, "csv")
+    assert exc.value.status_code == 403
+    with pytest.raises(HTTPException) as exc:
+        exp.ensure_export_access({"type": "usuario"}, "xlsx")
+    assert exc.value.status_code == 400
+
+
+def test_iter_export_ndjson_includes_joined_names(historial):
+    rows = _ndjson(exp.iter_export("correctivos", "ndjson"))
+    assert [row["numero_caso"] for row in rows] == [f"NC-{i}" for i in range(5)]
+    assert rows[0]["fecha_apertura"] == "2024-01-01"
+    assert (rows[0]["cliente"], rows[0]["sucursal"], rows[0]["zona"], rows[0]["cuadrilla"]) == ("ACME", "Central", "Norte", None)
+    assert rows[1]["cuadrilla"] == "Alfa"
+
+    preventivos = _ndjson(exp.iter_export("preventivos", "ndjson"))
+    assert [(row["frecuencia"], row["sucursal"]) for row in preventivos] == [("Mensual", "Central")]
+
+
+def test_iter_export_csv_writes_header_and_escapes_formulas(historial):
+    content = b"".join(exp.iter_export("correctivos", "csv")).decode("utf-8")
+    rows = list(csv.reader(io.StringIO(content)))
+    assert tuple(rows[0]) == exp.CORRECTIVO_FIELDS + exp.JOINED_FIELDS
+    assert len(rows) == 6
+    incidente = rows[0].index("incidente")
+    assert rows[1][incidente] == "'=HYPERLINK()"
+    assert rows[2][incidente] == "Pérdida"
+
+
+def test_iter_export_gzip_round_trips(historial):
+    plain = b"".join(exp.iter_export("correctivos", "csv"))
+    compressed = b"".join(exp.iter_export("correctivos", "csv", comprimir=True))
+    assert gzip.decompress(compressed) == plain
+
+
+def test_iter_export_streams_in_batches(historial, monkeypatch):
+    monkeypatch.setattr(exp, "EXPORT_BATCH_SIZE", 2)
+    chunks = list(exp.iter_export("correctivos", "ndjson"))
+    # Un bloque por partición del cursor: 2 + 2 + 1 filas
+    assert [chunk.count(b"\n") for chunk in chunks] == [2, 2, 1]
+
+
+def test_iter_export_closes_its_session(historial):
+    closed = []
+
+    class TrackedSession(exp.SessionLocal.class_):
+        def close(self):
+            closed.append(True)
+            super().close()
+
+    factory = lambda: TrackedSession(bind=exp.SessionLocal.kw["bind"])
+    stream = exp.iter_export("correctivos", "ndjson", session_factory=factory)
+    next(stream)
+    stream.close()
+    assert closed == [True]
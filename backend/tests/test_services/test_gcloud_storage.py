@@ -92,6 +92,91 @@ def test_generate_gallery_html(monkeypatch):
     index_blob = client.bucket_obj.created["photos/index.html"]
     assert "<div class=\"gallery\">" in index_blob.uploaded_content
 
+def test_gallery_published_checks_storage_once_and_follows_generator(db_session, monkeypatch):
+    monkeypatch.setenv("GOOGLE_CREDENTIALS", "{\"project_id\": \"test\"}")
+    importlib.reload(gcloud_storage)
+    checks = []
+
+    class DummyBlob:
+        def __init__(self, name):
+            self.name = name
+            self.content_type = "image/jpeg"
+
+        def exists(self):
+            checks.append(self.name)
+            return False
+
+        def upload_from_string(self, content, content_type=None):
+            pass
+
+        def patch(self):
+            pass
+
+    class DummyBucket:
+        images = []
+
+        def blob(self, name):
+            return DummyBlob(name)
+
+        def list_blobs(self, prefix):
+            return [DummyBlob(name) for name in self.images]
+
+    class DummyClient:
+        bucket_obj = DummyBucket()
+
+        def bucket(self, name):
+            return self.bucket_obj
+
+    client = DummyClient()
+    monkeypatch.setattr(gcloud_storage.storage.Client, "from_service_account_info", lambda info: client)
+
+    assert gcloud_storage.gallery_published("bucket", "otra") is False
+    assert gcloud_storage.gallery_published("bucket", "otra/") is False
+    assert checks == ["otra/index.html"]
+
+    client.bucket_obj.images = ["fotos/a.jpg"]
+    gcloud_storage.generate_gallery_html("bucket", "fotos")
+    checks.clear()
+    assert gcloud_storage.gallery_published("bucket", "fotos") is True
+
+    client.bucket_obj.images = []
+    assert gcloud_storage.generate_gallery_html("bucket", "fotos") is None
+    checks.clear()
+    assert gcloud_storage.gallery_published("bucket", "fotos") is False
+    assert checks == []
+
+def test_gallery_states_reads_recorded_folders_in_one_query(db_session, monkeypatch):
+    checks = []
+
+    class DummyBlob:
+        def __init__(self, name):
+            self.name = name
+
+        def exists(self):
+            checks.append(self.name)
+            return True
+
+    class DummyClient:
+        def bucket(self, name):
+            return self
+
+        def blob(self, name):
+            return DummyBlob(name)
+
+    monkeypatch.setattr(gcloud_storage, "get_storage_client", lambda: DummyClient())
+    gcloud_storage._record_gallery("bucket", "a/fotos", True)
+    gcloud_storage._record_gallery("bucket", "b/fotos/", False)
+    sessions = []
+    session_local = gcloud_storage.SessionLocal
+    monkeypatch.setattr(gcloud_storage, "SessionLocal", lambda: sessions.append(1) or session_local())
+
+    states = gcloud_storage.gallery_states("bucket", ["a/fotos", "b/fotos", "c/fotos", "a/fotos"])
+
+    assert states == {"a/fotos": True, "b/fotos": False, "c/fotos": True}
+    assert checks == ["c/fotos/index.html"]
+    # Una sesión para leer todo el lote y otra para registrar la carpeta nueva
+    assert len(sessions) == 2
+
 def test_upload_file_to_gcloud(monkeypatch):
     monkeypatch.setenv("GOOGLE_CREDENTIALS", "{\"project_id\": \"test\"}")
     importlib.reload(gcloud_storage)
@@ -1,10 +1,23 @@
+import importlib
 from datetime import date
 from types import SimpleNamespace
 from unittest.mock import MagicMock
 
+import pytest
+
+from gspread.utils import a1_to_rowcol
+
 from src.api.models import MantenimientoCorrectivo, MantenimientoPreventivo
 from src.services import google_sheets
-from src.services.google_sheets import CellNotFound
+
+
+@pytest.fixture(autouse=True)
+def sheets_session(monkeypatch):
+    monkeypatch.setattr(google_sheets, "_client", None)
+    monkeypatch.setattr(google_sheets, "_client_source", None)
+    monkeypatch.setattr(google_sheets, "_worksheets", {})
+    monkeypatch.setattr(google_sheets, "_prepared_sheets", {})
+    monkeypatch.setattr(google_sheets, "_row_indexes", {})
 
 
 def _correctivo():
@@ -43,17 +56,59 @@ def _preventivo():
 
 
 def test_get_fotos_gallery_url_returns_none_when_blob_missing(monkeypatch):
-    monkeypatch.setattr(google_sheets, "_blob_exists", lambda _: False)
+    monkeypatch.setattr(google_sheets, "_gallery_exists", lambda _: False)
     assert google_sheets.get_fotos_gallery_url(1, "correctivos") is None
 
 
 def test_get_planillas_gallery_url(monkeypatch):
-    monkeypatch.setattr(google_sheets, "_blob_exists", lambda _: True)
+    monkeypatch.setattr(google_sheets, "_gallery_exists", lambda _: True)
     monkeypatch.setattr(google_sheets, "GOOGLE_CLOUD_BUCKET_NAME", "test-bucket")
     url = google_sheets.get_planillas_gallery_url(1)
     assert url.endswith("mantenimientos_preventivos/1/planillas/index.html")
 
 
+def test_gallery_links_use_recorded_galleries_without_storage_calls(db_session, monkeypatch):
+    storage = importlib.import_module(google_sheets.gallery_published.__module__)
+    monkeypatch.setattr(storage, "get_storage_client", MagicMock(side_effect=AssertionError("sin llamadas a GCS")))
+    monkeypatch.setattr(google_sheets, "GOOGLE_CLOUD_BUCKET_NAME", "test-bucket")
+    storage._record_gallery("test-bucket", "mantenimientos_preventivos/1/fotos/", True)
+    storage._record_gallery("test-bucket", "mantenimientos_preventivos/1/planillas", False)
+
+    row = google_sheets._build_preventivo_row(_preventivo(), include_links=True)
+
+    assert row[-3] == ""
+    assert row[-2] == "https://storage.googleapis.com/test-bucket/mantenimientos_preventivos/1/fotos/index.html"
+
+
+def test_apply_changes_reads_gallery_states_once_per_batch(db_session, monkeypatch):
+    storage = importlib.import_module(google_sheets.gallery_published.__module__)
+    monkeypatch.setattr(storage, "get_storage_client", MagicMock(side_effect=AssertionError("sin llamadas a GCS")))
+    monkeypatch.setattr(google_sheets, "GOOGLE_CLOUD_BUCKET_NAME", "test-bucket")
+    worksheet, column = _tracked_worksheet("1", "2")
+    monkeypatch.setattr(google_sheets, "_get_worksheet", lambda _: worksheet)
+    monkeypatch.setattr(google_sheets, "_ensure_header", MagicMock())
+    preventivos = []
+    for mantenimiento_id in (1, 2, 3):
+        storage._record_gallery("test-bucket", f"mantenimientos_preventivos/{mantenimiento_id}/fotos", mantenimiento_id != 2)
+        storage._record_gallery("test-bucket", f"mantenimientos_preventivos/{mantenimiento_id}/planillas", False)
+        preventivos.append(_preventivo())
+        preventivos[-1].id = mantenimiento_id
+
+    gallery_states = MagicMock(side_effect=storage.gallery_states)
+    monkeypatch.setattr(google_sheets, "gallery_states", gallery_states)
+
+    google_sheets.apply_changes("preventivo", appends=[preventivos[2]], updates=preventivos[:2])
+
+    gallery_states.assert_called_once()
+    updated = [item["values"][0] for item in worksheet.batch_update.call_args.args[0]]
+    assert [row[-2] for row in updated] == [
+        "https://storage.googleapis.com/test-bucket/mantenimientos_preventivos/1/fotos/index.html",
+        "",
+    ]
+    appended = worksheet.append_row.call_args.args[0]
+    assert appended[-2] == "https://storage.googleapis.com/test-bucket/mantenimientos_preventivos/3/fotos/index.html"
+
+
 def test_column_letter_conversion():
     assert google_sheets._column_letter(1) == "A"
     assert google_sheets._column_letter(27) == "AA"
@@ -62,7 +117,7 @@ def test_column_letter_conversion():
 def test_apply_filters_sets_range(monkeypatch):
     worksheet = MagicMock(row_count=10)
     google_sheets._apply_filters(worksheet, 5)
-    worksheet.set_basic_filter.assert_called_once_with("A1:E10")
+    worksheet.set_basic_filter.assert_called_once_with("A1:E")
 
 
 def test_build_correctivo_row_includes_links(monkeypatch):
@@ -84,9 +139,8 @@ def test_append_correctivo_ensures_header(monkeypatch):
     worksheet = MagicMock()
     monkeypatch.setattr(google_sheets, "_get_worksheet", lambda _: worksheet)
     ensure = MagicMock()
-    append = MagicMock()
+    append = worksheet.append_row
     monkeypatch.setattr(google_sheets, "_ensure_header", ensure)
-    monkeypatch.setattr(google_sheets, "_append_row_with_filters", append)
 
     google_sheets.append_correctivo(_correctivo())
 
@@ -96,15 +150,59 @@ def test_append_correctivo_ensures_header(monkeypatch):
 
 def test_append_correctivo_skips_without_sheet(monkeypatch):
     monkeypatch.setattr(google_sheets, "_get_worksheet", lambda _: None)
-    append = MagicMock()
-    monkeypatch.setattr(google_sheets, "_append_row_with_filters", append)
+    ensure = MagicMock()
+    monkeypatch.setattr(google_sheets, "_ensure_header", ensure)
     google_sheets.append_correctivo(_correctivo())
-    append.assert_not_called()
+    ensure.assert_not_called()
 
 
-def test_update_correctivo_updates_row(monkeypatch):
+def test_append_rows_sends_one_batch_and_skips_existing(monkeypatch):
+    worksheet = MagicMock()
+    worksheet.col_values.return_value = [google_sheets.TRACKING_COLUMN_NAME, "1"]
+    monkeypatch.setattr(google_sheets, "_get_worksheet", lambda _: worksheet)
+    monkeypatch.setattr(google_sheets, "_ensure_header", MagicMock())
+    second = _preventivo()
+    second.id = 2
+    third = _preventivo()
+    third.id = 3
+
+    google_sheets.append_rows("preventivo", [_preventivo(), second, third], skip_existing=True)
+
+    worksheet.append_rows.assert_called_once()
+    assert [row[-1] for row in worksheet.append_rows.call_args.args[0]] == ["2", "3"]
+    worksheet.append_row.assert_not_called()
+
+
+def _tracked_worksheet(*tokens):
     worksheet = MagicMock()
-    worksheet.find.return_value = SimpleNamespace(row=3)
+    column = [google_sheets.TRACKING_COLUMN_NAME, *tokens]
+    worksheet.col_values.side_effect = lambda _: list(column)
+    worksheet.batch_get.side_effect = lambda ranges: [
+        [[column[row - 1]]] if row <= len(column) else [] for row, _ in map(a1_to_rowcol, ranges)
+    ]
+    return worksheet, column
+
+
+def test_update_row_raises_api_errors(monkeypatch):
+    worksheet, _ = _tracked_worksheet("1")
+    worksheet.update.side_effect = RuntimeError("quota")
+    monkeypatch.setattr(google_sheets, "_get_worksheet", lambda _: worksheet)
+    monkeypatch.setattr(google_sheets, "_ensure_header", MagicMock())
+    with pytest.raises(RuntimeError):
+        google_sheets.update_row("correctivo", _correctivo())
+
+
+def test_update_row_appends_when_token_missing(monkeypatch):
+    worksheet, _ = _tracked_worksheet("7")
+    monkeypatch.setattr(google_sheets, "_get_worksheet", lambda _: worksheet)
+    monkeypatch.setattr(google_sheets, "_ensure_header", MagicMock())
+    google_sheets.update_row("preventivo", _preventivo())
+    worksheet.append_row.assert_called_once()
+    worksheet.update.assert_not_called()
+
+
+def test_update_correctivo_updates_row(monkeypatch):
+    worksheet, _ = _tracked_worksheet("5", "1")
     monkeypatch.setattr(google_sheets, "_get_worksheet", lambda _: worksheet)
     monkeypatch.setattr(google_sheets, "_ensure_header", MagicMock())
 
@@ -116,21 +214,17 @@ def test_update_correctivo_updates_row(monkeypatch):
 
 
 def test_update_correctivo_appends_when_not_found(monkeypatch):
-    worksheet = MagicMock()
-    worksheet.find.side_effect = CellNotFound("missing")
+    worksheet, _ = _tracked_worksheet()
     monkeypatch.setattr(google_sheets, "_get_worksheet", lambda _: worksheet)
-    append = MagicMock()
-    monkeypatch.setattr(google_sheets, "_append_row_with_filters", append)
     monkeypatch.setattr(google_sheets, "_ensure_header", MagicMock())
 
     google_sheets.update_correctivo(_correctivo())
 
-    append.assert_called_once()
+    worksheet.append_row.assert_called_once()
 
 
 def test_delete_correctivo(monkeypatch):
-    worksheet = MagicMock()
-    worksheet.find.return_value = SimpleNamespace(row=4)
+    worksheet, _ = _tracked_worksheet("1", "2", "10")
     monkeypatch.setattr(google_sheets, "_get_worksheet", lambda _: worksheet)
     monkeypatch.setattr(google_sheets, "_ensure_header", MagicMock())
 
@@ -140,8 +234,7 @@ def test_delete_correctivo(monkeypatch):
 
 
 def test_delete_correctivo_ignores_missing(monkeypatch):
-    worksheet = MagicMock()
-    worksheet.find.side_effect = CellNotFound("missing")
+    worksheet, _ = _tracked_worksheet("1")
     monkeypatch.setattr(google_sheets, "_get_worksheet", lambda _: worksheet)
     monkeypatch.setattr(google_sheets, "_ensure_header", MagicMock())
 
@@ -154,9 +247,8 @@ def test_append_preventivo(monkeypatch):
     worksheet = MagicMock()
     monkeypatch.setattr(google_sheets, "_get_worksheet", lambda _: worksheet)
     ensure = MagicMock()
-    append = MagicMock()
+    append = worksheet.append_row
     monkeypatch.setattr(google_sheets, "_ensure_header", ensure)
-    monkeypatch.setattr(google_sheets, "_append_row_with_filters", append)
 
     google_sheets.append_preventivo(_preventivo())
 
@@ -165,8 +257,7 @@ def test_append_preventivo(monkeypatch):
 
 
 def test_update_preventivo_updates_existing_row(monkeypatch):
-    worksheet = MagicMock()
-    worksheet.find.return_value = SimpleNamespace(row=2)
+    worksheet, _ = _tracked_worksheet("1")
     monkeypatch.setattr(google_sheets, "_get_worksheet", lambda _: worksheet)
     monkeypatch.setattr(google_sheets, "_ensure_header", MagicMock())
 
@@ -178,21 +269,17 @@ def test_update_preventivo_updates_existing_row(monkeypatch):
 
 
 def test_update_preventivo_appends_when_missing(monkeypatch):
-    worksheet = MagicMock()
-    worksheet.find.side_effect = CellNotFound("missing")
+    worksheet, _ = _tracked_worksheet("2")
     monkeypatch.setattr(google_sheets, "_get_worksheet", lambda _: worksheet)
-    append = MagicMock()
     monkeypatch.setattr(google_sheets, "_ensure_header", MagicMock())
-    monkeypatch.setattr(google_sheets, "_append_row_with_filters", append)
 
     google_sheets.update_preventivo(_preventivo())
 
-    append.assert_called_once()
+    worksheet.append_row.assert_called_once()
 
 
 def test_delete_preventivo(monkeypatch):
-    worksheet = MagicMock()
-    worksheet.find.return_value = SimpleNamespace(row=5)
+    worksheet, _ = _tracked_worksheet("1", "2", "3", "5")
     monkeypatch.setattr(google_sheets, "_get_worksheet", lambda _: worksheet)
     monkeypatch.setattr(google_sheets, "_ensure_header", MagicMock())
 
@@ -202,11 +289,194 @@ def test_delete_preventivo(monkeypatch):
 
 
 def test_delete_preventivo_not_found(monkeypatch):
-    worksheet = MagicMock()
-    worksheet.find.side_effect = CellNotFound("missing")
+    worksheet, _ = _tracked_worksheet("1")
     monkeypatch.setattr(google_sheets, "_get_worksheet", lambda _: worksheet)
     monkeypatch.setattr(google_sheets, "_ensure_header", MagicMock())
 
     google_sheets.delete_preventivo(5)
 
     worksheet.delete_rows.assert_not_called()
+
+
+def test_row_index_is_read_once_and_follows_deletes(monkeypatch):
+    worksheet, column = _tracked_worksheet("1", "2", "3")
+    worksheet.delete_rows.side_effect = lambda row: column.pop(row - 1)
+    monkeypatch.setattr(google_sheets, "_get_worksheet", lambda _: worksheet)
+    monkeypatch.setattr(google_sheets, "_ensure_header", MagicMock())
+
+    google_sheets.delete_row("preventivo", 1)
+    mantenimiento = _preventivo()
+    mantenimiento.id = 3
+    google_sheets.update_row("preventivo", mantenimiento)
+
+    assert worksheet.col_values.call_count == 1
+    assert worksheet.batch_get.call_count == 2
+    worksheet.update.assert_called_once()
+    assert worksheet.update.call_args.args[0] == "A3:J3"
+
+
+def test_row_index_records_appended_rows(monkeypatch):
+    worksheet, column = _tracked_worksheet("1")
+    worksheet.append_rows.return_value = {"updates": {"updatedRange": "'MantenimientosPreventivos'!A3:J4"}}
+    monkeypatch.setattr(google_sheets, "_get_worksheet", lambda _: worksheet)
+    monkeypatch.setattr(google_sheets, "_ensure_header", MagicMock())
+    second, third = _preventivo(), _preventivo()
+    second.id, third.id = 2, 3
+
+    google_sheets.append_rows("preventivo", [second, third], skip_existing=True)
+    column.extend(["2", "3"])
+    google_sheets.update_row("preventivo", third)
+
+    assert worksheet.col_values.call_count == 1
+    assert worksheet.update.call_args.args[0] == "A4:J4"
+
+
+def test_row_index_rebuilds_when_token_missing(monkeypatch):
+    worksheet, column = _tracked_worksheet("2")
+    monkeypatch.setattr(google_sheets, "_get_worksheet", lambda _: worksheet)
+    monkeypatch.setattr(google_sheets, "_ensure_header", MagicMock())
+    google_sheets._row_index("preventivo", worksheet)
+    # Otro proceso agregó la fila después de la primera lectura
+    column.append("1")
+
+    google_sheets.update_row("preventivo", _preventivo())
+
+    assert worksheet.col_values.call_count == 2
+    assert worksheet.update.call_args.args[0] == "A3:J3"
+    worksheet.append_row.assert_not_called()
+
+
+def test_row_index_rebuilds_on_mismatch(monkeypatch):
+    worksheet, column = _tracked_worksheet("1", "2")
+    monkeypatch.setattr(google_sheets, "_get_worksheet", lambda _: worksheet)
+    monkeypatch.setattr(google_sheets, "_ensure_header", MagicMock())
+    google_sheets._row_index("preventivo", worksheet)
+    # Alguien reordenó la hoja a mano
+    column[1:] = ["2", "1"]
+
+    google_sheets.update_row("preventivo", _preventivo())
+
+    assert worksheet.col_values.call_count == 2
+    assert worksheet.update.call_args.args[0] == "A3:J3"
+
+
+def test_apply_changes_relocates_rows_after_manual_sort(monkeypatch):
+    worksheet, column = _tracked_worksheet("1", "2", "3")
+    worksheet.delete_rows.side_effect = lambda row: column.pop(row - 1)
+    monkeypatch.setattr(google_sheets, "_get_worksheet", lambda _: worksheet)
+    monkeypatch.setattr(google_sheets, "_ensure_header", MagicMock())
+    monkeypatch.setattr(google_sheets, "get_fotos_gallery_url", lambda *args: None)
+    monkeypatch.setattr(google_sheets, "get_planillas_gallery_url", lambda *args: None)
+    first = _preventivo()
+
+    google_sheets.apply_changes("preventivo", updates=[first])
+    assert worksheet.batch_update.call_args.args[0][0]["range"] == "A2:J2"
+    # Entre dos lotes alguien ordena la hoja a mano
+    column[1:] = ["3", "2", "1"]
+
+    google_sheets.apply_changes("preventivo", updates=[first], deletes=[3])
+
+    assert worksheet.batch_update.call_args.args[0][0]["range"] == "A4:J4"
+    worksheet.delete_rows.assert_called_once_with(2)
+    assert column == [google_sheets.TRACKING_COLUMN_NAME, "2", "1"]
+    assert worksheet.col_values.call_count == 2
+
+
+def test_reconcile_resets_row_index(monkeypatch):
+    worksheet, column = _tracked_worksheet("1", "2")
+    worksheet.get_all_values.side_effect = lambda: [[""] * 9 + [token] for token in column]
+    monkeypatch.setattr(google_sheets, "_get_worksheet", lambda _: worksheet)
+    monkeypatch.setattr(google_sheets, "_ensure_header", MagicMock())
+    monkeypatch.setattr(google_sheets, "get_fotos_gallery_url", lambda *args: None)
+    monkeypatch.setattr(google_sheets, "get_planillas_gallery_url", lambda *args: None)
+    first, second = _preventivo(), _preventivo()
+    second.id = 2
+    google_sheets._row_index("preventivo", worksheet)
+    # Alguien reordenó la hoja a mano: el índice en caché queda desfasado hasta la reconciliación
+    column[1:] = ["2", "1"]
+
+    google_sheets.reconcile_sheet("preventivo", [first, second])
+    google_sheets.update_row("preventivo", first)
+
+    assert worksheet.col_values.call_count == 2
+    assert worksheet.update.call_args.args[0] == "A3:J3"
+
+
+def test_apply_changes_writes_one_batch_per_kind(monkeypatch):
+    worksheet, column = _tracked_worksheet("1", "2", "3", "4")
+    worksheet.delete_rows.side_effect = lambda row: column.pop(row - 1)
+    monkeypatch.setattr(google_sheets, "_get_worksheet", lambda _: worksheet)
+    monkeypatch.setattr(google_sheets, "_ensure_header", MagicMock())
+    monkeypatch.setattr(google_sheets, "get_fotos_gallery_url", lambda *args: None)
+    monkeypatch.setattr(google_sheets, "get_planillas_gallery_url", lambda *args: None)
+    preventivos = {}
+    for mantenimiento_id in (1, 3, 8, 9):
+        preventivos[mantenimiento_id] = _preventivo()
+        preventivos[mantenimiento_id].id = mantenimiento_id
+
+    google_sheets.apply_changes(
+        "preventivo", appends=[preventivos[9]], updates=[preventivos[1], preventivos[3], preventivos[8]], deletes=[2, 4],
+    )
+
+    worksheet.batch_update.assert_called_once()
+    assert [item["range"] for item in worksheet.batch_update.call_args.args[0]] == ["A2:J2", "A4:J4"]
+    assert [call.args[0] for call in worksheet.delete_rows.call_args_list] == [5, 3]
+    worksheet.append_rows.assert_called_once()
+    assert [row[-1] for row in worksheet.append_rows.call_args.args[0]] == ["9", "8"]
+    assert column == [google_sheets.TRACKING_COLUMN_NAME, "1", "3"]
+
+
+def test_get_client_authorizes_once_per_credentials(monkeypatch):
+    monkeypatch.setattr(google_sheets, "GOOGLE_CREDENTIALS", '{"type": "service_account"}')
+    monkeypatch.setattr(google_sheets.ServiceAccountCredentials, "from_json_keyfile_dict", MagicMock())
+    authorize = MagicMock(side_effect=lambda creds: MagicMock())
+    monkeypatch.setattr(google_sheets.gspread, "authorize", authorize)
+
+    first = google_sheets.get_client()
+    assert google_sheets.get_client() is first
+    assert authorize.call_count == 1
+
+    monkeypatch.setattr(google_sheets, "GOOGLE_CREDENTIALS", '{"type": "otra"}')
+    assert google_sheets.get_client() is not first
+    assert authorize.call_count == 2
+
+
+def test_get_worksheet_is_memoized(monkeypatch):
+    client = MagicMock()
+    monkeypatch.setattr(google_sheets, "SHEET_ID", "sheet")
+    monkeypatch.setattr(google_sheets, "get_client", lambda: client)
+
+    worksheet = google_sheets._get_worksheet("MantenimientosCorrectivos")
+    assert google_sheets._get_worksheet("MantenimientosCorrectivos") is worksheet
+    client.open_by_key.assert_called_once_with("sheet")
+
+
+def test_header_is_prepared_once_and_each_save_is_one_call(monkeypatch):
+    worksheet = MagicMock()
+    worksheet.row_values.return_value = google_sheets.CORRECTIVO_HEADER
+    monkeypatch.setattr(google_sheets, "_get_worksheet", lambda _: worksheet)
+
+    google_sheets.append_correctivo(_correctivo())
+    worksheet.set_basic_filter.assert_called_once_with("A1:M")
+    worksheet.hide_columns.assert_called_once_with(14)
+
+    worksheet.reset_mock()
+    google_sheets.append_correctivo(_correctivo())
+    assert [call[0] for call in worksheet.method_calls] == ["append_row"]
+
+
+def test_failed_operation_reopens_worksheet(monkeypatch):
+    worksheets = [MagicMock(), MagicMock()]
+    worksheets[0].append_row.side_effect = RuntimeError("quota")
+    client = MagicMock()
+    client.open_by_key.return_value.worksheet.side_effect = worksheets
+    monkeypatch.setattr(google_sheets, "SHEET_ID", "sheet")
+    monkeypatch.setattr(google_sheets, "get_client", lambda: client)
+    ensure = MagicMock()
+    monkeypatch.setattr(google_sheets, "_ensure_header", ensure)
+
+    google_sheets.append_correctivo(_correctivo())
+    google_sheets.append_correctivo(_correctivo())
+
+    worksheets[1].append_row.assert_called_once()
+    assert ensure.call_count == 2
@@ -0,0 +1,106 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from src.services.google_tokeninfo import GoogleTokenInfoClient
+
+
+class TokenInfoHandler(BaseHTTPRequestHandler):
+    requests_seen = []
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        token = query.get("id_token", [""])[0]
+        TokenInfoHandler.requests_seen.append(token)
+        if token == "slow":
+            time.sleep(0.5)
+        if token.startswith("valid"):
+            status = 200
+            body = {"email": "user@example.com", "sub": "google", "exp": str(int(time.time()) + 3600)}
+        else:
+            status = 400
+            body = {"error": "invalid_token", "error_description": "Invalid Value"}
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    TokenInfoHandler.requests_seen = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), TokenInfoHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/tokeninfo"
+    server.shutdown()
+    server.server_close()
+
+
+def test_verify_returns_payload_and_caches_valid_tokens(stub_server):
+    client = GoogleTokenInfoClient(url=stub_server, timeout=2)
+
+    async def run():
+        first = await client.verify("valid-1")
+        second = await client.verify("valid-1")
+        await client.aclose()
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert first["email"] == "user@example.com"
+    assert second == first
+    assert TokenInfoHandler.requests_seen == ["valid-1"]
+
+
+def test_verify_does_not_cache_errors(stub_server):
+    client = GoogleTokenInfoClient(url=stub_server, timeout=2)
+
+    async def run():
+        first = await client.verify("bad")
+        second = await client.verify("bad")
+        await client.aclose()
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert first["error"] == "invalid_token"
+    assert second["error"] == "invalid_token"
+    assert TokenInfoHandler.requests_seen == ["bad", "bad"]
+
+
+def test_verify_reuses_pooled_client(stub_server):
+    client = GoogleTokenInfoClient(url=stub_server, timeout=2)
+
+    async def run():
+        await client.verify("valid-a")
+        pooled = client._client
+        await client.verify("valid-b")
+        same = client._client is pooled
+        await client.aclose()
+        return same
+
+    assert asyncio.run(run())
+
+
+def test_verify_times_out(stub_server):
+    client = GoogleTokenInfoClient(url=stub_server, timeout=0.1)
+
+    async def run():
+        try:
+            await client.verify("slow")
+        finally:
+            await client.aclose()
+
+    with pytest.raises(Exception):
+        asyncio.run(run())
@@ -1,5 +1,5 @@
 import asyncio
-from datetime import UTC, date, datetime
+from datetime import UTC, date, datetime, timedelta
 from unittest.mock import AsyncMock, MagicMock
 
 import pytest
@@ -10,11 +10,20 @@ from src.api.models import (
     Cuadrilla,
     MantenimientoCorrectivo,
     MantenimientoCorrectivoFoto,
+    ResumenMensualMantenimiento,
+    SheetSyncOutbox,
     Sucursal,
 )
 from src.services import mantenimientos_correctivos as mc
 
 
+def _outbox(db_session):
+    return [
+        (entry.operacion, entry.mantenimiento_id)
+        for entry in db_session.query(SheetSyncOutbox).order_by(SheetSyncOutbox.id)
+    ]
+
+
 @pytest.fixture
 def auth_entity():
     return {"type": "usuario"}
@@ -56,17 +65,11 @@ def cuadrilla(db_session):
 @pytest.fixture
 def correctivo_integrations(monkeypatch):
     patches = {
-        "append": MagicMock(),
-        "update": MagicMock(),
-        "delete": MagicMock(),
         "upload": AsyncMock(return_value="https://files.local/resource"),
         "delete_file": MagicMock(return_value=True),
         "notify_user": MagicMock(),
         "notify_users": AsyncMock(),
     }
-    monkeypatch.setattr(mc, "append_correctivo", patches["append"])
-    monkeypatch.setattr(mc, "update_correctivo", patches["update"])
-    monkeypatch.setattr(mc, "delete_correctivo", patches["delete"])
     monkeypatch.setattr(mc, "upload_file_to_gcloud", patches["upload"])
     monkeypatch.setattr(mc, "delete_file_in_folder", patches["delete_file"])
     monkeypatch.setattr(mc, "notify_user", patches["notify_user"])
@@ -112,7 +115,7 @@ def test_create_correctivo_high_priority_notifies(db_session, cliente, sucursal,
     )
     assert result.numero_caso == "NC-1"
     correctivo_integrations["notify_user"].assert_called_once()
-    assert correctivo_integrations["append"].called
+    assert _outbox(db_session) == [("append", result.id)]
 
 
 def test_create_correctivo_requires_matching_cliente(db_session, sucursal, cuadrilla, auth_entity):
@@ -176,7 +179,7 @@ def test_update_correctivo_handles_files_and_notifications(db_session, correctiv
     assert updated.extendido == extendido.replace(tzinfo=None)
     assert db_session.query(MantenimientoCorrectivoFoto).filter_by(mantenimiento_id=correctivo.id).count() == 1
     assert correctivo_integrations["notify_users"].await_count >= 1
-    correctivo_integrations["update"].assert_called_once()
+    assert _outbox(db_session) == [("update", correctivo.id)]
 
 
 def test_update_correctivo_not_found(db_session, auth_entity):
@@ -196,7 +199,7 @@ def test_delete_correctivo_calls_sheet_cleanup(db_session, correctivo, auth_enti
     record_id = correctivo.id
     response = mc.delete_mantenimiento_correctivo(db_session, record_id, auth_entity)
     assert "eliminado" in response["message"]
-    correctivo_integrations["delete"].assert_called_once_with(record_id)
+    assert _outbox(db_session) == [("delete", record_id)]
 
 
 def test_delete_correctivo_not_found(db_session, auth_entity):
@@ -230,13 +233,196 @@ def test_delete_photo_not_found(db_session, correctivo, auth_entity):
     assert exc.value.status_code == 404
 
 
-def test_get_mantenimientos_correctivos_returns_list(db_session, correctivo):
-    result = mc.get_mantenimientos_correctivos(db_session)
+def test_get_mantenimientos_correctivos_rows_returns_list(db_session, correctivo):
+    result = mc.get_mantenimientos_correctivos_rows(db_session)
     assert len(result) == 1
-    assert result[0].id == correctivo.id
+    assert result[0]["id"] == correctivo.id
+
+
+def _add_correctivos(db_session, cliente, sucursal, cuadrilla, count):
+    records = [
+        MantenimientoCorrectivo(
+            cliente_id=cliente.id,
+            sucursal_id=sucursal.id,
+            id_cuadrilla=cuadrilla.id if i % 2 == 0 else None,
+            fecha_apertura=date(2024, 1, 1) + timedelta(days=31 * i),
+            numero_caso=f"NC-{i}",
+            estado="Pendiente" if i % 2 == 0 else "Finalizado",
+            prioridad="Alta" if i < 2 else "Baja",
+        )
+        for i in range(count)
+    ]
+    db_session.add_all(records)
+    db_session.commit()
+    return records
+
+
+def test_get_mantenimientos_correctivos_rows_applies_filters(db_session, cliente, sucursal, cuadrilla):
+    _add_correctivos(db_session, cliente, sucursal, cuadrilla, 6)
+
+    result = mc.get_mantenimientos_correctivos_rows(
+        db_session,
+        estado="Pendiente",
+        id_cuadrilla=cuadrilla.id,
+        fecha_desde=date(2024, 2, 1),
+        fecha_hasta=date(2024, 6, 30),
+    )
+    assert sorted(m["numero_caso"] for m in result) == ["NC-2", "NC-4"]
+    assert [m["numero_caso"] for m in mc.get_mantenimientos_correctivos_rows(db_session, prioridad="Alta", estado="Finalizado")] == ["NC-1"]
+
+
+def test_get_mantenimientos_correctivos_rows_page_walks_with_cursor(db_session, cliente, sucursal, cuadrilla):
+    records = _add_correctivos(db_session, cliente, sucursal, cuadrilla, 5)
+
+    first, cursor = mc.get_mantenimientos_correctivos_rows_page(db_session, limit=2)
+    second, cursor_2 = mc.get_mantenimientos_correctivos_rows_page(db_session, limit=2, cursor=cursor)
+    third, cursor_3 = mc.get_mantenimientos_correctivos_rows_page(db_session, limit=2, cursor=cursor_2)
+
+    seen = [m["id"] for m in first + second + third]
+    assert seen == sorted((r.id for r in records), reverse=True)
+    assert cursor_3 is None
+
+
+def _list_fotos(db_session, count_queries, **kwargs):
+    db_session.expire_all()
+    with count_queries() as statements:
+        if kwargs:
+            mantenimientos, _ = mc.get_mantenimientos_correctivos_rows_page(db_session, **kwargs)
+        else:
+            mantenimientos = mc.get_mantenimientos_correctivos_rows(db_session)
+        fotos = [m["fotos"] for m in mantenimientos]
+    return fotos, len(statements)
+
+
+def test_list_correctivos_loads_fotos_with_constant_queries(db_session, cliente, sucursal, cuadrilla, count_queries):
+    records = _add_correctivos(db_session, cliente, sucursal, cuadrilla, 3)
+    db_session.add_all(MantenimientoCorrectivoFoto(mantenimiento_id=r.id, url=f"https://files/{r.id}.jpg") for r in records)
+    db_session.commit()
+    fotos_small, queries_small = _list_fotos(db_session, count_queries)
+
+    records = _add_correctivos(db_session, cliente, sucursal, cuadrilla, 20)
+    db_session.add_all(MantenimientoCorrectivoFoto(mantenimiento_id=r.id, url=f"https://files/{r.id}.jpg") for r in records)
+    db_session.commit()
+    fotos_large, queries_large = _list_fotos(db_session, count_queries)
+
+    assert len(fotos_small) == 3 and len(fotos_large) == 23
+    assert all(len(urls) == 1 for urls in fotos_large)
+    assert queries_small == queries_large == 2
+    assert _list_fotos(db_session, count_queries, limit=10)[1] == 2
+
+
+
+def test_correctivo_rows_match_orm_listing(db_session, cliente, sucursal, cuadrilla, count_queries):
+    records = _add_correctivos(db_session, cliente, sucursal, cuadrilla, 4)
+    db_session.add_all(MantenimientoCorrectivoFoto(mantenimiento_id=records[1].id, url=f"https://files/{i}.jpg") for i in range(2))
+    db_session.commit()
+    expected = {
+        m.id: {key: getattr(m, key) for key in mc.LIST_KEYS} | {"fotos": [f.url for f in m.fotos]}
+        for m in db_session.query(MantenimientoCorrectivo).filter(MantenimientoCorrectivo.estado == "Finalizado")
+    }
+
+    with count_queries() as statements:
+        rows = mc.get_mantenimientos_correctivos_rows(db_session, estado="Finalizado")
+    assert {row["id"]: row for row in rows} == expected
+    assert len(statements) == 2
+
+
+def test_correctivo_rows_page_walks_with_cursor(db_session, cliente, sucursal, cuadrilla):
+    records = _add_correctivos(db_session, cliente, sucursal, cuadrilla, 3)
+    db_session.add(MantenimientoCorrectivoFoto(mantenimiento_id=records[2].id, url="https://files/last.jpg"))
+    db_session.commit()
+
+    first, cursor = mc.get_mantenimientos_correctivos_rows_page(db_session, limit=2)
+    second, cursor_2 = mc.get_mantenimientos_correctivos_rows_page(db_session, limit=2, cursor=cursor)
+
+    assert [row["id"] for row in first + second] == [r.id for r in reversed(records)]
+    assert first[0]["fotos"] == ["https://files/last.jpg"]
+    assert second[0]["fotos"] == []
+    assert cursor_2 is None
+    assert mc.get_mantenimientos_correctivos_rows_page(db_session, estado="Otro") == ([], None)
+
+def test_get_correctivo_detail_loads_fotos_eagerly(db_session, correctivo, count_queries):
+    correctivo_id = correctivo.id
+    db_session.add(MantenimientoCorrectivoFoto(mantenimiento_id=correctivo_id, url="https://files/a.jpg"))
+    db_session.commit()
+    db_session.expire_all()
+    with count_queries() as statements:
+        mantenimiento = mc.get_mantenimiento_correctivo(db_session, correctivo_id)
+        urls = [foto.url for foto in mantenimiento.fotos]
+    assert urls == ["https://files/a.jpg"]
+    assert len(statements) == 2
 
 
 def test_get_mantenimiento_correctivo_not_found(db_session):
     with pytest.raises(HTTPException) as exc:
         mc.get_mantenimiento_correctivo(db_session, 999)
     assert exc.value.status_code == 404
+
+
+def test_create_and_update_correctivo_with_async_session(db_session, cliente, sucursal, cuadrilla, auth_entity, correctivo_integrations, run_with_async_session):
+    async def create(session):
+        return await mc.create_mantenimiento_correctivo(
+            session,
+            cliente.id,
+            sucursal.id,
+            cuadrilla.id,
+            date(2024, 1, 1),
+            "NC-ASYNC",
+            "Incidente",
+            "Otros",
+            "Pendiente",
+            "Media",
+            auth_entity,
+        )
+
+    created = run_with_async_session(create)
+
+    async def update(session):
+        return await mc.update_mantenimiento_correctivo(
+            session,
+            created.id,
+            auth_entity,
+            estado="En Progreso",
+            fotos=[MagicMock(filename="foto.jpg")],
+        )
+
+    updated = run_with_async_session(update)
+    assert updated.estado == "En Progreso"
+    assert [foto.url for foto in updated.fotos] == ["https://files.local/resource"]
+    stored = db_session.query(MantenimientoCorrectivo).filter_by(numero_caso="NC-ASYNC").one()
+    assert stored.estado == "En Progreso"
+    correctivo_integrations["notify_users"].assert_awaited_once()
+
+
+def _resumen(db_session):
+    resumen = ResumenMensualMantenimiento
+    return sorted(
+        db_session.query(resumen.anio, resumen.mes, resumen.zona, resumen.id_cuadrilla, resumen.estado, resumen.prioridad, resumen.total, resumen.resueltos).all()
+    )
+
+
+def test_correctivo_changes_keep_monthly_rollup_in_sync(db_session, cliente, sucursal, cuadrilla, auth_entity, correctivo_integrations):
+    created = asyncio.run(
+        mc.create_mantenimiento_correctivo(
+            db_session, cliente.id, sucursal.id, None, date(2024, 3, 5), "NC-R", "Incidente", "Otros", "Pendiente", "Media", auth_entity,
+        )
+    )
+    assert _resumen(db_session) == [(2024, 3, "Norte", 0, "Pendiente", "Media", 1, 0)]
+
+    asyncio.run(
+        mc.update_mantenimiento_correctivo(
+            db_session, created.id, auth_entity, id_cuadrilla=cuadrilla.id, fecha_apertura=date(2024, 4, 1), estado="Finalizado",
+        )
+    )
+    assert _resumen(db_session) == [(2024, 4, "Norte", cuadrilla.id, "Finalizado", "Media", 1, 1)]
+
+    mc.delete_mantenimiento_correctivo(db_session, created.id, auth_entity)
+    assert _resumen(db_session) == []
+
+
+def test_update_correctivo_notifies_after_rollup_is_saved(db_session, correctivo, auth_entity, correctivo_integrations):
+    seen = []
+    correctivo_integrations["notify_users"].side_effect = lambda **_: seen.append(_resumen(db_session))
+    asyncio.run(mc.update_mantenimiento_correctivo(db_session, correctivo.id, auth_entity, estado="Solucionado"))
+    # El aviso sale con el cambio y su resumen ya confirmados juntos
+    assert [[row[4] for row in rows] for rows in seen] == [["Solucionado"]]
@@ -4,6 +4,7 @@ from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
 
 from src.api.models import (
     Cliente,
@@ -11,11 +12,20 @@ from src.api.models import (
     MantenimientoPreventivo,
     MantenimientoPreventivoFoto,
     MantenimientoPreventivoPlanilla,
+    ResumenMensualMantenimiento,
+    SheetSyncOutbox,
     Sucursal,
 )
 from src.services import mantenimientos_preventivos as mp
 
 
+def _outbox(db_session):
+    return [
+        (entry.operacion, entry.mantenimiento_id)
+        for entry in db_session.query(SheetSyncOutbox).order_by(SheetSyncOutbox.id)
+    ]
+
+
 @pytest.fixture
 def auth_entity():
     return {"type": "usuario"}
@@ -74,19 +84,15 @@ def preventivo(db_session, cliente, sucursal, cuadrilla):
 @pytest.fixture
 def preventivo_integrations(monkeypatch):
     patches = {
-        "append": MagicMock(),
-        "update": MagicMock(),
-        "delete": MagicMock(),
         "upload": AsyncMock(return_value="https://files.local/resource"),
         "delete_file": MagicMock(return_value=True),
         "notify": AsyncMock(),
+        "notify_batch": AsyncMock(),
     }
-    monkeypatch.setattr(mp, "append_preventivo", patches["append"])
-    monkeypatch.setattr(mp, "update_preventivo", patches["update"])
-    monkeypatch.setattr(mp, "delete_preventivo", patches["delete"])
     monkeypatch.setattr(mp, "upload_file_to_gcloud", patches["upload"])
     monkeypatch.setattr(mp, "delete_file_in_folder", patches["delete_file"])
     monkeypatch.setattr(mp, "notify_users_preventivo", patches["notify"])
+    monkeypatch.setattr(mp, "notify_preventivos_batch", patches["notify_batch"])
     monkeypatch.setattr(mp, "GOOGLE_CLOUD_BUCKET_NAME", "test-bucket")
     return patches
 
@@ -105,7 +111,7 @@ def test_create_preventivo_success(db_session, cliente, sucursal, cuadrilla, aut
         )
     )
     assert mantenimiento.frecuencia == "Mensual"
-    preventivo_integrations["append"].assert_called_once()
+    assert _outbox(db_session) == [("append", mantenimiento.id)]
 
 
 def test_create_preventivo_mismatched_frequency(db_session, cliente, sucursal, cuadrilla, auth_entity):
@@ -167,7 +173,7 @@ def test_update_preventivo_handles_files_and_notifications(
     assert db_session.query(MantenimientoPreventivoPlanilla).count() == 1
     assert db_session.query(MantenimientoPreventivoFoto).count() == 1
     assert preventivo_integrations["notify"].await_count >= 1
-    preventivo_integrations["update"].assert_called_once()
+    assert _outbox(db_session) == [("update", preventivo.id)]
 
 
 def test_update_preventivo_not_found(db_session, auth_entity):
@@ -186,7 +192,7 @@ def test_delete_preventivo_calls_sheet_cleanup(db_session, preventivo, auth_enti
     record_id = preventivo.id
     response = mp.delete_mantenimiento_preventivo(db_session, record_id, auth_entity)
     assert "eliminado" in response["message"]
-    preventivo_integrations["delete"].assert_called_once_with(record_id)
+    assert _outbox(db_session) == [("delete", record_id)]
 
 
 def test_delete_preventivo_not_found(db_session, auth_entity):
@@ -215,13 +221,216 @@ def test_delete_photo_removes_record(db_session, preventivo, auth_entity, preven
     preventivo_integrations["delete_file"].assert_called_once()
 
 
-def test_get_mantenimientos_preventivos_returns_list(db_session, preventivo):
-    result = mp.get_mantenimientos_preventivos(db_session)
+def test_get_mantenimientos_preventivos_rows_returns_list(db_session, preventivo):
+    result = mp.get_mantenimientos_preventivos_rows(db_session)
     assert len(result) == 1
-    assert result[0].id == preventivo.id
+    assert result[0]["id"] == preventivo.id
+
+
+def test_list_preventivos_loads_collections_with_constant_queries(db_session, cliente, sucursal, cuadrilla, count_queries):
+    def seed(count, offset):
+        records = [
+            MantenimientoPreventivo(
+                cliente_id=cliente.id,
+                sucursal_id=sucursal.id,
+                frecuencia="Mensual",
+                id_cuadrilla=cuadrilla.id,
+                fecha_apertura=date(2020 + offset + i // 12, 1 + i % 12, 1),
+                estado="Pendiente",
+            )
+            for i in range(count)
+        ]
+        db_session.add_all(records)
+        db_session.commit()
+        for record in records:
+            db_session.add(MantenimientoPreventivoFoto(mantenimiento_id=record.id, url="https://files/foto.jpg"))
+            db_session.add(MantenimientoPreventivoPlanilla(mantenimiento_id=record.id, url="https://files/planilla.pdf"))
+        db_session.commit()
+
+    def list_queries():
+        db_session.expire_all()
+        with count_queries() as statements:
+            for m in mp.get_mantenimientos_preventivos_rows(db_session):
+                assert m["planillas"] == ["https://files/planilla.pdf"]
+                assert m["fotos"] == ["https://files/foto.jpg"]
+        return len(statements)
+
+    seed(2, 0)
+    small = list_queries()
+    seed(15, 2)
+    assert list_queries() == small == 3
+
+
+
+def test_preventivo_rows_match_orm_listing(db_session, preventivo, count_queries):
+    db_session.add(MantenimientoPreventivoFoto(mantenimiento_id=preventivo.id, url="https://files/foto.jpg"))
+    db_session.add_all(MantenimientoPreventivoPlanilla(mantenimiento_id=preventivo.id, url=f"https://files/{i}.pdf") for i in range(2))
+    db_session.commit()
+    m = db_session.get(MantenimientoPreventivo, preventivo.id)
+    expected = {key: getattr(m, key) for key in mp.LIST_KEYS}
+    expected.update(planillas=[p.url for p in m.planillas], fotos=[f.url for f in m.fotos])
+    sucursal_id = m.sucursal_id
 
+    with count_queries() as statements:
+        rows = mp.get_mantenimientos_preventivos_rows(db_session, sucursal_id=sucursal_id)
+    assert rows == [expected]
+    assert len(statements) == 3
+
+    items, cursor = mp.get_mantenimientos_preventivos_rows_page(db_session, limit=1)
+    assert items == [expected] and cursor is None
 
 def test_get_mantenimiento_preventivo_not_found(db_session):
     with pytest.raises(HTTPException) as exc:
         mp.get_mantenimiento_preventivo(db_session, 999)
     assert exc.value.status_code == 404
+
+
+def test_preventivo_changes_keep_monthly_rollup_in_sync(db_session, cliente, sucursal, cuadrilla, auth_entity, preventivo_integrations):
+    resumen = ResumenMensualMantenimiento
+
+    def rows():
+        return db_session.query(resumen.anio, resumen.mes, resumen.estado, resumen.prioridad, resumen.total, resumen.resueltos).all()
+
+    created = asyncio.run(
+        mp.create_mantenimiento_preventivo(
+            db_session, cliente.id, sucursal.id, "Mensual", cuadrilla.id, date(2024, 5, 2), "Pendiente", auth_entity,
+        )
+    )
+    assert rows() == [(2024, 5, "Pendiente", "", 1, 0)]
+
+    asyncio.run(mp.update_mantenimiento_preventivo(db_session, created.id, auth_entity, fecha_cierre=date(2024, 5, 9)))
+    assert rows() == [(2024, 5, "Pendiente", "", 1, 1)]
+
+    mp.delete_mantenimiento_preventivo(db_session, created.id, auth_entity)
+    assert rows() == []
+
+
+def test_planificar_preventivos_creates_missing_period(db_session, cliente, sucursal, cuadrilla, auth_entity, preventivo_integrations):
+    trimestral = Sucursal(nombre="Trimestral", zona="Norte", direccion="D", superficie="1", cliente_id=cliente.id, frecuencia_preventivo="Trimestral")
+    cubierta = Sucursal(nombre="Cubierta", zona="Norte", direccion="D", superficie="1", cliente_id=cliente.id, frecuencia_preventivo="Semestral")
+    sin_cuadrilla = Sucursal(nombre="Lejana", zona="Oeste", direccion="D", superficie="1", cliente_id=cliente.id, frecuencia_preventivo="Mensual")
+    sin_frecuencia = Sucursal(nombre="Sin plan", zona="Norte", direccion="D", superficie="1", cliente_id=cliente.id)
+    otra = Cuadrilla(nombre="C2", zona="Sur", email="c2@example.com", firebase_uid="uid-2")
+    db_session.add_all([trimestral, cubierta, sin_cuadrilla, sin_frecuencia, otra])
+    db_session.commit()
+    db_session.add(MantenimientoPreventivo(
+        cliente_id=cliente.id, sucursal_id=cubierta.id, frecuencia="Semestral", fecha_apertura=date(2024, 2, 1), estado="Pendiente",
+        period_start=date(2024, 1, 1),
+    ))
+    db_session.commit()
+
+    resultado = asyncio.run(
+        mp.planificar_preventivos(db_session, date(2024, 5, 15), auth_entity, asignaciones={trimestral.id: otra.id})
+    )
+
+    creados = {c["sucursal_id"]: c for c in resultado["creados"]}
+    assert set(creados) == {sucursal.id, trimestral.id, sin_cuadrilla.id}
+    # Sin asignación explícita no se elige una cuadrilla de la zona
+    assert creados[sucursal.id]["id_cuadrilla"] is None
+    assert creados[sin_cuadrilla.id]["id_cuadrilla"] is None
+    assert creados[trimestral.id]["id_cuadrilla"] == otra.id
+    assert creados[trimestral.id]["frecuencia"] == "Trimestral"
+    assert sorted(resultado["sin_cuadrilla"]) == sorted([sucursal.id, sin_cuadrilla.id])
+
+    assert sorted(_outbox(db_session)) == sorted(("append", c["id"]) for c in resultado["creados"])
+    avisos = preventivo_integrations["notify_batch"].await_args.args[1]
+    assert [uid for uid, _, _ in avisos] == ["uid-2"]
+    resumen = ResumenMensualMantenimiento
+    assert sorted(db_session.query(resumen.id_cuadrilla, resumen.total).filter(resumen.mes == 5).all()) == sorted(
+        [(0, 1), (0, 1), (otra.id, 1)]
+    )
+
+    # Una segunda planificación del mismo período no duplica; con autoasignar se usa la cuadrilla de la zona
+    again = asyncio.run(mp.planificar_preventivos(db_session, date(2024, 6, 1), auth_entity, autoasignar=True))
+    creados = {c["sucursal_id"]: c["id_cuadrilla"] for c in again["creados"]}
+    assert creados == {sucursal.id: cuadrilla.id, sin_cuadrilla.id: None}
+    assert again["sin_cuadrilla"] == [sin_cuadrilla.id]
+
+
+def test_update_planned_preventivo_without_cuadrilla(db_session, sucursal, auth_entity, preventivo_integrations):
+    resultado = asyncio.run(mp.planificar_preventivos(db_session, date(2024, 5, 15), auth_entity))
+    creado = resultado["creados"][0]
+    assert creado["id_cuadrilla"] is None
+
+    updated = asyncio.run(
+        mp.update_mantenimiento_preventivo(db_session, creado["id"], auth_entity, extendido=datetime(2024, 5, 20, 10, 0), estado="En Progreso")
+    )
+
+    assert updated.id_cuadrilla is None
+    assert updated.estado == "En Progreso"
+    preventivo_integrations["notify"].assert_not_called()
+
+
+def test_planificar_preventivos_finds_pending_sucursales_in_one_query(db_session, cliente, sucursal, count_queries):
+    for i in range(5):
+        db_session.add(Sucursal(nombre=f"S{i}", zona="Norte", direccion="D", superficie="1", cliente_id=cliente.id, frecuencia_preventivo="Mensual"))
+    db_session.commit()
+    with count_queries() as statements:
+        pendientes = mp._sucursales_sin_preventivo(db_session, date(2024, 1, 10))
+    assert len(pendientes) == 6
+    assert len(statements) == 1
+
+
+def test_planificar_preventivos_rejects_unknown_cuadrilla(db_session, sucursal, auth_entity, preventivo_integrations):
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(mp.planificar_preventivos(db_session, date(2024, 1, 1), auth_entity, asignaciones={sucursal.id: 999}))
+    assert exc.value.status_code == 404
+
+
+def test_period_start_follows_frequency():
+    assert mp.period_start(date(2024, 5, 15), "Mensual") == date(2024, 5, 1)
+    assert mp.period_start(date(2024, 5, 15), "Trimestral") == date(2024, 4, 1)
+    assert mp.period_start(date(2024, 5, 15), "Cuatrimestral") == date(2024, 5, 1)
+    assert mp.period_start(date(2024, 5, 15), "Semestral") == date(2024, 1, 1)
+    assert mp.period_start(None, "Mensual") is None
+    assert mp.period_start(date(2024, 5, 15), "Anual") is None
+
+
+def test_create_preventivo_rejects_second_in_period(db_session, cliente, sucursal, cuadrilla, auth_entity, preventivo_integrations):
+    first = asyncio.run(
+        mp.create_mantenimiento_preventivo(
+            db_session, cliente.id, sucursal.id, "Mensual", cuadrilla.id, date(2024, 3, 2), "Pendiente", auth_entity,
+        )
+    )
+    assert first.period_start == date(2024, 3, 1)
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(
+            mp.create_mantenimiento_preventivo(
+                db_session, cliente.id, sucursal.id, "Mensual", cuadrilla.id, date(2024, 3, 20), "Pendiente", auth_entity,
+            )
+        )
+    assert exc.value.status_code == 400
+    assert db_session.query(MantenimientoPreventivo).count() == 1
+    assert db_session.query(ResumenMensualMantenimiento.total).all() == [(1,)]
+
+
+def test_flush_preventivo_period_reraises_other_integrity_errors(db_session, sucursal):
+    db_session.add(MantenimientoPreventivo(cliente_id=None, sucursal_id=sucursal.id, frecuencia="Mensual", fecha_apertura=date(2024, 3, 2)))
+    with pytest.raises(IntegrityError) as exc:
+        mp._flush_preventivo_period(db_session)
+    assert "NOT NULL" in str(exc.value.orig)
+
+
+def test_update_preventivo_rejects_moving_into_taken_period(db_session, cliente, sucursal, cuadrilla, auth_entity, preventivo_integrations):
+    for day in (date(2024, 3, 2), date(2024, 4, 2)):
+        asyncio.run(
+            mp.create_mantenimiento_preventivo(
+                db_session, cliente.id, sucursal.id, "Mensual", cuadrilla.id, day, "Pendiente", auth_entity,
+            )
+        )
+    abril = db_session.query(MantenimientoPreventivo).filter(MantenimientoPreventivo.fecha_apertura == date(2024, 4, 2)).one()
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(mp.update_mantenimiento_preventivo(db_session, abril.id, auth_entity, fecha_apertura=date(2024, 3, 25)))
+    assert exc.value.status_code == 400
+
+    # Dentro del mismo período la fecha se puede cambiar
+    updated = asyncio.run(mp.update_mantenimiento_preventivo(db_session, abril.id, auth_entity, fecha_apertura=date(2024, 4, 20)))
+    assert updated.period_start == date(2024, 4, 1)
+
+
+def test_update_preventivo_queues_sheet_sync_with_the_change(db_session, preventivo, auth_entity, preventivo_integrations):
+    seen = []
+    preventivo_integrations["notify"].side_effect = lambda **_: seen.append(_outbox(db_session))
+    asyncio.run(mp.update_mantenimiento_preventivo(db_session, preventivo.id, auth_entity, fecha_cierre=date(2024, 2, 1)))
+    # Cuando sale el aviso, la edición y su fila en el outbox ya están confirmadas
+    assert seen == [[("update", preventivo.id)]]
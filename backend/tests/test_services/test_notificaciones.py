@@ -247,3 +247,32 @@ def test_delete_notificaciones_no_match(db_session):
 def test_delete_notificacion_not_found(db_session):
     result = notif_service.delete_notificacion(db_session, 999)
     assert result == {"detail": "No se encontró la notificación"}
+
+def test_notify_users_correctivo_with_async_session(db_session, run_with_async_session):
+    db_session.add_all([
+        Usuario(email="enc@example.com", rol="Encargado de Mantenimiento", firebase_uid="enc"),
+        Usuario(email="adm@example.com", rol="Administrador", firebase_uid="adm"),
+    ])
+    db_session.commit()
+
+    with patch("src.services.notificaciones.notification_manager.send_notification", new=AsyncMock()) as mock_ws:
+        run_with_async_session(lambda session: notif_service.notify_users_correctivo(session, 1, "Solucionado"))
+
+    assert mock_ws.await_count == 2
+    stored = db_session.query(Notificacion_Correctivo).order_by(Notificacion_Correctivo.firebase_uid).all()
+    assert [n.firebase_uid for n in stored] == ["adm", "enc"]
+
+def test_notify_preventivos_batch_inserts_once_and_falls_back_to_encargados(db_session, count_queries):
+    db_session.add(Usuario(email="encb@example.com", rol="Encargado de Mantenimiento", firebase_uid="encb"))
+    db_session.commit()
+    avisos = [("uid-1", 1, "Nuevo"), ("uid-2", 2, "Nuevo"), (None, 3, "Nuevo")]
+
+    with patch("src.services.notificaciones.notification_manager.send_notification", new=AsyncMock()) as mock_send:
+        with count_queries() as statements:
+            creadas = asyncio.run(notif_service.notify_preventivos_batch(db_session, avisos))
+
+    assert [(n["firebase_uid"], n["id_mantenimiento"]) for n in creadas] == [("uid-1", 1), ("uid-2", 2), ("encb", 3)]
+    assert mock_send.await_count == 3
+    # Sin consultas de deduplicación por destinatario: solo los usuarios encargados y los INSERT
+    assert [s for s in statements if s.lstrip().upper().startswith("SELECT")] == [statements[0]]
+    assert db_session.query(Notificacion_Preventivo).count() == 3
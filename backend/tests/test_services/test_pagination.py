@@ -0,0 +1,15 @@
+import pytest
+from fastapi import HTTPException
+
+from src.services.pagination import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(42)) == 42
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", "eyJ4IjoxfQ", "eyJpZCI6ImEifQ"])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor)
+    assert exc.value.status_code == 400
@@ -0,0 +1,54 @@
+import asyncio
+import csv
+import io
+
+import pytest
+
+from src.services import reportes
+
+DATA = {
+    "correctivos": {
+        "total": 3,
+        "por_estado": {"Finalizado": 2, None: 1},
+        "por_prioridad": {"Alta": 3},
+        "por_mes": [{"anio": 2024, "mes": 1, "total": 3}],
+        "por_cuadrilla": [{"id_cuadrilla": 1, "nombre": "=Alfa", "asignados": 3, "resueltos": 2}],
+        "por_rubro": [{"rubro": "Plomería", "count": 2, "avg_days": 3.5}],
+        "por_zona": [{"zona": "Norte", "total": 3, "sucursales": 2, "promedio": 1.5}],
+        "por_sucursal": [{"sucursal_id": 1, "sucursal": "Central", "zona": "Norte", "total": 3}],
+    },
+    "preventivos": {"total": 0, "por_estado": {}, "por_mes": [], "por_cuadrilla": []},
+}
+
+
+def test_report_sections_flatten_payload():
+    sections = {title: (headers, rows) for title, headers, rows in reportes.report_sections(DATA)}
+    assert sections["Resumen"][1] == [["Correctivos", 3], ["Preventivos", 0]]
+    assert sections["Correctivos por estado"][1] == [["Finalizado", 2], ["Sin dato", 1]]
+    assert sections["Correctivos por cuadrilla"][1] == [["=Alfa", 3, 2, "0.67"]]
+    assert sections["Preventivos por cuadrilla"][1] == []
+
+
+def test_iter_estadisticas_csv_streams_rows():
+    chunks = list(reportes.iter_estadisticas_csv(DATA))
+    assert len(chunks) > len(reportes.report_sections(DATA))
+    text = b"".join(chunks).decode("utf-8-sig")
+    rows = list(csv.reader(io.StringIO(text)))
+    assert rows[0] == ["Resumen"]
+    assert ["'=Alfa", "3", "2", "0.67"] in rows
+    assert ["Plomería", "2", "3.50"] in rows
+
+
+def test_render_estadisticas_pdf_returns_document():
+    pdf = reportes.render_estadisticas_pdf(DATA, {"zona": "<Norte>", "anios": [2024], "cliente_id": None})
+    assert pdf.startswith(b"%PDF")
+
+
+def test_render_pdf_in_worker_uses_process_pool():
+    try:
+        pdf = asyncio.run(reportes.render_pdf_in_worker(DATA))
+        assert reportes.get_report_executor() is reportes.get_report_executor()
+    finally:
+        reportes.shutdown_report_executor()
+    assert pdf.startswith(b"%PDF")
+    assert reportes._executor is None
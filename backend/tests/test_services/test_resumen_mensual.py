@@ -0,0 +1,88 @@
+from datetime import date
+
+import pytest
+
+from src.api.models import Cliente, MantenimientoCorrectivo, MantenimientoPreventivo, ResumenMensualMantenimiento, Sucursal
+from src.services import resumen_mensual as rm
+
+
+@pytest.fixture
+def sucursal(db_session):
+    cliente = Cliente(nombre="ACME", contacto="Jane", email="acme@example.com")
+    db_session.add(cliente)
+    db_session.commit()
+    sucursal = Sucursal(nombre="Central", zona="Norte", direccion="Dir", superficie="1", cliente_id=cliente.id)
+    db_session.add(sucursal)
+    db_session.commit()
+    return sucursal
+
+
+def _rows(db_session):
+    resumen = ResumenMensualMantenimiento
+    return sorted(
+        db_session.query(resumen.anio, resumen.mes, resumen.zona, resumen.tipo, resumen.estado, resumen.total, resumen.resueltos).all()
+    )
+
+
+def _correctivo(sucursal, estado="Pendiente", apertura=date(2024, 1, 10)):
+    return MantenimientoCorrectivo(
+        cliente_id=sucursal.cliente_id, sucursal_id=sucursal.id, fecha_apertura=apertura, estado=estado, prioridad="Alta",
+    )
+
+
+def test_record_change_moves_between_buckets(db_session, sucursal):
+    first, second = _correctivo(sucursal), _correctivo(sucursal)
+    rm.record_change(db_session, None, rm.rollup_entry(db_session, first, rm.TIPO_CORRECTIVO))
+    rm.record_change(db_session, None, rm.rollup_entry(db_session, second, rm.TIPO_CORRECTIVO))
+    assert _rows(db_session) == [(2024, 1, "Norte", "correctivo", "Pendiente", 2, 0)]
+
+    before = rm.rollup_entry(db_session, first, rm.TIPO_CORRECTIVO)
+    first.estado = "Finalizado"
+    rm.record_change(db_session, before, rm.rollup_entry(db_session, first, rm.TIPO_CORRECTIVO))
+    assert _rows(db_session) == [
+        (2024, 1, "Norte", "correctivo", "Finalizado", 1, 1),
+        (2024, 1, "Norte", "correctivo", "Pendiente", 1, 0),
+    ]
+
+    rm.record_change(db_session, rm.rollup_entry(db_session, second, rm.TIPO_CORRECTIVO), None)
+    assert _rows(db_session) == [(2024, 1, "Norte", "correctivo", "Finalizado", 1, 1)]
+
+
+def test_rollup_entry_skips_maintenances_without_fecha(db_session, sucursal):
+    assert rm.rollup_entry(db_session, _correctivo(sucursal, apertura=None), rm.TIPO_CORRECTIVO) is None
+
+
+def test_rebuild_resumen_recomputes_from_tables(db_session, sucursal):
+    db_session.add_all([
+        _correctivo(sucursal),
+        _correctivo(sucursal, estado="Finalizado"),
+        _correctivo(sucursal, apertura=None),
+        MantenimientoPreventivo(
+            cliente_id=sucursal.cliente_id, sucursal_id=sucursal.id, frecuencia="Mensual",
+            fecha_apertura=date(2024, 2, 1), fecha_cierre=date(2024, 2, 3), estado="Finalizado",
+        ),
+    ])
+    db_session.add(ResumenMensualMantenimiento(anio=1999, mes=1, cliente_id=1, zona="Vieja", tipo="correctivo", total=5))
+    db_session.commit()
+
+    assert rm.rebuild_resumen(db_session) == 3
+    assert _rows(db_session) == [
+        (2024, 1, "Norte", "correctivo", "Finalizado", 1, 1),
+        (2024, 1, "Norte", "correctivo", "Pendiente", 1, 0),
+        (2024, 2, "Norte", "preventivo", "Finalizado", 1, 1),
+    ]
+
+
+def test_move_sucursal_zona_rebuckets_history(db_session, sucursal):
+    db_session.add_all([_correctivo(sucursal), _correctivo(sucursal, estado="Finalizado")])
+    db_session.commit()
+    rm.rebuild_resumen(db_session)
+
+    sucursal.zona = "Sur"
+    rm.move_sucursal_zona(db_session, sucursal.id, "Norte", "Sur")
+    db_session.commit()
+
+    moved = _rows(db_session)
+    rm.rebuild_resumen(db_session)
+    assert moved == _rows(db_session)
+    assert {row[2] for row in moved} == {"Sur"}
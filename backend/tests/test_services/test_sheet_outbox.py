@@ -0,0 +1,143 @@
+import asyncio
+from datetime import date, datetime, timedelta
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.api.models import Cliente, MantenimientoPreventivo, SheetSyncOutbox, Sucursal
+from src.services import sheet_outbox
+
+
+@pytest.fixture
+def preventivos(db_session):
+    cliente = Cliente(nombre="ACME", contacto="Jane", email="acme@example.com")
+    db_session.add(cliente)
+    db_session.commit()
+    sucursal = Sucursal(nombre="Central", zona="Norte", direccion="D", superficie="1", cliente_id=cliente.id)
+    db_session.add(sucursal)
+    db_session.commit()
+    records = [
+        MantenimientoPreventivo(cliente_id=cliente.id, sucursal_id=sucursal.id, frecuencia="Mensual", fecha_apertura=date(2024, m, 1))
+        for m in (1, 2)
+    ]
+    db_session.add_all(records)
+    db_session.commit()
+    return records
+
+
+@pytest.fixture
+def sheets(monkeypatch):
+    fakes = {"apply_changes": MagicMock(), "reset_worksheet_cache": MagicMock()}
+    for name, fake in fakes.items():
+        monkeypatch.setattr(sheet_outbox.google_sheets, name, fake)
+    return fakes
+
+
+def _queue(db_session, *entries):
+    for operacion, mantenimiento_id in entries:
+        sheet_outbox.queue_sheet_sync(db_session, "preventivo", operacion, mantenimiento_id)
+    db_session.commit()
+
+
+def _after_window():
+    return datetime.utcnow() + sheet_outbox.SHEET_SYNC_DEBOUNCE + timedelta(seconds=1)
+
+
+def test_process_coalesces_changes_per_maintenance(db_session, preventivos, sheets):
+    first, second = preventivos
+    first_id, second_id = first.id, second.id
+    written = {}
+
+    # Las filas se arman con la sesión del worker abierta, incluidos los nombres relacionados
+    def apply_changes(tipo, appends, updates, deletes):
+        written.update(
+            appends=[(m.id, m.sucursal.nombre) for m in appends], updates=[m.id for m in updates], deletes=deletes,
+        )
+
+    sheets["apply_changes"].side_effect = apply_changes
+    _queue(
+        db_session,
+        ("append", first_id), ("update", second_id), ("update", first_id), ("update", second_id),
+        ("delete", 99), ("append", 77), ("delete", 77),
+    )
+
+    assert sheet_outbox.process_sheet_outbox(now=_after_window()) == 7
+
+    sheets["apply_changes"].assert_called_once()
+    assert written == {"appends": [(first_id, "Central")], "updates": [second_id], "deletes": [99]}
+    db_session.expire_all()
+    assert db_session.query(SheetSyncOutbox).count() == 0
+
+
+def test_process_waits_for_the_debounce_window(db_session, preventivos, sheets):
+    _queue(db_session, ("update", preventivos[0].id))
+    assert sheet_outbox.process_sheet_outbox() == 0
+    sheets["apply_changes"].assert_not_called()
+    assert sheet_outbox.process_sheet_outbox(flush=True) == 1
+    sheets["apply_changes"].assert_called_once()
+
+
+def test_due_entry_takes_pending_changes_of_the_same_row(db_session, preventivos, sheets):
+    first, second = preventivos
+    updated = []
+    sheets["apply_changes"].side_effect = lambda tipo, updates, **_: updated.extend(m.id for m in updates)
+    _queue(db_session, ("update", first.id))
+    db_session.query(SheetSyncOutbox).update({"next_attempt_at": datetime.utcnow() - timedelta(seconds=1)})
+    db_session.commit()
+    _queue(db_session, ("update", first.id), ("update", second.id))
+
+    assert sheet_outbox.process_sheet_outbox() == 2
+
+    assert updated == [first.id]
+    db_session.expire_all()
+    assert db_session.query(SheetSyncOutbox.mantenimiento_id).all() == [(second.id,)]
+
+
+def test_process_skips_maintenances_deleted_since_queued(db_session, preventivos, sheets):
+    _queue(db_session, ("update", 12345))
+    sheet_outbox.process_sheet_outbox(now=_after_window())
+    assert sheets["apply_changes"].call_args.kwargs["updates"] == []
+    assert db_session.query(SheetSyncOutbox).count() == 0
+
+
+def test_failed_writes_are_retried_with_backoff(db_session, preventivos, sheets):
+    sheets["apply_changes"].side_effect = RuntimeError("quota exceeded")
+    _queue(db_session, ("update", preventivos[0].id))
+    now = _after_window()
+
+    sheet_outbox.process_sheet_outbox(now=now)
+
+    db_session.expire_all()
+    entry = db_session.query(SheetSyncOutbox).one()
+    assert entry.attempts == 1
+    assert entry.last_error == "quota exceeded"
+    assert entry.next_attempt_at == now + sheet_outbox._backoff(1)
+    sheets["reset_worksheet_cache"].assert_called_once()
+
+    # Antes de la espera no se vuelve a intentar
+    assert sheet_outbox.process_sheet_outbox(now=now + timedelta(seconds=1)) == 0
+
+    sheets["apply_changes"].side_effect = None
+    assert sheet_outbox.process_sheet_outbox(now=entry.next_attempt_at) == 1
+    db_session.expire_all()
+    assert db_session.query(SheetSyncOutbox).count() == 0
+
+
+def test_worker_stop_flushes_pending_entries(db_session, preventivos, sheets):
+    _queue(db_session, ("update", preventivos[0].id))
+
+    async def run():
+        worker = sheet_outbox.SheetOutboxWorker(interval=3600)
+        worker._task = asyncio.create_task(asyncio.sleep(3600))
+        await worker.stop()
+
+    asyncio.run(run())
+
+    sheets["apply_changes"].assert_called_once()
+    db_session.expire_all()
+    assert db_session.query(SheetSyncOutbox).count() == 0
+
+
+def test_backoff_is_capped():
+    assert sheet_outbox._backoff(1) < sheet_outbox._backoff(2)
+    assert sheet_outbox._backoff(30) == sheet_outbox.MAX_BACKOFF
@@ -0,0 +1,126 @@
+from datetime import date
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import HTTPException
+from gspread.utils import a1_range_to_grid_range
+
+from src.api.models import Cliente, MantenimientoPreventivo, Sucursal
+from src.services import sheet_reconcile
+
+# El módulo que usa el servicio, para que los monkeypatch lo alcancen
+google_sheets = sheet_reconcile.google_sheets
+HEADER = google_sheets.PREVENTIVO_HEADER
+
+
+class FakeSpreadsheet:
+    def __init__(self, worksheet):
+        self.worksheet = worksheet
+
+    def batch_update(self, body):
+        self.worksheet.calls.append("delete_rows")
+        for request in body["requests"]:
+            grid = request["deleteDimension"]["range"]
+            del self.worksheet.rows[grid["startIndex"]:grid["endIndex"]]
+
+
+class FakeWorksheet:
+    """In-memory worksheet that records one entry per API call."""
+
+    id = 0
+
+    def __init__(self, rows):
+        self.rows = [list(row) for row in rows]
+        self.calls = []
+        self.spreadsheet = FakeSpreadsheet(self)
+
+    def get_all_values(self):
+        self.calls.append("get_all_values")
+        return [list(row) for row in self.rows]
+
+    def batch_update(self, data):
+        self.calls.append("batch_update")
+        for item in data:
+            start = a1_range_to_grid_range(item["range"])["startRowIndex"]
+            for offset, values in enumerate(item["values"]):
+                self.rows[start + offset] = list(values)
+
+    def append_rows(self, rows):
+        self.calls.append("append_rows")
+        self.rows.extend(list(row) for row in rows)
+
+
+@pytest.fixture(autouse=True)
+def sheets_session(monkeypatch):
+    monkeypatch.setattr(google_sheets, "_prepared_sheets", {})
+    monkeypatch.setattr(google_sheets, "_row_indexes", {})
+    monkeypatch.setattr(google_sheets, "_ensure_header", MagicMock())
+
+
+def _use(monkeypatch, worksheet):
+    monkeypatch.setattr(google_sheets, "_get_worksheet", lambda _: worksheet)
+    return worksheet
+
+
+@pytest.fixture
+def preventivos(db_session):
+    cliente = Cliente(nombre="ACME", contacto="Jane", email="acme@example.com")
+    db_session.add(cliente)
+    db_session.commit()
+    sucursal = Sucursal(nombre="Central", zona="Norte", direccion="D", superficie="1", cliente_id=cliente.id)
+    db_session.add(sucursal)
+    db_session.commit()
+    records = [
+        MantenimientoPreventivo(cliente_id=cliente.id, sucursal_id=sucursal.id, frecuencia="Mensual", fecha_apertura=date(2024, m, 1))
+        for m in (1, 2, 3)
+    ]
+    db_session.add_all(records)
+    db_session.commit()
+    return records
+
+
+def test_reconcile_rewrites_only_the_drift(db_session, preventivos, monkeypatch):
+    first, second, third = (google_sheets._build_preventivo_row(m) for m in preventivos)
+    linked = list(first)
+    linked[HEADER.index("planillas_gallery_url")] = "https://files/planillas.html"
+    stale = list(second)
+    stale[HEADER.index("fecha_apertura")] = "2020-01-01"
+    nota = ["nota a mano"] + [""] * (len(HEADER) - 1)
+    borrado = list(third)
+    borrado[-1] = "999"
+    worksheet = _use(monkeypatch, FakeWorksheet([HEADER, linked, stale, borrado, nota, linked]))
+
+    resultado = sheet_reconcile.reconcile_sheets(db_session, ["preventivo"])
+
+    assert resultado == {"preventivo": {"filas": 3, "actualizadas": 1, "agregadas": 1, "eliminadas": 2}}
+    assert worksheet.rows == [HEADER, linked, second, nota, third]
+    assert worksheet.calls == ["get_all_values", "batch_update", "delete_rows", "append_rows"]
+
+    worksheet.calls.clear()
+    resultado = sheet_reconcile.reconcile_sheets(db_session, ["preventivo"])
+    assert resultado["preventivo"] == {"filas": 3, "actualizadas": 0, "agregadas": 0, "eliminadas": 0}
+    assert worksheet.calls == ["get_all_values"]
+
+
+def test_reconcile_large_sheet_in_few_calls(monkeypatch):
+    mantenimientos = [
+        SimpleNamespace(id=i, frecuencia="Mensual", fecha_apertura=date(2024, 1, 1), fecha_cierre=None, extendido=None)
+        for i in range(1, 30001)
+    ]
+    rows = [google_sheets._build_preventivo_row(m) for m in mantenimientos]
+    for row in rows[::3]:
+        row[HEADER.index("frecuencia")] = "Anual"
+    worksheet = _use(monkeypatch, FakeWorksheet([HEADER] + rows[:-500] + [["", "", "", "", "", "", "", "", "", "123456"]]))
+
+    resultado = google_sheets.reconcile_sheet("preventivo", mantenimientos)
+
+    assert resultado == {"filas": 30000, "actualizadas": 9834, "agregadas": 500, "eliminadas": 1}
+    assert worksheet.rows[1:] == [google_sheets._build_preventivo_row(m) for m in mantenimientos]
+    assert len(worksheet.calls) <= 6
+
+
+def test_reconcile_sheets_for_requires_admin(db_session):
+    with pytest.raises(HTTPException) as exc:
+        sheet_reconcile.reconcile_sheets_for(db_session, {"type": "usuario", "data": {"rol": "Encargado de Mantenimiento"}})
+    assert exc.value.status_code == 403
@@ -0,0 +1,70 @@
+from src.services.token_cache import TokenCache
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_cache_hit_and_miss_counters():
+    cache = TokenCache(ttl=60, max_entries=10, clock=FakeClock())
+    assert cache.get("token") is None
+    cache.set("token", {"type": "usuario"})
+    assert cache.get("token") == {"type": "usuario"}
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["size"] == 1
+
+
+def test_token_cache_expires_at_ttl():
+    clock = FakeClock()
+    cache = TokenCache(ttl=60, max_entries=10, clock=clock)
+    cache.set("token", {"type": "usuario"}, exp=clock.now + 3600)
+    clock.now += 61
+    assert cache.get("token") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_token_cache_expires_at_token_exp():
+    clock = FakeClock()
+    cache = TokenCache(ttl=600, max_entries=10, clock=clock)
+    cache.set("token", {"type": "usuario"}, exp=clock.now + 10)
+    clock.now += 11
+    assert cache.get("token") is None
+
+
+def test_token_cache_skips_already_expired_tokens():
+    clock = FakeClock()
+    cache = TokenCache(ttl=600, max_entries=10, clock=clock)
+    cache.set("token", {"type": "usuario"}, exp=clock.now - 1)
+    assert cache.stats()["size"] == 0
+
+
+def test_token_cache_evicts_least_recently_used():
+    cache = TokenCache(ttl=60, max_entries=2, clock=FakeClock())
+    cache.set("a", {"id": 1})
+    cache.set("b", {"id": 2})
+    cache.get("a")
+    cache.set("c", {"id": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"id": 1}
+    assert cache.get("c") == {"id": 3}
+
+
+def test_token_cache_does_not_store_raw_token():
+    cache = TokenCache(ttl=60, max_entries=10, clock=FakeClock())
+    cache.set("secret-token", {"id": 1})
+    assert "secret-token" not in cache._entries
+
+
+def test_token_cache_clear_resets_counters():
+    cache = TokenCache(ttl=60, max_entries=10, clock=FakeClock())
+    cache.set("token", {"id": 1})
+    cache.get("token")
+    cache.clear()
+    assert cache.stats()["hits"] == 0
+    assert cache.stats()["size"] == 0
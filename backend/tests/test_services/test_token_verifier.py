@@ -0,0 +1,171 @@
+import asyncio
+import datetime
+import time
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.auth import crypt, jwt
+
+from src.auth.token_verifier import FirebaseTokenVerifier, _cache_lifetime
+
+PROJECT_ID = "demo-project"
+
+
+def _make_key(kid):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "securetoken")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    signer = crypt.RSASigner.from_string(private_pem, key_id=kid)
+    return signer, cert.public_bytes(serialization.Encoding.PEM).decode()
+
+
+@pytest.fixture(scope="module")
+def keys():
+    return {kid: _make_key(kid) for kid in ("kid-1", "kid-2")}
+
+
+def _token(signer, **overrides):
+    now = int(time.time())
+    payload = {
+        "iss": f"https://securetoken.google.com/{PROJECT_ID}",
+        "aud": PROJECT_ID,
+        "sub": "firebase-uid",
+        "email": "user@example.com",
+        "iat": now,
+        "exp": now + 3600,
+        "auth_time": now,
+    }
+    payload.update(overrides)
+    return jwt.encode(signer, payload).decode()
+
+
+class FakeFetch:
+    def __init__(self, certs, max_age=3600):
+        self.certs = certs
+        self.max_age = max_age
+        self.calls = 0
+
+    def __call__(self, url):
+        self.calls += 1
+        return dict(self.certs), {"Cache-Control": f"public, max-age={self.max_age}, must-revalidate"}
+
+
+def test_verify_valid_token_returns_uid(keys):
+    signer, cert = keys["kid-1"]
+    fetch = FakeFetch({"kid-1": cert})
+    verifier = FirebaseTokenVerifier(project_id=PROJECT_ID, fetch=fetch)
+
+    decoded = verifier.verify(_token(signer))
+
+    assert decoded["uid"] == "firebase-uid"
+    assert decoded["email"] == "user@example.com"
+
+
+def test_certificates_are_cached_for_max_age(keys):
+    signer, cert = keys["kid-1"]
+    fetch = FakeFetch({"kid-1": cert}, max_age=100)
+    now = [time.time()]
+    verifier = FirebaseTokenVerifier(project_id=PROJECT_ID, fetch=fetch, clock=lambda: now[0])
+
+    verifier.verify(_token(signer))
+    verifier.verify(_token(signer))
+    assert fetch.calls == 1
+
+    now[0] += 101
+    verifier.verify(_token(signer))
+    assert fetch.calls == 2
+
+
+def test_token_issued_slightly_in_the_future_is_accepted_within_skew(keys):
+    signer, cert = keys["kid-1"]
+    verifier = FirebaseTokenVerifier(project_id=PROJECT_ID, clock_skew_seconds=30, fetch=FakeFetch({"kid-1": cert}))
+    future = int(time.time()) + 20
+
+    decoded = verifier.verify(_token(signer, iat=future, auth_time=future))
+
+    assert decoded["uid"] == "firebase-uid"
+
+
+def test_token_issued_beyond_skew_is_rejected(keys):
+    signer, cert = keys["kid-1"]
+    verifier = FirebaseTokenVerifier(project_id=PROJECT_ID, clock_skew_seconds=5, fetch=FakeFetch({"kid-1": cert}))
+    future = int(time.time()) + 60
+
+    with pytest.raises(Exception, match="too early"):
+        verifier.verify(_token(signer, iat=future))
+
+
+def test_token_with_wrong_audience_or_issuer_is_rejected(keys):
+    signer, cert = keys["kid-1"]
+    verifier = FirebaseTokenVerifier(project_id=PROJECT_ID, fetch=FakeFetch({"kid-1": cert}))
+
+    with pytest.raises(Exception):
+        verifier.verify(_token(signer, aud="other-project"))
+    with pytest.raises(ValueError, match="Issuer"):
+        verifier.verify(_token(signer, iss="https://securetoken.google.com/other-project"))
+
+
+def test_token_signed_with_unknown_key_is_rejected(keys):
+    signer, _ = keys["kid-1"]
+    _, other_cert = keys["kid-2"]
+    verifier = FirebaseTokenVerifier(project_id=PROJECT_ID, fetch=FakeFetch({"kid-1": other_cert}))
+
+    with pytest.raises(Exception):
+        verifier.verify(_token(signer))
+
+
+def test_unknown_kid_triggers_a_refresh(keys):
+    signer_1, cert_1 = keys["kid-1"]
+    signer_2, cert_2 = keys["kid-2"]
+    fetch = FakeFetch({"kid-1": cert_1})
+    now = [time.time()]
+    verifier = FirebaseTokenVerifier(project_id=PROJECT_ID, fetch=fetch, clock=lambda: now[0])
+    verifier.verify(_token(signer_1))
+
+    fetch.certs = {"kid-1": cert_1, "kid-2": cert_2}
+    now[0] += 61
+    assert verifier.verify(_token(signer_2))["uid"] == "firebase-uid"
+    assert fetch.calls == 2
+
+
+def test_ensure_keys_refreshes_in_worker_thread(keys, monkeypatch):
+    signer, cert = keys["kid-1"]
+    fetch = FakeFetch({"kid-1": cert})
+    verifier = FirebaseTokenVerifier(project_id=PROJECT_ID, fetch=fetch)
+    calls = []
+
+    async def fake_to_thread(func, *args):
+        calls.append(func)
+        return func(*args)
+
+    monkeypatch.setattr("src.auth.token_verifier.asyncio.to_thread", fake_to_thread)
+
+    asyncio.run(verifier.ensure_keys(_token(signer)))
+    asyncio.run(verifier.ensure_keys(_token(signer)))
+
+    assert calls == [verifier.refresh_keys]
+    assert fetch.calls == 1
+
+
+def test_cache_lifetime_parses_max_age_and_age():
+    assert _cache_lifetime({"Cache-Control": "public, max-age=19000"}) == 19000
+    assert _cache_lifetime({"cache-control": "max-age=100", "Age": "40"}) == 60
+    assert _cache_lifetime({}) == 3600
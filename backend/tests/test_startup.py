@@ -0,0 +1,71 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from fastapi.testclient import TestClient
+
+import src.api.routes as routes
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+# Presupuesto de importación de la aplicación (segundos, medido en frío en un subproceso)
+IMPORT_TIME_BUDGET = float(os.getenv("IMPORT_TIME_BUDGET", "5"))
+
+IMPORT_PROBE = """
+import json, time
+start = time.perf_counter()
+import api.routes
+elapsed = time.perf_counter() - start
+import firebase_admin
+import services.gcloud_storage as gcloud_storage
+print(json.dumps({
+    "seconds": elapsed,
+    "firebase_apps": len(firebase_admin._apps),
+    "storage_client": gcloud_storage._storage_client is not None,
+}))
+"""
+
+
+def test_import_has_no_side_effects_and_fits_budget(tmp_path):
+    db_path = tmp_path / "fresh.db"
+    env = dict(
+        os.environ,
+        TESTING="true",
+        DATABASE_URL=f"sqlite:///{db_path}",
+        GOOGLE_CREDENTIALS=json.dumps({"project_id": "demo"}),
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE],
+        cwd=SRC_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    probe = json.loads(result.stdout.strip().splitlines()[-1])
+
+    assert not db_path.exists()
+    assert probe["firebase_apps"] == 0
+    assert probe["storage_client"] is False
+    assert probe["seconds"] < IMPORT_TIME_BUDGET, f"import took {probe['seconds']:.2f}s"
+
+
+def test_lifespan_bootstraps_schema(monkeypatch):
+    bootstrap = MagicMock(return_value=[])
+    monkeypatch.setattr(routes, "bootstrap_schema", bootstrap)
+    monkeypatch.setattr(routes, "DB_BOOTSTRAP_ON_STARTUP", True)
+
+    with TestClient(routes.app):
+        bootstrap.assert_called_once_with()
+
+
+def test_lifespan_skips_bootstrap_when_disabled(monkeypatch):
+    bootstrap = MagicMock(return_value=[])
+    monkeypatch.setattr(routes, "bootstrap_schema", bootstrap)
+    monkeypatch.setattr(routes, "DB_BOOTSTRAP_ON_STARTUP", False)
+
+    with TestClient(routes.app):
+        pass
+    bootstrap.assert_not_called()
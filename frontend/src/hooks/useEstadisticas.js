@@ -1,20 +1,14 @@
 import React, { useState, useEffect, useMemo, useCallback } from 'react';
 import { getCuadrillas } from '../services/cuadrillaService';
-import { getMantenimientosCorrectivos } from '../services/mantenimientoCorrectivoService';
-import { getMantenimientosPreventivos } from '../services/mantenimientoPreventivoService';
+import { downloadEstadisticasPdf, getEstadisticas } from '../services/estadisticasService';
 import { getSucursales } from '../services/sucursalService';
 import { getZonas } from '../services/zonaService';
 import { getClientes } from '../services/clienteService';
-import html2canvas from 'html2canvas';
-import jsPDF from 'jspdf';
-import logoImg from '../assets/logo_inversur.png';
 
 const useEstadisticas = () => {
   const [selectedMonths, setSelectedMonths] = useState([]);
   const [selectedYears, setSelectedYears] = useState([]);
   const [cuadrillas, setCuadrillas] = useState([]);
-  const [correctivos, setCorrectivos] = useState([]);
-  const [preventivos, setPreventivos] = useState([]);
   const [zonas, setZonas] = useState([]);
   const [sucursales, setSucursales] = useState([]);
   const [estadisticasData, setEstadisticasData] = useState({});
@@ -27,22 +21,16 @@ const useEstadisticas = () => {
       try {
         const [
           cuadrillasRes,
-          correctivosRes,
-          preventivosRes,
           zonasRes,
           sucursalesRes,
           clientesRes,
         ] = await Promise.all([
           getCuadrillas(),
-          getMantenimientosCorrectivos(),
-          getMantenimientosPreventivos(),
           getZonas(),
           getSucursales(),
           getClientes(),
         ]);
         setCuadrillas(cuadrillasRes.data);
-        setCorrectivos(correctivosRes.data);
-        setPreventivos(preventivosRes.data);
         setZonas(zonasRes.data);
         setSucursales(sucursalesRes.data);
         setClientes(clientesRes.data || []);
@@ -55,236 +43,105 @@ const useEstadisticas = () => {
     fetchData();
   }, []);
 
-  const sucursalMap = useMemo(() => {
-    const map = {};
-    sucursales.forEach((s) => {
-      map[s.id] = s;
-    });
-    return map;
-  }, [sucursales]);
-
-  const filterByMonthYear = useCallback((items, dateField) => {
-    return items.filter(item => {
-      const rawDate = item[dateField];
-      if (!rawDate) return false;
-
-      const date = new Date(rawDate);
-      if (isNaN(date)) return false;
-
-      const monthValue = `${date.getMonth() + 1}`;
-      const yearValue = `${date.getFullYear()}`;
-      const matchesMonth = selectedMonths.length ? selectedMonths.includes(monthValue) : true;
-      const matchesYear = selectedYears.length ? selectedYears.includes(yearValue) : true;
+  // Los agregados se calculan en el backend con GROUP BY; acá solo se arman los filtros de cada sección
+  const sectionParams = (filters = {}, extra = {}) => {
+    const params = { ...extra };
+    if (filters.cliente) params.cliente_id = filters.cliente;
+    if (filters.zona) params.zona = filters.zona;
+    if (filters.sucursal) params.sucursal_id = filters.sucursal;
+    if (filters.cuadrilla) params.id_cuadrilla = filters.cuadrilla;
+    if (filters.estado) params.estado = filters.estado;
+    return params;
+  };
 
-      return matchesMonth && matchesYear;
-    });
+  const periodParams = useCallback(() => {
+    const params = {};
+    if (selectedMonths.length) params.meses = selectedMonths;
+    if (selectedYears.length) params.anios = selectedYears;
+    return params;
   }, [selectedMonths, selectedYears]);
 
-  const applyFilters = useCallback((items, filters = {}, dateField = 'fecha_apertura') => {
-    let filtered = filterByMonthYear(items, dateField);
-    const {
-      cliente: clienteFilter,
-      zona: zonaFilter,
-      sucursal: sucursalFilter,
-      cuadrilla: cuadrillaFilter,
-      estado: estadoFilter,
-    } = filters;
-
-    if (clienteFilter) {
-      filtered = filtered.filter((item) => {
-        const sucursal = sucursalMap[item.id_sucursal];
-        return sucursal && String(sucursal.cliente_id) === clienteFilter;
-      });
-    }
-    if (zonaFilter) {
-      filtered = filtered.filter((item) => {
-        const sucursal = sucursalMap[item.id_sucursal];
-        return sucursal?.zona === zonaFilter;
-      });
-    }
-    if (sucursalFilter) {
-      filtered = filtered.filter((item) => String(item.id_sucursal) === sucursalFilter);
-    }
-    if (cuadrillaFilter) {
-      filtered = filtered.filter((item) => String(item.id_cuadrilla) === cuadrillaFilter);
-    }
-    if (estadoFilter) {
-      filtered = filtered.filter((item) => item.estado === estadoFilter);
-    }
-    return filtered;
-  }, [filterByMonthYear, sucursalMap]);
-
-  const generatePreventivoReport = useCallback((filters = {}) => {
-    const filteredPreventivos = applyFilters(preventivos, filters, 'fecha_apertura');
-    if (filteredPreventivos.length === 0) return [];
-
-    const targetCuadrillas = filters.cuadrilla
-      ? cuadrillas.filter((cuadrilla) => String(cuadrilla.id) === filters.cuadrilla)
-      : cuadrillas.filter((cuadrilla) => filteredPreventivos.some((p) => p.id_cuadrilla === cuadrilla.id));
-
-    return targetCuadrillas
-      .map((cuadrilla) => {
-        const asignados = filteredPreventivos.filter((p) => p.id_cuadrilla === cuadrilla.id).length;
-        if (asignados === 0) {
-          return null;
-        }
-        const resueltos = filteredPreventivos.filter((p) => p.id_cuadrilla === cuadrilla.id && p.fecha_cierre).length;
-        return {
-          nombre: cuadrilla.nombre,
-          ratio: asignados ? (resueltos / asignados).toFixed(2) : 0,
-          resueltos,
-          asignados,
-        };
-      })
-      .filter(Boolean);
-  }, [applyFilters, cuadrillas, preventivos]);
-
-  const generateCorrectivoReport = useCallback((filters = {}) => {
-    const filteredCorrectivos = applyFilters(correctivos, filters, 'fecha_apertura');
-    if (filteredCorrectivos.length === 0) return [];
-
-    const targetCuadrillas = filters.cuadrilla
-      ? cuadrillas.filter((cuadrilla) => String(cuadrilla.id) === filters.cuadrilla)
-      : cuadrillas.filter((cuadrilla) => filteredCorrectivos.some((c) => c.id_cuadrilla === cuadrilla.id));
-
-    return targetCuadrillas
-      .map((cuadrilla) => {
-        const asignados = filteredCorrectivos.filter((c) => c.id_cuadrilla === cuadrilla.id).length;
-        if (asignados === 0) {
-          return null;
-        }
-        const resueltos = filteredCorrectivos.filter((c) => c.id_cuadrilla === cuadrilla.id && c.estado === 'Finalizado').length;
-        return {
-          nombre: cuadrilla.nombre,
-          ratio: asignados ? (resueltos / asignados).toFixed(2) : 0,
-          resueltos,
-          asignados,
-        };
-      })
-      .filter(Boolean);
-  }, [applyFilters, cuadrillas, correctivos]);
-
-  const generateRubroReport = useCallback((filters = {}) => {
-    const filtered = applyFilters(
-      correctivos.filter((c) => c.estado === 'Finalizado'),
-      filters,
-      'fecha_apertura'
-    );
-    const rubros = [...new Set(filtered.map(c => c.rubro))];
-    const report = rubros.map(rubro => {
-      const items = filtered.filter(c => c.rubro === rubro);
-      const days = items.map(c => (new Date(c.fecha_cierre) - new Date(c.fecha_apertura)) / (1000 * 60 * 60 * 24));
-      const avgDays = days.length ? (days.reduce((a, b) => a + b, 0) / days.length).toFixed(2) : 0;
-      return { rubro, avgDays, count: items.length };
+  // Los rubros se miden sobre correctivos finalizados, en pantalla y en el PDF
+  const sectionRequests = (filtersBySection = {}) => [
+    { seccion: 'preventivos', params: sectionParams(filtersBySection.preventivos) },
+    { seccion: 'correctivos', params: sectionParams(filtersBySection.correctivos) },
+    { seccion: 'rubros', params: sectionParams(filtersBySection.rubros, { estado: 'Finalizado' }) },
+    { seccion: 'zonas', params: sectionParams(filtersBySection.zonas) },
+    { seccion: 'sucursales', params: sectionParams(filtersBySection.sucursales) },
+  ];
+
+  // Una consulta por cada combinación distinta de filtros, pidiendo solo las secciones que se muestran
+  const fetchSections = useCallback(async (requests) => {
+    const groups = new Map();
+    requests.forEach(({ seccion, params }) => {
+      const key = JSON.stringify(params);
+      if (!groups.has(key)) groups.set(key, { params, secciones: [] });
+      groups.get(key).secciones.push(seccion);
     });
-    const totalAvgDays = filtered.length
-      ? (filtered.reduce((sum, c) => sum + (new Date(c.fecha_cierre) - new Date(c.fecha_apertura)) / (1000 * 60 * 60 * 24), 0) / filtered.length).toFixed(2)
-      : 0;
-    const totalCount = filtered.length;
-
-    return { rubros: report, totalAvgDays, totalCount };
-  }, [applyFilters, correctivos]);
-
-  const generateZonaReport = useCallback((filters = {}) => {
-    const filtered = applyFilters(correctivos, filters, 'fecha_apertura');
-    if (filtered.length === 0) return [];
-
-    const zoneMap = new Map();
-
-    filtered.forEach((item) => {
-      const sucursal = sucursalMap[item.id_sucursal];
-      if (!sucursal) return;
-      const zoneName = sucursal.zona || 'Sin zona';
-
-      if (!zoneMap.has(zoneName)) {
-        const relevantSucursales = sucursales.filter((s) => {
-          if (s.zona !== zoneName) return false;
-          if (filters.cliente && String(s.cliente_id) !== filters.cliente) return false;
-          if (filters.sucursal && String(s.id) !== filters.sucursal) return false;
-          return true;
-        });
-
-        zoneMap.set(zoneName, {
-          zona: zoneName,
-          totalCorrectivos: 0,
-          sucursalesCount: relevantSucursales.length || 1,
-        });
-      }
-
-      const entry = zoneMap.get(zoneName);
-      entry.totalCorrectivos += 1;
+    const results = await Promise.all(
+      [...groups.values()].map(({ params, secciones }) =>
+        getEstadisticas({ ...params, secciones }).then((res) => ({ secciones, data: res.data }))
+      )
+    );
+    const bySection = {};
+    results.forEach(({ secciones, data }) => {
+      secciones.forEach((seccion) => { bySection[seccion] = data; });
     });
+    return bySection;
+  }, []);
 
-    if (filters.zona) {
-      const filteredZone = zoneMap.get(filters.zona);
-      return filteredZone
-        ? [{
-          zona: filteredZone.zona,
-          totalCorrectivos: filteredZone.totalCorrectivos,
-          avgCorrectivos: (filteredZone.totalCorrectivos / filteredZone.sucursalesCount).toFixed(2),
-        }]
-        : [];
-    }
-
-    return Array.from(zoneMap.values()).map((entry) => ({
-      zona: entry.zona,
-      totalCorrectivos: entry.totalCorrectivos,
-      avgCorrectivos: (entry.totalCorrectivos / entry.sucursalesCount).toFixed(2),
+  const toCuadrillaReport = (rows) =>
+    rows.map((row) => ({
+      nombre: row.nombre,
+      ratio: row.asignados ? (row.resueltos / row.asignados).toFixed(2) : 0,
+      resueltos: row.resueltos,
+      asignados: row.asignados,
     }));
-  }, [applyFilters, correctivos, sucursalMap, sucursales]);
-
-  const generateSucursalReport = useCallback((filters = {}) => {
-    const filtered = applyFilters(correctivos, filters, 'fecha_apertura');
-    if (filtered.length === 0) return [];
-
-    const totals = {};
-
-    filtered.forEach((item) => {
-      const sucursal = sucursalMap[item.id_sucursal];
-      if (!sucursal) return;
-
-      if (!totals[sucursal.id]) {
-        totals[sucursal.id] = {
-          sucursal: sucursal.nombre,
-          zona: sucursal.zona,
-          totalCorrectivos: 0,
-        };
-      }
 
-      totals[sucursal.id].totalCorrectivos += 1;
-    });
-
-    return Object.values(totals);
-  }, [applyFilters, correctivos, sucursalMap]);
+  const toRubroReport = (rows) => {
+    const totalCount = rows.reduce((sum, row) => sum + row.count, 0);
+    const totalDays = rows.reduce((sum, row) => sum + row.avg_days * row.count, 0);
+    return {
+      rubros: rows.map((row) => ({ rubro: row.rubro, avgDays: row.avg_days.toFixed(2), count: row.count })),
+      totalAvgDays: totalCount ? (totalDays / totalCount).toFixed(2) : 0,
+      totalCount,
+    };
+  };
 
-  const handleGenerateEstadisticas = useCallback((filtersBySection = {}) => {
+  const handleGenerateEstadisticas = useCallback(async (filtersBySection = {}) => {
     if (isLoadingData) {
       return;
     }
 
-    const normalizedFilters = {
-      preventivos: filtersBySection.preventivos || {},
-      correctivos: filtersBySection.correctivos || {},
-      rubros: filtersBySection.rubros || {},
-      zonas: filtersBySection.zonas || {},
-      sucursales: filtersBySection.sucursales || {},
-    };
-
-    setEstadisticasData({
-      preventivos: generatePreventivoReport(normalizedFilters.preventivos),
-      correctivos: generateCorrectivoReport(normalizedFilters.correctivos),
-      rubros: generateRubroReport(normalizedFilters.rubros),
-      zonas: generateZonaReport(normalizedFilters.zonas),
-      sucursales: generateSucursalReport(normalizedFilters.sucursales),
-    });
-  }, [
-    generatePreventivoReport,
-    generateCorrectivoReport,
-    generateRubroReport,
-    generateZonaReport,
-    generateSucursalReport,
-    isLoadingData,
-  ]);
+    try {
+      const {
+        preventivos: preventivosRes,
+        correctivos: correctivosRes,
+        rubros: rubrosRes,
+        zonas: zonasRes,
+        sucursales: sucursalesRes,
+      } = await fetchSections(
+        sectionRequests(filtersBySection).map(({ seccion, params }) => ({ seccion, params: { ...params, ...periodParams() } }))
+      );
+      setEstadisticasData({
+        preventivos: toCuadrillaReport(preventivosRes.preventivos.por_cuadrilla),
+        correctivos: toCuadrillaReport(correctivosRes.correctivos.por_cuadrilla),
+        rubros: toRubroReport(rubrosRes.correctivos.por_rubro),
+        zonas: zonasRes.correctivos.por_zona.map((row) => ({
+          zona: row.zona,
+          totalCorrectivos: row.total,
+          avgCorrectivos: row.promedio.toFixed(2),
+        })),
+        sucursales: sucursalesRes.correctivos.por_sucursal.map((row) => ({
+          sucursal: row.sucursal,
+          zona: row.zona,
+          totalCorrectivos: row.total,
+        })),
+      });
+    } catch (error) {
+      console.error('Error al generar estadísticas', error);
+    }
+  }, [fetchSections, isLoadingData, periodParams]);
 
   const generatePieChartData = (report, type) => {
     return report.map(item => ({
@@ -321,98 +178,28 @@ const useEstadisticas = () => {
     setSelectedYears(years);
   }, [months, years]);
 
-  const handleDownloadEstadisticas = async () => {
-    const reportElement = document.querySelector('.reports-container');
-
-    if (!reportElement) {
-      alert('No se encontró el contenido de las estadísticas.');
-      return;
-    }
-
-    const canvas = await html2canvas(reportElement, {
-      scale: 2,
-      useCORS: true,
-      scrollY: -window.scrollY,
-    });
-
-    const pdf = new jsPDF('p', 'mm', 'a4');
-
-    const pageWidth = pdf.internal.pageSize.getWidth();
-    const pageHeight = pdf.internal.pageSize.getHeight();
-
-    const marginTop = 28;  // Espacio para navbar/logo
-    const marginBottom = 10; // Espacio inferior
-    const usableHeight = pageHeight - marginTop - marginBottom - 3;
-
-    const imgWidth = pageWidth;
-    const imgHeight = (canvas.height * imgWidth) / canvas.width;
-
-    const canvasToPDFRatio = canvas.height / imgHeight;
-    const pageCanvasHeight = usableHeight * canvasToPDFRatio;
-
-    const overlapPx = 50; // cantidad de píxeles para superposición entre páginas
-    const totalPages = Math.ceil((canvas.height - overlapPx) / (pageCanvasHeight - overlapPx));
-
-    let currentYOffset;
-
-    if (window.innerWidth > 1024) {
-      currentYOffset = canvas.height * 0.025; // offset para PC
-    } else {
-      currentYOffset = 0; // offset para móvil/tablet
-    }
-
-    for (let page = 0; page < totalPages; page++) {
-      const pageCanvas = document.createElement('canvas');
-      const context = pageCanvas.getContext('2d');
-
-      pageCanvas.width = canvas.width;
-      pageCanvas.height = pageCanvasHeight;
-
-      context.drawImage(
-        canvas,
-        0, currentYOffset,
-        canvas.width, pageCanvasHeight,
-        0, 0,
-        canvas.width, pageCanvasHeight
-      );
-
-      const pageImgData = pageCanvas.toDataURL('image/png');
-
-      if (page > 0) pdf.addPage();
-
-      // Barra superior
-      pdf.setFillColor('#2c2c2c');
-      pdf.rect(0, 0, pageWidth, marginTop - 3, 'F');
-
-      // Logo centrado
-      const logoWidth = 33.33;
-      const logoHeight = 15;
-      const logoX = (pageWidth - logoWidth) / 2;
-      const logoY = 5;
-
-      pdf.addImage(logoImg, 'PNG', logoX, logoY, logoWidth, logoHeight);
-
-      // Imagen de contenido
-      pdf.addImage(
-        pageImgData,
-        'PNG',
-        0,
-        marginTop,
-        imgWidth,
-        usableHeight
-      );
-
-      // Barra inferior
-      pdf.setFillColor('#2c2c2c');
-      pdf.rect(0, pageHeight - marginBottom, pageWidth, marginBottom, 'F');
+  // El PDF se genera en el backend con los mismos filtros por sección que muestra la pantalla
+  const handleDownloadEstadisticas = async (filtersBySection = {}) => {
+    const secciones = Object.fromEntries(
+      sectionRequests(filtersBySection).map(({ seccion, params }) => [seccion, params])
+    );
 
-      // Aumentar el offset para la siguiente página, aplicando superposición
-      currentYOffset += pageCanvasHeight - overlapPx;
+    try {
+      const response = await downloadEstadisticasPdf({ ...periodParams(), secciones });
+      const now = new Date();
+      const fileName = `Estadisticas_${now.toLocaleDateString().replace(/\//g, '-')}_${now.toLocaleTimeString().replace(/:/g, '-')}.pdf`;
+      const url = URL.createObjectURL(response.data);
+      const link = document.createElement('a');
+      link.href = url;
+      link.download = fileName;
+      document.body.appendChild(link);
+      link.click();
+      link.remove();
+      URL.revokeObjectURL(url);
+    } catch (error) {
+      console.error('Error al descargar estadísticas', error);
+      alert('No se pudo generar el reporte de estadísticas.');
     }
-
-    const now = new Date();
-    const fileName = `Estadisticas_${now.toLocaleDateString().replace(/\//g, '-')}_${now.toLocaleTimeString().replace(/:/g, '-')}.pdf`;
-    pdf.save(fileName);
   };
 
   return { 
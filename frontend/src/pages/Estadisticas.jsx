@@ -246,7 +246,7 @@ const Estadisticas = () => {
               </div>
             </div>
             <div className="report-actions">
-              <button onClick={handleDownloadEstadisticas} className="download-button">
+              <button onClick={() => handleDownloadEstadisticas(filtersPayload)} className="download-button">
                 Descargar Estadísticas
               </button>
             </div>
@@ -0,0 +1,9 @@
+import api from './api';
+
+// FastAPI espera listas como meses=1&meses=2, sin corchetes
+export const getEstadisticas = (params = {}) =>
+  api.get('/estadisticas/', { params, paramsSerializer: { indexes: null } });
+
+// Los filtros de cada sección viajan en el cuerpo: no entran en una query string plana
+export const downloadEstadisticasPdf = (payload) =>
+  api.post('/estadisticas/reporte.pdf', payload, { responseType: 'blob' });
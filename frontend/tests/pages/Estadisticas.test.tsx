@@ -106,7 +106,10 @@ describe('Página de Estadísticas', () => {
 
     const downloadButton = screen.getByRole('button', { name: /Descargar Estadísticas/i });
     fireEvent.click(downloadButton);
-    expect(mockUseEstadisticasReturn.handleDownloadEstadisticas).toHaveBeenCalledTimes(1);
+    expect(mockUseEstadisticasReturn.handleDownloadEstadisticas).toHaveBeenCalledWith({
+      ...defaultFilterPayload,
+      preventivos: { cliente: '1', zona: '', sucursal: '', cuadrilla: '' },
+    });
   });
 
   it('muestra las secciones de estadísticas cuando hay datos', () => {